@@ -1,47 +1,168 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, or_, case, select, union
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
+from ....core.cache import response_cache
+from ....core.config import settings
 from ....core.database import get_db
+from ....core.heatmaps import SOURCES as HEATMAP_SOURCES, heatmap_window, usage_heatmap
+from ....core.leaderboard import department_leaderboard, rank_history
+from ....core.metrics import metrics
+from ....core.review_stats import review_summary
+from ....core.timeseries import build_series, timeframe_bounds
+from ....core.unique_visitors import unique_visitor_counts
 from ....models import (
     User, Document, Department, Review, Download, 
-    DocumentStatus
+    DocumentStatus, DailyActivityRollup, DocumentStatusRollup, DocumentImpact
 )
 
 router = APIRouter()
 
+PERFORMANCE_WINDOWS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+ACTIVITY_METRICS = ("uploads", "downloads", "approvals", "registrations")
+
 @router.get("/overview")
 async def get_analytics_overview(
     role: str = Query("student"),
     department_id: Optional[str] = Query(None),
-    timeframe: str = Query("30d"),  # 7d, 30d, 90d, 1y
-    db: Session = Depends(get_db)
+    timeframe: str = Query("30d")  # 7d, 30d, 90d, 1y
 ):
     """
     Get comprehensive analytics overview
     """
     try:
-        # Calculate date range
-        days = _parse_timeframe(timeframe)
-        start_date = datetime.now() - timedelta(days=days)
+        return await response_cache.get_or_compute(
+            "analytics.overview",
+            lambda db: compute_analytics_overview(db, role, department_id, timeframe),
+            role=role,
+            department_id=department_id if role in ("supervisor", "staff") else None,
+            timeframe=timeframe
+        )
         
-        analytics = {}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get analytics: {str(e)}")
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """
+    Hit ratios of the response cache, per cached endpoint
+    """
+    return {"backend": type(response_cache.backend).__name__, "endpoints": response_cache.stats()}
+
+@router.get("/unique-visitors")
+async def get_unique_visitors(
+    department_ids: Optional[str] = Query(None),  # Comma-separated; every department when omitted
+    days: Optional[int] = Query(None, ge=1, le=366),  # All time when omitted
+    db: Session = Depends(get_db)
+):
+    """
+    Estimated distinct viewers and downloaders across one or more departments
+    """
+    try:
+        scope_ids = [value.strip() for value in department_ids.split(",") if value.strip()] if department_ids else None
+        return {"department_ids": scope_ids, "days": days, **unique_visitor_counts(db, "department", scope_ids, days)}
         
-        if role == "admin":
-            analytics = await _get_admin_analytics(db, start_date)
-        elif role == "supervisor":
-            analytics = await _get_supervisor_analytics(db, start_date, department_id)
-        elif role == "staff":
-            analytics = await _get_staff_analytics(db, start_date, department_id)
-        else:  # student
-            analytics = await _get_student_analytics(db, start_date)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get unique visitors: {str(e)}")
+
+@router.get("/departments/leaderboard")
+async def get_department_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    department_id: Optional[str] = Query(None),  # Also return this department's entry, wherever it ranks
+    db: Session = Depends(get_db)
+):
+    """
+    Departments ranked by time-decayed uploads, approvals and downloads
+    """
+    try:
+        if department_leaderboard.refreshed_at is None:
+            department_leaderboard.refresh(db)
+        return {
+            "entries": department_leaderboard.top(limit),
+            "department": department_leaderboard.entry(department_id) if department_id else None,
+            "total_departments": len(department_leaderboard),
+            "half_life_days": settings.LEADERBOARD_HALF_LIFE_DAYS,
+            "refreshed_at": datetime.fromtimestamp(department_leaderboard.refreshed_at).isoformat()
+        }
         
-        return analytics
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get department leaderboard: {str(e)}")
+
+@router.get("/departments/{department_id}/rank-history")
+async def get_department_rank_history(
+    department_id: str,
+    days: int = Query(90, ge=1, le=730),
+    db: Session = Depends(get_db)
+):
+    """
+    Daily leaderboard rank snapshots of one department
+    """
+    try:
+        return {"department_id": department_id, "history": rank_history(db, department_id, days)}
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get rank history: {str(e)}")
+
+@router.get("/citations/impact")
+async def get_citation_impact(
+    department_id: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Approved documents ranked by PageRank-style citation impact
+    """
+    try:
+        query = db.query(DocumentImpact, Document.title).join(Document, DocumentImpact.document_id == Document.id)
+        if department_id:
+            query = query.filter(DocumentImpact.department_id == department_id)
+        return {
+            "department_id": department_id,
+            "documents": [
+                {
+                    "document_id": impact.document_id,
+                    "title": title,
+                    "rank": impact.rank,
+                    "impact_score": impact.impact_score,
+                    "citation_count": impact.citation_count
+                }
+                for impact, title in query.order_by(DocumentImpact.rank).limit(limit)
+            ]
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get citation impact: {str(e)}")
+
+@router.get("/heatmap")
+async def get_usage_heatmap(
+    source: str = Query("downloads"),  # downloads, audit
+    days: int = Query(90, ge=1, le=3660),
+    department_id: Optional[str] = Query(None),
+    utc_offset_minutes: int = Query(0, ge=-720, le=840),  # Shift to local time before binning
+    db: Session = Depends(get_db)
+):
+    """
+    Downloads or audited actions by day of week and hour of day, overall and per department
+    """
+    if source not in HEATMAP_SOURCES:
+        raise HTTPException(status_code=400, detail=f"Unsupported source: {source}. Use downloads or audit")
+    try:
+        start, end = heatmap_window(days)
+        return await response_cache.get_or_compute(
+            "analytics.heatmap",
+            lambda db: usage_heatmap(db, source, start, end, department_id, utc_offset_minutes),
+            ttl=settings.HEATMAP_CACHE_TTL,
+            source=source,
+            start=start.date(),
+            end=end.date(),
+            department_id=department_id,
+            utc_offset_minutes=utc_offset_minutes
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get usage heatmap: {str(e)}")
 
 @router.get("/charts/uploads")
 async def get_upload_trends(
@@ -54,37 +175,32 @@ async def get_upload_trends(
     Get document upload trends over time
     """
     try:
-        days = _parse_timeframe(timeframe)
-        start_date = datetime.now() - timedelta(days=days)
-        
-        # Query uploads by date
-        query = db.query(
-            func.date(Document.upload_date).label('date'),
-            func.count(Document.id).label('count')
-        ).filter(Document.upload_date >= start_date)
-        
-        # Apply role-based filtering
-        if role == "supervisor" and department_id:
-            query = query.filter(Document.department_id == department_id)
-        elif role == "staff" and department_id:
-            query = query.filter(Document.department_id == department_id)
-        elif role == "student":
-            query = query.filter(Document.uploader_id == "mock-user-id")
-        
-        results = query.group_by(func.date(Document.upload_date)).all()
-        
-        chart_data = []
-        for date, count in results:
-            chart_data.append({
-                "date": date.isoformat(),
-                "uploads": count
-            })
-        
-        return {"chart_data": chart_data}
+        return compute_upload_trends(db, role, department_id, timeframe)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get upload trends: {str(e)}")
 
+@router.get("/charts/activity")
+async def get_activity_trends(
+    role: str = Query("student"),
+    department_id: Optional[str] = Query(None),
+    timeframe: str = Query("30d"),
+    metric_names: str = Query(",".join(ACTIVITY_METRICS), alias="metrics"),  # Comma-separated subset of ACTIVITY_METRICS
+    db: Session = Depends(get_db)
+):
+    """
+    Gap-filled activity series (with moving averages) for several metrics at once
+    """
+    requested = [name.strip() for name in metric_names.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in ACTIVITY_METRICS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown) or metric_names}")
+    try:
+        return compute_activity_series(db, role, department_id, timeframe, requested)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get activity trends: {str(e)}")
+
 @router.get("/charts/categories")
 async def get_category_distribution(
     role: str = Query("student"),
@@ -138,32 +254,7 @@ async def get_status_distribution(
     Get document distribution by status
     """
     try:
-        days = _parse_timeframe(timeframe)
-        start_date = datetime.now() - timedelta(days=days)
-        
-        query = db.query(
-            Document.status,
-            func.count(Document.id).label('count')
-        ).filter(Document.upload_date >= start_date)
-        
-        # Apply role-based filtering
-        if role == "supervisor" and department_id:
-            query = query.filter(Document.department_id == department_id)
-        elif role == "staff" and department_id:
-            query = query.filter(Document.department_id == department_id)
-        elif role == "student":
-            query = query.filter(Document.uploader_id == "mock-user-id")
-        
-        results = query.group_by(Document.status).all()
-        
-        chart_data = []
-        for status, count in results:
-            chart_data.append({
-                "status": status.value,
-                "count": count
-            })
-        
-        return {"chart_data": chart_data}
+        return compute_status_distribution(db, role, department_id, timeframe)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get status distribution: {str(e)}")
@@ -172,32 +263,142 @@ async def get_status_distribution(
 async def get_performance_metrics(
     role: str = Query("student"),
     department_id: Optional[str] = Query(None),
+    window: str = Query("5m"),  # 1m, 5m, 15m, 1h
     db: Session = Depends(get_db)
 ):
     """
     Get system performance metrics
     """
     try:
-        metrics = {
-            "avg_upload_time": "2.3s",  # Mock data
-            "avg_review_time": "48h",
-            "approval_rate": 85.7,
-            "user_satisfaction": 4.2,
-            "storage_efficiency": 92.1,
-            "api_response_time": "245ms",
-            "uptime": "99.9%",
-            "active_users_24h": 127,
-            "peak_concurrent_users": 45,
-            "bandwidth_usage": "2.4 GB"
+        summary = metrics.summary(PERFORMANCE_WINDOWS.get(window, 300))
+        overall = summary["overall"]
+        upload = summary["routes"].get("POST /api/v1/documents/upload")
+        
+        # Users who uploaded or downloaded anything in the last day
+        since = datetime.now() - timedelta(hours=24)
+        active_users = db.query(func.count()).select_from(union(
+            select(Document.uploader_id).where(Document.upload_date >= since),
+            select(Download.user_id).where(Download.download_timestamp >= since)
+        ).subquery()).scalar()
+        reviews = review_summary(db, "department", department_id)  # All departments when none is given
+        
+        performance = {
+            "avg_upload_time": f"{upload['p50_ms'] / 1000:.1f}s" if upload else None,
+            "avg_review_time": f"{reviews['avg_turnaround_hours']:.0f}h" if reviews["completed_reviews"] else None,
+            "approval_rate": reviews["approval_rate"],
+            "api_response_time": f"{overall['p50_ms']:.0f}ms",
+            "uptime": _format_uptime(summary["uptime_seconds"]),
+            "active_users_24h": active_users,
+            "peak_concurrent_users": summary["peak_websocket_connections"],
+            "bandwidth_usage": _format_bytes(overall["bytes_sent"])
         }
         
-        return {"metrics": metrics}
+        return {
+            "metrics": performance,
+            "latency": overall,
+            "routes": summary["routes"],
+            "window_seconds": summary["window_seconds"],
+            "in_flight_requests": summary["in_flight"],
+            "websocket_connections": summary["websocket_connections"]
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get performance metrics: {str(e)}")
 
 # Helper functions
 
+def compute_activity_series(
+    db: Session, role: str, department_id: Optional[str], timeframe: str, names: List[str]
+) -> Dict[str, Any]:
+    """
+    Daily activity over ``timeframe`` bucketed by day, week or month, with
+    empty buckets filled in. All metrics come from one rollup query.
+    """
+    start, end = timeframe_bounds(_parse_timeframe(timeframe))
+
+    if role == "student":
+        # Rollups are per department; a single user's history stays a direct query
+        rows: Dict[Any, List[int]] = {}
+        direct = {
+            "uploads": (Document.upload_date, Document.uploader_id),
+            "downloads": (Download.download_timestamp, Download.user_id),
+        }
+        for position, name in enumerate(names):
+            if name not in direct:
+                continue  # Approvals and registrations are not tracked per user
+            timestamp, owner = direct[name]
+            day = func.date(timestamp)
+            for date, count in db.query(day, func.count()).filter(
+                timestamp >= datetime.combine(start, datetime.min.time()),
+                owner == "mock-user-id"
+            ).group_by(day):
+                rows.setdefault(date, [0] * len(names))[position] = count
+        results = [(date, *values) for date, values in rows.items()]
+    else:
+        # One rollup row per day (and department) instead of scanning the source tables
+        query = db.query(
+            DailyActivityRollup.day,
+            *[func.sum(getattr(DailyActivityRollup, name)) for name in names]
+        ).filter(DailyActivityRollup.day >= start)
+        if role in ("supervisor", "staff") and department_id:
+            query = query.filter(DailyActivityRollup.department_id == department_id)
+        results = query.group_by(DailyActivityRollup.day).all()
+
+    return build_series(results, names, start, end)
+
+def compute_upload_trends(db: Session, role: str, department_id: Optional[str], timeframe: str) -> Dict[str, Any]:
+    """Uploads per day, week or month over ``timeframe``"""
+    return compute_activity_series(db, role, department_id, timeframe, ["uploads"])
+
+def compute_status_distribution(db: Session, role: str, department_id: Optional[str], timeframe: str) -> Dict[str, Any]:
+    """Documents uploaded within ``timeframe`` per current status"""
+    days = _parse_timeframe(timeframe)
+    start_date = datetime.now() - timedelta(days=days)
+    
+    if role == "student":
+        query = db.query(
+            Document.status,
+            func.count(Document.id).label('count')
+        ).filter(
+            Document.upload_date >= start_date,
+            Document.uploader_id == "mock-user-id"
+        ).group_by(Document.status)
+    else:
+        query = db.query(
+            DocumentStatusRollup.status,
+            func.sum(DocumentStatusRollup.document_count).label('count')
+        ).filter(DocumentStatusRollup.day >= start_date.date())
+        if role in ("supervisor", "staff") and department_id:
+            query = query.filter(DocumentStatusRollup.department_id == department_id)
+        query = query.group_by(DocumentStatusRollup.status)
+    
+    results = query.all()
+    
+    chart_data = []
+    for status, count in results:
+        if not count:
+            continue
+        chart_data.append({
+            "status": DocumentStatus(status).value,
+            "count": int(count)
+        })
+    
+    return {"chart_data": chart_data}
+
+def compute_analytics_overview(db: Session, role: str, department_id: Optional[str], timeframe: str) -> Dict[str, Any]:
+    """Analytics overview for ``role`` over ``timeframe``"""
+    days = _parse_timeframe(timeframe)
+    start_date = datetime.now() - timedelta(days=days)
+    
+    if role == "admin":
+        return _get_admin_analytics(db, start_date)
+    elif role == "supervisor":
+        return _get_supervisor_analytics(db, start_date, department_id)
+    elif role == "staff":
+        return _get_staff_analytics(db, start_date, department_id)
+    else:  # student
+        return _get_student_analytics(db, start_date)
+
 def _parse_timeframe(timeframe: str) -> int:
     """Parse timeframe string to number of days"""
     timeframe_map = {
@@ -208,7 +409,18 @@ def _parse_timeframe(timeframe: str) -> int:
     }
     return timeframe_map.get(timeframe, 30)
 
-async def _get_admin_analytics(db: Session, start_date: datetime) -> Dict[str, Any]:
+def _format_uptime(seconds: int) -> str:
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    return f"{days}d {hours}h {seconds // 60}m"
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+def _get_admin_analytics(db: Session, start_date: datetime) -> Dict[str, Any]:
     """Get analytics for admin role"""
     total_docs = db.query(Document).count()
     total_users = db.query(User).count()
@@ -234,7 +446,7 @@ async def _get_admin_analytics(db: Session, start_date: datetime) -> Dict[str, A
         }
     }
 
-async def _get_supervisor_analytics(db: Session, start_date: datetime, department_id: str = None) -> Dict[str, Any]:
+def _get_supervisor_analytics(db: Session, start_date: datetime, department_id: str = None) -> Dict[str, Any]:
     """Get analytics for supervisor role"""
     query_filter = []
     if department_id:
@@ -243,28 +455,42 @@ async def _get_supervisor_analytics(db: Session, start_date: datetime, departmen
     where_clause = and_(*query_filter) if query_filter else True
     
     pending_reviews = db.query(Document).filter(
-        and_(Document.status == DocumentStatus.PENDING, where_clause)
+        and_(Document.status.in_([DocumentStatus.SUBMITTED, DocumentStatus.UNDER_REVIEW]), where_clause)
     ).count()
     
     completed_reviews = db.query(Document).filter(
         and_(Document.status.in_([DocumentStatus.APPROVED, DocumentStatus.REJECTED]), where_clause)
     ).count()
     
+    # Turnaround and backlog come from the maintained review aggregates
+    summary = review_summary(db, "department", department_id)
+    week_ago = datetime.now() - timedelta(days=7)
+    weekly = db.query(
+        func.coalesce(func.sum(case((Review.assigned_date >= week_ago, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Review.completed_date >= week_ago, 1), else_=0)), 0)
+    ).join(Document, Review.document_id == Document.id).filter(
+        where_clause,
+        or_(Review.assigned_date >= week_ago, Review.completed_date >= week_ago)
+    ).one()
+    
     return {
         "overview": {
             "pending_reviews": pending_reviews,
             "completed_reviews": completed_reviews,
-            "avg_review_time": "48h",
-            "approval_rate": 85.7
+            "avg_review_time": f"{summary['avg_turnaround_hours']:g}h",
+            "median_review_time": f"{summary['p50_turnaround_hours']:g}h",
+            "p90_review_time": f"{summary['p90_turnaround_hours']:g}h",
+            "approval_rate": summary["approval_rate"]
         },
         "workload": {
-            "assigned_this_week": 12,
-            "completed_this_week": 8,
-            "overdue_reviews": 2
+            "assigned_this_week": weekly[0],
+            "completed_this_week": weekly[1],
+            "open_reviews": summary["open_reviews"],
+            "overdue_reviews": summary["overdue_reviews"]
         }
     }
 
-async def _get_staff_analytics(db: Session, start_date: datetime, department_id: str = None) -> Dict[str, Any]:
+def _get_staff_analytics(db: Session, start_date: datetime, department_id: str = None) -> Dict[str, Any]:
     """Get analytics for staff role"""
     query_filter = []
     if department_id:
@@ -277,21 +503,25 @@ async def _get_staff_analytics(db: Session, start_date: datetime, department_id:
         and_(Document.upload_date >= start_date, where_clause)
     ).count()
     
+    citations = db.query(func.coalesce(func.sum(DocumentImpact.citation_count), 0))
+    if department_id:
+        citations = citations.filter(DocumentImpact.department_id == department_id)
+    
     return {
         "overview": {
             "department_documents": dept_documents,
             "recent_uploads": recent_uploads,
             "collaboration_score": 4.2,
-            "department_ranking": 3
+            "department_ranking": department_leaderboard.rank(department_id) if department_id else None
         },
         "activity": {
             "uploads_this_month": recent_uploads,
             "downloads_received": 234,
-            "citations": 45
+            "citations": citations.scalar()
         }
     }
 
-async def _get_student_analytics(db: Session, start_date: datetime) -> Dict[str, Any]:
+def _get_student_analytics(db: Session, start_date: datetime) -> Dict[str, Any]:
     """Get analytics for student role"""
     my_documents = db.query(Document).filter(
         Document.uploader_id == "mock-user-id"
@@ -9,7 +9,8 @@ from app.core.auth import (
     get_password_hash,
     get_current_user
 )
-from app.models import User, Department
+from app.core.rollups import record_user_registered
+from app.models import User as UserModel, Department
 from app.schemas.user import UserCreate, User
 from app.schemas.auth import LoginRequest, TokenResponse, ChangePasswordRequest
 
@@ -18,7 +19,7 @@ router = APIRouter()
 @router.post("/register", response_model=User)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = db.query(UserModel).filter(UserModel.email == user_data.email).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -33,12 +34,13 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     hashed_password = get_password_hash(user_data.password)
-    db_user = User(
+    db_user = UserModel(
         **user_data.model_dump(exclude={"password"}),
         password=hashed_password
     )
     
     db.add(db_user)
+    record_user_registered(db, db_user)
     db.commit()
     db.refresh(db_user)
     
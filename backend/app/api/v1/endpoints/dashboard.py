@@ -1,205 +1,319 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, and_, or_
-from typing import List, Dict, Any, Optional
+from sqlalchemy import func, desc, and_, or_, case, select, true
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import time
 
-from ....core.database import get_db
+from ....core.cache import response_cache
+from ....core.config import settings
+from ....core.dashboard_deltas import dashboard_rooms
+from ....core.database import get_db, SessionLocal
+from ....core.leaderboard import department_leaderboard
 from ....models import (
     User, Document, DocumentStatus, UserRole, Department, 
-    Review, Download
+    Review, ReviewAggregate, DashboardRoomSequence
 )
 
+from .analytics import compute_analytics_overview, compute_upload_trends, compute_status_distribution
+
 router = APIRouter()
 
+BOOTSTRAP_BUDGET_MS = 2000  # Default latency budget for /bootstrap
+REVIEW_WORKLOAD_NORMAL = 5  # Open reviews from which a supervisor's workload is "Normal"
+REVIEW_WORKLOAD_HEAVY = 15  # ... and "Heavy"
+
+def _aggregate_value(column, supervisor_id: Optional[str]):
+    """A column of the supervisor's review aggregate row, as a scalar subquery"""
+    return select(column).where(
+        ReviewAggregate.scope == "supervisor", ReviewAggregate.scope_id == supervisor_id
+    ).correlate(None).scalar_subquery()
+
+def _workload_label(open_reviews: int) -> str:
+    if open_reviews < REVIEW_WORKLOAD_NORMAL:
+        return "Light"
+    return "Normal" if open_reviews < REVIEW_WORKLOAD_HEAVY else "Heavy"
+
+def _count_if(condition):
+    """COUNT of the rows matching ``condition``, for conditional aggregation"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def _scalar_count(model, *conditions):
+    """``(SELECT COUNT(*) FROM model WHERE ...)`` to embed in an aggregate query"""
+    return select(func.count()).select_from(model).where(*conditions).correlate(None).scalar_subquery()
+
+def _mb(size_bytes) -> float:
+    return round((size_bytes or 0) / 1024 / 1024, 2)
+
+def _cache_scope(role: str, user_id: Optional[str], department_id: Optional[str]) -> Dict[str, Any]:
+    """Parameters a cached dashboard response actually depends on for ``role``"""
+    return {
+        "role": role,
+        "department_id": department_id if role in ("supervisor", "staff") else None,
+        "user_id": user_id if role != "admin" else None
+    }
+
+def _sequence_columns(rooms: List[str]) -> List[Any]:
+    """The last stat delta number of each room, as scalar subqueries ``seq_<i>``"""
+    return [
+        func.coalesce(
+            select(DashboardRoomSequence.seq).where(DashboardRoomSequence.room == room).correlate(None).scalar_subquery(), 0
+        ).label(f"seq_{index}")
+        for index, room in enumerate(rooms)
+    ]
+
+def _sequences(row, rooms: List[str]) -> Dict[str, int]:
+    return {room: getattr(row, f"seq_{index}") for index, room in enumerate(rooms)}
+
+def compute_dashboard_stats(db: Session, role: str, user_id: Optional[str], department_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Dashboard statistics for a role, computed with one aggregate query over
+    ``documents`` (the admin department breakdown comes from the leaderboard).
+    The same query reads the number of the last stat delta of each of the
+    role's rooms (``sequences``), so clients know which pushed deltas the
+    figures already include.
+    """
+    scope = _cache_scope(role, user_id, department_id)
+    rooms = dashboard_rooms(role, scope["user_id"], scope["department_id"])
+    sequence_columns = _sequence_columns(rooms)
+    week_ago = datetime.now() - timedelta(days=7)
+    recent = Document.upload_date >= week_ago
+    in_department = Document.department_id == department_id if department_id else true()
+
+    if role == "admin":
+        # Admin sees system-wide statistics
+        row = db.query(
+            func.count(Document.id).label("total_documents"),
+            _count_if(Document.status == DocumentStatus.SUBMITTED).label("pending_reviews"),
+            _count_if(Document.status == DocumentStatus.APPROVED).label("approved_documents"),
+            _count_if(Document.status == DocumentStatus.REJECTED).label("rejected_documents"),
+            _count_if(Document.status == DocumentStatus.UNDER_REVIEW).label("under_review"),
+            _count_if(recent).label("recent_uploads"),
+            func.sum(Document.file_size).label("storage_used"),
+            _scalar_count(User).label("total_users"),
+            _scalar_count(User, User.is_active == True).label("active_users"),
+            _scalar_count(Department).label("total_departments"),
+            func.sum(Document.download_count).label("total_downloads"),
+            *sequence_columns
+        ).one()
+
+        return {
+            "total_users": row.total_users,
+            "total_documents": row.total_documents,
+            "total_departments": row.total_departments,
+            "pending_reviews": row.pending_reviews,
+            "approved_documents": row.approved_documents,
+            "rejected_documents": row.rejected_documents,
+            "under_review": row.under_review,
+            "total_downloads": int(row.total_downloads or 0),
+            "storage_used_mb": _mb(row.storage_used),
+            
+            # Recent activity counts
+            "recent_uploads": row.recent_uploads,
+            "active_users": row.active_users,
+            
+            # Department breakdown, from the in-memory leaderboard (refreshed from the rollups)
+            "department_stats": [
+                {"name": entry["name"], "count": entry["documents"], "rank": entry["rank"]}
+                for entry in department_leaderboard.top(len(department_leaderboard)) if entry["documents"]
+            ],
+            "sequences": _sequences(row, rooms)
+        }
+        
+    elif role == "supervisor":
+        # Supervisor sees department-specific and review statistics
+        row = db.query(
+            _count_if(and_(Document.status == DocumentStatus.SUBMITTED, Document.supervisor_id == user_id)).label("assigned_reviews"),
+            _count_if(and_(Document.status == DocumentStatus.SUBMITTED, in_department)).label("pending_documents"),
+            _count_if(and_(Document.status == DocumentStatus.APPROVED, in_department)).label("approved_documents"),
+            _count_if(in_department).label("department_documents"),
+            _count_if(and_(recent, in_department)).label("recent_submissions"),
+            _scalar_count(Review, Review.reviewer_id == user_id).label("completed_reviews"),
+            _aggregate_value(ReviewAggregate.turnaround_hours_sum, user_id).label("turnaround_hours_sum"),
+            _aggregate_value(ReviewAggregate.completed_reviews, user_id).label("aggregate_completed"),
+            _aggregate_value(ReviewAggregate.open_reviews, user_id).label("open_reviews"),
+            *sequence_columns
+        ).filter(or_(in_department, Document.supervisor_id == user_id)).one()
+
+        return {
+            "assigned_reviews": row.assigned_reviews,
+            "completed_reviews": row.completed_reviews,
+            "pending_documents": row.pending_documents,
+            "approved_documents": row.approved_documents,
+            "department_documents": row.department_documents,
+            "recent_submissions": row.recent_submissions,
+            "avg_review_time": round(row.turnaround_hours_sum / row.aggregate_completed / 24, 1) if row.aggregate_completed else 0.0,  # Days
+            "review_workload": _workload_label(row.open_reviews or 0),
+            "sequences": _sequences(row, rooms)
+        }
+        
+    elif role == "staff":
+        # Staff sees department-specific statistics
+        row = db.query(
+            func.count(Document.id).label("department_documents"),
+            _count_if(Document.status == DocumentStatus.APPROVED).label("approved_documents"),
+            _count_if(Document.status == DocumentStatus.SUBMITTED).label("pending_documents"),
+            _count_if(Document.status == DocumentStatus.REJECTED).label("rejected_documents"),
+            _count_if(Document.uploader_id == user_id).label("your_uploads"),
+            _count_if(recent).label("recent_department_uploads"),
+            func.sum(Document.file_size).label("storage_used"),
+            _scalar_count(User, User.department_id == department_id).label("total_department_users"),
+            *sequence_columns
+        ).filter(in_department).one()
+
+        return {
+            "department_documents": row.department_documents,
+            "approved_documents": row.approved_documents,
+            "pending_documents": row.pending_documents,
+            "rejected_documents": row.rejected_documents,
+            "your_uploads": row.your_uploads,
+            "recent_department_uploads": row.recent_department_uploads,
+            "total_department_users": row.total_department_users,
+            "storage_used_department_mb": _mb(row.storage_used),
+            "sequences": _sequences(row, rooms)
+        }
+        
+    elif role == "student":
+        # Student sees their own statistics
+        row = db.query(
+            func.count(Document.id).label("total_uploads"),
+            _count_if(Document.status == DocumentStatus.APPROVED).label("approved_uploads"),
+            _count_if(Document.status == DocumentStatus.REJECTED).label("rejected_uploads"),
+            _count_if(Document.status == DocumentStatus.SUBMITTED).label("pending_reviews"),
+            _count_if(Document.status == DocumentStatus.UNDER_REVIEW).label("under_review"),
+            func.sum(Document.download_count).label("total_downloads"),
+            *sequence_columns
+        ).filter(Document.uploader_id == user_id).one()
+
+        return {
+            "total_uploads": row.total_uploads,
+            "approved_uploads": row.approved_uploads,
+            "rejected_uploads": row.rejected_uploads,
+            "pending_reviews": row.pending_reviews,
+            "under_review": row.under_review,
+            "total_downloads": int(row.total_downloads or 0),
+            "average_rating": 4.5,  # Mock data
+            "sequences": _sequences(row, rooms)
+        }
+        
+    return {}
+
 @router.get("/stats")
 async def get_dashboard_stats(
     role: str = Query("student"),
     user_id: Optional[str] = Query(None),
     department_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
 ):
     """
     Get dashboard statistics based on user role
     """
+    role = role.lower()
     try:
-        stats = {}
-        
-        if role == "admin":
-            # Admin sees system-wide statistics
-            stats = {
-                "total_users": db.query(User).count(),
-                "total_documents": db.query(Document).count(),
-                "total_departments": db.query(Department).count(),
-                "pending_reviews": db.query(Document).filter(Document.status == DocumentStatus.SUBMITTED).count(),
-                "approved_documents": db.query(Document).filter(Document.status == DocumentStatus.APPROVED).count(),
-                "rejected_documents": db.query(Document).filter(Document.status == DocumentStatus.REJECTED).count(),
-                "under_review": db.query(Document).filter(Document.status == DocumentStatus.UNDER_REVIEW).count(),
-                "total_downloads": db.query(Download).count(),
-                "storage_used_mb": round((db.query(func.sum(Document.file_size)).scalar() or 0) / 1024 / 1024, 2),
-                
-                # Recent activity counts
-                "recent_uploads": db.query(Document).filter(
-                    Document.upload_date >= datetime.now() - timedelta(days=7)
-                ).count(),
-                "active_users": db.query(User).filter(User.is_active == True).count(),
-                
-                # Department breakdown
-                "department_stats": [
-                    {"name": dept[0], "count": dept[1]} 
-                    for dept in db.query(Department.name, func.count(Document.id)).join(Document, Document.department_id == Department.id).group_by(Department.name).all()
-                ]
-            }
-            
-        elif role == "supervisor":
-            # Supervisor sees department-specific and review statistics
-            query_filter = []
-            if department_id:
-                query_filter.append(Document.department_id == department_id)
-            
-            where_clause = and_(*query_filter) if query_filter else True
-            
-            stats = {
-                "assigned_reviews": db.query(Document).filter(
-                    and_(Document.status == DocumentStatus.SUBMITTED, Document.supervisor_id == user_id)
-                ).count(),
-                "completed_reviews": db.query(Review).filter(Review.user_id == user_id).count(),
-                "pending_documents": db.query(Document).filter(
-                    and_(Document.status == DocumentStatus.SUBMITTED, where_clause)
-                ).count(),
-                "approved_documents": db.query(Document).filter(
-                    and_(Document.status == DocumentStatus.APPROVED, where_clause)
-                ).count(),
-                "department_documents": db.query(Document).filter(where_clause).count(),
-                "recent_submissions": db.query(Document).filter(
-                    and_(
-                        Document.upload_date >= datetime.now() - timedelta(days=7),
-                        where_clause
-                    )
-                ).count(),
-                "avg_review_time": 2.5,  # Mock data for now
-                "review_workload": "Normal"  # Mock data
-            }
-            
-        elif role == "staff":
-            # Staff sees department-specific statistics
-            query_filter = []
-            if department_id:
-                query_filter.append(Document.department_id == department_id)
-            
-            where_clause = and_(*query_filter) if query_filter else True
-            
-            stats = {
-                "department_documents": db.query(Document).filter(where_clause).count(),
-                "approved_documents": db.query(Document).filter(
-                    and_(Document.status == DocumentStatus.APPROVED, where_clause)
-                ).count(),
-                "pending_documents": db.query(Document).filter(
-                    and_(Document.status == DocumentStatus.SUBMITTED, where_clause)
-                ).count(),
-                "rejected_documents": db.query(Document).filter(
-                    and_(Document.status == DocumentStatus.REJECTED, where_clause)
-                ).count(),
-                "your_uploads": db.query(Document).filter(
-                    and_(Document.uploader_id == user_id, where_clause)
-                ).count(),
-                "recent_department_uploads": db.query(Document).filter(
-                    and_(
-                        Document.upload_date >= datetime.now() - timedelta(days=7),
-                        where_clause
-                    )
-                ).count(),
-                "total_department_users": db.query(User).filter(User.department_id == department_id).count(),
-                "storage_used_department_mb": round((db.query(func.sum(Document.file_size)).filter(where_clause).scalar() or 0) / 1024 / 1024, 2)
-            }
-            
-        elif role == "student":
-            # Student sees their own statistics
-            stats = {
-                "total_uploads": db.query(Document).filter(Document.uploader_id == user_id).count(),
-                "approved_uploads": db.query(Document).filter(
-                    and_(Document.uploader_id == user_id, Document.status == DocumentStatus.APPROVED)
-                ).count(),
-                "rejected_uploads": db.query(Document).filter(
-                    and_(Document.uploader_id == user_id, Document.status == DocumentStatus.REJECTED)
-                ).count(),
-                "pending_reviews": db.query(Document).filter(
-                    and_(Document.uploader_id == user_id, Document.status == DocumentStatus.SUBMITTED)
-                ).count(),
-                "under_review": db.query(Document).filter(
-                    and_(Document.uploader_id == user_id, Document.status == DocumentStatus.UNDER_REVIEW)
-                ).count(),
-                "total_downloads": db.query(Download).join(Document).filter(Document.uploader_id == user_id).count(),
-                "average_rating": 4.5,  # Mock data
-            }
-            
-        return stats
+        return await response_cache.get_or_compute(
+            "dashboard.stats",
+            lambda db: compute_dashboard_stats(db, role, user_id, department_id),
+            **_cache_scope(role, user_id, department_id)
+        )
         
     except Exception as e:
         print(f"Error fetching dashboard stats: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+def compute_recent_documents(db: Session, role: str, user_id: Optional[str], department_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Most recently uploaded documents visible to ``role``"""
+    query = db.query(
+        Document.id,
+        Document.title,
+        Document.status,
+        Document.upload_date,
+        User.first_name,
+        User.last_name
+    ).join(User, Document.uploader_id == User.id)
+
+    if role == "admin":
+        # Admin sees all recent documents
+        query = query.order_by(desc(Document.upload_date))
+    
+    elif role == "supervisor":
+        # Supervisor sees recent documents in their department or assigned for review
+        query = query.filter(
+            or_(
+                Document.department_id == department_id,
+                Document.supervisor_id == user_id
+            )
+        ).order_by(desc(Document.upload_date))
+        
+    elif role == "staff":
+        # Staff sees recent documents in their department
+        query = query.filter(Document.department_id == department_id).order_by(desc(Document.upload_date))
+        
+    elif role == "student":
+        # Student sees their own recent documents
+        query = query.filter(Document.uploader_id == user_id).order_by(desc(Document.upload_date))
+        
+    else:
+        return []
+
+    recent_docs = query.limit(limit).all()
+    
+    return [
+        {
+            "id": doc.id,
+            "title": doc.title,
+            "status": doc.status.value,
+            "upload_date": doc.upload_date.isoformat(),
+            "uploader": f"{doc.first_name} {doc.last_name}"
+        }
+        for doc in recent_docs
+    ]
+
 @router.get("/recent-documents")
 async def get_recent_documents(
     role: str = Query("student"),
     user_id: Optional[str] = Query(None),
     department_id: Optional[str] = Query(None),
-    limit: int = Query(5, ge=1, le=100),
-    db: Session = Depends(get_db)
+    limit: int = Query(5, ge=1, le=100)
 ):
     """
     Get recent documents based on user role
     """
+    role = role.lower()
     try:
-        query = db.query(
-            Document.title,
-            Document.status,
-            Document.upload_date,
-            User.first_name,
-            User.last_name
-        ).join(User, Document.uploader_id == User.id)
-
-        if role == "admin":
-            # Admin sees all recent documents
-            query = query.order_by(desc(Document.upload_date))
-        
-        elif role == "supervisor":
-            # Supervisor sees recent documents in their department or assigned for review
-            query = query.filter(
-                or_(
-                    Document.department_id == department_id,
-                    Document.supervisor_id == user_id
-                )
-            ).order_by(desc(Document.upload_date))
-            
-        elif role == "staff":
-            # Staff sees recent documents in their department
-            query = query.filter(Document.department_id == department_id).order_by(desc(Document.upload_date))
-            
-        elif role == "student":
-            # Student sees their own recent documents
-            query = query.filter(Document.uploader_id == user_id).order_by(desc(Document.upload_date))
-            
-        else:
-            return []
-
-        recent_docs = query.limit(limit).all()
-        
-        return [
-            {
-                "title": doc.title,
-                "status": doc.status.value,
-                "upload_date": doc.upload_date.isoformat(),
-                "uploader": f"{doc.first_name} {doc.last_name}"
-            }
-            for doc in recent_docs
-        ]
+        return await response_cache.get_or_compute(
+            "dashboard.recent-documents",
+            lambda db: compute_recent_documents(db, role, user_id, department_id, limit),
+            limit=limit,
+            **_cache_scope(role, user_id, department_id)
+        )
     except Exception as e:
         print(f"Error fetching recent documents: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+def compute_user_profile(db: Session, user_id: str) -> Optional[Dict[str, Any]]:
+    """Name, email, role and department of ``user_id`` for the dashboard header"""
+    user = db.query(
+        User.first_name,
+        User.last_name,
+        User.email,
+        User.role,
+        Department.name.label("department_name")
+    ).join(Department, User.department_id == Department.id).filter(User.id == user_id).first()
+
+    if not user:
+        return None
+
+    return {
+        "name": f"{user.first_name} {user.last_name}",
+        "email": user.email,
+        "role": user.role.value,
+        "department": user.department_name
+    }
+
 @router.get("/user-profile")
 async def get_user_profile_summary(
     user_id: str = Query(...),
@@ -209,23 +323,12 @@ async def get_user_profile_summary(
     Get a summary of the user's profile for the dashboard header
     """
     try:
-        user = db.query(
-            User.first_name,
-            User.last_name,
-            User.email,
-            User.role,
-            Department.name
-        ).join(Department).filter(User.id == user_id).first()
-
-        if not user:
+        profile = compute_user_profile(db, user_id)
+        if not profile:
             raise HTTPException(status_code=404, detail="User not found")
-
-        return {
-            "name": f"{user.first_name} {user.last_name}",
-            "email": user.email,
-            "role": user.role.value,
-            "department": user.department_name
-        }
+        return profile
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching user profile summary: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -244,3 +347,82 @@ async def get_recent_activity(
     """
     # TODO: Implement real activity logs if needed
     return []
+
+
+# Uncached bootstrap panels; bounds the threads and connections that panels past their budget keep busy
+_panel_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_PANEL_WORKERS, thread_name_prefix="dashboard-panel")
+
+def _run_panel(compute: Callable[[Session], Any]) -> Any:
+    """Run ``compute`` on its own pooled session (called in a worker thread)"""
+    db = SessionLocal()
+    try:
+        return compute(db)
+    finally:
+        db.close()
+
+def _panel_future(compute: Callable[[Session], Any]) -> asyncio.Future:
+    """Queue a panel on the panel pool, keeping the request's context like ``asyncio.to_thread``"""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_panel_executor, context.run, _run_panel, compute)
+
+@router.get("/bootstrap")
+async def get_dashboard_bootstrap(
+    role: str = Query("student"),
+    user_id: Optional[str] = Query(None),
+    department_id: Optional[str] = Query(None),
+    timeframe: str = Query("30d"),
+    limit: int = Query(5, ge=1, le=100),
+    budget_ms: int = Query(BOOTSTRAP_BUDGET_MS, ge=50, le=30000)
+):
+    """
+    Every dashboard panel for a role in one response.
+
+    Panels are evaluated concurrently, each on its own pooled connection.
+    Panels that fail or are not done within ``budget_ms`` are left out of
+    ``panels`` and listed under ``errors`` / ``timed_out``.
+
+    Uncached panels run on a pool of ``DASHBOARD_PANEL_WORKERS`` threads. A
+    timed-out panel that is still queued is cancelled; one already running
+    cannot be interrupted, so it finishes and releases its connection on its
+    own, and the pool size bounds how many of those a worker can have.
+    """
+    role = role.lower()
+    scope = _cache_scope(role, user_id, department_id)
+    panels = {
+        "stats": response_cache.get_or_compute(
+            "dashboard.stats", lambda db: compute_dashboard_stats(db, role, user_id, department_id), **scope
+        ),
+        "recent_documents": response_cache.get_or_compute(
+            "dashboard.recent-documents",
+            lambda db: compute_recent_documents(db, role, user_id, department_id, limit), limit=limit, **scope
+        ),
+        "analytics": response_cache.get_or_compute(
+            "analytics.overview",
+            lambda db: compute_analytics_overview(db, role, department_id, timeframe),
+            role=role, department_id=scope["department_id"], timeframe=timeframe
+        ),
+        "upload_trends": _panel_future(lambda db: compute_upload_trends(db, role, department_id, timeframe)),
+        "status_distribution": _panel_future(
+            lambda db: compute_status_distribution(db, role, department_id, timeframe)
+        ),
+    }
+    if user_id:
+        panels["user_profile"] = _panel_future(lambda db: compute_user_profile(db, user_id))
+
+    started = time.perf_counter()
+    tasks = {name: asyncio.ensure_future(coroutine) for name, coroutine in panels.items()}
+    await asyncio.wait(tasks.values(), timeout=budget_ms / 1000)
+
+    # No activity log yet (see /recent-activity), so this panel needs no query
+    result: Dict[str, Any] = {"panels": {"recent_activity": []}, "errors": {}, "timed_out": []}
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()  # Only stops a panel that has not started; see the docstring
+            result["timed_out"].append(name)
+        elif task.exception() is not None:
+            print(f"Error computing dashboard panel {name}: {task.exception()}")
+            result["errors"][name] = "Internal Server Error"
+        else:
+            result["panels"][name] = task.result()
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
@@ -1,21 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Request, status
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc, asc, func, and_, or_
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 import uuid
 import shutil
 from pathlib import Path
 
 from app.core.database import get_db
-from app.models import User, Document, Department, Download, DocumentStatus
+from app.models import User, Document, Department, Download, DocumentStatus, Citation, DocumentImpact
 from app.schemas.document import DocumentCreate, DocumentResponse, DocumentUpdate, DocumentFilter, DocumentListResponse, UploaderInfo
-from .websocket import notify_document_uploaded
+from .websocket import notify_document_uploaded, broadcast_stats_update, notify_activity_update
 from app.core.auth import get_current_user
+from app.core.document_processing import enqueue_document_processing, reindex_document
+from app.core.metrics import metrics
+from app.core.related import (
+    get_related_documents, refresh_related_for_approved, refresh_related_for_withdrawn, refresh_related_lists,
+    remove_related_documents
+)
+from app.core.near_duplicates import get_document_overlaps, lsh_index, record_signature_deleted
+from app.core.metadata_index import documents_with_keyword, documents_by_author
+from app.core.search_index import search_index
+from app.core.counters import document_counters
+from app.core.unique_visitors import unique_visitors, unique_visitor_counts
+from app.core.trending import trending_documents
+from app.core.recommendations import recommend_for_user
+from app.core.citations import (
+    impact_scores, refresh_citations_for_approved, refresh_citations_for_withdrawn, remove_citations
+)
+from app.core.rollups import record_document_uploaded, record_status_change, record_document_deleted, record_download
+from app.core.cache import response_cache
+from app.core.dashboard_deltas import (
+    upload_deltas, status_change_deltas, download_deltas, recent_document_entry, recent_document_rooms, next_sequences
+)
 
 router = APIRouter()
 
+metrics.describe("upload_bytes_total", "counter", "Bytes received in accepted document uploads")
+metrics.describe("download_bytes_total", "counter", "Bytes of document files served for download")
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent.parent
 UPLOAD_DIR = BASE_DIR / "uploads"
 DOCUMENTS_DIR = UPLOAD_DIR / "documents"
@@ -25,6 +49,28 @@ DOCUMENTS_DIR.mkdir(parents=True, exist_ok=True)
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 ALLOWED_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt'}
 
+def _invalidate_cached_dashboards():
+    # Downloads are left to expire with the TTL; they are too frequent to invalidate on
+    response_cache.invalidate("dashboard.")
+    response_cache.invalidate("analytics.")
+
+def schedule_status_change_updates(background_tasks: BackgroundTasks, doc: Document, previous_status: DocumentStatus,
+                                   sequences: Dict[str, int]):
+    """
+    Cache invalidation, related-document refresh and dashboard pushes after a
+    committed document update; ``sequences`` numbered its stat deltas before the commit.
+    """
+    _invalidate_cached_dashboards()
+    if doc.status == DocumentStatus.APPROVED and previous_status != DocumentStatus.APPROVED:
+        background_tasks.add_task(refresh_related_for_approved, [doc.id])
+        background_tasks.add_task(refresh_citations_for_approved, [doc.id])
+    elif previous_status == DocumentStatus.APPROVED and doc.status != DocumentStatus.APPROVED:
+        background_tasks.add_task(refresh_related_for_withdrawn, [doc.id])
+        background_tasks.add_task(refresh_citations_for_withdrawn, [doc.id])
+    if doc.status != previous_status:
+        background_tasks.add_task(broadcast_stats_update, status_change_deltas(doc, previous_status), "status_changed", doc.id, sequences)
+        background_tasks.add_task(notify_activity_update, recent_document_entry(doc), recent_document_rooms(doc))
+
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
@@ -32,6 +78,7 @@ async def upload_document(
     uploader_id: str = Form(...),
     department_id: str = Form(...),
     supervisor_id: Optional[str] = Form(None),
+    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db),
     request: Request = None
 ):
@@ -42,6 +89,7 @@ async def upload_document(
     content = await file.read()
     if len(content) > MAX_FILE_SIZE:
         raise HTTPException(status_code=400, detail="File size exceeds the 50MB limit.")
+    metrics.increment("upload_bytes_total", len(content))
 
     document_id = str(uuid.uuid4())
     file_ext = Path(file.filename).suffix
@@ -61,9 +109,18 @@ async def upload_document(
         file_size=len(content)
     )
     db.add(db_document)
+    db.flush()
+    db.refresh(db_document, attribute_names=["upload_date", "status"])
+    record_document_uploaded(db, db_document)
+    deltas = upload_deltas(db_document)
+    sequences = next_sequences(db, deltas)
     db.commit()
+    _invalidate_cached_dashboards()
     # Re-query the document with relationships loaded
     db_document = db.query(Document).options(joinedload(Document.uploader)).filter(Document.id == document_id).first()
+    background_tasks.add_task(broadcast_stats_update, deltas, "document_uploaded", document_id, sequences)
+    background_tasks.add_task(notify_activity_update, recent_document_entry(db_document), recent_document_rooms(db_document))
+    enqueue_document_processing(background_tasks, document_id)
 
     download_url = request.url_for("download_document_file", document_id=db_document.id)
 
@@ -81,12 +138,65 @@ async def upload_document(
         file_path=db_document.file_path,
         file_size=db_document.file_size,
         rejection_reason=db_document.rejection_reason,
+        overlap_score=db_document.overlap_score,
         download_url=str(download_url)
     )
 
+@router.get("/trending")
+async def get_trending_documents(
+    department_id: Optional[str] = Query(None),  # All departments when omitted
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    request: Request = None
+):
+    """Most viewed and downloaded approved documents, weighted towards recent activity."""
+    ranked = trending_documents.trending(department_id, limit)
+    titles = dict(
+        db.query(Document.id, Document.title).filter(Document.id.in_([item["document_id"] for item in ranked]))
+    ) if ranked else {}
+    return {
+        "department_id": department_id,
+        "items": [
+            {
+                "id": item["document_id"],
+                "title": titles[item["document_id"]],
+                "score": item["score"],
+                "download_url": str(request.url_for("download_document_file", document_id=item["document_id"]))
+            }
+            for item in ranked if item["document_id"] in titles  # Skips documents deleted since
+        ]
+    }
+
+@router.get("/recommendations")
+async def get_recommendations(
+    user_id: str = Query(...),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    request: Request = None
+):
+    """Documents read by students in the user's department who read what the user read."""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    source, recommendations = recommend_for_user(db, user, limit)
+    return {
+        "source": source,
+        "items": [
+            {
+                "id": doc.id,
+                "title": doc.title,
+                "score": round(score, 4),
+                "download_url": str(request.url_for("download_document_file", document_id=doc.id))
+            }
+            for doc, score in recommendations
+        ]
+    }
+
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: str,
+    user_id: Optional[str] = Query(None),  # Viewer, for unique-viewer counts (the client address otherwise)
     db: Session = Depends(get_db),
     request: Request = None
 ):
@@ -96,6 +206,13 @@ async def get_document(
         raise HTTPException(status_code=404, detail="Document not found")
 
     download_url = request.url_for("download_document_file", document_id=doc.id)
+    document_counters.record_view(doc.id)
+    visitor = user_id or (f"ip:{request.client.host}" if request.client else None)
+    if visitor:
+        unique_visitors.record("view", doc.id, doc.department_id, visitor)
+    if doc.status == DocumentStatus.APPROVED:
+        trending_documents.record("view", doc.id, doc.department_id)
+    pending = document_counters.pending(doc.id)
     
     return DocumentResponse(
         id=doc.id,
@@ -111,9 +228,95 @@ async def get_document(
         file_path=doc.file_path,
         file_size=doc.file_size,
         rejection_reason=doc.rejection_reason,
+        overlap_score=doc.overlap_score,
+        download_count=doc.download_count + pending["download_count"],
+        view_count=doc.view_count + pending["view_count"],
         download_url=str(download_url)
     )
 
+@router.get("/{document_id}/related")
+async def get_document_related(
+    document_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    request: Request = None
+):
+    """Return the precomputed related-documents list for a document."""
+    relations = get_related_documents(db, document_id, limit)
+    return {
+        "items": [
+            {
+                "id": relation.related_document_id,
+                "title": relation.related_document.title,
+                "score": round(relation.score, 4),
+                "download_url": str(request.url_for("download_document_file", document_id=relation.related_document_id))
+            }
+            for relation in relations
+        ]
+    }
+
+@router.get("/{document_id}/unique-visitors")
+async def get_document_unique_visitors(
+    document_id: str,
+    days: Optional[int] = Query(None, ge=1, le=366),  # All time when omitted
+    db: Session = Depends(get_db)
+):
+    """Estimated number of distinct people who viewed and downloaded a document."""
+    return {"document_id": document_id, "days": days, **unique_visitor_counts(db, "document", [document_id], days)}
+
+@router.get("/{document_id}/overlaps")
+async def get_document_overlap_report(
+    document_id: str,
+    db: Session = Depends(get_db)
+):
+    """Return near-duplicate matches found for a document when it was uploaded."""
+    overlaps = get_document_overlaps(db, document_id)
+    return {
+        "items": [
+            {
+                "matched_document_id": overlap.matched_document_id,
+                "title": overlap.matched_document.title,
+                "score": round(overlap.score, 3)
+            }
+            for overlap in overlaps
+        ]
+    }
+
+@router.get("/{document_id}/citations")
+async def get_document_citations(
+    document_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Return a document's citation count, impact score and the repository documents citing and cited by it."""
+    impact = db.query(DocumentImpact).filter(DocumentImpact.document_id == document_id).first()
+    cited_by = db.query(Citation).options(joinedload(Citation.citing_document)).filter(
+        Citation.cited_document_id == document_id
+    ).order_by(Citation.created_at.desc()).limit(limit).all()
+    references = db.query(Citation).options(joinedload(Citation.cited_document)).filter(
+        Citation.citing_document_id == document_id,
+        Citation.cited_document_id.isnot(None)
+    ).order_by(Citation.position).limit(limit).all()
+    return {
+        "document_id": document_id,
+        "citation_count": impact.citation_count if impact else 0,
+        "impact_score": impact.impact_score if impact else None,
+        "rank": impact.rank if impact else None,
+        "cited_by": [
+            {"document_id": citation.citing_document_id, "title": citation.citing_document.title}
+            for citation in cited_by
+        ],
+        "references": [
+            {
+                "document_id": citation.cited_document_id,
+                "title": citation.cited_document.title,
+                "reference": citation.reference_text,
+                "match_score": citation.match_score
+            }
+            for citation in references
+        ]
+    }
+
 @router.get("", response_model=DocumentListResponse)
 async def get_documents(
     page: int = Query(1, ge=1),
@@ -136,6 +339,10 @@ async def get_documents(
         query = query.filter(Document.uploader_id == filters.uploader_id)
     if filters.supervisor_id:
         query = query.filter(Document.supervisor_id == filters.supervisor_id)
+    if filters.keyword:
+        query = query.filter(Document.id.in_(documents_with_keyword(filters.keyword)))
+    if filters.author:
+        query = query.filter(Document.id.in_(documents_by_author(filters.author)))
 
     total = query.count()
     
@@ -160,6 +367,7 @@ async def get_documents(
             file_path=doc.file_path,
             file_size=doc.file_size,
             rejection_reason=doc.rejection_reason,
+            overlap_score=doc.overlap_score,
             download_url=str(request.url_for("download_document_file", document_id=doc.id))
         )
         for doc in documents
@@ -174,6 +382,7 @@ async def get_documents(
 async def update_document(
     document_id: str,
     update_data: DocumentUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     request: Request = None
 ):
@@ -182,15 +391,22 @@ async def update_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    previous_status = doc.status
     update_dict = update_data.model_dump(exclude_unset=True)
     for key, value in update_dict.items():
         setattr(doc, key, value)
 
+    record_status_change(db, doc, previous_status)
+    sequences = next_sequences(db, status_change_deltas(doc, previous_status))
     db.commit()
     db.refresh(doc)
     db.refresh(doc, attribute_names=['uploader'])
+    schedule_status_change_updates(background_tasks, doc, previous_status, sequences)
+    if "title" in update_dict:
+        background_tasks.add_task(reindex_document, doc.id)
 
     download_url = request.url_for("download_document_file", document_id=doc.id)
+    pending = document_counters.pending(doc.id)
 
     return DocumentResponse(
         id=doc.id,
@@ -206,26 +422,43 @@ async def update_document(
         file_path=doc.file_path,
         file_size=doc.file_size,
         rejection_reason=doc.rejection_reason,
+        overlap_score=doc.overlap_score,
+        download_count=doc.download_count + pending["download_count"],
+        view_count=doc.view_count + pending["view_count"],
         download_url=str(download_url)
     )
 
 @router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_document(document_id: str, db: Session = Depends(get_db)):
+async def delete_document(document_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Delete a document."""
     doc = db.query(Document).filter(Document.id == document_id).first()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
+    deltas = upload_deltas(doc, sign=-1)
 
     if os.path.exists(doc.file_path):
         os.remove(doc.file_path)
 
+    record_document_deleted(db, doc)
+    record_signature_deleted(db, document_id)
+    related_owners = remove_related_documents(db, [document_id])
+    remove_citations(db, [document_id])
+    sequences = next_sequences(db, deltas)
     db.delete(doc)
     db.commit()
+    impact_scores.mark_stale()
+    lsh_index.remove(document_id)
+    search_index.delete_documents([document_id])
+    _invalidate_cached_dashboards()
+    background_tasks.add_task(broadcast_stats_update, deltas, "document_deleted", document_id, sequences)
+    if related_owners:
+        background_tasks.add_task(refresh_related_lists, related_owners)
     return
 
 @router.get("/{document_id}/download", response_class=FileResponse)
 async def download_document_file(
     document_id: str,
+    background_tasks: BackgroundTasks,
     user_id: str = Query(...),
     db: Session = Depends(get_db)
 ):
@@ -246,6 +479,13 @@ async def download_document_file(
     # Log the download action
     new_download = Download(document_id=document_id, user_id=user_id)
     db.add(new_download)
+    record_download(db, doc)
     db.commit()
+    document_counters.record_download(doc.id)
+    unique_visitors.record("download", doc.id, doc.department_id, user_id)
+    if doc.status == DocumentStatus.APPROVED:
+        trending_documents.record("download", doc.id, doc.department_id)
+    background_tasks.add_task(broadcast_stats_update, download_deltas(doc), "document_downloaded", document_id)
+    metrics.increment("download_bytes_total", os.path.getsize(file_path))
 
     return FileResponse(path=file_path, filename=Path(file_path).name, media_type='application/octet-stream')
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+
+from ....core.auth import get_admin_user
+from ....core.exports import EXPORT_TABLES, FORMATS, GZIP_MEDIA_TYPE, export_filename, stream_export
+from ....models import User
+
+router = APIRouter()
+
+@router.get("/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("csv"),  # csv, ndjson
+    gzip: bool = Query(False),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Stream a full export of users, documents, downloads or audit-log (admin only)
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {table}. Available: {', '.join(EXPORT_TABLES)}")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}. Use csv or ndjson")
+
+    return StreamingResponse(
+        stream_export(table, format, compress=gzip, since=since, until=until),
+        media_type=GZIP_MEDIA_TYPE if gzip else FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(table, format, gzip)}"'}
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -6,6 +6,11 @@ from ....core.database import get_db
 from ....models.metadata import Metadata
 from ....models.document import Document
 from ....schemas.metadata import MetadataCreate, MetadataUpdate, MetadataResponse
+from ....core.metadata_index import sync_metadata_terms, remove_metadata_terms
+from ....core.document_processing import reindex_document
+
+# Metadata fields that are part of a document's search text
+INDEXED_FIELDS = {"keywords", "abstract"}
 
 router = APIRouter()
 
@@ -23,6 +28,7 @@ async def get_document_metadata(
 @router.post("/", response_model=MetadataResponse)
 async def create_metadata(
     metadata: MetadataCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Create metadata for a document"""
@@ -38,14 +44,18 @@ async def create_metadata(
     
     db_metadata = Metadata(**metadata.dict())
     db.add(db_metadata)
+    db.flush()
+    sync_metadata_terms(db, [db_metadata])
     db.commit()
     db.refresh(db_metadata)
+    background_tasks.add_task(reindex_document, db_metadata.document_id)
     return db_metadata
 
 @router.put("/{metadata_id}", response_model=MetadataResponse)
 async def update_metadata(
     metadata_id: str,
     metadata: MetadataUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Update metadata"""
@@ -57,13 +67,18 @@ async def update_metadata(
     for field, value in update_data.items():
         setattr(db_metadata, field, value)
     
+    if "keywords" in update_data or "authors" in update_data:
+        sync_metadata_terms(db, [db_metadata])
     db.commit()
     db.refresh(db_metadata)
+    if INDEXED_FIELDS & update_data.keys():
+        background_tasks.add_task(reindex_document, db_metadata.document_id)
     return db_metadata
 
 @router.delete("/{metadata_id}")
 async def delete_metadata(
     metadata_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Delete metadata"""
@@ -71,6 +86,9 @@ async def delete_metadata(
     if not db_metadata:
         raise HTTPException(status_code=404, detail="Metadata not found")
     
+    document_id = db_metadata.document_id
+    remove_metadata_terms(db, document_id)
     db.delete(db_metadata)
     db.commit()
+    background_tasks.add_task(reindex_document, document_id)
     return {"message": "Metadata deleted successfully"}
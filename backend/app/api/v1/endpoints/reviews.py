@@ -0,0 +1,132 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+from datetime import datetime
+
+from ....core.database import get_db
+from ....core.review_stats import record_review_assigned, record_review_completed, review_summary
+from ....core.dashboard_deltas import next_sequences, status_change_deltas
+from ....core.rollups import record_review_decision, record_status_change
+from ....models import Department, Document, DocumentStatus, Review, ReviewDecision, ReviewStatus, User
+from ....schemas.review import ReviewAssign, ReviewComplete
+from .documents import schedule_status_change_updates
+
+router = APIRouter()
+
+# Document status after a completed review; needs_revision sends it back to the uploader
+DECISION_STATUS = {
+    ReviewDecision.APPROVED: DocumentStatus.APPROVED,
+    ReviewDecision.REJECTED: DocumentStatus.REJECTED,
+    ReviewDecision.NEEDS_REVISION: DocumentStatus.SUBMITTED,
+}
+
+def _review_dict(review: Review) -> Dict[str, Any]:
+    return {
+        "id": review.id,
+        "document_id": review.document_id,
+        "reviewer_id": review.reviewer_id,
+        "status": ReviewStatus(review.status).value,
+        "decision": ReviewDecision(review.decision).value if review.decision else None,
+        "priority": review.priority,
+        "comments": review.comments,
+        "assigned_date": review.assigned_date.isoformat() if review.assigned_date else None,
+        "started_date": review.started_date.isoformat() if review.started_date else None,
+        "completed_date": review.completed_date.isoformat() if review.completed_date else None
+    }
+
+def _get_review(db: Session, review_id: str) -> Review:
+    review = db.query(Review).filter(Review.id == review_id).first()
+    if not review:
+        raise HTTPException(status_code=404, detail="Review not found")
+    return review
+
+@router.post("", response_model=dict)
+async def assign_review(
+    assignment: ReviewAssign,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Assign a document to a supervisor for review."""
+    doc = db.query(Document).filter(Document.id == str(assignment.document_id)).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not db.query(User.id).filter(User.id == str(assignment.reviewer_id)).first():
+        raise HTTPException(status_code=404, detail="Reviewer not found")
+
+    review = Review(
+        document_id=doc.id,
+        reviewer_id=str(assignment.reviewer_id),
+        priority=assignment.priority,
+        status=ReviewStatus.PENDING,
+        assigned_date=datetime.now()
+    )
+    db.add(review)
+
+    previous_status = doc.status
+    doc.supervisor_id = review.reviewer_id
+    doc.status = DocumentStatus.UNDER_REVIEW
+    record_status_change(db, doc, previous_status)
+    record_review_assigned(db, review, doc.department_id)
+    sequences = next_sequences(db, status_change_deltas(doc, previous_status))
+    db.commit()
+    db.refresh(doc, attribute_names=['uploader'])
+    schedule_status_change_updates(background_tasks, doc, previous_status, sequences)
+    return _review_dict(review)
+
+@router.post("/{review_id}/start", response_model=dict)
+async def start_review(review_id: str, db: Session = Depends(get_db)):
+    """Mark a review as in progress."""
+    review = _get_review(db, review_id)
+    if review.status != ReviewStatus.PENDING:
+        raise HTTPException(status_code=400, detail="Review has already been started")
+    review.status = ReviewStatus.IN_PROGRESS
+    review.started_date = datetime.now()
+    db.commit()
+    return _review_dict(review)
+
+@router.post("/{review_id}/complete", response_model=dict)
+async def complete_review(
+    review_id: str,
+    result: ReviewComplete,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Record the review decision and apply it to the document."""
+    review = _get_review(db, review_id)
+    if review.status == ReviewStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail="Review is already completed")
+    doc = db.query(Document).filter(Document.id == review.document_id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    review.status = ReviewStatus.COMPLETED
+    review.decision = result.decision
+    review.comments = result.comments
+    review.feedback = result.feedback
+    review.started_date = review.started_date or datetime.now()
+    review.completed_date = datetime.now()
+
+    previous_status = doc.status
+    doc.status = DECISION_STATUS[result.decision]
+    if result.decision == ReviewDecision.REJECTED:
+        doc.rejection_reason = result.comments
+    record_status_change(db, doc, previous_status)
+    record_review_decision(db, doc, review)
+    record_review_completed(db, review, doc.department_id)
+    sequences = next_sequences(db, status_change_deltas(doc, previous_status))
+    db.commit()
+    db.refresh(doc, attribute_names=['uploader'])
+    schedule_status_change_updates(background_tasks, doc, previous_status, sequences)
+    return _review_dict(review)
+
+@router.get("/stats/supervisors/{supervisor_id}", response_model=dict)
+async def get_supervisor_review_stats(supervisor_id: str, db: Session = Depends(get_db)):
+    """Turnaround, approval rate, backlog and overdue reviews of one supervisor."""
+    return {"supervisor_id": supervisor_id, **review_summary(db, "supervisor", supervisor_id)}
+
+@router.get("/stats/departments/{department_id}", response_model=dict)
+async def get_department_review_stats(department_id: str, db: Session = Depends(get_db)):
+    """Turnaround, approval rate, backlog and overdue reviews across a department."""
+    if not db.query(Department.id).filter(Department.id == department_id).first():
+        raise HTTPException(status_code=404, detail="Department not found")
+    return {"department_id": department_id, **review_summary(db, "department", department_id)}
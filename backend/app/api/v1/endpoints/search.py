@@ -1,20 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, or_, and_
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 from ....core.database import get_db
 from ....models import Document, User, Department, DocumentStatus
 from ....schemas import DocumentResponse
+from ....core.search_index import search_index
 
 router = APIRouter()
 
+MAX_SEARCH_CANDIDATES = 1000  # Index hits ranked and checked beyond the page before ``total`` becomes a lower bound
+FILTER_CHUNK_SIZE = 500       # Ranked ids per filtering query
+
+def _filter_ranked(db: Session, ranked: List[str], filters: list, wanted: int) -> Tuple[List[str], bool]:
+    """
+    Walk the ranked ids in order and keep those passing ``filters``, until at
+    least ``wanted`` passed and ``MAX_SEARCH_CANDIDATES`` were checked.
+    Returns the passing ids and whether ids were left unchecked.
+    """
+    matched: List[str] = []
+    checked = 0
+    while checked < len(ranked) and (len(matched) < wanted or checked < MAX_SEARCH_CANDIDATES):
+        chunk = ranked[checked:checked + FILTER_CHUNK_SIZE]
+        passing = {doc_id for (doc_id,) in db.query(Document.id).filter(Document.id.in_(chunk), *filters)}
+        matched.extend(doc_id for doc_id in chunk if doc_id in passing)
+        checked += len(chunk)
+    return matched, checked < len(ranked)
+
 @router.get("/documents")
 async def search_documents(
     q: str = Query(..., description="Search query"),
     role: str = Query("student"),
-    category: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     department_id: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=100),
@@ -22,70 +40,79 @@ async def search_documents(
     db: Session = Depends(get_db)
 ):
     """
-    Advanced document search with full-text search capabilities
+    Full-text document search served from the memory-mapped search index.
+
+    ``total`` counts every match when ``total_capped`` is false; otherwise
+    only the best ``offset + limit + MAX_SEARCH_CANDIDATES`` index hits (or
+    as many as the requested page needed) were filtered and it is a lower
+    bound.
     """
     try:
-        query = db.query(Document).options(
-            joinedload(Document.uploader),
-            joinedload(Document.department)
-        )
-        
-        # Full-text search on title, description, filename
-        search_filter = or_(
-            Document.title.ilike(f"%{q}%"),
-            Document.description.ilike(f"%{q}%"),
-            Document.original_filename.ilike(f"%{q}%"),
-            Document.extracted_text.ilike(f"%{q}%")
-        )
-        query = query.filter(search_filter)
-        
         # Apply filters
-        if category:
-            query = query.filter(Document.category == category)
+        filters = []
         if status:
-            query = query.filter(Document.status == status)
+            filters.append(Document.status == status)
         if department_id:
-            query = query.filter(Document.department_id == department_id)
+            filters.append(Document.department_id == department_id)
         
         # Apply role-based filtering
         if role == "admin":
             pass  # Admin sees all
         elif role == "supervisor":
             if department_id:
-                query = query.filter(Document.department_id == department_id)
+                filters.append(Document.department_id == department_id)
         elif role == "staff":
             if department_id:
-                query = query.filter(Document.department_id == department_id)
+                filters.append(Document.department_id == department_id)
         else:  # student
-            query = query.filter(Document.uploader_id == "mock-user-id")
-        
-        # Get total count
-        total = query.count()
-        
-        # Apply pagination and ordering
-        documents = query.order_by(Document.upload_date.desc()).offset(offset).limit(limit).all()
+            filters.append(Document.status == DocumentStatus.APPROVED)
+
+        # Rank the best hits in the index, then filter in the database in rank order;
+        # rank more only when the filters rejected too many for the requested page
+        wanted = offset + limit
+        request = wanted + MAX_SEARCH_CANDIDATES
+        while True:
+            ranked, hits = search_index.search(q, limit=request)
+            matched, unchecked = _filter_ranked(db, [doc_id for doc_id, _ in ranked], filters, wanted)
+            if len(matched) >= wanted or len(ranked) >= hits:
+                break
+            request *= 2
+        scores = dict(ranked)
+        total_capped = unchecked or len(ranked) < hits
+
+        query = db.query(Document).options(
+            joinedload(Document.uploader),
+            joinedload(Document.department)
+        )
+        if scores:
+            total = len(matched)
+            page_ids = matched[offset:offset + limit]
+            documents = sorted(query.filter(Document.id.in_(page_ids)).all(), key=lambda doc: scores[doc.id], reverse=True)
+        elif search_index.segment_count == 0:
+            # Index not built yet (run the reindex job); fall back to a title scan
+            query = query.filter(Document.title.ilike(f"%{q}%"), *filters)
+            total = query.count()
+            documents = query.order_by(Document.upload_date.desc()).offset(offset).limit(limit).all()
+        else:
+            return {"items": [], "total": 0, "total_capped": False, "page": 1, "limit": limit, "total_pages": 0}
         
         results = []
         for doc in documents:
             results.append({
                 "id": doc.id,
                 "title": doc.title,
-                "description": doc.description,
-                "filename": doc.original_filename,
-                "category": doc.category.value,
                 "status": doc.status.value,
                 "upload_date": doc.upload_date.isoformat(),
                 "file_size": doc.file_size,
                 "uploader_name": doc.uploader.name if doc.uploader else "Unknown",
                 "department_name": doc.department.name if doc.department else "Unknown",
-                "download_count": doc.download_count or 0,
-                "view_count": doc.view_count or 0,
-                "relevance_score": 1.0  # Mock relevance score
+                "relevance_score": round(scores.get(doc.id, 0.0), 4)
             })
         
         return {
             "items": results,
             "total": total,
+            "total_capped": total_capped,
             "page": (offset // limit) + 1,
             "limit": limit,
             "total_pages": (total + limit - 1) // limit
@@ -130,9 +157,9 @@ async def get_popular_searches(
     Get popular search terms based on document views/downloads
     """
     try:
-        # Get most downloaded/viewed documents and extract keywords
+        # Get most downloaded/viewed documents (read from ix_documents_popularity) and extract keywords
         popular_docs = db.query(Document).order_by(
-            (Document.download_count + Document.view_count).desc()
+            Document.download_count.desc(), Document.view_count.desc()
         ).limit(limit).all()
         
         popular_terms = []
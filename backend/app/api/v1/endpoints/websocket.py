@@ -1,139 +1,354 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from fastapi.websockets import WebSocketState
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Deque, Iterable, Optional, Set, Union
+from collections import deque
 import json
 import asyncio
 import logging
 from datetime import datetime
 import uuid
 
+from app.core.backplane import create_backplane
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.metrics import metrics
+from app.core.dashboard_deltas import Deltas, dashboard_rooms
 from app.models.user import User, UserRole
 from app.models.document import Document
 
 router = APIRouter()
 
+SLOW_CONSUMER_POLICIES = ("coalesce", "drop_oldest", "disconnect")
+BROADCAST_CHANNEL = "ws:all"
+DASHBOARD_ROOM = "dashboard"  # Anonymous /ws/dashboard connections
+RECENT_EVENT_IDS = 1024  # Remembered to deliver multi-room events once per worker
+
+metrics.describe("websocket_messages_dropped_total", "counter", "Outbound WebSocket messages discarded because a send queue was full")
+metrics.describe("websocket_messages_coalesced_total", "counter", "Outbound WebSocket messages merged into one already queued")
+metrics.describe("websocket_slow_consumers_disconnected_total", "counter", "WebSocket connections closed for not keeping up")
+
+class OutboundMessage:
+    """
+    A message serialised at most once and shared by every queue it is put on.
+
+    Messages with a ``coalesce_key`` describe state that a newer message with
+    the same key can absorb: additive ``stats_delta`` payloads are summed (and
+    cover the sequence numbers ``first_seq`` to ``seq``), anything else is
+    replaced by the newer message.
+    """
+    __slots__ = ("payload", "coalesce_key", "_text")
+
+    def __init__(self, payload: Union[Dict[str, Any], str], coalesce_key: Optional[str] = None):
+        self.payload = payload
+        self.coalesce_key = coalesce_key
+        self._text = payload if isinstance(payload, str) else None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.payload)
+        return self._text
+
+    def absorb(self, newer: "OutboundMessage") -> "OutboundMessage":
+        if isinstance(self.payload, dict) and isinstance(newer.payload, dict) and newer.payload.get("type") == "stats_delta":
+            data = dict(self.payload.get("data") or {})
+            for field, value in (newer.payload.get("data") or {}).items():
+                data[field] = round(data.get(field, 0) + value, 4)
+            coalesced = self.payload.get("coalesced", 1) + newer.payload.get("coalesced", 1)
+            payload = {**newer.payload, "data": data, "coalesced": coalesced}
+            if self.payload.get("seq") is not None and newer.payload.get("seq") is not None:
+                payload["first_seq"] = self.payload.get("first_seq", self.payload["seq"])
+            return OutboundMessage(payload, newer.coalesce_key)
+        return newer
+
+class ConnectionWriter:
+    """
+    Bounded outbound queue of one connection, drained by its own task so a
+    slow client only ever delays itself. Under the ``coalesce`` policy a keyed
+    message is merged into a queued one with the same key at any queue depth,
+    so a connection never holds two pending updates of the same state. A
+    message that still needs a slot in a full queue drops the oldest one under
+    ``coalesce`` and ``drop_oldest``, and closes the connection under
+    ``disconnect``.
+    """
+
+    def __init__(self, connection_id: str, websocket: WebSocket, on_failure: Callable[[str], Any],
+                 max_queue: Optional[int] = None, policy: Optional[str] = None, send_timeout: Optional[float] = None):
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.on_failure = on_failure
+        self.max_queue = max_queue or settings.WEBSOCKET_SEND_QUEUE_SIZE
+        self.policy = policy or settings.WEBSOCKET_SLOW_CONSUMER_POLICY
+        self.send_timeout = send_timeout or settings.WEBSOCKET_SEND_TIMEOUT
+        self.queue: Deque[OutboundMessage] = deque()
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    def enqueue(self, message: OutboundMessage) -> bool:
+        if self.closed:
+            return False
+        if self.policy == "coalesce" and message.coalesce_key is not None:
+            for index, queued in enumerate(self.queue):
+                if queued.coalesce_key == message.coalesce_key:
+                    self.queue[index] = queued.absorb(message)
+                    metrics.increment("websocket_messages_coalesced_total")
+                    return True
+        if len(self.queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                metrics.increment("websocket_messages_dropped_total", len(self.queue) + 1, policy=self.policy)
+                metrics.increment("websocket_slow_consumers_disconnected_total")
+                self.close()
+                self.on_failure(self.connection_id)
+                return False
+            self.queue.popleft()
+            metrics.increment("websocket_messages_dropped_total", policy=self.policy)
+        self.queue.append(message)
+        self._ready.set()
+        return True
+
+    async def _drain(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self.queue:
+                    message = self.queue.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(message.text), self.send_timeout)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"Error sending message to {self.connection_id}: {e}")
+            self.closed = True
+            self.queue.clear()
+            self.on_failure(self.connection_id)
+
+    def close(self):
+        """Stop the writer and discard what is still queued"""
+        self.closed = True
+        self.queue.clear()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
 class ConnectionManager:
+    """
+    Registry of open WebSocket connections.
+
+    Users and rooms map to sets of connection ids, and each connection keeps
+    reverse references to its user and rooms, so connecting, disconnecting,
+    joining and looking up are O(1) and a fan-out only touches its recipients.
+    Sends only put the (once-serialised) message on each recipient's
+    ``ConnectionWriter`` queue, so a fan-out never waits for a client.
+
+    User, room and broadcast sends are also published to the backplane, and
+    the manager subscribes to a user's or room's channel only while it has
+    local connections for it, so other workers receive just the events they
+    can deliver. Events arriving from the backplane are delivered locally.
+    """
+
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.user_connections: Dict[str, List[str]] = {}
-        self.room_connections: Dict[str, List[str]] = {}  # For department/role-based rooms
+        self.writers: Dict[str, ConnectionWriter] = {}
+        self.user_connections: Dict[str, Set[str]] = {}
+        self.room_connections: Dict[str, Set[str]] = {}  # For department/role-based rooms
+        self.connection_users: Dict[str, str] = {}
+        self.connection_rooms: Dict[str, Set[str]] = {}
+        self.worker_id = uuid.uuid4().hex
+        self.backplane = None
+        self._recent_events: Deque[str] = deque()
+        self._recent_event_ids: Set[str] = set()
 
-    async def connect(self, websocket: WebSocket, user_id: str, connection_id: str, room: Optional[str] = None):
-        await websocket.accept()
-        self.active_connections[connection_id] = websocket
-        
-        # Track user connections
-        if user_id not in self.user_connections:
-            self.user_connections[user_id] = []
-        self.user_connections[user_id].append(connection_id)
-        
-        # Track room connections
-        if room:
-            if room not in self.room_connections:
-                self.room_connections[room] = []
-            self.room_connections[room].append(connection_id)
-        
-        logging.info(f"WebSocket connected: user_id={user_id}, connection_id={connection_id}, room={room}")
-        
-        # Send connection confirmation
-        await self.send_personal_message(json.dumps({
-            "type": "connection_established",
-            "message": "Connected to Academic Repository System",
-            "connection_id": connection_id,
-            "timestamp": datetime.now().isoformat()
-        }), connection_id)
+    async def start_backplane(self, backplane=None):
+        """Share events with other workers through ``backplane`` (from settings by default)"""
+        self.backplane = backplane or create_backplane()
+        await self.backplane.start(self._receive_event)
+        for channel in [BROADCAST_CHANNEL, *map(_user_channel, self.user_connections), *map(_room_channel, self.room_connections)]:
+            self.backplane.subscribe(channel)
+
+    async def stop_backplane(self):
+        if self.backplane is not None:
+            backplane, self.backplane = self.backplane, None
+            await backplane.stop()
+
+    def _subscribe(self, channel: str):
+        if self.backplane is not None:
+            self.backplane.subscribe(channel)
 
-    def disconnect(self, connection_id: str, user_id: str, room: Optional[str] = None):
+    def _unsubscribe(self, channel: str):
+        if self.backplane is not None:
+            self.backplane.unsubscribe(channel)
+
+    def register(self, connection_id: str, websocket: WebSocket, user_id: Optional[str], rooms: Iterable[str] = ()):
+        """Track an accepted connection (replacing an earlier one with the same id)"""
         if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
-        
-        # Remove from user connections
-        if user_id in self.user_connections:
-            if connection_id in self.user_connections[user_id]:
-                self.user_connections[user_id].remove(connection_id)
-            if not self.user_connections[user_id]:
-                del self.user_connections[user_id]
-        
-        # Remove from room connections
-        if room and room in self.room_connections:
-            if connection_id in self.room_connections[room]:
-                self.room_connections[room].remove(connection_id)
-            if not self.room_connections[room]:
+            self.disconnect(connection_id)
+        self.active_connections[connection_id] = websocket
+        self.writers[connection_id] = ConnectionWriter(connection_id, websocket, self._writer_failed)
+        self.connection_rooms[connection_id] = set()
+        if user_id is not None:
+            self.connection_users[connection_id] = user_id
+            if user_id not in self.user_connections:
+                self.user_connections[user_id] = set()
+                self._subscribe(_user_channel(user_id))
+            self.user_connections[user_id].add(connection_id)
+        for room in rooms:
+            self.join_room(connection_id, room)
+
+    async def connect(self, websocket: WebSocket, user_id: str, connection_id: str, rooms: Iterable[str] = ()):
+        await websocket.accept()
+        self.register(connection_id, websocket, user_id, rooms)
+        logging.info(f"WebSocket connected: user_id={user_id}, connection_id={connection_id}")
+
+    def join_room(self, connection_id: str, room: str):
+        if connection_id not in self.connection_rooms:
+            return
+        if room not in self.room_connections:
+            self.room_connections[room] = set()
+            self._subscribe(_room_channel(room))
+        self.room_connections[room].add(connection_id)
+        self.connection_rooms[connection_id].add(room)
+
+    def leave_room(self, connection_id: str, room: str):
+        self.connection_rooms.get(connection_id, set()).discard(room)
+        connections = self.room_connections.get(room)
+        if connections is not None:
+            connections.discard(connection_id)
+            if not connections:
                 del self.room_connections[room]
-        
-        logging.info(f"WebSocket disconnected: user_id={user_id}, connection_id={connection_id}, room={room}")
+                self._unsubscribe(_room_channel(room))
 
-    async def send_personal_message(self, message: str, connection_id: str):
+    def leave_all_rooms(self, connection_id: str):
+        for room in list(self.connection_rooms.get(connection_id, ())):
+            self.leave_room(connection_id, room)
+
+    def disconnect(self, connection_id: str):
+        """Forget a connection; safe to call more than once"""
+        self.leave_all_rooms(connection_id)
+        self.connection_rooms.pop(connection_id, None)
+        self.active_connections.pop(connection_id, None)
+        writer = self.writers.pop(connection_id, None)
+        if writer is not None:
+            writer.close()
+        user_id = self.connection_users.pop(connection_id, None)
+        if user_id is not None:
+            connections = self.user_connections.get(user_id)
+            if connections is not None:
+                connections.discard(connection_id)
+                if not connections:
+                    del self.user_connections[user_id]
+                    self._unsubscribe(_user_channel(user_id))
+            logging.info(f"WebSocket disconnected: user_id={user_id}, connection_id={connection_id}")
+
+    async def remove_connection(self, connection_id: str):
+        """Close and forget a dead connection"""
         websocket = self.active_connections.get(connection_id)
-        if websocket and websocket.client_state == WebSocketState.CONNECTED:
+        self.disconnect(connection_id)
+        if websocket is not None:
             try:
-                await websocket.send_text(message)
-                return True
-            except Exception as e:
-                logging.error(f"Error sending message to {connection_id}: {e}")
-                await self.remove_connection(connection_id)
-                return False
-        return False
+                await websocket.close()
+            except Exception:
+                pass
 
-    async def send_to_user(self, user_id: str, message: Dict[str, Any]):
+    def _writer_failed(self, connection_id: str):
+        asyncio.get_running_loop().create_task(self.remove_connection(connection_id))
+
+    def _send_many(self, connection_ids: Iterable[str], message: OutboundMessage) -> int:
+        sent = 0
+        for connection_id in connection_ids:
+            writer = self.writers.get(connection_id)
+            if writer is not None and writer.enqueue(message):
+                sent += 1
+        return sent
+
+    async def send_personal_message(self, message: str, connection_id: str, coalesce_key: Optional[str] = None) -> bool:
+        return self._send_many((connection_id,), OutboundMessage(message, coalesce_key)) > 0
+
+    def _excluding(self, connection_ids: Set[str], exclude_user: Optional[str]) -> Set[str]:
+        if exclude_user and exclude_user in self.user_connections:
+            return connection_ids - self.user_connections[exclude_user]
+        return connection_ids
+
+    def _deliver(self, target: str, names: List[str], message: OutboundMessage, exclude_user: Optional[str] = None) -> int:
+        """Send to this worker's connections of the users or rooms named, or to all of them"""
+        if target == "user":
+            connection_ids = set().union(*(self.user_connections.get(name, ()) for name in names))
+        elif target == "rooms":
+            connection_ids = set().union(*(self.room_connections.get(name, ()) for name in names))
+        else:
+            connection_ids = set(self.active_connections)
+        return self._send_many(self._excluding(connection_ids, exclude_user), message)
+
+    def _dispatch(self, target: str, names: List[str], payload: Union[Dict[str, Any], str],
+                  exclude_user: Optional[str] = None, coalesce_key: Optional[str] = None):
+        """Deliver locally, then publish for the other workers"""
+        self._deliver(target, names, OutboundMessage(payload, coalesce_key), exclude_user)
+        if self.backplane is None:
+            return
+        if target == "user":
+            channels = [_user_channel(name) for name in names]
+        elif target == "rooms":
+            channels = [_room_channel(name) for name in names]
+        else:
+            channels = [BROADCAST_CHANNEL]
+        event = json.dumps({
+            "id": uuid.uuid4().hex,
+            "origin": self.worker_id,
+            "target": target,
+            "names": names,
+            "message": payload,
+            "exclude_user": exclude_user,
+            "coalesce_key": coalesce_key
+        }).encode()
+        for channel in channels:
+            if self.backplane.publish(channel, event):
+                metrics.increment("websocket_backplane_published_total")
+
+    def _receive_event(self, channel: str, data: bytes):
+        """Deliver an event published by another worker"""
+        try:
+            event = json.loads(data)
+        except ValueError:
+            logging.warning(f"Ignoring malformed backplane event on {channel}")
+            return
+        if event.get("origin") == self.worker_id:
+            return
+        if len(event["names"]) > 1:
+            # Published on several channels this worker may all be subscribed to
+            if event["id"] in self._recent_event_ids:
+                return
+            self._recent_events.append(event["id"])
+            self._recent_event_ids.add(event["id"])
+            if len(self._recent_events) > RECENT_EVENT_IDS:
+                self._recent_event_ids.discard(self._recent_events.popleft())
+        metrics.increment("websocket_backplane_received_total")
+        self._deliver(event["target"], event["names"], OutboundMessage(event["message"], event.get("coalesce_key")),
+                      event.get("exclude_user"))
+
+    async def send_to_user(self, user_id: str, message: Dict[str, Any], coalesce_key: Optional[str] = None):
         """Send message to all connections of a specific user"""
-        if user_id in self.user_connections:
-            message_str = json.dumps(message)
-            tasks = []
-            for connection_id in self.user_connections[user_id]:
-                tasks.append(self.send_personal_message(message_str, connection_id))
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def send_to_room(self, room: str, message: Dict[str, Any], exclude_user: Optional[str] = None):
+        self._dispatch("user", [user_id], message, coalesce_key=coalesce_key)
+
+    async def send_to_room(self, room: str, message: Dict[str, Any], exclude_user: Optional[str] = None,
+                           coalesce_key: Optional[str] = None):
         """Send message to all connections in a room"""
-        if room in self.room_connections:
-            message_str = json.dumps(message)
-            tasks = []
-            
-            for connection_id in self.room_connections[room]:
-                # Skip if excluding specific user
-                if exclude_user:
-                    user_id = self.get_user_id_by_connection(connection_id)
-                    if user_id == exclude_user:
-                        continue
-                
-                tasks.append(self.send_personal_message(message_str, connection_id))
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatch("rooms", [room], message, exclude_user, coalesce_key)
+
+    async def send_to_rooms(self, rooms: Iterable[str], message: Dict[str, Any], coalesce_key: Optional[str] = None):
+        """Send message once to every connection in any of the rooms"""
+        self._dispatch("rooms", sorted(set(rooms)), message, coalesce_key=coalesce_key)
 
     async def broadcast_to_all(self, message: Dict[str, Any], exclude_user: Optional[str] = None):
         """Broadcast message to all connected users"""
-        message_str = json.dumps(message)
-        tasks = []
-        
-        for connection_id in self.active_connections:
-            if exclude_user:
-                user_id = self.get_user_id_by_connection(connection_id)
-                if user_id == exclude_user:
-                    continue
-            
-            tasks.append(self.send_personal_message(message_str, connection_id))
-        
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.broadcast(json.dumps(message), exclude_user)
+
+    async def broadcast(self, message: str, exclude_user: Optional[str] = None):
+        """Broadcast an already serialised message to all connected users"""
+        self._dispatch("all", [], message, exclude_user)
 
     def get_user_id_by_connection(self, connection_id: str) -> Optional[str]:
         """Get user ID by connection ID"""
-        for user_id, connections in self.user_connections.items():
-            if connection_id in connections:
-                return user_id
-        return None
-
-    async def remove_connection(self, connection_id: str):
-        """Remove a dead connection"""
-        user_id = self.get_user_id_by_connection(connection_id)
-        if user_id:
-            self.disconnect(connection_id, user_id)
+        return self.connection_users.get(connection_id)
 
     def get_active_users(self) -> List[str]:
         """Get list of currently active user IDs"""
@@ -141,63 +356,54 @@ class ConnectionManager:
 
     def get_room_users(self, room: str) -> List[str]:
         """Get list of users in a specific room"""
-        if room not in self.room_connections:
-            return []
-        
-        users = []
-        for connection_id in self.room_connections[room]:
-            user_id = self.get_user_id_by_connection(connection_id)
-            if user_id and user_id not in users:
-                users.append(user_id)
-        return users
+        return list({
+            self.connection_users[connection_id] for connection_id in self.room_connections.get(room, ())
+            if connection_id in self.connection_users
+        })
 
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get connection statistics"""
+        depths = [len(writer.queue) for writer in self.writers.values()]
         return {
             "total_connections": len(self.active_connections),
             "active_users": len(self.user_connections),
             "active_rooms": len(self.room_connections),
-            "rooms": {room: len(connections) for room, connections in self.room_connections.items()}
+            "rooms": {room: len(connections) for room, connections in self.room_connections.items()},
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "backplane": type(self.backplane).__name__ if self.backplane is not None else None
         }
 
-    async def send_to_user(self, message: str, user_id: str):
-        if user_id in self.user_connections:
-            for connection_id in self.user_connections[user_id].copy():
-                await self.send_personal_message(message, connection_id)
-
-    async def broadcast(self, message: str):
-        disconnected_connections = []
-        for connection_id, websocket in self.active_connections.items():
-            if websocket.client_state == WebSocketState.CONNECTED:
-                try:
-                    await websocket.send_text(message)
-                except Exception as e:
-                    logging.error(f"Error broadcasting to {connection_id}: {e}")
-                    disconnected_connections.append(connection_id)
-        
-        # Clean up disconnected connections
-        for connection_id in disconnected_connections:
-            await self.remove_connection(connection_id)
+def _user_channel(user_id: str) -> str:
+    return f"ws:user:{user_id}"
 
-    async def remove_connection(self, connection_id: str):
-        if connection_id in self.active_connections:
-            websocket = self.active_connections[connection_id]
-            try:
-                await websocket.close()
-            except:
-                pass
-            del self.active_connections[connection_id]
-        
-        # Remove from user connections
-        for user_id, connections in self.user_connections.items():
-            if connection_id in connections:
-                connections.remove(connection_id)
-                if not connections:
-                    del self.user_connections[user_id]
-                break
+def _room_channel(room: str) -> str:
+    return f"ws:room:{room}"
 
 manager = ConnectionManager()
 
+metrics.describe("websocket_room_connections", "gauge", "WebSocket connections per room (user rooms are summed as room=\"user\")")
+
+def _room_samples():
+    user_connections = 0
+    for room, connections in list(manager.room_connections.items()):
+        if room.startswith("user:"):
+            user_connections += len(connections)
+        else:
+            yield "websocket_room_connections", {"room": room}, len(connections)
+    yield "websocket_room_connections", {"room": "user"}, user_connections
+
+metrics.register_collector(_room_samples)
+
+metrics.describe("websocket_send_queue_depth", "gauge", "Outbound WebSocket messages waiting to be sent (stat=\"total\" or \"max\" per connection)")
+
+def _queue_samples():
+    depths = [len(writer.queue) for writer in list(manager.writers.values())]
+    yield "websocket_send_queue_depth", {"stat": "total"}, sum(depths)
+    yield "websocket_send_queue_depth", {"stat": "max"}, max(depths, default=0)
+
+metrics.register_collector(_queue_samples)
+
 @router.websocket("/ws/{connection_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
@@ -235,30 +441,27 @@ async def websocket_endpoint(
         except Exception as e:
             logging.error(f"Database error during user verification: {e}")
         
-        # Add to connection manager
-        manager.active_connections[connection_id] = websocket
-        if user_id not in manager.user_connections:
-            manager.user_connections[user_id] = []
-        manager.user_connections[user_id].append(connection_id)
-        
+        # Rooms decide which dashboard stats the connection receives, so they only come from the user row
         if not user:
-            # For demo purposes, create a temporary user session
-            # In production, you should enforce proper authentication
             await websocket.send_text(json.dumps({
-                "type": "connected",
-                "message": "WebSocket connected (demo mode - user not found in database)",
-                "user_id": user_id,
-                "connection_id": connection_id,
-                "warning": "Demo mode: Please use proper authentication in production"
-            }))
-        else:
-            # Send connection confirmation for valid user
-            await websocket.send_text(json.dumps({
-                "type": "connected",
-                "message": "WebSocket connected successfully",
-                "user_id": user_id,
-                "connection_id": connection_id
+                "type": "error",
+                "message": "User not found"
             }))
+            await websocket.close()
+            return
+        
+        # Register with the rooms dashboard stat deltas are published to
+        rooms = dashboard_rooms(user.role.value, user_id, user.department_id)
+        manager.register(connection_id, websocket, user_id, rooms)
+        
+        # From here on the connection's writer task owns the socket, so replies are queued too
+        await manager.send_personal_message(json.dumps({
+            "type": "connected",
+            "message": "WebSocket connected successfully",
+            "user_id": user_id,
+            "connection_id": connection_id,
+            "rooms": rooms
+        }), connection_id)
         
         # Keep connection alive and handle messages
         while True:
@@ -268,16 +471,16 @@ async def websocket_endpoint(
                 
                 # Handle different message types
                 if message_data.get("type") == "ping":
-                    await websocket.send_text(json.dumps({
+                    await manager.send_personal_message(json.dumps({
                         "type": "pong",
                         "timestamp": message_data.get("timestamp")
-                    }))
+                    }), connection_id)
                 elif message_data.get("type") == "subscribe":
                     # Handle subscription to specific events
-                    await websocket.send_text(json.dumps({
+                    await manager.send_personal_message(json.dumps({
                         "type": "subscribed",
                         "channel": message_data.get("channel", "dashboard")
-                    }))
+                    }), connection_id)
                 
             except WebSocketDisconnect:
                 break
@@ -290,44 +493,53 @@ async def websocket_endpoint(
     
     finally:
         # Clean up connection
-        manager.disconnect(connection_id, user_id)
+        if manager.active_connections.get(connection_id) is websocket:
+            manager.disconnect(connection_id)
 
 # Utility functions to send real-time updates
 async def notify_document_uploaded(user_id: str, document_data: Dict[str, Any]):
     """Notify when a document is uploaded"""
-    message = json.dumps({
+    await manager.send_to_user(user_id, {
         "type": "document_uploaded",
         "data": document_data,
         "timestamp": asyncio.get_event_loop().time()
     })
-    await manager.send_to_user(message, user_id)
 
 async def notify_document_reviewed(user_id: str, document_data: Dict[str, Any]):
     """Notify when a document is reviewed"""
-    message = json.dumps({
+    await manager.send_to_user(user_id, {
         "type": "document_reviewed", 
         "data": document_data,
         "timestamp": asyncio.get_event_loop().time()
     })
-    await manager.send_to_user(message, user_id)
 
-async def broadcast_stats_update(stats_data: Dict[str, Any]):
-    """Broadcast updated dashboard stats to all connected users"""
-    message = json.dumps({
-        "type": "stats_update",
-        "data": stats_data,
-        "timestamp": asyncio.get_event_loop().time()
-    })
-    await manager.broadcast(message)
+async def broadcast_stats_update(deltas: Deltas, event: str, document_id: Optional[str] = None,
+                                 sequences: Optional[Dict[str, int]] = None):
+    """Send each room the dashboard stat deltas that apply to its members, numbered by ``sequences``"""
+    timestamp = asyncio.get_event_loop().time()
+    for room, changes in deltas.items():
+        seq = (sequences or {}).get(room)
+        # Clients skip numbered deltas their snapshot covers but apply unnumbered ones
+        # unconditionally, so the two kinds are never merged into one message
+        key = f"stats_delta:{room}" if seq is not None else f"stats_delta:{room}:unnumbered"
+        await manager.send_to_room(room, {
+            "type": "stats_delta",
+            "event": event,
+            "document_id": document_id,
+            "room": room,
+            "seq": seq,
+            "data": changes,
+            "timestamp": timestamp
+        }, coalesce_key=key)
 
-async def notify_activity_update(activity_data: Dict[str, Any]):
-    """Broadcast new activity to all users"""
-    message = json.dumps({
+async def notify_activity_update(activity_data: Dict[str, Any], rooms: List[str]):
+    """Send a new or changed recent-documents entry to the rooms that list it"""
+    # A connection can be in several of the rooms; send it the entry once
+    await manager.send_to_rooms(rooms, {
         "type": "activity_update",
         "data": activity_data,
         "timestamp": asyncio.get_event_loop().time()
-    })
-    await manager.broadcast(message)
+    }, coalesce_key=f"activity:{activity_data.get('id')}")
 
 # Export the manager for use in other modules
 __all__ = ['manager', 'notify_document_uploaded', 'notify_document_reviewed', 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import auth, dashboard, documents, search, notifications, analytics, users, metadata, departments
+from .endpoints import auth, dashboard, documents, search, notifications, analytics, users, metadata, departments, websocket, exports, reviews
 
 api_router = APIRouter()
 
@@ -13,7 +13,9 @@ api_router.include_router(notifications.router, prefix="/notifications", tags=["
 api_router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
 api_router.include_router(users.router, prefix="/users", tags=["Users"])
 api_router.include_router(departments.router, prefix="/departments", tags=["Departments"])
+api_router.include_router(websocket.router, prefix="/ws", tags=["WebSocket"])
+api_router.include_router(exports.router, prefix="/exports", tags=["Exports"])
+api_router.include_router(reviews.router, prefix="/reviews", tags=["Reviews"])
 
 # TODO: Add other endpoint routers when they are created:
-# api_router.include_router(reviews.router, prefix="/reviews", tags=["Reviews"])
 # api_router.include_router(audit.router, prefix="/audit", tags=["Audit Logs"])
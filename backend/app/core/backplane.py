@@ -0,0 +1,330 @@
+"""
+Pub/sub backplane carrying WebSocket events between workers.
+
+Each worker subscribes only to the channels it has local recipients for
+(``ws:room:<room>``, ``ws:user:<id>`` and ``ws:all``), so the broker forwards
+an event only to workers that can deliver it. Backends:
+
+- ``InProcessBackplane`` – workers sharing an ``InProcessBroker`` in one
+  process (a single worker by default, where it carries nothing).
+- ``RedisBackplane`` – the Redis pub/sub protocol over asyncio streams,
+  reconnecting and resubscribing after failures. It works against Redis or
+  against ``LocalBroker``, a small stand-in server for a single host:
+  ``python -m app.core.backplane --port 6380``.
+
+Backends expose synchronous ``subscribe``/``unsubscribe``/``publish`` so
+callers never wait on the network; a publish while disconnected is dropped
+and counted.
+"""
+import argparse
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Set, Union
+from urllib.parse import urlparse
+
+from .config import settings
+from .metrics import metrics
+
+Handler = Callable[[str, bytes], None]
+Reply = Union[bytes, int, None, List["Reply"]]
+
+RECONNECT_MAX_DELAY = 10.0  # seconds
+BROKER_MAX_BUFFER = 8 * 1024 * 1024  # Subscribers further behind than this are disconnected by LocalBroker
+
+metrics.describe("websocket_backplane_published_total", "counter", "WebSocket events published to the backplane")
+metrics.describe("websocket_backplane_received_total", "counter", "WebSocket events received from the backplane")
+metrics.describe("websocket_backplane_dropped_total", "counter", "WebSocket events not published because the backplane was unavailable")
+
+class BackplaneError(Exception):
+    pass
+
+def encode_command(*parts: Union[str, bytes, int]) -> bytes:
+    """A RESP array of bulk strings"""
+    chunks = [b"*%d\r\n" % len(parts)]
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode()
+        chunks.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(chunks)
+
+async def read_reply(reader: asyncio.StreamReader) -> Reply:
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise asyncio.IncompleteReadError(line, None)
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body
+    if prefix == b"-":
+        raise BackplaneError(body.decode(errors="replace"))
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        return None if length < 0 else (await reader.readexactly(length + 2))[:-2]
+    if prefix == b"*":
+        length = int(body)
+        return None if length < 0 else [await read_reply(reader) for _ in range(length)]
+    raise BackplaneError(f"Unexpected reply: {line[:50]!r}")
+
+def _subscription_reply(kind: str, channel: str, count: int) -> bytes:
+    """``[kind, channel, count]`` as Redis confirms (un)subscriptions"""
+    return encode_command(kind, channel).replace(b"*2", b"*3", 1) + b":%d\r\n" % count
+
+class InProcessBroker:
+    """Routes messages between the in-process backplanes attached to it"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InProcessBackplane"]] = {}
+
+    def publish(self, channel: str, data: bytes, origin: "InProcessBackplane") -> int:
+        receivers = [backplane for backplane in self.subscribers.get(channel, ()) if backplane is not origin]
+        for backplane in receivers:
+            backplane.deliver(channel, data)
+        return len(receivers)
+
+class InProcessBackplane:
+    def __init__(self, broker: Optional[InProcessBroker] = None):
+        self.broker = broker or InProcessBroker()
+        self.channels: Set[str] = set()
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def stop(self):
+        for channel in list(self.channels):
+            self.unsubscribe(channel)
+        self._handler = None
+
+    def subscribe(self, channel: str):
+        self.channels.add(channel)
+        self.broker.subscribers.setdefault(channel, set()).add(self)
+
+    def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+        subscribers = self.broker.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.broker.subscribers[channel]
+
+    def publish(self, channel: str, data: bytes) -> bool:
+        self.broker.publish(channel, data, self)
+        return True
+
+    def deliver(self, channel: str, data: bytes):
+        if self._handler is not None:
+            self._handler(channel, data)
+
+class RedisBackplane:
+    """
+    Redis pub/sub client: one connection in subscriber mode and one for
+    publishing. Receivers skip their own events, which Redis echoes back.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.channels: Set[str] = set()
+        self.connected = asyncio.Event()
+        self._handler: Optional[Handler] = None
+        self._subscriber: Optional[asyncio.StreamWriter] = None
+        self._publisher: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, channel: str):
+        if channel not in self.channels:
+            self.channels.add(channel)
+            if self._subscriber is not None:
+                self._subscriber.write(encode_command("SUBSCRIBE", channel))
+
+    def unsubscribe(self, channel: str):
+        if channel in self.channels:
+            self.channels.discard(channel)
+            if self._subscriber is not None:
+                self._subscriber.write(encode_command("UNSUBSCRIBE", channel))
+
+    def publish(self, channel: str, data: bytes) -> bool:
+        if self._publisher is None or self._publisher.is_closing():
+            metrics.increment("websocket_backplane_dropped_total")
+            return False
+        self._publisher.write(encode_command("PUBLISH", channel, data))
+        return True
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            await read_reply(reader)
+        return reader, writer
+
+    async def _run(self):
+        delay = 0.5
+        while True:
+            writers = []
+            try:
+                sub_reader, subscriber = await self._open()
+                writers.append(subscriber)
+                pub_reader, publisher = await self._open()
+                writers.append(publisher)
+                if self.channels:
+                    subscriber.write(encode_command("SUBSCRIBE", *sorted(self.channels)))
+                self._subscriber, self._publisher = subscriber, publisher
+                self.connected.set()
+                logging.info(f"WebSocket backplane connected to {self.host}:{self.port}")
+                delay = 0.5
+
+                tasks = [asyncio.ensure_future(self._receive(sub_reader)), asyncio.ensure_future(self._discard_replies(pub_reader))]
+                try:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                for task in done:
+                    task.result()
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.IncompleteReadError, BackplaneError) as e:
+                logging.warning(f"WebSocket backplane connection to {self.host}:{self.port} failed: {e}")
+            finally:
+                self.connected.clear()
+                self._subscriber = self._publisher = None
+                for writer in writers:
+                    writer.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _receive(self, reader: asyncio.StreamReader):
+        while True:
+            reply = await read_reply(reader)
+            if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message" and self._handler is not None:
+                self._handler(reply[1].decode(), reply[2])
+
+    @staticmethod
+    async def _discard_replies(reader: asyncio.StreamReader):
+        while True:
+            await read_reply(reader)  # Subscriber counts of our PUBLISH commands
+
+class LocalBroker:
+    """Minimal server for the Redis pub/sub commands (SUBSCRIBE, UNSUBSCRIBE, PUBLISH, PING, AUTH)"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self.clients: Set[asyncio.StreamWriter] = set()
+        self.tasks: Set[asyncio.Task] = set()  # One ``_serve`` task per connected client
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 6380):
+        self.server = await asyncio.start_server(self._serve, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+        # Client tasks would otherwise keep reading from sockets that outlive the server
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+            self.server = None
+        for writer in self.clients:
+            writer.close()
+        self.clients.clear()
+        self.subscribers.clear()
+
+    def _publish(self, channel: str, data: bytes) -> int:
+        receivers = list(self.subscribers.get(channel, ()))
+        message = encode_command("message", channel, data)
+        for writer in receivers:
+            if writer.transport.get_write_buffer_size() > BROKER_MAX_BUFFER:
+                logging.warning("Backplane broker dropped a subscriber that stopped reading")
+                writer.close()
+                continue
+            writer.write(message)
+        return len(receivers)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels: Set[str] = set()
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        self.clients.add(writer)
+        try:
+            while True:
+                try:
+                    command = await read_reply(reader)
+                except BackplaneError:
+                    break
+                if not isinstance(command, list) or not command:
+                    writer.write(b"-ERR expected a command array\r\n")
+                    continue
+                name, args = command[0].upper(), [arg.decode() if isinstance(arg, bytes) else arg for arg in command[1:]]
+                if name == b"SUBSCRIBE":
+                    for channel in args:
+                        channels.add(channel)
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(_subscription_reply("subscribe", channel, len(channels)))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in args or list(channels):
+                        channels.discard(channel)
+                        self._remove(channel, writer)
+                        writer.write(_subscription_reply("unsubscribe", channel, len(channels)))
+                elif name == b"PUBLISH" and len(command) == 3:
+                    writer.write(b":%d\r\n" % self._publish(args[0], command[2]))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"AUTH":
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for channel in channels:
+                self._remove(channel, writer)
+            self.clients.discard(writer)
+            self.tasks.discard(task)
+            writer.close()
+
+    def _remove(self, channel: str, writer: asyncio.StreamWriter):
+        writers = self.subscribers.get(channel)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[channel]
+
+def create_backplane():
+    if settings.WEBSOCKET_BACKPLANE_URL:
+        return RedisBackplane(settings.WEBSOCKET_BACKPLANE_URL)
+    return InProcessBackplane()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local pub/sub broker for the WebSocket backplane")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def serve():
+        broker = LocalBroker()
+        port = await broker.start(args.host, args.port)
+        logging.info(f"Backplane broker listening on {args.host}:{port}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
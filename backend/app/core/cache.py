@@ -0,0 +1,362 @@
+"""
+Response cache for read-heavy dashboard and analytics endpoints.
+
+Entries are keyed by endpoint and the parameters that scope the response
+(role, department, user). Each entry is fresh for ``ttl`` seconds and may then
+be served stale for ``stale_ttl`` more seconds while one background refresh
+recomputes it. Concurrent misses for the same key share one computation
+(single flight); with the SQLite backend a lease row extends that across
+worker processes.
+
+Every ``invalidate(prefix)`` bumps a generation counter for that prefix. A
+computation records the generations covering its key before it starts and
+its result is only stored if they are unchanged, so a response computed
+from data read before an invalidation is never cached as fresh after it.
+
+Backends marked ``blocking`` (SQLite, which can wait on other processes' locks)
+are only called from worker threads, never on the event loop.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .metrics import metrics
+
+LEASE_SECONDS = 10.0
+LEASE_POLL_SECONDS = 0.05
+
+Entry = Tuple[Any, float, float]  # (value, fresh_until, stale_until)
+
+class InProcessLRUBackend:
+    """Per-process LRU dictionary"""
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def generation(self, key: str) -> int:
+        with self._lock:
+            return self._generation(key)
+
+    def _generation(self, key: str) -> int:
+        return sum(n for prefix, n in self._generations.items() if key.startswith(prefix))
+
+    def set(self, key: str, value: Any, fresh_until: float, stale_until: float, generation: Optional[int] = None) -> bool:
+        with self._lock:
+            if generation is not None and self._generation(key) != generation:
+                return False
+            self._entries[key] = (value, fresh_until, stale_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, prefix: str):
+        with self._lock:
+            self._generations[prefix] = self._generations.get(prefix, 0) + 1
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def acquire_lease(self, key: str) -> bool:
+        return True  # In-process coalescing is handled by ResponseCache itself
+
+    def release_lease(self, key: str):
+        pass
+
+class SQLiteBackend:
+    """Cache shared by all worker processes on a host through a WAL-mode SQLite file"""
+    blocking = True  # Waits up to the busy timeout while another process writes
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, fresh_until REAL NOT NULL, stale_until REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_stale ON cache_entries (stale_until)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_generations (prefix TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Entry]:
+        row = self._connection().execute(
+            "SELECT value, fresh_until, stale_until FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def generation(self, key: str) -> int:
+        return self._generation(self._connection(), key)
+
+    @staticmethod
+    def _generation(connection: sqlite3.Connection, key: str) -> int:
+        return connection.execute(
+            "SELECT COALESCE(SUM(generation), 0) FROM cache_generations WHERE substr(?, 1, length(prefix)) = prefix",
+            (key,)
+        ).fetchone()[0]
+
+    def set(self, key: str, value: Any, fresh_until: float, stale_until: float, generation: Optional[int] = None) -> bool:
+        connection = self._connection()
+        text = json.dumps(value, default=str)
+        # Write lock first, so no invalidation can land between the check and the insert
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if generation is not None and self._generation(connection, key) != generation:
+                connection.execute("ROLLBACK")
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, fresh_until, stale_until) VALUES (?, ?, ?, ?)",
+                (key, text, fresh_until, stale_until)
+            )
+            # Drop expired rows, then the soonest-to-expire ones beyond max_entries
+            connection.execute("DELETE FROM cache_entries WHERE stale_until < ?", (time.time(),))
+            connection.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries ORDER BY stale_until DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            connection.execute("COMMIT")
+            return True
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def invalidate(self, prefix: str):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO cache_generations (prefix, generation) VALUES (?, 1) "
+                "ON CONFLICT(prefix) DO UPDATE SET generation = generation + 1",
+                (prefix,)
+            )
+            connection.execute("DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def acquire_lease(self, key: str) -> bool:
+        now = time.time()
+        connection = self._connection()
+        connection.execute("DELETE FROM cache_leases WHERE key = ? AND expires < ?", (key, now))
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO cache_leases (key, owner, expires) VALUES (?, ?, ?)",
+            (key, self.owner, now + LEASE_SECONDS)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str):
+        self._connection().execute("DELETE FROM cache_leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+class ResponseCache:
+    def __init__(self, backend, session_factory: Optional[Callable[[], Session]] = None):
+        self.backend = backend
+        self.session_factory = session_factory
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refreshing: set = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._invalidations: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def make_key(endpoint: str, **scope) -> str:
+        parts = {name: value for name, value in scope.items() if value is not None}
+        return f"{endpoint}:{json.dumps(parts, sort_keys=True, default=str)}"
+
+    async def _backend(self, method: str, *args):
+        """Call a backend method, in a worker thread when it may block"""
+        function = getattr(self.backend, method)
+        if self.backend.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    def _count(self, endpoint: str, outcome: str):
+        counters = self._stats.setdefault(endpoint, {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0})
+        counters[outcome] += 1
+
+    def _compute_with_session(self, compute: Callable[[Session], Any]) -> Any:
+        if self.session_factory is None:
+            from .database import SessionLocal
+            self.session_factory = SessionLocal
+        db = self.session_factory()
+        try:
+            return compute(db)
+        finally:
+            db.close()
+
+    async def get_or_compute(
+        self,
+        endpoint: str,
+        compute: Callable[[Session], Any],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        **scope
+    ) -> Any:
+        """
+        Return the cached response for ``endpoint`` and ``scope`` or compute it
+        with ``compute(db)`` in a worker thread using its own database session.
+        """
+        ttl = settings.CACHE_DEFAULT_TTL if ttl is None else ttl
+        stale_ttl = settings.CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+        key = self.make_key(endpoint, **scope)
+        now = time.time()
+
+        entry = await self._backend("get", key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._count(endpoint, "hits")
+                return value
+            if now < stale_until:
+                self._count(endpoint, "stale_hits")
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    asyncio.get_running_loop().create_task(self._refresh(key, compute, ttl, stale_ttl))
+                return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count(endpoint, "coalesced")
+            return await asyncio.shield(inflight)
+
+        self._count(endpoint, "misses")
+        # The computation is a task of its own so that a cancelled caller
+        # (e.g. a timed-out dashboard panel) does not abandon the callers
+        # coalesced onto it; the result is cached either way.
+        task = asyncio.ensure_future(self._compute_shared(key, compute, ttl, stale_ttl))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._computation_finished(key, done))
+        return await asyncio.shield(task)
+
+    def _computation_finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark a failure as retrieved even when every caller has gone
+
+    async def _compute_shared(self, key: str, compute, ttl: int, stale_ttl: int) -> Any:
+        """Compute once across processes: wait for a peer holding the lease, else compute"""
+        deadline = time.monotonic() + LEASE_SECONDS
+        while not await self._backend("acquire_lease", key):
+            await asyncio.sleep(LEASE_POLL_SECONDS)
+            entry = await self._backend("get", key)
+            if entry is not None and time.time() < entry[1]:
+                return entry[0]
+            if time.monotonic() > deadline:
+                break
+        try:
+            return await self._compute_and_store(key, compute, ttl, stale_ttl)
+        finally:
+            await self._backend("release_lease", key)
+
+    async def _compute_and_store(self, key: str, compute, ttl: int, stale_ttl: int) -> Any:
+        """Compute the value; store it unless the key was invalidated meanwhile"""
+        generation = await self._backend("generation", key)
+        value = await asyncio.to_thread(self._compute_with_session, compute)
+        now = time.time()
+        if not await self._backend("set", key, value, now + ttl, now + ttl + stale_ttl, generation):
+            logging.debug(f"Not caching {key}: invalidated while it was computed")
+        return value
+
+    async def _refresh(self, key: str, compute, ttl: int, stale_ttl: int):
+        try:
+            if await self._backend("acquire_lease", key):
+                try:
+                    await self._compute_and_store(key, compute, ttl, stale_ttl)
+                finally:
+                    await self._backend("release_lease", key)
+        except Exception as e:
+            logging.error(f"Background cache refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def invalidate(self, endpoint_prefix: str):
+        """
+        Drop every entry whose endpoint starts with ``endpoint_prefix``. On the
+        event loop a blocking backend is invalidated on a single background
+        thread, which keeps invalidations in the order they were requested.
+        Requests arriving afterwards do not join computations already running.
+        """
+        for key in [key for key in list(self._inflight) if key.startswith(endpoint_prefix)]:
+            del self._inflight[key]
+        if self.backend.blocking:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                if self._invalidations is None:
+                    self._invalidations = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-invalidation")
+                loop.run_in_executor(self._invalidations, self._invalidate, endpoint_prefix)
+                return
+        self._invalidate(endpoint_prefix)
+
+    def _invalidate(self, endpoint_prefix: str):
+        try:
+            self.backend.invalidate(endpoint_prefix)
+        except Exception as e:
+            logging.error(f"Cache invalidation failed for {endpoint_prefix}: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint counters and hit ratio (stale hits count as hits)"""
+        result = {}
+        for endpoint, counters in self._stats.items():
+            total = sum(counters.values())
+            served = counters["hits"] + counters["stale_hits"] + counters["coalesced"]
+            result[endpoint] = {**counters, "hit_ratio": round(served / total, 4) if total else 0.0}
+        return result
+
+def _create_backend():
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(settings.CACHE_SQLITE_PATH, settings.CACHE_MAX_ENTRIES)
+    return InProcessLRUBackend(settings.CACHE_MAX_ENTRIES)
+
+# Global response cache instance
+response_cache = ResponseCache(_create_backend())
+
+metrics.describe("response_cache_requests_total", "counter",
+                 "Cached endpoint requests by outcome (hit ratio = (hits + stale_hits + coalesced) / total)")
+
+def _cache_samples():
+    for endpoint, counters in response_cache.stats().items():
+        for outcome in ("hits", "stale_hits", "misses", "coalesced"):
+            yield "response_cache_requests_total", {"endpoint": endpoint, "outcome": outcome}, counters[outcome]
+
+metrics.register_collector(_cache_samples)
@@ -0,0 +1,469 @@
+"""
+Citation graph and impact scores.
+
+References are parsed from the reference section of each approved document's
+extracted text and stored in ``citations``. A reference resolves to a
+repository document when it contains nearly all of that document's title
+tokens; short titles must also agree on an author surname or the year.
+Unresolved references are kept and matched again when new documents are
+approved, so a citation is found whichever of the two documents came first.
+
+Both directions go through stored postings instead of the whole corpus:
+``citation_title_tokens`` holds the title tokens of approved documents and
+``citation_reference_tokens`` the tokens of every parsed reference. A new
+document's references are only compared with the titles sharing enough of
+their tokens, and a new title only with the unresolved references that
+contain enough of its tokens.
+
+Impact is PageRank over the resolved edges between approved documents,
+computed by power iteration with ``np.bincount`` (warm-started from the stored
+scores) and stored with citation counts in ``document_impact_scores``. It is
+a whole-graph computation, so citation changes only mark it stale and
+``ImpactScoreRefresher`` recomputes it at most once per interval.
+
+Run ``python -m app.core.citations`` to rebuild everything from scratch.
+"""
+import argparse
+import logging
+import math
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, joinedload, undefer
+
+from .database import SessionLocal
+from .metadata_index import split_terms
+from .related import _chunks
+from .text import tokenize
+from ..models import Citation, CitationReferenceToken, CitationTitleToken, Document, DocumentImpact, DocumentStatus
+
+MAX_REFERENCES = 300             # Per document; longer lists are almost always mis-parsed text
+MAX_REFERENCE_LENGTH = 1000
+MIN_TITLE_CONTAINMENT = 0.8      # Share of a title's tokens a reference must contain
+SHORT_TITLE_TOKENS = 4           # Titles shorter than this also need an author or year match
+MAX_TOKEN_LENGTH = 64            # Longer tokens are noise and do not fit the token tables
+DAMPING = 0.85
+TOLERANCE = 1e-9
+MAX_ITERATIONS = 100
+
+_HEADING = re.compile(
+    r"^[ \t]*(?:\d+\.?[ \t]*)?(?:references|bibliography|works cited|literature cited|reference list)[ \t]*:?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+_END_OF_REFERENCES = re.compile(r"^[ \t]*(?:appendix|appendices)\b", re.IGNORECASE | re.MULTILINE)
+_NUMBERED_ENTRY = re.compile(r"^[ \t]*(?:\[\d{1,3}\]|\(\d{1,3}\)|\d{1,3}\.(?=\s))", re.MULTILINE)
+_AUTHOR_ENTRY = re.compile(r"^[A-Z][A-Za-z'\-]+,[ \t]+[A-Z]")  # "Surname, I." starts an unnumbered entry
+_YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+_WHITESPACE = re.compile(r"\s+")
+
+def extract_references(text: Optional[str]) -> List[str]:
+    """Split the last reference section of ``text`` into individual references"""
+    if not text:
+        return []
+    headings = list(_HEADING.finditer(text))
+    if not headings:
+        return []
+    section = text[headings[-1].end():]
+    end = _END_OF_REFERENCES.search(section)
+    if end:
+        section = section[:end.start()]
+
+    markers = [match.start() for match in _NUMBERED_ENTRY.finditer(section)]
+    if len(markers) >= 2:
+        entries = [section[start:end] for start, end in zip(markers, markers[1:] + [len(section)])]
+        entries = [_NUMBERED_ENTRY.sub("", entry, count=1) for entry in entries]
+    elif re.search(r"\n[ \t]*\n", section.strip()):
+        entries = re.split(r"\n[ \t]*\n", section)
+    else:
+        entries = []
+        for line in section.splitlines():
+            if entries and not _AUTHOR_ENTRY.match(line.strip()):
+                entries[-1] += " " + line
+            else:
+                entries.append(line)
+
+    references = []
+    for entry in entries:
+        entry = _WHITESPACE.sub(" ", entry).strip()
+        if len(entry) >= 20:
+            references.append(entry[:MAX_REFERENCE_LENGTH])
+    return references[:MAX_REFERENCES]
+
+def _surnames(authors: Optional[str]) -> Set[str]:
+    """Last name token of each author in a comma-separated author list"""
+    surnames = set()
+    for display, _ in split_terms(authors):
+        tokens = tokenize(display)
+        if tokens:
+            surnames.add(tokens[-1])
+    return surnames
+
+def _tokens(text: Optional[str]) -> Set[str]:
+    return {token for token in tokenize(text or "") if len(token) <= MAX_TOKEN_LENGTH}
+
+def _min_shared_tokens(title_size: int) -> int:
+    """Fewest title tokens a reference must contain to reach ``MIN_TITLE_CONTAINMENT``"""
+    return math.ceil(MIN_TITLE_CONTAINMENT * title_size - 1e-9)
+
+class TitleMatcher:
+    """Resolves reference strings to documents through an inverted index of title tokens"""
+
+    def __init__(self, documents: Iterable[Document]):
+        self.document_ids: List[str] = []
+        self.title_sizes: List[int] = []
+        self.surnames: List[Set[str]] = []
+        self.years: List[Optional[int]] = []
+        self.postings: Dict[str, List[int]] = {}
+        for document in documents:
+            tokens = _tokens(document.title)
+            if len(tokens) < 2:
+                continue  # One-word titles match far too much
+            ordinal = len(self.document_ids)
+            self.document_ids.append(document.id)
+            self.title_sizes.append(len(tokens))
+            metadata = document.document_metadata
+            self.surnames.append(_surnames(metadata.authors if metadata else None))
+            self.years.append(metadata.publication_year if metadata else None)
+            for token in tokens:
+                self.postings.setdefault(token, []).append(ordinal)
+
+    def __len__(self) -> int:
+        return len(self.document_ids)
+
+    def match(self, reference: str, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Best ``(document_id, score)`` for a reference, or None"""
+        tokens = _tokens(reference)
+        hits = Counter(ordinal for token in tokens for ordinal in self.postings.get(token, ()))
+        years = {int(year) for year in _YEAR.findall(reference)}
+
+        best: Optional[Tuple[str, float]] = None
+        for ordinal, shared in hits.items():
+            containment = shared / self.title_sizes[ordinal]
+            if containment < MIN_TITLE_CONTAINMENT or self.document_ids[ordinal] == exclude:
+                continue
+            author_match = bool(self.surnames[ordinal] & tokens)
+            year_match = self.years[ordinal] in years
+            if self.title_sizes[ordinal] < SHORT_TITLE_TOKENS and not (author_match or year_match):
+                continue
+            score = containment + 0.1 * author_match + 0.05 * year_match
+            if best is None or score > best[1]:
+                best = (self.document_ids[ordinal], score)
+        return best
+
+def _approved_documents(db: Session, document_ids: Optional[Sequence[str]] = None, with_text: bool = False):
+    query = db.query(Document).options(joinedload(Document.document_metadata)).filter(
+        Document.status == DocumentStatus.APPROVED
+    )
+    if with_text:
+        query = query.options(undefer(Document.extracted_text))
+    if document_ids is not None:
+        query = query.filter(Document.id.in_(list(document_ids)))
+    return query
+
+def _store_title_tokens(db: Session, documents: Iterable[Document]):
+    rows = []
+    for document in documents:
+        tokens = _tokens(document.title)
+        if len(tokens) >= 2:  # Same rule as ``TitleMatcher``
+            rows.extend({"document_id": document.id, "token": token, "title_size": len(tokens)} for token in sorted(tokens))
+    db.bulk_insert_mappings(CitationTitleToken, rows)
+
+def _store_references(db: Session, document_id: str, references: List[str], matcher: TitleMatcher) -> int:
+    rows, token_rows = [], []
+    for position, reference in enumerate(references):
+        match = matcher.match(reference, exclude=document_id)
+        citation_id = str(uuid.uuid4())
+        rows.append({
+            "id": citation_id,
+            "citing_document_id": document_id,
+            "position": position,
+            "reference_text": reference,
+            "cited_document_id": match[0] if match else None,
+            "match_score": round(match[1], 4) if match else None
+        })
+        token_rows.extend({"citation_id": citation_id, "token": token} for token in sorted(_tokens(reference)))
+    db.bulk_insert_mappings(Citation, rows)
+    db.bulk_insert_mappings(CitationReferenceToken, token_rows)
+    return sum(1 for row in rows if row["cited_document_id"])
+
+def _delete_parsed(db: Session, document_ids: Sequence[str]):
+    """Drop the references and title tokens of documents, in the caller's transaction"""
+    document_ids = list(document_ids)
+    db.query(CitationReferenceToken).filter(CitationReferenceToken.citation_id.in_(
+        db.query(Citation.id).filter(Citation.citing_document_id.in_(document_ids))
+    )).delete(synchronize_session=False)
+    db.query(Citation).filter(Citation.citing_document_id.in_(document_ids)).delete(synchronize_session=False)
+    db.query(CitationTitleToken).filter(CitationTitleToken.document_id.in_(document_ids)).delete(synchronize_session=False)
+
+def _candidate_titles(db: Session, references: List[Set[str]]) -> Set[str]:
+    """Approved documents whose title shares enough tokens with one of the references"""
+    postings: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    for chunk in _chunks(sorted(set().union(*references))):
+        for document_id, token, title_size in db.query(
+            CitationTitleToken.document_id, CitationTitleToken.token, CitationTitleToken.title_size
+        ).filter(CitationTitleToken.token.in_(chunk)):
+            postings[token].append((document_id, title_size))
+
+    candidates: Set[str] = set()
+    for tokens in references:
+        hits: Counter = Counter()
+        sizes: Dict[str, int] = {}
+        for token in tokens:
+            for document_id, title_size in postings.get(token, ()):
+                hits[document_id] += 1
+                sizes[document_id] = title_size
+        candidates.update(
+            document_id for document_id, shared in hits.items() if shared >= _min_shared_tokens(sizes[document_id])
+        )
+    return candidates
+
+def _resolve_waiting(db: Session, new_documents: List[Document]) -> int:
+    """Resolve unresolved references of other documents that cite one of ``new_documents``"""
+    matcher = TitleMatcher(new_documents)
+    if not len(matcher):
+        return 0
+    new_ids = [document.id for document in new_documents]
+
+    candidates: Set[str] = set()
+    for document in new_documents:
+        tokens = _tokens(document.title)
+        if len(tokens) < 2:
+            continue
+        candidates.update(citation_id for (citation_id,) in db.query(CitationReferenceToken.citation_id).join(
+            Citation, Citation.id == CitationReferenceToken.citation_id
+        ).filter(
+            CitationReferenceToken.token.in_(sorted(tokens)),
+            Citation.cited_document_id.is_(None),
+            Citation.citing_document_id.notin_(new_ids)
+        ).group_by(CitationReferenceToken.citation_id).having(
+            func.count(CitationReferenceToken.id) >= _min_shared_tokens(len(tokens))
+        ))
+
+    matches = []
+    for chunk in _chunks(sorted(candidates)):
+        for citation_id, citing_id, reference in db.query(
+            Citation.id, Citation.citing_document_id, Citation.reference_text
+        ).filter(Citation.id.in_(chunk)):
+            match = matcher.match(reference, exclude=citing_id)
+            if match:
+                matches.append({"id": citation_id, "cited_document_id": match[0], "match_score": round(match[1], 4)})
+    if matches:
+        db.execute(update(Citation), matches)
+    return len(matches)
+
+def update_citations(db: Session, document_ids: Sequence[str]) -> int:
+    """
+    Parse the references of newly approved documents and resolve earlier
+    references that cite them; returns the number of new citation edges.
+    Only titles and references sharing tokens with the new documents are read.
+    """
+    new_documents = _approved_documents(db, document_ids, with_text=True).all()
+    if not new_documents:
+        return 0
+
+    # A re-approved document is parsed again from scratch
+    _delete_parsed(db, [document.id for document in new_documents])
+    _store_title_tokens(db, new_documents)
+    db.flush()
+
+    references = {document.id: extract_references(document.extracted_text) for document in new_documents}
+    candidates = _candidate_titles(db, [_tokens(reference) for found in references.values() for reference in found])
+    matcher = TitleMatcher(
+        document for chunk in _chunks(sorted(candidates)) for document in _approved_documents(db, chunk)
+    )
+    resolved = sum(_store_references(db, document.id, references[document.id], matcher) for document in new_documents)
+    resolved += _resolve_waiting(db, new_documents)
+
+    db.commit()
+    impact_scores.mark_stale()
+    return resolved
+
+def remove_citations(db: Session, document_ids: Sequence[str]):
+    """
+    Take documents out of the citation graph, in the caller's transaction.
+    References citing them become unresolved again and keep their tokens, so
+    they resolve once more if the documents are approved again.
+    """
+    document_ids = list(document_ids)
+    _delete_parsed(db, document_ids)
+    db.query(Citation).filter(Citation.cited_document_id.in_(document_ids)).update(
+        {Citation.cited_document_id: None, Citation.match_score: None}, synchronize_session=False
+    )
+    db.query(DocumentImpact).filter(DocumentImpact.document_id.in_(document_ids)).delete(synchronize_session=False)
+
+def rebuild_citations(db: Session, batch_size: int = 200) -> int:
+    """Re-parse every approved document's references from scratch"""
+    db.query(CitationReferenceToken).delete(synchronize_session=False)
+    db.query(Citation).delete(synchronize_session=False)
+    db.query(CitationTitleToken).delete(synchronize_session=False)
+    _store_title_tokens(db, _approved_documents(db))
+    matcher = TitleMatcher(_approved_documents(db))
+    resolved = 0
+    document_ids = [document_id for (document_id,) in db.query(Document.id).filter(
+        Document.status == DocumentStatus.APPROVED
+    ).order_by(Document.id)]
+    for start in range(0, len(document_ids), batch_size):
+        for document in _approved_documents(db, document_ids[start:start + batch_size], with_text=True):
+            resolved += _store_references(db, document.id, extract_references(document.extracted_text), matcher)
+        db.flush()
+    db.commit()
+    compute_impact_scores(db)
+    return resolved
+
+def pagerank(n: int, sources: np.ndarray, targets: np.ndarray, damping: float = DAMPING,
+             initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Stationary distribution of the citation random walk. Each iteration is one
+    ``bincount`` over the edges; documents citing nothing spread their rank evenly.
+    """
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    out_degree = np.bincount(sources, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    edge_weights = 1.0 / out_degree[sources] if len(sources) else np.empty(0)
+
+    rank = np.full(n, 1.0 / n) if initial is None or initial.sum() <= 0 else initial / initial.sum()
+    for _ in range(MAX_ITERATIONS):
+        spread = np.bincount(targets, weights=rank[sources] * edge_weights, minlength=n)
+        updated = (1.0 - damping) / n + damping * (spread + rank[dangling].sum() / n)
+        converged = np.abs(updated - rank).sum() < TOLERANCE
+        rank = updated
+        if converged:
+            break
+    return rank
+
+def compute_impact_scores(db: Session) -> int:
+    """Recompute citation counts and impact for every approved document"""
+    documents = db.query(Document.id, Document.department_id).filter(
+        Document.status == DocumentStatus.APPROVED
+    ).order_by(Document.id).all()
+    ordinals = {document_id: i for i, (document_id, _) in enumerate(documents)}
+    n = len(documents)
+
+    edges = [
+        (ordinals[citing], ordinals[cited])
+        for citing, cited in db.query(Citation.citing_document_id, Citation.cited_document_id).filter(
+            Citation.cited_document_id.isnot(None)
+        ).distinct()
+        if citing in ordinals and cited in ordinals and citing != cited
+    ]
+    sources = np.array([edge[0] for edge in edges], dtype=np.int64)
+    targets = np.array([edge[1] for edge in edges], dtype=np.int64)
+
+    previous = np.zeros(n)
+    for document_id, impact in db.query(DocumentImpact.document_id, DocumentImpact.impact_score):
+        if document_id in ordinals:
+            previous[ordinals[document_id]] = impact
+    impact = pagerank(n, sources, targets, initial=np.where(previous > 0, previous, 1.0)) * n
+    citation_counts = np.bincount(targets, minlength=n)
+    order = np.lexsort((np.arange(n), -impact))
+
+    db.query(DocumentImpact).delete(synchronize_session=False)
+    db.bulk_insert_mappings(DocumentImpact, [
+        {
+            "document_id": documents[i][0],
+            "department_id": documents[i][1],
+            "citation_count": int(citation_counts[i]),
+            "impact_score": round(float(impact[i]), 6),
+            "rank": rank
+        }
+        for rank, i in enumerate(order, start=1)
+    ])
+    db.commit()
+    logging.info(f"Computed impact scores for {n} documents over {len(edges)} citations")
+    return n
+
+class ImpactScoreRefresher:
+    """Recomputes impact scores on an interval in a background thread, only after citations changed"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._stale = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark_stale(self):
+        self._stale.set()
+
+    def run_once(self) -> bool:
+        """Recompute if anything changed since the last run; returns whether it did"""
+        if not self._stale.is_set():
+            return False
+        self._stale.clear()
+        db = self.session_factory()
+        try:
+            compute_impact_scores(db)
+            return True
+        except Exception as e:
+            db.rollback()
+            self._stale.set()  # Try again on the next interval
+            logging.error(f"Failed to compute impact scores: {e}")
+            return False
+        finally:
+            db.close()
+
+    def start(self, interval: float):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="impact-scores", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.run_once()  # Changes since the last interval
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.run_once()
+
+# Global refresher instance
+impact_scores = ImpactScoreRefresher()
+
+def refresh_citations_for_approved(document_ids: Sequence[str]):
+    """Background task entry point: opens its own session"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        update_citations(db, document_ids)
+    except Exception as e:
+        logging.error(f"Error updating citations for {list(document_ids)}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def refresh_citations_for_withdrawn(document_ids: Sequence[str]):
+    """Background task entry point for documents no longer approved: opens its own session"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        remove_citations(db, document_ids)
+        db.commit()
+        impact_scores.mark_stale()
+    except Exception as e:
+        logging.error(f"Error removing citations of {list(document_ids)}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-parse references and recompute citation impact scores")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(f"Resolved {rebuild_citations(session)} citations")
+    finally:
+        session.close()
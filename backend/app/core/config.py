@@ -27,6 +27,54 @@ class Settings(BaseSettings):
         "xlsx", "xls", "csv",
         "pptx", "ppt", "py", "js", "ts", "html", "css", "json"    ]
     
+    # Search index settings
+    SEARCH_INDEX_DIR: str = "search_index"
+    SEARCH_INDEX_MAX_SEGMENTS: int = 8
+    SEARCH_INDEX_MERGE_INTERVAL: int = 60  # seconds
+    
+    # Response cache settings
+    CACHE_BACKEND: str = "memory"  # "memory" (per worker) or "sqlite" (shared by all workers on a host)
+    CACHE_SQLITE_PATH: str = "response_cache.sqlite3"
+    CACHE_MAX_ENTRIES: int = 2048
+    CACHE_DEFAULT_TTL: int = 30  # seconds an entry is served as fresh
+    CACHE_STALE_TTL: int = 120  # further seconds it may be served while it is refreshed
+    HEATMAP_CACHE_TTL: int = 3600  # usage heatmaps cover whole days and change slowly
+    
+    # Metrics settings
+    METRICS_MULTIPROCESS_DIR: Optional[str] = None  # Shared snapshot directory when running several workers
+    METRICS_FLUSH_INTERVAL: int = 5  # seconds between snapshot writes
+    
+    # Dashboard settings
+    DASHBOARD_PANEL_WORKERS: int = 4  # threads (so pooled connections) computing uncached /bootstrap panels per worker
+    
+    # Review settings
+    REVIEW_DUE_DAYS: int = 14  # open reviews assigned longer ago than this count as overdue
+    
+    # Department leaderboard settings
+    LEADERBOARD_REFRESH_INTERVAL: int = 60  # seconds between leaderboard refreshes from the rollups
+    LEADERBOARD_HALF_LIFE_DAYS: float = 30.0  # age at which a day's activity counts half
+    
+    # Trending document settings
+    TRENDING_HALF_LIFE_HOURS: float = 72.0  # age at which a view or download counts half
+    TRENDING_FLUSH_INTERVAL: int = 30  # seconds between persisting and reloading trending scores
+    TRENDING_TOP_K: int = 50  # documents kept per department and globally
+    
+    # Recommendation settings
+    RECOMMENDATION_REFRESH_INTERVAL: int = 900  # seconds between incremental co-download rebuilds
+    
+    # Citation settings
+    IMPACT_REFRESH_INTERVAL: int = 300  # seconds between impact score recomputations after citations changed
+    
+    # WebSocket settings
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 100  # outbound messages buffered per connection
+    WEBSOCKET_SLOW_CONSUMER_POLICY: str = "coalesce"  # "coalesce", "drop_oldest" or "disconnect" when a queue is full
+    WEBSOCKET_SEND_TIMEOUT: float = 10.0  # seconds a single send may take before the connection is dropped
+    WEBSOCKET_BACKPLANE_URL: str = ""  # redis://host:port (Redis or `python -m app.core.backplane`) to share events between workers; empty keeps them in-process
+    
+    # Document counter settings
+    COUNTER_FLUSH_INTERVAL: int = 5  # seconds between batched download/view count and unique-visitor sketch updates
+    COUNTER_RECONCILE_INTERVAL: int = 3600  # seconds between recounts from the downloads table (0 disables)
+    
     # Email settings (for notifications)
     SMTP_SERVER: Optional[str] = None
     SMTP_PORT: Optional[int] = None
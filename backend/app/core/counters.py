@@ -0,0 +1,172 @@
+"""
+Denormalized per-document download and view counters.
+
+Requests only bump an in-memory accumulator; a background thread flushes it
+every ``COUNTER_FLUSH_INTERVAL`` seconds in batched statements, so counts for
+increments still waiting in a worker are a few seconds behind.
+
+Views have no event table and are flushed as ``view_count = view_count + n``.
+Downloads are recorded in ``downloads`` before they are counted, so a flush
+sets ``download_count`` of the documents it touched to their row count
+instead of adding to it. That makes flushes idempotent: a flush landing after
+``reconcile_download_counts`` (or after another worker's flush) cannot count a
+download twice. The periodic reconcile only repairs documents whose flush was
+lost (crashed workers).
+
+Run ``python -m app.core.counters`` to reconcile by hand.
+"""
+import argparse
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .metrics import metrics
+from ..models import Document, Download
+
+metrics.describe("document_counter_pending", "gauge", "Documents with counter increments waiting to be flushed")
+metrics.describe("document_counter_flushes_total", "counter", "Batched counter flushes, by outcome")
+
+_documents = Document.__table__
+_download_total = (
+    select(func.count(Download.id))
+    .where(Download.document_id == _documents.c.document_id)
+    .correlate(_documents)
+    .scalar_subquery()
+)
+_view_increment_statement = (
+    update(_documents)
+    .where(_documents.c.document_id == bindparam("b_document_id"))
+    .values(view_count=_documents.c.view_count + bindparam("b_views"))
+)
+_download_recount_statement = (
+    update(_documents)
+    .where(_documents.c.document_id == bindparam("b_document_id"))
+    .values(download_count=_download_total)
+)
+
+class DocumentCounters:
+    """Accumulates counter increments and writes them in batches"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._pending: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _add(self, document_id: str, downloads: int, views: int):
+        with self._lock:
+            counts = self._pending.get(document_id)
+            if counts is None:
+                counts = self._pending[document_id] = [0, 0]
+            counts[0] += downloads
+            counts[1] += views
+            pending = len(self._pending)
+        metrics.set_gauge("document_counter_pending", pending)
+
+    def record_download(self, document_id: str):
+        self._add(document_id, 1, 0)
+
+    def record_view(self, document_id: str):
+        self._add(document_id, 0, 1)
+
+    def pending(self, document_id: str) -> Dict[str, int]:
+        """Increments for ``document_id`` not yet written to the database"""
+        with self._lock:
+            downloads, views = self._pending.get(document_id, (0, 0))
+        return {"download_count": downloads, "view_count": views}
+
+    def flush(self) -> int:
+        """Write all pending increments in batched UPDATEs; returns the number of documents"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        metrics.set_gauge("document_counter_pending", 0)
+        if not batch:
+            return 0
+
+        db = None
+        try:
+            db = self.session_factory()
+            # Same row order in every worker, so concurrent flushes cannot deadlock
+            ordered = sorted(batch.items())
+            views = [{"b_document_id": document_id, "b_views": counts[1]} for document_id, counts in ordered if counts[1]]
+            downloads = [{"b_document_id": document_id} for document_id, counts in ordered if counts[0]]
+            if views:
+                db.execute(_view_increment_statement, views)
+            if downloads:
+                db.execute(_download_recount_statement, downloads)
+            db.commit()
+            metrics.increment("document_counter_flushes_total", outcome="ok")
+            return len(batch)
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            logging.error(f"Failed to flush document counters, keeping {len(batch)} for retry: {e}")
+            metrics.increment("document_counter_flushes_total", outcome="error")
+            for document_id, (downloads, views) in batch.items():
+                self._add(document_id, downloads, views)
+            return 0
+        finally:
+            if db is not None:
+                db.close()
+
+    def start(self, flush_interval: float, reconcile_interval: float = 0):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(flush_interval, reconcile_interval), name="document-counters", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self, flush_interval: float, reconcile_interval: float):
+        since_reconcile = 0.0
+        while not self._stop.wait(flush_interval):
+            self.flush()
+            since_reconcile += flush_interval
+            if reconcile_interval and since_reconcile >= reconcile_interval:
+                since_reconcile = 0.0
+                try:
+                    db = self.session_factory()
+                    try:
+                        reconcile_download_counts(db)
+                    finally:
+                        db.close()
+                except Exception as e:
+                    logging.error(f"Failed to reconcile download counts: {e}")
+
+def reconcile_download_counts(db: Session) -> int:
+    """Reset ``download_count`` to the number of ``downloads`` rows wherever they differ"""
+    result = db.execute(
+        update(_documents).where(_documents.c.download_count != _download_total).values(download_count=_download_total)
+    )
+    db.commit()
+    if result.rowcount:
+        logging.info(f"Reconciled download counts of {result.rowcount} documents")
+    return result.rowcount
+
+# Global counter accumulator
+document_counters = DocumentCounters()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recount documents.download_count from the downloads table")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(f"Reconciled {reconcile_download_counts(session)} documents")
+    finally:
+        session.close()
@@ -0,0 +1,172 @@
+"""
+Dashboard stat deltas pushed over WebSocket.
+
+Each function maps a document write onto the ``/dashboard/stats`` fields it
+changes, grouped by the room whose members see those fields:
+
+- ``role:admin`` – system-wide stats
+- ``department:<id>`` – supervisor and staff department stats
+- ``user:<id>`` – the uploader's own stats and a supervisor's assigned reviews
+
+Clients add each value to the matching field of their last snapshot and
+ignore fields they do not have. Rolling windows such as ``recent_uploads``
+are only corrected by the next snapshot, which clients take periodically.
+
+Deltas of document writes are numbered per room by ``next_sequences`` in the
+transaction of the write, and ``/dashboard/stats`` returns the numbers its
+figures include. A client that sees a number other than the next one it
+expects (a delta lost while reconnecting, or delivered out of order) takes a
+new snapshot. Download deltas are not numbered: snapshots count downloads
+only once the counters are flushed, so they stay approximate until then.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import DashboardRoomSequence, Document, DocumentStatus, UserRole
+
+Deltas = Dict[str, Dict[str, float]]
+
+ADMIN_STATUS_FIELDS = {
+    DocumentStatus.SUBMITTED: "pending_reviews",
+    DocumentStatus.APPROVED: "approved_documents",
+    DocumentStatus.REJECTED: "rejected_documents",
+    DocumentStatus.UNDER_REVIEW: "under_review",
+}
+DEPARTMENT_STATUS_FIELDS = {
+    DocumentStatus.SUBMITTED: "pending_documents",
+    DocumentStatus.APPROVED: "approved_documents",
+    DocumentStatus.REJECTED: "rejected_documents",
+}
+STUDENT_STATUS_FIELDS = {
+    DocumentStatus.SUBMITTED: "pending_reviews",
+    DocumentStatus.APPROVED: "approved_uploads",
+    DocumentStatus.REJECTED: "rejected_uploads",
+    DocumentStatus.UNDER_REVIEW: "under_review",
+}
+
+def role_room(role: str) -> str:
+    return f"role:{role}"
+
+def department_room(department_id: str) -> str:
+    return f"department:{department_id}"
+
+def user_room(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def dashboard_rooms(role: str, user_id: Optional[str], department_id: Optional[str]) -> List[str]:
+    """Rooms whose deltas apply to the dashboard of ``role``"""
+    rooms = [role_room(role)]
+    if user_id:
+        rooms.insert(0, user_room(user_id))
+    if role in (UserRole.SUPERVISOR.value, UserRole.STAFF.value) and department_id:
+        rooms.append(department_room(department_id))
+    return rooms
+
+def next_sequences(db: Session, deltas: Deltas) -> Dict[str, int]:
+    """Number the deltas of each room in ``deltas`` (in the caller's transaction)"""
+    sequences = {}
+    for room in sorted(deltas):  # Same lock order in every transaction
+        statement = update(DashboardRoomSequence).where(DashboardRoomSequence.room == room).values(
+            seq=DashboardRoomSequence.seq + 1
+        ).execution_options(synchronize_session=False)
+        if not db.execute(statement).rowcount:
+            try:
+                with db.begin_nested():
+                    db.add(DashboardRoomSequence(room=room, seq=1))
+            except IntegrityError:
+                # A concurrent transaction created the row first
+                db.execute(statement)
+        sequences[room] = db.query(DashboardRoomSequence.seq).filter(DashboardRoomSequence.room == room).scalar()
+    return sequences
+
+def _add(deltas: Deltas, room: str, field: Optional[str], value: float):
+    if field and value:
+        fields = deltas.setdefault(room, {})
+        fields[field] = round(fields.get(field, 0) + value, 4)
+
+def _mb(size_bytes: Optional[int]) -> float:
+    return round((size_bytes or 0) / 1024 / 1024, 4)
+
+def _uploader_role(document: Document) -> Optional[UserRole]:
+    return document.uploader.role if document.uploader else None
+
+def upload_deltas(document: Document, sign: int = 1) -> Deltas:
+    """Deltas for a new document (``sign=-1`` for a deletion)"""
+    status = DocumentStatus(document.status or DocumentStatus.SUBMITTED)
+    size_mb = _mb(document.file_size) * sign
+    deltas: Deltas = {}
+
+    admin = role_room(UserRole.ADMIN.value)
+    _add(deltas, admin, "total_documents", sign)
+    _add(deltas, admin, ADMIN_STATUS_FIELDS.get(status), sign)
+    _add(deltas, admin, "storage_used_mb", size_mb)
+    if sign > 0:
+        _add(deltas, admin, "recent_uploads", 1)
+
+    department = department_room(document.department_id)
+    _add(deltas, department, "department_documents", sign)
+    _add(deltas, department, DEPARTMENT_STATUS_FIELDS.get(status), sign)
+    _add(deltas, department, "storage_used_department_mb", size_mb)
+    if sign > 0:
+        _add(deltas, department, "recent_submissions", 1)
+        _add(deltas, department, "recent_department_uploads", 1)
+
+    uploader = user_room(document.uploader_id)
+    role = _uploader_role(document)
+    if role == UserRole.STUDENT:
+        _add(deltas, uploader, "total_uploads", sign)
+        _add(deltas, uploader, STUDENT_STATUS_FIELDS.get(status), sign)
+    elif role == UserRole.STAFF:
+        _add(deltas, uploader, "your_uploads", sign)
+
+    if document.supervisor_id and status == DocumentStatus.SUBMITTED:
+        _add(deltas, user_room(document.supervisor_id), "assigned_reviews", sign)
+    return deltas
+
+def status_change_deltas(document: Document, previous_status: DocumentStatus) -> Deltas:
+    """Deltas for a document moving from ``previous_status`` to its current status"""
+    previous, current = DocumentStatus(previous_status), DocumentStatus(document.status)
+    deltas: Deltas = {}
+    if previous == current:
+        return deltas
+
+    field_maps = [(role_room(UserRole.ADMIN.value), ADMIN_STATUS_FIELDS),
+                  (department_room(document.department_id), DEPARTMENT_STATUS_FIELDS)]
+    if _uploader_role(document) == UserRole.STUDENT:
+        field_maps.append((user_room(document.uploader_id), STUDENT_STATUS_FIELDS))
+    for room, fields in field_maps:
+        _add(deltas, room, fields.get(previous), -1)
+        _add(deltas, room, fields.get(current), 1)
+
+    if document.supervisor_id:
+        assigned = user_room(document.supervisor_id)
+        _add(deltas, assigned, "assigned_reviews", -1 if previous == DocumentStatus.SUBMITTED else 0)
+        _add(deltas, assigned, "assigned_reviews", 1 if current == DocumentStatus.SUBMITTED else 0)
+    return deltas
+
+def download_deltas(document: Document) -> Deltas:
+    deltas: Deltas = {}
+    _add(deltas, role_room(UserRole.ADMIN.value), "total_downloads", 1)
+    if _uploader_role(document) == UserRole.STUDENT:
+        _add(deltas, user_room(document.uploader_id), "total_downloads", 1)
+    return deltas
+
+def recent_document_entry(document: Document) -> Dict[str, str]:
+    """A ``/dashboard/recent-documents`` row for ``document``"""
+    return {
+        "id": document.id,
+        "title": document.title,
+        "status": DocumentStatus(document.status).value,
+        "upload_date": document.upload_date.isoformat() if document.upload_date else None,
+        "uploader": f"{document.uploader.first_name} {document.uploader.last_name}" if document.uploader else ""
+    }
+
+def recent_document_rooms(document: Document) -> list:
+    """Rooms whose recent-documents list includes ``document``"""
+    rooms = [role_room(UserRole.ADMIN.value), department_room(document.department_id), user_room(document.uploader_id)]
+    if document.supervisor_id:
+        rooms.append(user_room(document.supervisor_id))
+    return rooms
@@ -3,12 +3,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 from .config import settings
+from .metrics import TimedQueuePool
 import logging
 
 # Create database engine with improved connection management
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DATABASE_ECHO,
+    poolclass=TimedQueuePool,  # Records connection wait time
     pool_pre_ping=True,
     pool_recycle=300,  # Recycle connections every 5 minutes
     pool_size=10,      # Base pool size
@@ -0,0 +1,64 @@
+"""
+Background processing that runs after a document has been uploaded
+"""
+import logging
+from pathlib import Path
+
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import joinedload, undefer
+
+from .file_manager import file_manager
+from .metrics import metrics
+from .near_duplicates import check_near_duplicates
+from .related import document_text
+from .search_index import search_index
+from ..models import Document
+
+metrics.describe("document_processing_queue_depth", "gauge", "Uploaded documents waiting for or in background processing")
+
+def enqueue_document_processing(background_tasks: BackgroundTasks, document_id: str):
+    metrics.adjust_gauge("document_processing_queue_depth", 1)
+    background_tasks.add_task(process_uploaded_document, document_id)
+
+def process_uploaded_document(document_id: str):
+    """
+    Extract derived data (search text and index entry, near-duplicate signature) for a freshly uploaded document.
+
+    A plain function, so BackgroundTasks runs it in the threadpool rather than on the event loop.
+    """
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document or not document.file_path:
+            return
+
+        document.extracted_text = file_manager.extract_text(Path(document.file_path))
+        if document.extracted_text:
+            check_near_duplicates(db, document, document.extracted_text)
+        db.commit()
+        search_index.add_documents([(document.id, document_text(document))])
+    except Exception as e:
+        logging.error(f"Error processing uploaded document {document_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+        metrics.adjust_gauge("document_processing_queue_depth", -1)
+
+def reindex_document(document_id: str):
+    """Re-index a document whose title or metadata changed; a background task with its own session"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        document = db.query(Document).options(
+            joinedload(Document.document_metadata),
+            undefer(Document.extracted_text)
+        ).filter(Document.id == document_id).first()
+        if document:
+            search_index.add_documents([(document.id, document_text(document))])
+    except Exception as e:
+        logging.error(f"Error re-indexing document {document_id}: {e}")
+    finally:
+        db.close()
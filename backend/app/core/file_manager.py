@@ -13,7 +13,6 @@ import fitz  # PyMuPDF
 import docx
 from datetime import datetime
 import asyncio
-import aiofiles
 
 class FileManager:
     def __init__(self, base_upload_dir: str = "uploads"):
@@ -176,6 +175,10 @@ class FileManager:
     
     async def extract_text_content(self, file_path: Path) -> Optional[str]:
         """Extract text content for search indexing"""
+        return await asyncio.to_thread(self.extract_text, file_path)
+    
+    def extract_text(self, file_path: Path) -> Optional[str]:
+        """Blocking text extraction, for background tasks that already run in a worker thread"""
         try:
             extension = file_path.suffix.lower()
             
@@ -188,9 +191,8 @@ class FileManager:
                 return text[:10000]  # Limit to 10KB of text
             
             elif extension in ['.txt', '.md', '.py', '.js', '.html', '.css']:
-                async with aiofiles.open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = await f.read(10000)
-                    return content
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    return f.read(10000)
             
             elif extension == '.docx':
                 doc = docx.Document(file_path)
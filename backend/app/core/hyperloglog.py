@@ -0,0 +1,69 @@
+"""
+HyperLogLog cardinality sketch.
+
+With ``p = 14`` a sketch has 16384 one-byte registers and estimates the
+number of distinct items with a standard error of about 0.8%. Sketches of the
+same precision merge by taking the register-wise maximum, so daily sketches
+can be combined into any window and department sketches into faculty totals.
+"""
+import hashlib
+from typing import Iterable, Optional
+
+import numpy as np
+
+DEFAULT_PRECISION = 14
+
+def _hash64(item: str) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+
+class HyperLogLog:
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add_many(self, items: Iterable[str]):
+        """Add items; the register index is the top ``p`` bits of the hash, the rank the leading zeros after it plus one"""
+        rest_bits = 64 - self.precision
+        indexes, ranks = [], []
+        for item in items:
+            value = _hash64(item)
+            indexes.append(value >> rest_bits)
+            ranks.append(rest_bits - (value & ((1 << rest_bits) - 1)).bit_length() + 1)
+        if indexes:
+            np.maximum.at(self.registers, np.array(indexes, dtype=np.intp), np.array(ranks, dtype=np.uint8))
+
+    def add(self, item: str):
+        self.add_many([item])
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @classmethod
+    def union(cls, sketches: Iterable["HyperLogLog"], precision: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        registers = [sketch.registers for sketch in sketches]
+        if not registers:
+            return cls(precision)
+        return cls(precision, np.maximum.reduce(registers))
+
+    def estimate(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))  # Linear counting while most registers are empty
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        """The raw registers: always ``2 ** p`` bytes, so stored sketches are fixed-size and updated in place"""
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        if len(data) != 1 << precision:
+            raise ValueError("Sketch size does not match precision")
+        return cls(precision, np.frombuffer(data, dtype=np.uint8).copy())
@@ -0,0 +1,196 @@
+"""
+Department leaderboard.
+
+Each department's score is its weighted uploads, approvals and downloads
+from ``daily_activity_rollups``, each day decayed by
+``0.5 ** (age / LEADERBOARD_HALF_LIFE_DAYS)`` so recent activity dominates.
+Scores are kept in memory in a list sorted by ``(-score, department_id)``;
+rank lookups bisect it in O(log n) and the top N is a slice. Departments with
+equal scores share a rank (1, 1, 3). A background
+thread refreshes the scores every ``LEADERBOARD_REFRESH_INTERVAL`` seconds and
+records each department's rank once a day in ``department_rank_snapshots``.
+
+Run ``python -m app.core.leaderboard`` to refresh and snapshot by hand.
+"""
+import argparse
+import bisect
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from ..models import DailyActivityRollup, Department, DepartmentRankSnapshot, DocumentStatusRollup
+
+SCORE_WEIGHTS = {"uploads": 1.0, "approvals": 2.0, "downloads": 0.1}
+DECAY_HORIZON_DAYS = 365  # Older days weigh less than 0.02% at the default half-life and are skipped
+
+class DepartmentLeaderboard:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self.refreshed_at: Optional[float] = None
+        self._order: List[Tuple[float, str]] = []  # (-score, department_id), ascending
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._snapshot_day: Optional[date] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _rank(self, department_id: str) -> Optional[int]:
+        entry = self._entries.get(department_id)
+        if entry is None:
+            return None
+        return bisect.bisect_left(self._order, (-entry["score"],)) + 1  # First department with this score
+
+    def rank(self, department_id: str) -> Optional[int]:
+        with self._lock:
+            return self._rank(department_id)
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"rank": self._rank(department_id), **self._entries[department_id]}
+                for _, department_id in self._order[:limit]
+            ]
+
+    def entry(self, department_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rank = self._rank(department_id)
+            return {"rank": rank, **self._entries[department_id]} if rank is not None else None
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def refresh(self, db: Session, today: Optional[date] = None):
+        """Recompute every department's score and totals from the rollups"""
+        today = today or date.today()
+        horizon = today - timedelta(days=DECAY_HORIZON_DAYS)
+
+        entries: Dict[str, Dict[str, Any]] = {
+            department_id: {"department_id": department_id, "name": name, "score": 0.0,
+                            "uploads": 0, "approvals": 0, "downloads": 0, "documents": 0}
+            for department_id, name in db.query(Department.id, Department.name)
+        }
+
+        for department_id, uploads, approvals, downloads in db.query(
+            DailyActivityRollup.department_id,
+            func.sum(DailyActivityRollup.uploads),
+            func.sum(DailyActivityRollup.approvals),
+            func.sum(DailyActivityRollup.downloads)
+        ).group_by(DailyActivityRollup.department_id):
+            if department_id in entries:
+                entries[department_id].update(uploads=int(uploads or 0), approvals=int(approvals or 0),
+                                              downloads=int(downloads or 0))
+
+        for department_id, documents in db.query(
+            DocumentStatusRollup.department_id, func.sum(DocumentStatusRollup.document_count)
+        ).group_by(DocumentStatusRollup.department_id):
+            if department_id in entries:
+                entries[department_id]["documents"] = int(documents or 0)
+
+        rows = db.query(
+            DailyActivityRollup.department_id, DailyActivityRollup.day,
+            DailyActivityRollup.uploads, DailyActivityRollup.approvals, DailyActivityRollup.downloads
+        ).filter(DailyActivityRollup.day >= horizon).all()
+        if rows:
+            department_ids, days, *columns = zip(*rows)
+            ages = (np.datetime64(today, "D") - np.array(days, dtype="datetime64[D]")).astype(np.float64)
+            decay = np.power(0.5, np.maximum(ages, 0) / settings.LEADERBOARD_HALF_LIFE_DAYS)
+            weighted = sum(
+                weight * np.array(values, dtype=np.float64)
+                for weight, values in zip(SCORE_WEIGHTS.values(), columns)
+            ) * decay
+            labels, index = np.unique(np.array(department_ids, dtype=object), return_inverse=True)
+            for department_id, score in zip(labels, np.bincount(index, weights=weighted)):
+                if department_id in entries:
+                    entries[department_id]["score"] = round(float(score), 3)
+
+        order = sorted((-entry["score"], department_id) for department_id, entry in entries.items())
+        with self._lock:
+            self._entries, self._order = entries, order
+            self.refreshed_at = time.time()
+
+    def snapshot(self, db: Session, day: Optional[date] = None) -> int:
+        """Record the current ranks for ``day`` (today) unless that day is already recorded"""
+        day = day or date.today()
+        if self._snapshot_day == day:
+            return 0
+        if db.query(DepartmentRankSnapshot.id).filter(DepartmentRankSnapshot.day == day).first():
+            self._snapshot_day = day
+            return 0
+        entries = self.top(len(self))
+        try:
+            db.bulk_insert_mappings(DepartmentRankSnapshot, [
+                {"day": day, "department_id": entry["department_id"], "rank": entry["rank"], "score": entry["score"]}
+                for entry in entries
+            ])
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # Another worker recorded the day first
+            entries = []
+        self._snapshot_day = day
+        return len(entries)
+
+    def refresh_and_snapshot(self):
+        db = self.session_factory()
+        try:
+            self.refresh(db)
+            self.snapshot(db)
+        except Exception as e:
+            db.rollback()
+            logging.error(f"Failed to refresh the department leaderboard: {e}")
+        finally:
+            db.close()
+
+    def start(self, interval: float):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="department-leaderboard", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval: float):
+        self.refresh_and_snapshot()
+        while not self._stop.wait(interval):
+            self.refresh_and_snapshot()
+
+def rank_history(db: Session, department_id: str, days: int) -> List[Dict[str, Any]]:
+    since = date.today() - timedelta(days=days - 1)
+    return [
+        {"date": day.isoformat(), "rank": rank, "score": score}
+        for day, rank, score in db.query(
+            DepartmentRankSnapshot.day, DepartmentRankSnapshot.rank, DepartmentRankSnapshot.score
+        ).filter(
+            DepartmentRankSnapshot.department_id == department_id,
+            DepartmentRankSnapshot.day >= since
+        ).order_by(DepartmentRankSnapshot.day)
+    ]
+
+# Global leaderboard instance
+department_leaderboard = DepartmentLeaderboard()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the department leaderboard and record today's ranks")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        department_leaderboard.refresh(session)
+        print(f"Recorded {department_leaderboard.snapshot(session)} department ranks")
+    finally:
+        session.close()
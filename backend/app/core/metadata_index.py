@@ -0,0 +1,146 @@
+"""
+Normalised keyword and author tables derived from the free-text metadata columns.
+
+``Metadata.keywords`` and ``Metadata.authors`` stay the source of truth; the
+``keywords``/``authors`` tables and their link tables are kept in sync so that
+filtering by a single keyword or author is an index seek instead of a LIKE scan.
+
+Run ``python -m app.core.metadata_index`` to backfill existing rows.
+"""
+import argparse
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import Author, Keyword, Metadata, document_authors, document_keywords
+
+_SEPARATORS = re.compile(r"[,;\n]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_term(value: str) -> str:
+    """Lookup key for a keyword or author name"""
+    return _WHITESPACE.sub(" ", value).strip().lower()
+
+def split_terms(value: Optional[str]) -> List[Tuple[str, str]]:
+    """Split a comma-separated list into unique ``(display_name, normalized_name)`` pairs"""
+    terms: Dict[str, str] = {}
+    for part in _SEPARATORS.split(value or ""):
+        display = _WHITESPACE.sub(" ", part).strip()[:255]
+        if display:
+            terms.setdefault(normalize_term(display), display)
+    return [(display, normalized) for normalized, display in terms.items()]
+
+def _select_term_ids(db: Session, model, normalized_names: List[str], lock: bool = False) -> Dict[str, str]:
+    query = db.query(model.normalized_name, model.id).filter(model.normalized_name.in_(normalized_names))
+    if lock:
+        # A locking read also sees rows committed after this transaction's REPEATABLE READ snapshot
+        query = query.with_for_update(read=True)
+    return dict(query.all())
+
+def _get_or_create_terms(db: Session, model, terms: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+    """Map normalized names to term ids, inserting the missing terms"""
+    wanted = dict((normalized, display) for display, normalized in terms)
+    if not wanted:
+        return {}
+
+    ids = _select_term_ids(db, model, list(wanted))
+    missing = [normalized for normalized in wanted if normalized not in ids]
+    if not missing:
+        return ids
+    new_terms = [model(name=wanted[normalized], normalized_name=normalized) for normalized in missing]
+    try:
+        with db.begin_nested():
+            db.add_all(new_terms)
+        ids.update((term.normalized_name, term.id) for term in new_terms)
+    except IntegrityError:
+        # Another request inserted some of the same terms concurrently; add the rest one at a time
+        for normalized in missing:
+            term = model(name=wanted[normalized], normalized_name=normalized)
+            try:
+                with db.begin_nested():
+                    db.add(term)
+                ids[normalized] = term.id
+            except IntegrityError:
+                ids.update(_select_term_ids(db, model, [normalized], lock=True))
+    return ids
+
+def _replace_links(db: Session, table, term_column: str, links: Dict[str, List[str]]):
+    if not links:
+        return
+    db.execute(table.delete().where(table.c.document_id.in_(list(links))))
+    rows = [
+        {"document_id": document_id, term_column: term_id}
+        for document_id, term_ids in links.items()
+        for term_id in term_ids
+    ]
+    if rows:
+        db.execute(table.insert(), rows)
+
+def sync_metadata_terms(db: Session, metadata_rows: List[Metadata]):
+    """Rebuild the keyword/author links of the given metadata rows (caller commits)"""
+    keyword_terms = {row.document_id: split_terms(row.keywords) for row in metadata_rows}
+    author_terms = {row.document_id: split_terms(row.authors) for row in metadata_rows}
+
+    keyword_ids = _get_or_create_terms(db, Keyword, [t for terms in keyword_terms.values() for t in terms])
+    author_ids = _get_or_create_terms(db, Author, [t for terms in author_terms.values() for t in terms])
+
+    _replace_links(db, document_keywords, "keyword_id", {
+        document_id: [keyword_ids[normalized] for _, normalized in terms]
+        for document_id, terms in keyword_terms.items()
+    })
+    _replace_links(db, document_authors, "author_id", {
+        document_id: [author_ids[normalized] for _, normalized in terms]
+        for document_id, terms in author_terms.items()
+    })
+
+def remove_metadata_terms(db: Session, document_id: str):
+    """Drop the keyword/author links of a document (caller commits)"""
+    db.execute(document_keywords.delete().where(document_keywords.c.document_id == document_id))
+    db.execute(document_authors.delete().where(document_authors.c.document_id == document_id))
+
+def documents_with_keyword(keyword: str):
+    """Subquery of document ids linked to ``keyword``"""
+    return select(document_keywords.c.document_id).join(
+        Keyword, Keyword.id == document_keywords.c.keyword_id
+    ).where(Keyword.normalized_name == normalize_term(keyword))
+
+def documents_by_author(author: str):
+    """Subquery of document ids linked to ``author``"""
+    return select(document_authors.c.document_id).join(
+        Author, Author.id == document_authors.c.author_id
+    ).where(Author.normalized_name == normalize_term(author))
+
+def backfill_metadata_terms(db: Session, batch_size: int = 500) -> int:
+    """Populate the term tables from existing metadata rows in id-ordered batches"""
+    processed = 0
+    last_id = ""
+    while True:
+        batch = db.query(Metadata).filter(Metadata.id > last_id).order_by(Metadata.id).limit(batch_size).all()
+        if not batch:
+            break
+        sync_metadata_terms(db, batch)
+        db.commit()
+        processed += len(batch)
+        last_id = batch[-1].id
+        db.expunge_all()
+        logging.info(f"Backfilled keyword/author terms for {processed} metadata rows")
+    return processed
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Backfill normalised keyword/author tables")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        total = backfill_metadata_terms(session, args.batch_size)
+        print(f"Backfilled {total} metadata rows")
+    finally:
+        session.close()
@@ -0,0 +1,338 @@
+"""
+In-process request metrics.
+
+Latencies are recorded into log-bucketed histograms: fixed memory, about 9%
+relative error and O(1) recording. Every route keeps a ring of one-minute
+slots (latency, database time, status codes, bytes sent) so percentiles are
+available over sliding windows of up to an hour; slots leaving the ring are
+folded into cumulative totals.
+
+``MetricsMiddleware`` is a pure ASGI middleware; database time is collected
+per request through SQLAlchemy cursor events and a context variable, which
+also follows work handed to ``asyncio.to_thread``.
+
+Other modules add labelled counters, gauges and histograms with
+``increment``/``adjust_gauge``/``observe``, or register a collector that
+reports current values at export time (see ``metrics_export``).
+"""
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+SLOT_SECONDS = 60
+SLOT_COUNT = 60
+UNMATCHED_ROUTE = "unmatched"
+
+class LogHistogram:
+    """
+    Histogram with logarithmically spaced buckets between ``min_value`` and
+    ``max_value``. Bucket ``i`` counts values in
+    ``(min_value * growth**(i-1), min_value * growth**i]``; bucket 0 holds
+    everything up to ``min_value`` and the last bucket everything above
+    ``max_value``.
+    """
+    __slots__ = ("min_value", "growth", "_inv_log_growth", "counts", "count", "sum", "max")
+
+    def __init__(self, min_value: float = 1e-5, max_value: float = 100.0, growth: float = 2 ** 0.125):
+        self.min_value = min_value
+        self.growth = growth
+        self._inv_log_growth = 1.0 / math.log(growth)
+        self.counts = [0] * (int(math.ceil(math.log(max_value / min_value) * self._inv_log_growth)) + 2)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(int(math.log(value / self.min_value) * self._inv_log_growth) + 1, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LogHistogram"):
+        counts = self.counts
+        for index, n in enumerate(other.counts):
+            if n:
+                counts[index] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def upper_bound(self, index: int) -> float:
+        return self.min_value * self.growth ** index
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q``-th percentile (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100.0))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                if index == len(self.counts) - 1:
+                    return self.max  # The overflow bucket has no upper bound of its own
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+class _Slot:
+    __slots__ = ("minute", "latency", "db_time", "statuses", "bytes_sent")
+
+    def __init__(self, minute: int):
+        self.minute = minute
+        self.latency = LogHistogram()
+        self.db_time = LogHistogram()
+        self.statuses: Dict[int, int] = {}
+        self.bytes_sent = 0
+
+def _merge_slot(target: _Slot, slot: _Slot):
+    target.latency.merge(slot.latency)
+    target.db_time.merge(slot.db_time)
+    for status, n in slot.statuses.items():
+        target.statuses[status] = target.statuses.get(status, 0) + n
+    target.bytes_sent += slot.bytes_sent
+
+class RouteMetrics:
+    """Sliding-window and cumulative metrics for one route"""
+
+    def __init__(self):
+        self.slots: List[Optional[_Slot]] = [None] * SLOT_COUNT
+        self.evicted = _Slot(0)  # Cumulative totals of slots that left the ring
+
+    def record(self, minute: int, status: int, seconds: float, db_seconds: float, bytes_sent: int):
+        slot = self.slots[minute % SLOT_COUNT]
+        if slot is None or slot.minute != minute:
+            if slot is not None:
+                _merge_slot(self.evicted, slot)
+            slot = self.slots[minute % SLOT_COUNT] = _Slot(minute)
+        slot.latency.record(seconds)
+        slot.db_time.record(db_seconds)
+        slot.statuses[status] = slot.statuses.get(status, 0) + 1
+        slot.bytes_sent += bytes_sent
+
+    def window(self, minute: int, minutes: int) -> Optional[_Slot]:
+        """Merge the slots of the last ``minutes`` minutes, or ``None`` when there were no requests"""
+        merged = None
+        for slot in self.slots:
+            if slot is None or slot.minute <= minute - minutes:
+                continue
+            if merged is None:
+                merged = _Slot(minute)
+            _merge_slot(merged, slot)
+        return merged
+
+    def totals(self) -> _Slot:
+        """Everything recorded since the process started"""
+        merged = _Slot(0)
+        _merge_slot(merged, self.evicted)
+        for slot in self.slots:
+            if slot is not None:
+                _merge_slot(merged, slot)
+        return merged
+
+def _summarize(slot: _Slot) -> Dict[str, Any]:
+    requests = slot.latency.count
+    errors = sum(n for status, n in slot.statuses.items() if status >= 500)
+    return {
+        "requests": requests,
+        "p50_ms": round(slot.latency.percentile(50) * 1000, 2),
+        "p95_ms": round(slot.latency.percentile(95) * 1000, 2),
+        "p99_ms": round(slot.latency.percentile(99) * 1000, 2),
+        "max_ms": round(slot.latency.max * 1000, 2),
+        "avg_db_ms": round(slot.db_time.mean * 1000, 2),
+        "error_rate": round(errors / requests * 100, 2) if requests else 0.0,
+        "statuses": {str(status): n for status, n in sorted(slot.statuses.items())},
+        "bytes_sent": slot.bytes_sent
+    }
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes: Dict[str, RouteMetrics] = {}
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.websockets = 0
+        self.peak_websockets = 0
+
+        self.families: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self.values: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, LogHistogram]] = {}
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()  # Routes, counters and histograms are read and updated from several threads
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        """Declare a metric family (``counter``, ``gauge`` or ``histogram``) for export"""
+        self.families[name] = (metric_type, help_text)
+
+    def increment(self, name: str, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            values = self.values.setdefault(name, {})
+            values[key] = values.get(key, 0.0) + amount
+
+    adjust_gauge = increment
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.values.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            histograms = self.histograms.setdefault(name, {})
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LogHistogram()
+            histogram.record(value)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """``collector()`` returns ``(name, labels, value)`` samples read at export time"""
+        self.collectors.append(collector)
+
+    def record_request(self, route: str, status: int, seconds: float, db_seconds: float, bytes_sent: int = 0):
+        minute = int(time.time() // SLOT_SECONDS)
+        with self._lock:  # Snapshots read the slots from other threads
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics()
+            metrics.record(minute, status, seconds, db_seconds, bytes_sent)
+
+    def request_started(self):
+        self.in_flight += 1
+        if self.in_flight > self.peak_in_flight:
+            self.peak_in_flight = self.in_flight
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    def websocket_opened(self):
+        self.websockets += 1
+        if self.websockets > self.peak_websockets:
+            self.peak_websockets = self.websockets
+
+    def websocket_closed(self):
+        self.websockets -= 1
+
+    def summary(self, window_seconds: int = 300) -> Dict[str, Any]:
+        """Overall and per-route figures for the last ``window_seconds`` (at most an hour)"""
+        minute = int(time.time() // SLOT_SECONDS)
+        minutes = max(1, min(SLOT_COUNT, window_seconds // SLOT_SECONDS))
+        overall = _Slot(minute)
+        routes = {}
+        with self._lock:
+            windows = {route: metrics.window(minute, minutes) for route, metrics in self.routes.items()}
+        for route, window in windows.items():
+            if window is None:
+                continue
+            routes[route] = _summarize(window)
+            _merge_slot(overall, window)
+
+        return {
+            "window_seconds": minutes * SLOT_SECONDS,
+            "overall": _summarize(overall),
+            "routes": dict(sorted(routes.items(), key=lambda item: item[1]["requests"], reverse=True)),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "websocket_connections": self.websockets,
+            "peak_websocket_connections": self.peak_websockets,
+            "uptime_seconds": int(time.time() - self.started_at)
+        }
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+# [seconds, statements] for the current request; shared with threads via context copies
+_request_db_time: ContextVar[Optional[list]] = ContextVar("request_db_time", default=None)
+
+def instrument_engine(engine):
+    """Attribute statement execution time on ``engine`` to the current request"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        cell = _request_db_time.get()
+        if cell is not None:
+            cell[0] += time.perf_counter() - context._metrics_started
+            cell[1] += 1
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe("db_pool_wait_seconds", time.perf_counter() - started)
+
+class MetricsMiddleware:
+    """Record latency, status, database time and bytes sent for every HTTP request"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            self.registry.websocket_opened()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.registry.websocket_closed()
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        db_time = [0.0, 0]
+        token = _request_db_time.set(db_time)
+        # status, bytes sent, finish time and database time when the last body chunk went out
+        response = [500, 0, 0.0, 0.0]
+
+        async def send_wrapper(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                response[0] = message["status"]
+            elif message_type == "http.response.body":
+                response[1] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Background tasks run after this; they are not part of the request latency
+                    response[2] = time.perf_counter()
+                    response[3] = db_time[0]
+            await send(message)
+
+        self.registry.request_started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db_time.reset(token)
+            self.registry.request_finished()
+            finished = response[2] or time.perf_counter()
+            route = scope.get("route")
+            route_name = f"{scope['method']} {route.path}" if route is not None else UNMATCHED_ROUTE
+            self.registry.record_request(
+                route_name, response[0], finished - started,
+                response[3] if response[2] else db_time[0], response[1]
+            )
@@ -0,0 +1,371 @@
+"""
+Prometheus text exposition of the in-process metrics.
+
+Each worker periodically writes a JSON snapshot of its metrics to
+``METRICS_MULTIPROCESS_DIR/<pid>.json`` (atomically, every
+``METRICS_FLUSH_INTERVAL`` seconds and on every scrape it serves). ``/metrics``
+merges all snapshots in the directory: counters and histograms are summed over
+every file, while gauges are only taken from workers that are still alive.
+Without a directory only the serving process is reported.
+
+Snapshots of exited workers are folded into ``totals.json`` and removed, so
+totals survive worker restarts without the directory growing. Each snapshot
+carries a per-process ``instance`` id; a worker that finds its PID's file
+written by an earlier process folds it before overwriting it.
+
+Request latencies are kept in fine log-spaced buckets; on export each bucket
+is counted under the first ``le`` boundary at or above its upper bound.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import settings
+from .metrics import LogHistogram, MetricsRegistry, metrics
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOTALS_FILE = "totals.json"
+LOCK_TIMEOUT = 5.0            # seconds to wait for another worker's compaction
+STALE_LOCK_SECONDS = 60.0
+MAX_FOLDED_INSTANCES = 1000   # Remembered so a snapshot that outlived a crash mid-compaction is not counted twice
+
+REQUEST_FAMILIES = {
+    "http_requests_total": ("counter", "HTTP requests by route and status code"),
+    "http_request_duration_seconds": ("histogram", "Time to the last response byte, by route"),
+    "http_request_db_seconds_total": ("counter", "Database statement time spent serving requests, by route"),
+    "http_response_bytes_total": ("counter", "Response body bytes sent, by route"),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being served"),
+    "websocket_connections": ("gauge", "Open WebSocket connections"),
+}
+
+metrics.describe("db_pool_wait_seconds", "histogram", "Time spent waiting for a pooled database connection")
+metrics.describe("db_pool_checked_out", "gauge", "Database connections currently checked out")
+metrics.describe("db_pool_overflow", "gauge", "Connections open beyond the pool size")
+metrics.describe("db_pool_size", "gauge", "Configured database pool size")
+
+def _pool_samples():
+    from .database import engine
+
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        yield "db_pool_checked_out", {}, pool.checkedout()
+    if hasattr(pool, "overflow"):
+        yield "db_pool_overflow", {}, max(pool.overflow(), 0)
+    if hasattr(pool, "size"):
+        yield "db_pool_size", {}, pool.size()
+
+metrics.register_collector(_pool_samples)
+
+_instance: Tuple[int, str] = (0, "")
+
+def _instance_id() -> str:
+    """Random id of this process, regenerated after a fork"""
+    global _instance
+    if _instance[0] != os.getpid():
+        _instance = (os.getpid(), uuid.uuid4().hex)
+    return _instance[1]
+
+def _histogram_state(histogram: LogHistogram) -> Dict[str, Any]:
+    return {
+        "min_value": histogram.min_value,
+        "growth": histogram.growth,
+        "buckets": {str(index): n for index, n in enumerate(histogram.counts) if n},
+        "count": histogram.count,
+        "sum": histogram.sum
+    }
+
+def collect_snapshot(registry: MetricsRegistry = metrics) -> Dict[str, Any]:
+    """Everything this process exports, as a JSON-serializable dict"""
+    families = {**REQUEST_FAMILIES, **registry.families}
+    samples: List[Tuple[str, Dict[str, str], float]] = []
+    histograms: List[Tuple[str, Dict[str, str], Dict[str, Any]]] = []
+
+    with registry._lock:  # record_request changes the slots meanwhile; a torn read could run a counter backwards
+        route_totals = [(route, route_metrics.totals()) for route, route_metrics in registry.routes.items()]
+    for route, totals in route_totals:
+        for status, n in totals.statuses.items():
+            samples.append(("http_requests_total", {"route": route, "status": str(status)}, n))
+        samples.append(("http_request_db_seconds_total", {"route": route}, totals.db_time.sum))
+        samples.append(("http_response_bytes_total", {"route": route}, totals.bytes_sent))
+        histograms.append(("http_request_duration_seconds", {"route": route}, _histogram_state(totals.latency)))
+    samples.append(("http_requests_in_flight", {}, registry.in_flight))
+    samples.append(("websocket_connections", {}, registry.websockets))
+
+    with registry._lock:
+        for name, values in registry.values.items():
+            samples.extend((name, dict(labels), value) for labels, value in values.items())
+        for name, by_labels in registry.histograms.items():
+            histograms.extend((name, dict(labels), _histogram_state(h)) for labels, h in by_labels.items())
+
+    for collector in registry.collectors:
+        try:
+            samples.extend(collector())
+        except Exception as e:
+            logging.error(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+    return {
+        "pid": os.getpid(),
+        "instance": _instance_id(),
+        "written_at": time.time(),
+        "families": families,
+        "samples": samples,
+        "histograms": histograms
+    }
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False  # The retained totals
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"pid": None, "written_at": 0.0, "families": {}, "samples": [], "histograms": [], "folded": []}
+
+def fold_snapshot(totals: Dict[str, Any], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """``totals`` plus the counters and histograms of an exited worker's snapshot; gauges are dropped"""
+    families = {**totals["families"], **snapshot["families"]}
+    samples: Dict[Tuple, float] = {}
+    for name, labels, value in [*totals["samples"], *snapshot["samples"]]:
+        if families.get(name, ("gauge",))[0] == "gauge":
+            continue
+        key = (name, tuple(sorted(labels.items())))
+        samples[key] = samples.get(key, 0.0) + value
+
+    histograms: Dict[Tuple, Dict[str, Any]] = {}
+    for name, labels, state in [*totals["histograms"], *snapshot["histograms"]]:
+        key = (name, tuple(sorted(labels.items())), state["min_value"], state["growth"])
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = {**state, "buckets": dict(state["buckets"])}
+            continue
+        for index, n in state["buckets"].items():
+            merged["buckets"][index] = merged["buckets"].get(index, 0) + n
+        merged["count"] += state["count"]
+        merged["sum"] += state["sum"]
+
+    return {
+        "pid": None,
+        "written_at": time.time(),
+        "families": families,
+        "samples": [(name, dict(labels), value) for (name, labels), value in samples.items()],
+        "histograms": [(key[0], dict(key[1]), state) for key, state in histograms.items()],
+        "folded": [*totals.get("folded", []), *filter(None, [snapshot.get("instance")])][-MAX_FOLDED_INSTANCES:]
+    }
+
+class MultiprocessCollector:
+    """Per-worker snapshot files in a shared directory, plus the totals of exited workers"""
+
+    def __init__(self, directory: str, registry: MetricsRegistry = metrics):
+        self.directory = Path(directory)
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._written_by: Optional[str] = None  # Instance that last wrote this process's file
+
+    def write(self) -> Dict[str, Any]:
+        snapshot = collect_snapshot(self.registry)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{snapshot['pid']}.json"
+        if self._written_by != snapshot["instance"] and path.exists():
+            # A reused PID: the file belongs to an exited worker
+            self.compact([path])
+        self._write_json(path, snapshot)
+        self._written_by = snapshot["instance"]
+        return snapshot
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        own = self.write()
+        snapshots = [own]
+        for path in self.directory.glob("*.json"):
+            if path.stem == str(own["pid"]):
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logging.error(f"Skipping unreadable metrics snapshot {path}: {e}")
+        # A file read just before a concurrent compaction deleted it is already in the totals
+        folded = {instance for snapshot in snapshots for instance in snapshot.get("folded", ())}
+        return [snapshot for snapshot in snapshots if snapshot.get("instance") not in folded]
+
+    def compact(self, paths: Optional[List[Path]] = None) -> int:
+        """
+        Fold the snapshots of exited workers (or the given ``paths``) into
+        ``totals.json`` and delete them; returns how many were folded.
+        """
+        with self._lock() as locked:
+            if not locked:
+                return 0
+            totals_path = self.directory / TOTALS_FILE
+            try:
+                with open(totals_path) as f:
+                    totals = json.load(f)
+            except FileNotFoundError:
+                totals = _empty_totals()
+
+            folded = []
+            own = self.directory / f"{os.getpid()}.json"
+            candidates = paths if paths is not None else [
+                path for path in self.directory.glob("*.json") if path.name != TOTALS_FILE and path != own
+            ]
+            for path in candidates:
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if snapshot.get("instance") == _instance_id() or (paths is None and _pid_alive(snapshot["pid"])):
+                    continue
+                if snapshot.get("instance") not in totals.get("folded", []):
+                    totals = fold_snapshot(totals, snapshot)
+                folded.append(path)
+
+            if folded:
+                self._write_json(totals_path, totals)
+                for path in folded:
+                    path.unlink(missing_ok=True)
+            return len(folded)
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict[str, Any]):
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _lock(self):
+        """Cross-process lock on the totals file (exclusive file creation); yields False on timeout"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / "compact.lock"
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime > STALE_LOCK_SECONDS:
+                        path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    logging.warning(f"Metrics compaction skipped: {path} is held by another worker")
+                    yield False
+                    return
+                time.sleep(0.01)
+        try:
+            yield True
+        finally:
+            path.unlink(missing_ok=True)
+
+    def start(self, interval: float):
+        if self._thread is not None:
+            return
+        self.write()  # Claims this PID's file (folding a reused one) before the first interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.write()
+                self.compact()
+            except Exception as e:
+                logging.error(f"Failed to write metrics snapshot: {e}")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in sorted(labels.items())) + "}"
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+def _le_counts(state: Dict[str, Any]) -> List[int]:
+    """Cumulative counts per LATENCY_BUCKETS boundary (plus +Inf) for one histogram state"""
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for index, n in state["buckets"].items():
+        upper = state["min_value"] * state["growth"] ** int(index)
+        position = next((i for i, le in enumerate(LATENCY_BUCKETS) if upper <= le * (1 + 1e-9)), len(LATENCY_BUCKETS))
+        counts[position] += n
+    for i in range(1, len(counts)):
+        counts[i] += counts[i - 1]
+    return counts
+
+def render(snapshots: Iterable[Dict[str, Any]]) -> str:
+    """Merge worker snapshots and render them in the Prometheus text format"""
+    families: Dict[str, Tuple[str, str]] = {}
+    values: Dict[str, Dict[Tuple, float]] = {}
+    histograms: Dict[str, Dict[Tuple, List[float]]] = {}
+
+    for snapshot in snapshots:
+        for name, (metric_type, help_text) in snapshot["families"].items():
+            families[name] = (metric_type, help_text)
+        alive = _pid_alive(snapshot["pid"])
+        for name, labels, value in snapshot["samples"]:
+            if families.get(name, ("gauge",))[0] == "gauge" and not alive:
+                continue
+            key = tuple(sorted(labels.items()))
+            by_labels = values.setdefault(name, {})
+            by_labels[key] = by_labels.get(key, 0.0) + value
+        for name, labels, state in snapshot["histograms"]:
+            key = tuple(sorted(labels.items()))
+            merged = histograms.setdefault(name, {}).setdefault(key, [0] * (len(LATENCY_BUCKETS) + 3))
+            for i, n in enumerate(_le_counts(state)):
+                merged[i] += n
+            merged[-2] += state["count"]
+            merged[-1] += state["sum"]
+
+    lines = []
+    for name in sorted(set(values) | set(histograms)):
+        metric_type, help_text = families.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for key, value in sorted(values.get(name, {}).items()):
+            lines.append(f"{name}{_format_labels(dict(key))} {_format_value(value)}")
+        for key, merged in sorted(histograms.get(name, {}).items()):
+            labels = dict(key)
+            for le, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], merged):
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {count}")
+            lines.append(f"{name}_count{_format_labels(labels)} {merged[-2]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(merged[-1])}")
+    return "\n".join(lines) + "\n"
+
+# Global collector when metrics are shared between workers
+multiprocess_collector = (
+    MultiprocessCollector(settings.METRICS_MULTIPROCESS_DIR) if settings.METRICS_MULTIPROCESS_DIR else None
+)
+
+def render_metrics() -> str:
+    if multiprocess_collector is not None:
+        return render(multiprocess_collector.read_all())
+    return render([collect_snapshot()])
@@ -0,0 +1,206 @@
+"""
+Near-duplicate detection with MinHash signatures and an LSH banding index.
+
+Each document is reduced to a fixed-size array of ``NUM_PERMUTATIONS`` uint32
+minimum hashes over its word shingles. Signatures are split into bands; two
+documents become candidates only when a whole band matches, so a lookup touches
+a handful of buckets instead of every stored document.
+
+Each worker keeps its own index and catches up from the database before a
+lookup: signatures stored or updated since its last refresh are (re)added, and
+documents deleted since then are dropped through their tombstones.
+"""
+import logging
+import re
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models import Document, DocumentOverlap, DocumentSignature, DocumentSignatureTombstone
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS  # Candidate threshold is roughly (1/32) ** (1/4) ~ 0.42
+SHINGLE_SIZE = 5
+OVERLAP_THRESHOLD = 0.3  # Minimum estimated Jaccard similarity reported to reviewers
+REFRESH_OVERLAP = timedelta(minutes=1)  # Re-read window for rows committed after a later timestamp was seen
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Fixed seed so that every worker process produces identical signatures
+_rng = np.random.default_rng(20240621)
+_PERM_A = _rng.integers(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Return the unique 32-bit hashes of the word ``size``-grams of ``text``"""
+    words = _WORD_PATTERN.findall((text or "").lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+
+    word_hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+    if len(words) < size:
+        size = len(words)
+
+    # Polynomial rolling combination of consecutive word hashes, vectorised over all positions
+    n_shingles = len(words) - size + 1
+    combined = np.zeros(n_shingles, dtype=np.uint64)
+    for offset in range(size):
+        combined = (combined * np.uint64(1000003) + word_hashes[offset:offset + n_shingles]) & _MAX_HASH
+    return np.unique(combined)
+
+def minhash_signature(text: str, chunk_size: int = 4096) -> Optional[np.ndarray]:
+    """Compute the MinHash signature of ``text``; ``None`` when it has no words"""
+    shingles = shingle_hashes(text)
+    if len(shingles) == 0:
+        return None
+
+    signature = np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(shingles), chunk_size):
+        chunk = shingles[start:start + chunk_size, np.newaxis]
+        # a < 2**32 and x < 2**32 keep a * x + b inside uint64
+        hashed = ((chunk * _PERM_A + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def pack_signature(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+def unpack_signature(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4").astype(np.uint32)
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity: fraction of matching MinHash positions"""
+    return float(np.count_nonzero(a == b)) / NUM_PERMUTATIONS
+
+class LSHIndex:
+    """In-memory banding index over all stored signatures"""
+
+    def __init__(self):
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(LSH_BANDS)]
+        self.loaded_until: Optional[datetime] = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> List[bytes]:
+        bands = signature.reshape(LSH_BANDS, LSH_ROWS)
+        return [band.tobytes() for band in bands]
+
+    def add(self, document_id: str, signature: np.ndarray):
+        with self.lock:
+            if document_id in self.signatures:
+                self._remove(document_id)
+            self.signatures[document_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self.buckets[band].setdefault(key, set()).add(document_id)
+
+    def remove(self, document_id: str):
+        with self.lock:
+            self._remove(document_id)
+
+    def _remove(self, document_id: str):
+        signature = self.signatures.pop(document_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self.buckets[band].get(key)
+            if bucket:
+                bucket.discard(document_id)
+                if not bucket:
+                    del self.buckets[band][key]
+
+    def query(self, signature: np.ndarray, threshold: float = OVERLAP_THRESHOLD,
+              exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Return ``(document_id, score)`` for candidates above ``threshold``, best first"""
+        with self.lock:
+            candidates: Set[str] = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self.buckets[band].get(key, ()))
+            candidates.discard(exclude)
+            scored = [(doc_id, estimate_similarity(signature, self.signatures[doc_id])) for doc_id in candidates]
+
+        matches = [(doc_id, score) for doc_id, score in scored if score >= threshold]
+        return sorted(matches, key=lambda item: item[1], reverse=True)
+
+    def refresh(self, db: Session):
+        """Apply signatures stored or updated, and documents deleted, since the last refresh (by any worker)"""
+        since = self.loaded_until - REFRESH_OVERLAP if self.loaded_until is not None else None
+        query = db.query(DocumentSignature.document_id, DocumentSignature.signature, DocumentSignature.updated_at)
+        if since is not None:
+            query = query.filter(DocumentSignature.updated_at >= since)
+
+        latest = self.loaded_until
+        for document_id, blob, updated_at in query.yield_per(5000):
+            self.add(document_id, unpack_signature(blob))
+            if updated_at and (latest is None or updated_at > latest):
+                latest = updated_at
+
+        if since is not None:  # A full load only sees documents that still exist
+            for (document_id,) in db.query(DocumentSignatureTombstone.document_id).filter(
+                DocumentSignatureTombstone.deleted_at >= since
+            ):
+                self.remove(document_id)
+        self.loaded_until = latest
+
+lsh_index = LSHIndex()
+
+def check_near_duplicates(db: Session, document: Document, text: str) -> List[Tuple[str, float]]:
+    """
+    Store the signature of ``document``, record overlaps with existing documents
+    and add it to the index. Returns the recorded overlaps.
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return []
+
+    lsh_index.refresh(db)
+    matches = lsh_index.query(signature, exclude=document.id)
+    if matches:
+        # Another worker may have deleted a match after this index last caught up
+        existing = {
+            document_id for (document_id,) in db.query(Document.id).filter(Document.id.in_([m[0] for m in matches]))
+        }
+        for matched_id, _ in matches:
+            if matched_id not in existing:
+                lsh_index.remove(matched_id)
+        matches = [match for match in matches if match[0] in existing]
+
+    stored = db.query(DocumentSignature).filter(DocumentSignature.document_id == document.id).first()
+    if stored:
+        stored.signature = pack_signature(signature)
+    else:
+        db.add(DocumentSignature(document_id=document.id, signature=pack_signature(signature)))
+
+    db.query(DocumentOverlap).filter(DocumentOverlap.document_id == document.id).delete(synchronize_session=False)
+    for matched_id, score in matches:
+        db.add(DocumentOverlap(document_id=document.id, matched_document_id=matched_id, score=score))
+    document.overlap_score = matches[0][1] if matches else 0.0
+
+    db.flush()
+    lsh_index.add(document.id, signature)
+    if matches:
+        logging.info(f"Document {document.id} overlaps {len(matches)} existing documents (max {matches[0][1]:.2f})")
+    return matches
+
+def record_signature_deleted(db: Session, document_id: str):
+    """Leave a tombstone for a deleted document (in the caller's transaction) and prune expired ones"""
+    # Stamped and pruned by the database clock, which workers compare ``deleted_at`` against
+    now = db.query(func.now()).scalar()
+    db.add(DocumentSignatureTombstone(document_id=document_id, deleted_at=func.now()))
+    db.query(DocumentSignatureTombstone).filter(
+        DocumentSignatureTombstone.deleted_at < now - TOMBSTONE_RETENTION
+    ).delete(synchronize_session=False)
+
+def get_document_overlaps(db: Session, document_id: str) -> List[DocumentOverlap]:
+    return db.query(DocumentOverlap).filter(
+        DocumentOverlap.document_id == document_id
+    ).order_by(DocumentOverlap.score.desc()).all()
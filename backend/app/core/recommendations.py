@@ -0,0 +1,321 @@
+"""
+"Also read" recommendations from download co-occurrence.
+
+Each user contributes their most recent ``MAX_USER_HISTORY`` distinct downloads
+to the item-item matrix ``C = A^T A`` of their department, stored sparsely in
+``co_downloads``. Documents are compared by cosine similarity of their
+download vectors, ``C[a, b] / sqrt(C[a, a] * C[b, b])``, shrunk by
+``C[a, b] / (C[a, b] + SHRINKAGE)`` so a single shared reader counts for
+little, and the best ``RECOMMENDATION_TOP_K`` are kept per document in
+``document_recommendations``.
+
+The job is incremental: it only reads the users who downloaded something
+since the checkpoint in ``job_checkpoints`` and adds the difference between
+the pair counts of their histories after and before it, processing users in
+chunks with vectorised NumPy. Lists are recomputed for the documents whose
+counts changed; other lists pick up changed popularity (the diagonal) the
+next time one of their counts changes, or on a ``--full`` rebuild.
+
+Run ``python -m app.core.recommendations [--full]`` to update by hand.
+"""
+import argparse
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, null, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .related import _concat_ranges
+from ..models import CoDownload, Document, DocumentRecommendation, DocumentStatus, Download, JobCheckpoint, User
+
+JOB_NAME = "co_downloads"
+RECOMMENDATION_TOP_K = 20
+MAX_USER_HISTORY = 200      # Bounds the pairs a single heavy user adds (history length squared)
+SHRINKAGE = 2.0
+CHUNK_SIZE = 500            # Users per co-occurrence batch, documents per list rebuild
+COMMIT_LAG = timedelta(minutes=1)  # Downloads this close to the newest are left for the next run
+PERSONAL_HISTORY = 20       # Recent downloads whose lists are combined for a user
+
+def _checkpoint(db: Session) -> JobCheckpoint:
+    """The locked checkpoint row; holding it keeps two runs from applying the same downloads"""
+    query = db.query(JobCheckpoint).filter(JobCheckpoint.job == JOB_NAME)
+    row = query.with_for_update().first()
+    if row is not None:
+        return row
+    try:
+        with db.begin_nested():
+            row = JobCheckpoint(job=JOB_NAME)
+            db.add(row)
+        return row
+    except IntegrityError:
+        # A concurrent run created the row first
+        return query.with_for_update().one()
+
+def pair_codes(slots: np.ndarray, users: np.ndarray, recency: np.ndarray, n_documents: int) -> np.ndarray:
+    """
+    ``slot * n_documents + document`` for every ordered pair (diagonal included)
+    within each user's ``MAX_USER_HISTORY`` most recent entries, where
+    ``slot = department * n_documents + document`` of the first document.
+    """
+    order = np.lexsort((-recency, users))
+    slots, users = slots[order], users[order]
+    _, starts, lengths = np.unique(users, return_index=True, return_counts=True)
+    owner = np.repeat(np.arange(len(starts)), lengths)
+    keep = np.arange(len(users)) - starts[owner] < MAX_USER_HISTORY
+    slots, users = slots[keep], users[keep]
+
+    _, starts, lengths = np.unique(users, return_index=True, return_counts=True)
+    owner = np.repeat(np.arange(len(starts)), lengths)
+    reps = lengths[owner]
+    left = np.repeat(np.arange(len(slots)), reps)
+    right = _concat_ranges(starts[owner], reps)
+    return slots[left] * n_documents + slots[right] % n_documents
+
+def _chunk_deltas(rows: List[tuple]) -> Dict[Tuple[str, str, str], int]:
+    """Co-download count changes from ``(user, department, document, recency_before, recency_after)`` rows"""
+    users, departments, documents, before, after = zip(*rows)
+    user_labels, user_index = np.unique(np.array(users, dtype=object), return_inverse=True)
+    department_labels, department_index = np.unique(np.array(departments, dtype=object), return_inverse=True)
+    document_labels, document_index = np.unique(np.array(documents, dtype=object), return_inverse=True)
+    n = len(document_labels)
+    slots = department_index.astype(np.int64) * n + document_index
+
+    def codes(timestamps) -> np.ndarray:
+        present = np.array([ts is not None for ts in timestamps], dtype=bool)
+        if not present.any():
+            return np.empty(0, dtype=np.int64)
+        recency = np.array([ts.timestamp() for ts in timestamps if ts is not None], dtype=np.float64)
+        return pair_codes(slots[present], user_index[present], recency, n)
+
+    after_codes, before_codes = codes(after), codes(before)
+    labels, inverse = np.unique(np.concatenate([after_codes, before_codes]), return_inverse=True)
+    weights = np.concatenate([np.ones(len(after_codes)), -np.ones(len(before_codes))])
+    delta = np.rint(np.bincount(inverse, weights=weights, minlength=len(labels))).astype(np.int64)
+
+    changed = delta != 0
+    labels, delta = labels[changed], delta[changed]
+    slots_a, b = np.divmod(labels, n)
+    department, a = np.divmod(slots_a, n)
+    return {
+        (department_labels[d], document_labels[x], document_labels[y]): int(change)
+        for d, x, y, change in zip(department, a, b, delta)
+    }
+
+def _apply_deltas(db: Session, deltas: Dict[Tuple[str, str, str], int]):
+    # Plain rows rather than entities: the bulk updates below bypass the identity map
+    existing = {
+        (row.department_id, row.document_id, row.other_document_id): row
+        for row in db.query(
+            CoDownload.id, CoDownload.department_id, CoDownload.document_id, CoDownload.other_document_id, CoDownload.count
+        ).filter(
+            CoDownload.department_id.in_({key[0] for key in deltas}),
+            CoDownload.document_id.in_({key[1] for key in deltas}),
+            CoDownload.other_document_id.in_({key[2] for key in deltas})
+        )
+    }
+    updates, inserts, removed = [], [], []
+    for key, change in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            if change > 0:
+                inserts.append({"department_id": key[0], "document_id": key[1], "other_document_id": key[2], "count": change})
+        elif row.count + change > 0:
+            updates.append({"id": row.id, "count": row.count + change})
+        else:
+            removed.append(row.id)
+    if updates:
+        db.execute(update(CoDownload), updates)
+    if inserts:
+        db.bulk_insert_mappings(CoDownload, inserts)
+    if removed:
+        db.query(CoDownload).filter(CoDownload.id.in_(removed)).delete(synchronize_session=False)
+
+def _rebuild_lists(db: Session, department_id: str, document_ids: List[str], k: int) -> int:
+    """Recompute the recommendation lists of ``document_ids`` within one department"""
+    popularity = dict(db.query(CoDownload.document_id, CoDownload.count).filter(
+        CoDownload.department_id == department_id,
+        CoDownload.document_id == CoDownload.other_document_id
+    ))
+    stored = 0
+    for start in range(0, len(document_ids), CHUNK_SIZE):
+        chunk = document_ids[start:start + CHUNK_SIZE]
+        db.query(DocumentRecommendation).filter(
+            DocumentRecommendation.department_id == department_id,
+            DocumentRecommendation.document_id.in_(chunk)
+        ).delete(synchronize_session=False)
+        rows = db.query(CoDownload.document_id, CoDownload.other_document_id, CoDownload.count).filter(
+            CoDownload.department_id == department_id,
+            CoDownload.document_id.in_(chunk),
+            CoDownload.document_id != CoDownload.other_document_id
+        ).all()
+        if not rows:
+            continue
+
+        documents, others, counts = zip(*rows)
+        counts = np.array(counts, dtype=np.float64)
+        norms = np.sqrt(
+            np.array([popularity.get(doc, 0) for doc in documents], dtype=np.float64)
+            * np.array([popularity.get(doc, 0) for doc in others], dtype=np.float64)
+        )
+        scores = np.divide(counts, norms, out=np.zeros_like(counts), where=norms > 0) * counts / (counts + SHRINKAGE)
+
+        labels, owner = np.unique(np.array(documents, dtype=object), return_inverse=True)
+        order = np.lexsort((-scores, owner))
+        starts = np.searchsorted(owner[order], np.arange(len(labels)))
+        ranks = np.arange(len(order)) - starts[owner[order]] + 1
+        keep = order[ranks <= k]
+        mappings = [
+            {"department_id": department_id, "document_id": documents[i], "recommended_document_id": others[i],
+             "score": float(scores[i]), "rank": int(rank)}
+            for i, rank in zip(keep, ranks[ranks <= k])
+        ]
+        db.bulk_insert_mappings(DocumentRecommendation, mappings)
+        stored += len(mappings)
+    return stored
+
+def update_recommendations(db: Session, full: bool = False, k: int = RECOMMENDATION_TOP_K) -> Dict[str, int]:
+    """Fold downloads since the last run into the co-download counts and refresh the affected lists"""
+    checkpoint = _checkpoint(db)
+    until = db.query(func.max(Download.download_timestamp)).scalar()
+    since = None if full else checkpoint.position
+    if until is None or (since is not None and until - COMMIT_LAG <= since):
+        db.commit()
+        return {"users": 0, "pairs": 0, "recommendations": 0}
+    until -= COMMIT_LAG
+
+    if since is None:
+        db.query(CoDownload).delete(synchronize_session=False)
+        db.query(DocumentRecommendation).delete(synchronize_session=False)
+
+    window = db.query(Download.user_id).filter(Download.download_timestamp <= until)
+    if since is not None:
+        window = window.filter(Download.download_timestamp > since)
+    user_ids = [user_id for (user_id,) in window.distinct()]
+
+    before = (
+        func.max(case((Download.download_timestamp <= since, Download.download_timestamp)))
+        if since is not None else null()
+    )
+    touched: Dict[str, Set[str]] = {}
+    pairs = 0
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        rows = db.query(
+            Download.user_id, User.department_id, Download.document_id, before, func.max(Download.download_timestamp)
+        ).join(User, User.id == Download.user_id).filter(
+            Download.user_id.in_(user_ids[start:start + CHUNK_SIZE]),
+            Download.download_timestamp <= until
+        ).group_by(Download.user_id, User.department_id, Download.document_id).all()
+        if not rows:
+            continue
+        deltas = _chunk_deltas(rows)
+        _apply_deltas(db, deltas)
+        db.flush()
+        for department_id, document_id, _ in deltas:
+            touched.setdefault(department_id, set()).add(document_id)
+        pairs += len(deltas)
+
+    stored = sum(
+        _rebuild_lists(db, department_id, sorted(document_ids), k)
+        for department_id, document_ids in touched.items()
+    )
+    checkpoint.position = until
+    db.commit()
+    logging.info(f"Updated co-downloads: {len(user_ids)} users, {pairs} pair changes, {stored} recommendations")
+    return {"users": len(user_ids), "pairs": pairs, "recommendations": stored}
+
+def recommend_for_user(db: Session, user: User, limit: int = 10) -> Tuple[str, List[Tuple[Document, float]]]:
+    """
+    Approved documents read by users of the same department who read what ``user`` read,
+    or the department's most downloaded documents for users without downloads yet.
+    """
+    history = [
+        document_id for document_id, _ in db.query(
+            Download.document_id, func.max(Download.download_timestamp).label("latest")
+        ).filter(Download.user_id == user.id).group_by(Download.document_id).order_by(
+            func.max(Download.download_timestamp).desc()
+        ).limit(PERSONAL_HISTORY)
+    ]
+
+    scores: Dict[str, float] = {}
+    if history:
+        for recommended_id, score in db.query(
+            DocumentRecommendation.recommended_document_id, DocumentRecommendation.score
+        ).filter(
+            DocumentRecommendation.department_id == user.department_id,
+            DocumentRecommendation.document_id.in_(history)
+        ):
+            scores[recommended_id] = scores.get(recommended_id, 0.0) + score
+        for document_id in history:
+            scores.pop(document_id, None)
+
+    if scores:
+        documents = db.query(Document).filter(
+            Document.id.in_(list(scores)), Document.status == DocumentStatus.APPROVED
+        ).all()
+        ranked = sorted(((doc, scores[doc.id]) for doc in documents), key=lambda item: (-item[1], item[0].id))
+        return "co_downloads", ranked[:limit]
+
+    popular = db.query(Document).filter(
+        Document.department_id == user.department_id,
+        Document.status == DocumentStatus.APPROVED
+    )
+    if history:
+        popular = popular.filter(~Document.id.in_(history))
+    popular = popular.order_by(Document.download_count.desc(), Document.id).limit(limit).all()
+    return "popular", [(doc, float(doc.download_count)) for doc in popular]
+
+class RecommendationBuilder:
+    """Runs the incremental update on an interval in a background thread"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self):
+        db = self.session_factory()
+        try:
+            update_recommendations(db)
+        except Exception as e:
+            db.rollback()
+            logging.error(f"Failed to update recommendations: {e}")
+        finally:
+            db.close()
+
+    def start(self, interval: float):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="recommendations", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.run_once()
+
+# Global builder instance
+recommendation_builder = RecommendationBuilder()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update co-download counts and document recommendations")
+    parser.add_argument("--full", action="store_true", help="Rebuild from all downloads instead of since the last run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(update_recommendations(session, full=args.full))
+    finally:
+        session.close()
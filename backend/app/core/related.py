@@ -0,0 +1,483 @@
+"""
+Related-documents engine based on TF-IDF cosine similarity.
+
+Neighbour lists are precomputed into the ``related_documents`` table so that
+serving ``GET /documents/{id}/related`` is a single indexed lookup.
+
+The vector of every approved document is stored in ``document_term_weights``,
+which doubles as the inverted index: an approval scores the new vectors only
+against documents sharing one of their terms, and rewrites only the lists
+they enter, scoring them with the same ``similarity_block`` as a rebuild.
+Document frequencies are counted over the stored postings (each document's
+strongest terms), and stored weights keep the IDF they were computed with, so
+incremental scores drift from a rebuild by how much the IDF changed since (a
+few hundredths while a small corpus grows, less as it gets larger).
+``python -m app.core.related`` rebuilds everything from the current corpus,
+which also fills the index the first time.
+"""
+import argparse
+import heapq
+import logging
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session, joinedload, undefer
+
+from .text import tokenize
+from ..models import Document, DocumentStatus, DocumentTermWeight, RelatedDocument
+
+RELATED_TOP_K = 10
+MAX_TERMS_PER_DOCUMENT = 200   # Keep only the strongest terms of each vector
+MAX_DOCUMENT_FREQUENCY = 0.5   # Terms present in more than half the corpus carry no signal
+MAX_BLOCK_CELLS = 4_000_000    # Upper bound for the dense similarity block (rows * corpus size)
+TITLE_WEIGHT = 3               # Title and keyword tokens are repeated to boost them
+KEYWORD_WEIGHT = 2
+MAX_TERM_LENGTH = 64           # Longer tokens are noise (hashes, run-together text)
+IN_CHUNK_SIZE = 500            # Values per SQL ``IN`` list
+
+def _idf(n_docs: int, document_frequency: int) -> float:
+    return math.log((1 + n_docs) / (1 + document_frequency)) + 1.0
+
+def _max_document_frequency(n_docs: int) -> int:
+    return max(1, int(MAX_DOCUMENT_FREQUENCY * n_docs)) if n_docs > 2 else n_docs
+
+def _chunks(values: Sequence, size: int = IN_CHUNK_SIZE) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class TfidfMatrix:
+    """L2-normalised TF-IDF vectors stored as CSR arrays plus a term-major (CSC) copy"""
+
+    def __init__(self, document_ids: List[str], token_lists: List[List[str]]):
+        self.document_ids = document_ids
+        self.ordinals = {doc_id: i for i, doc_id in enumerate(document_ids)}
+        n_docs = len(document_ids)
+
+        document_frequency = Counter()
+        for tokens in token_lists:
+            document_frequency.update(set(tokens))
+
+        max_df = _max_document_frequency(n_docs)
+        self.vocabulary: Dict[str, int] = {}
+        idf = []
+        for term, df in document_frequency.items():
+            if df <= max_df:
+                self.vocabulary[term] = len(idf)
+                idf.append(_idf(n_docs, df))
+        self.terms = list(self.vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float32)
+
+        indptr = [0]
+        indices: List[np.ndarray] = []
+        data: List[np.ndarray] = []
+        for tokens in token_lists:
+            term_ids, weights = self._vectorize(tokens)
+            indices.append(term_ids)
+            data.append(weights)
+            indptr.append(indptr[-1] + len(term_ids))
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        self.data = np.concatenate(data) if data else np.empty(0, dtype=np.float32)
+        self._index_columns()
+
+    @classmethod
+    def from_weights(cls, postings: Sequence[Tuple[str, str, float]]) -> "TfidfMatrix":
+        """A matrix over stored ``(document_id, term, weight)`` postings, taking the weights as they are"""
+        document_ids, terms, weights = zip(*postings)
+        document_labels, rows = np.unique(np.array(document_ids, dtype=object), return_inverse=True)
+        term_labels, term_ids = np.unique(np.array(terms, dtype=object), return_inverse=True)
+        order = np.lexsort((term_ids, rows))
+
+        matrix = cls.__new__(cls)
+        matrix.document_ids = document_labels.tolist()
+        matrix.ordinals = {doc_id: i for i, doc_id in enumerate(matrix.document_ids)}
+        matrix.terms = term_labels.tolist()
+        matrix.vocabulary = {term: i for i, term in enumerate(matrix.terms)}
+        matrix.idf = None  # Already applied to the stored weights
+        matrix.indptr = np.zeros(len(document_labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(document_labels)), out=matrix.indptr[1:])
+        matrix.indices = term_ids[order].astype(np.int64)
+        matrix.data = np.asarray(weights, dtype=np.float32)[order]
+        matrix._index_columns()
+        return matrix
+
+    def _index_columns(self):
+        """Term-major copy used to expand postings during the sparse product"""
+        n_docs, n_terms = len(self.document_ids), len(self.terms)
+        order = np.argsort(self.indices, kind="stable")
+        rows = np.repeat(np.arange(n_docs, dtype=np.int64), np.diff(self.indptr))
+        self.col_rows = rows[order]
+        self.col_data = self.data[order]
+        self.colptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=n_terms), out=self.colptr[1:])
+
+    def _vectorize(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        counts = Counter(token for token in tokens if token in self.vocabulary)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        term_ids = np.fromiter((self.vocabulary[t] for t in counts), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        weights = (1.0 + np.log(tf)) * self.idf[term_ids]
+
+        if len(weights) > MAX_TERMS_PER_DOCUMENT:
+            keep = np.argpartition(-weights, MAX_TERMS_PER_DOCUMENT)[:MAX_TERMS_PER_DOCUMENT]
+            term_ids, weights = term_ids[keep], weights[keep]
+
+        norm = np.linalg.norm(weights)
+        order = np.argsort(term_ids)
+        return term_ids[order], (weights[order] / norm).astype(np.float32)
+
+    def similarity_block(self, rows: np.ndarray) -> np.ndarray:
+        """Dense cosine similarities of the given rows against the whole corpus"""
+        n_docs = len(self.document_ids)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        block_rows = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+        positions = _concat_ranges(starts, lengths)
+        terms = self.indices[positions]
+        weights = self.data[positions]
+
+        # Expand each (row, term) entry over the posting list of that term
+        posting_lengths = self.colptr[terms + 1] - self.colptr[terms]
+        posting_positions = _concat_ranges(self.colptr[terms], posting_lengths)
+        expanded_rows = np.repeat(block_rows, posting_lengths)
+        expanded_weights = np.repeat(weights, posting_lengths) * self.col_data[posting_positions]
+        cells = expanded_rows * n_docs + self.col_rows[posting_positions]
+
+        scores = np.bincount(cells, weights=expanded_weights, minlength=len(rows) * n_docs)
+        return scores.reshape(len(rows), n_docs)
+
+def _concat_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Vectorised ``np.concatenate([np.arange(s, s + n) for s, n in zip(starts, lengths)])``"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total, dtype=np.int64)
+
+def top_k_neighbours(matrix: TfidfMatrix, rows: Sequence[int], k: int = RELATED_TOP_K):
+    """
+    Yield ``(row, neighbour_rows, scores, similarity_row)`` for each requested row,
+    processing rows in blocks sized so that the dense block stays bounded.
+    """
+    n_docs = len(matrix.document_ids)
+    if n_docs < 2:
+        return
+    rows = np.asarray(rows, dtype=np.int64)
+    block_size = max(1, MAX_BLOCK_CELLS // n_docs)
+    k = min(k, n_docs - 1)
+
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        scores = matrix.similarity_block(block)
+        scores[np.arange(len(block)), block] = -1.0  # Never relate a document to itself
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        for i, row in enumerate(block):
+            positive = candidate_scores[i] > 0
+            yield int(row), candidates[i][positive], candidate_scores[i][positive], scores[i]
+
+def document_text(document: Document) -> str:
+    """Combine title, keywords, abstract and extracted text into one weighted string"""
+    parts = [document.title or ""] * TITLE_WEIGHT
+    metadata = document.document_metadata
+    if metadata:
+        parts.extend([metadata.keywords or ""] * KEYWORD_WEIGHT)
+        parts.append(metadata.abstract or "")
+    parts.append(document.extracted_text or "")
+    return "\n".join(parts)
+
+def document_terms(document: Document) -> List[str]:
+    return [token for token in tokenize(document_text(document)) if len(token) <= MAX_TERM_LENGTH]
+
+def term_weights(tokens: List[str], document_frequency: Dict[str, int], n_docs: int) -> Dict[str, float]:
+    """The L2-normalised TF-IDF vector of ``tokens`` as ``{term: weight}``, weighed like ``TfidfMatrix``"""
+    max_df = _max_document_frequency(n_docs)
+    counts = Counter(token for token in tokens if 0 < document_frequency.get(token, 0) <= max_df)
+    if not counts:
+        return {}
+    weights = {term: (1.0 + math.log(tf)) * _idf(n_docs, document_frequency[term]) for term, tf in counts.items()}
+    if len(weights) > MAX_TERMS_PER_DOCUMENT:
+        weights = dict(heapq.nlargest(MAX_TERMS_PER_DOCUMENT, weights.items(), key=lambda item: item[1]))
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {term: weight / norm for term, weight in weights.items()}
+
+def load_corpus(db: Session) -> TfidfMatrix:
+    """Build the TF-IDF matrix for all approved documents"""
+    documents = db.query(Document).options(
+        joinedload(Document.document_metadata),
+        undefer(Document.extracted_text)
+    ).filter(Document.status == DocumentStatus.APPROVED).order_by(Document.id).all()
+
+    return TfidfMatrix(
+        [doc.id for doc in documents],
+        [document_terms(doc) for doc in documents]
+    )
+
+def _relation_rows(matrix: TfidfMatrix, row: int, neighbours: np.ndarray, scores: np.ndarray) -> List[dict]:
+    document_id = matrix.document_ids[row]
+    return [
+        {
+            "document_id": document_id,
+            "related_document_id": matrix.document_ids[int(neighbour)],
+            "score": float(score),
+            "rank": rank
+        }
+        for rank, (neighbour, score) in enumerate(zip(neighbours, scores), start=1)
+    ]
+
+def _relation_mappings(document_id: str, neighbours: List[Tuple[str, float]]) -> List[dict]:
+    return [
+        {"document_id": document_id, "related_document_id": related_id, "score": score, "rank": rank}
+        for rank, (related_id, score) in enumerate(neighbours, start=1)
+    ]
+
+def _best(scores: Dict[str, float], k: int) -> List[Tuple[str, float]]:
+    return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+def rebuild_related_documents(db: Session, k: int = RELATED_TOP_K, batch_size: int = 1000) -> int:
+    """Recompute the stored vectors and every neighbour list from scratch; returns the number of stored relations"""
+    matrix = load_corpus(db)
+    db.query(RelatedDocument).delete(synchronize_session=False)
+    db.query(DocumentTermWeight).delete(synchronize_session=False)
+
+    weights: List[dict] = []
+    for row, document_id in enumerate(matrix.document_ids):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        weights.extend(
+            {"document_id": document_id, "term": matrix.terms[int(term)], "weight": float(weight)}
+            for term, weight in zip(matrix.indices[start:end], matrix.data[start:end])
+        )
+        if len(weights) >= batch_size:
+            db.bulk_insert_mappings(DocumentTermWeight, weights)
+            weights = []
+    if weights:
+        db.bulk_insert_mappings(DocumentTermWeight, weights)
+
+    pending: List[dict] = []
+    stored = 0
+    for row, neighbours, scores, _ in top_k_neighbours(matrix, range(len(matrix.document_ids)), k):
+        pending.extend(_relation_rows(matrix, row, neighbours, scores))
+        if len(pending) >= batch_size:
+            db.bulk_insert_mappings(RelatedDocument, pending)
+            stored += len(pending)
+            pending = []
+    if pending:
+        db.bulk_insert_mappings(RelatedDocument, pending)
+        stored += len(pending)
+
+    db.commit()
+    logging.info(f"Rebuilt related documents: {stored} relations for {len(matrix.document_ids)} documents")
+    return stored
+
+def _stored_document_frequencies(db: Session, terms: Iterable[str]) -> Dict[str, int]:
+    frequencies: Dict[str, int] = {}
+    for chunk in _chunks(list(terms)):
+        frequencies.update(db.query(DocumentTermWeight.term, func.count(DocumentTermWeight.id)).filter(
+            DocumentTermWeight.term.in_(chunk)
+        ).group_by(DocumentTermWeight.term))
+    return frequencies
+
+def _approved_count(db: Session) -> int:
+    return db.query(func.count(Document.id)).filter(Document.status == DocumentStatus.APPROVED).scalar()
+
+def _score_candidates(db: Session, vector: Dict[str, float], exclude: str) -> Dict[str, float]:
+    """
+    Cosine similarity of ``vector`` (the vector of ``exclude``) with every
+    stored document sharing one of its terms. Those postings and the vector
+    form a small matrix whose ``similarity_block`` is the vector's row against
+    the candidates, computed exactly as in a rebuild.
+    """
+    postings: List[Tuple[str, str, float]] = [(exclude, term, weight) for term, weight in vector.items()]
+    for chunk in _chunks(list(vector)):
+        postings.extend(db.query(
+            DocumentTermWeight.document_id, DocumentTermWeight.term, DocumentTermWeight.weight
+        ).filter(DocumentTermWeight.term.in_(chunk), DocumentTermWeight.document_id != exclude))
+    if not postings:
+        return {}
+    matrix = TfidfMatrix.from_weights(postings)
+    row = matrix.ordinals[exclude]
+    scores = matrix.similarity_block(np.array([row], dtype=np.int64))[0]
+    scores[row] = 0.0
+    candidates = np.flatnonzero(scores > 0)
+    return {matrix.document_ids[i]: float(scores[i]) for i in candidates}
+
+def _entering_lists(db: Session, scores: Dict[str, float], k: int) -> List[Tuple[str, float]]:
+    """``(document_id, score)`` of the scored documents whose neighbour list the score gets into"""
+    weakest: Dict[str, float] = {}  # Score to beat in each full list
+    for chunk in _chunks(list(scores)):
+        for document_id, count, minimum in db.query(
+            RelatedDocument.document_id, func.count(RelatedDocument.id), func.min(RelatedDocument.score)
+        ).filter(RelatedDocument.document_id.in_(chunk)).group_by(RelatedDocument.document_id):
+            if count >= k:
+                weakest[document_id] = minimum
+    return [(document_id, score) for document_id, score in scores.items() if score > weakest.get(document_id, 0.0)]
+
+def update_related_documents(db: Session, document_ids: Sequence[str], k: int = RELATED_TOP_K) -> int:
+    """
+    Add newly approved documents to the index and the neighbour table.
+
+    Each new vector is scored only against the documents sharing one of its
+    terms. Because cosine similarity is symmetric, the same scores tell which
+    existing lists the new documents should enter, so no other list is read.
+    """
+    documents = db.query(Document).options(
+        joinedload(Document.document_metadata),
+        undefer(Document.extracted_text)
+    ).filter(Document.id.in_(list(document_ids)), Document.status == DocumentStatus.APPROVED).all()
+    if not documents:
+        return 0
+    new_ids = {doc.id for doc in documents}
+
+    # A re-approved document is indexed again from scratch
+    db.query(DocumentTermWeight).filter(DocumentTermWeight.document_id.in_(new_ids)).delete(synchronize_session=False)
+    db.query(RelatedDocument).filter(RelatedDocument.document_id.in_(new_ids)).delete(synchronize_session=False)
+
+    tokens = {doc.id: document_terms(doc) for doc in documents}
+    document_frequency: Counter = Counter()
+    for terms in tokens.values():
+        document_frequency.update(set(terms))
+    document_frequency.update(_stored_document_frequencies(db, document_frequency))
+    n_docs = _approved_count(db)
+
+    vectors = {document_id: term_weights(terms, document_frequency, n_docs) for document_id, terms in tokens.items()}
+    db.bulk_insert_mappings(DocumentTermWeight, [
+        {"document_id": document_id, "term": term, "weight": weight}
+        for document_id, vector in vectors.items() for term, weight in vector.items()
+    ])
+
+    touched: Dict[str, List[Tuple[str, float]]] = {}
+    for document_id, vector in vectors.items():
+        scores = _score_candidates(db, vector, exclude=document_id)
+        db.bulk_insert_mappings(RelatedDocument, _relation_mappings(document_id, _best(scores, k)))
+        others = {other_id: score for other_id, score in scores.items() if other_id not in new_ids}
+        for other_id, score in _entering_lists(db, others, k):
+            touched.setdefault(other_id, []).append((document_id, score))
+
+    for other_id, candidates in touched.items():
+        _merge_into_list(db, other_id, candidates, k)
+
+    db.commit()
+    return len(vectors) + len(touched)
+
+def remove_related_documents(db: Session, document_ids: Sequence[str]) -> List[str]:
+    """
+    Drop documents from the index and from every neighbour list, in the
+    caller's transaction. Returns the documents whose lists lost an entry.
+    """
+    document_ids = list(document_ids)
+    owners = {
+        document_id for (document_id,) in db.query(RelatedDocument.document_id).filter(
+            RelatedDocument.related_document_id.in_(document_ids)
+        ).distinct()
+    }
+    db.query(RelatedDocument).filter(or_(
+        RelatedDocument.document_id.in_(document_ids), RelatedDocument.related_document_id.in_(document_ids)
+    )).delete(synchronize_session=False)
+    db.query(DocumentTermWeight).filter(
+        DocumentTermWeight.document_id.in_(document_ids)
+    ).delete(synchronize_session=False)
+    return sorted(owners - set(document_ids))
+
+def refill_related_lists(db: Session, document_ids: Sequence[str], k: int = RELATED_TOP_K) -> int:
+    """Recompute the lists of ``document_ids`` from their stored vectors"""
+    max_df = _max_document_frequency(_approved_count(db))
+    refilled = 0
+    for document_id in document_ids:
+        vector = dict(db.query(DocumentTermWeight.term, DocumentTermWeight.weight).filter(
+            DocumentTermWeight.document_id == document_id
+        ))
+        # Terms that became common since the vector was stored would pull in most of the corpus
+        frequencies = _stored_document_frequencies(db, vector)
+        vector = {term: weight for term, weight in vector.items() if frequencies.get(term, 0) <= max_df}
+        if not vector:
+            continue
+        scores = _score_candidates(db, vector, exclude=document_id)
+        db.query(RelatedDocument).filter(RelatedDocument.document_id == document_id).delete(synchronize_session=False)
+        db.bulk_insert_mappings(RelatedDocument, _relation_mappings(document_id, _best(scores, k)))
+        refilled += 1
+    db.commit()
+    return refilled
+
+def _merge_into_list(db: Session, document_id: str, candidates: List[Tuple[str, float]], k: int):
+    """Merge new candidates into an existing neighbour list, keeping the best ``k``"""
+    existing = db.query(RelatedDocument).filter(RelatedDocument.document_id == document_id).all()
+    merged = {relation.related_document_id: relation.score for relation in existing}
+    for related_id, score in candidates:
+        merged[related_id] = max(score, merged.get(related_id, 0.0))
+
+    for relation in existing:
+        db.delete(relation)
+    db.flush()
+    db.bulk_insert_mappings(RelatedDocument, _relation_mappings(document_id, _best(merged, k)))
+
+def get_related_documents(db: Session, document_id: str, limit: int = RELATED_TOP_K) -> List[RelatedDocument]:
+    """Serve a precomputed neighbour list"""
+    return db.query(RelatedDocument).options(
+        joinedload(RelatedDocument.related_document)
+    ).filter(
+        RelatedDocument.document_id == document_id
+    ).order_by(RelatedDocument.rank).limit(limit).all()
+
+def refresh_related_for_approved(document_ids: Sequence[str]):
+    """Background task entry point: opens its own session"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        update_related_documents(db, document_ids)
+    except Exception as e:
+        logging.error(f"Error updating related documents for {list(document_ids)}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def refresh_related_for_withdrawn(document_ids: Sequence[str]):
+    """Background task entry point for documents no longer approved: opens its own session"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        owners = remove_related_documents(db, document_ids)
+        refill_related_lists(db, owners)
+    except Exception as e:
+        logging.error(f"Error removing related documents for {list(document_ids)}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def refresh_related_lists(document_ids: Sequence[str]):
+    """Background task entry point refilling lists after ``remove_related_documents``: opens its own session"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        refill_related_lists(db, document_ids)
+    except Exception as e:
+        logging.error(f"Error refilling related documents of {list(document_ids)}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the related-documents index and every neighbour list")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(f"Stored {rebuild_related_documents(session)} relations")
+    finally:
+        session.close()
@@ -0,0 +1,192 @@
+"""
+Review turnaround and workload aggregates.
+
+``review_aggregates`` holds one row per supervisor and one per department
+with running totals (backlog, decisions, turnaround sum and a log-bucketed
+turnaround histogram for percentiles). Rows are updated in the same
+transaction as the review they describe, so dashboards read one row instead
+of scanning ``reviews``. Only the overdue count, which changes with time
+rather than with writes, is counted from the open reviews when read.
+
+Run ``python -m app.core.review_stats`` to rebuild every row from ``reviews``.
+"""
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .metrics import LogHistogram
+from ..models import Document, Review, ReviewAggregate, ReviewDecision, ReviewStatus
+
+DECISION_COLUMNS = {
+    ReviewDecision.APPROVED: "approved",
+    ReviewDecision.REJECTED: "rejected",
+    ReviewDecision.NEEDS_REVISION: "needs_revision",
+}
+
+def _new_histogram() -> LogHistogram:
+    # Hours, from 6 minutes to a year in ~19% steps
+    return LogHistogram(min_value=0.1, max_value=24 * 366, growth=2 ** 0.25)
+
+def load_histogram(data: Optional[str]) -> LogHistogram:
+    histogram = _new_histogram()
+    if data:
+        state = json.loads(data)
+        for index, n in state["buckets"].items():
+            histogram.counts[int(index)] = n
+        histogram.count = state["count"]
+        histogram.sum = state["sum"]
+        histogram.max = state["max"]
+    return histogram
+
+def dump_histogram(histogram: LogHistogram) -> str:
+    return json.dumps({
+        "buckets": {str(index): n for index, n in enumerate(histogram.counts) if n},
+        "count": histogram.count,
+        "sum": histogram.sum,
+        "max": histogram.max
+    }, separators=(",", ":"))
+
+def _empty_aggregate(scope: Optional[str] = None, scope_id: Optional[str] = None) -> ReviewAggregate:
+    return ReviewAggregate(scope=scope, scope_id=scope_id, assigned_reviews=0, open_reviews=0, completed_reviews=0,
+                           approved=0, rejected=0, needs_revision=0, turnaround_hours_sum=0.0)
+
+def _aggregate_row(db: Session, scope: str, scope_id: str) -> ReviewAggregate:
+    """The locked aggregate row for ``scope``/``scope_id``, created if it does not exist yet"""
+    query = db.query(ReviewAggregate).filter(ReviewAggregate.scope == scope, ReviewAggregate.scope_id == scope_id)
+    row = query.with_for_update().first()
+    if row is not None:
+        return row
+    try:
+        with db.begin_nested():
+            row = _empty_aggregate(scope, scope_id)
+            db.add(row)
+        return row
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        return query.with_for_update().one()
+
+def _scopes(review: Review, department_id: str):
+    return (("supervisor", review.reviewer_id), ("department", department_id))
+
+def record_review_assigned(db: Session, review: Review, department_id: str):
+    for scope, scope_id in _scopes(review, department_id):
+        row = _aggregate_row(db, scope, scope_id)
+        row.assigned_reviews += 1
+        row.open_reviews += 1
+
+def record_review_completed(db: Session, review: Review, department_id: str):
+    turnaround = None
+    if review.assigned_date:
+        turnaround = max((review.completed_date - review.assigned_date).total_seconds() / 3600, 0.0)
+    column = DECISION_COLUMNS.get(ReviewDecision(review.decision)) if review.decision else None
+    for scope, scope_id in _scopes(review, department_id):
+        row = _aggregate_row(db, scope, scope_id)
+        row.open_reviews = max(row.open_reviews - 1, 0)
+        row.completed_reviews += 1
+        if column:
+            setattr(row, column, getattr(row, column) + 1)
+        if turnaround is not None:
+            row.turnaround_hours_sum += turnaround
+            histogram = load_histogram(row.turnaround_histogram)
+            histogram.record(turnaround)
+            row.turnaround_histogram = dump_histogram(histogram)
+
+def count_overdue(db: Session, scope: str, scope_id: Optional[str], now: Optional[datetime] = None) -> int:
+    cutoff = (now or datetime.now()) - timedelta(days=settings.REVIEW_DUE_DAYS)
+    query = db.query(func.count(Review.id)).filter(
+        Review.status != ReviewStatus.COMPLETED,
+        Review.assigned_date < cutoff
+    )
+    if scope_id is None:
+        pass
+    elif scope == "supervisor":
+        query = query.filter(Review.reviewer_id == scope_id)
+    else:
+        query = query.join(Document, Review.document_id == Document.id).filter(Document.department_id == scope_id)
+    return query.scalar() or 0
+
+def summarize_aggregate(row: Optional[ReviewAggregate]) -> Dict[str, Any]:
+    """Turnaround and workload figures from an aggregate row (zeros when there is none)"""
+    row = row if row is not None else _empty_aggregate()
+    histogram = load_histogram(row.turnaround_histogram)
+    decided = row.approved + row.rejected + row.needs_revision
+    return {
+        "assigned_reviews": row.assigned_reviews,
+        "open_reviews": row.open_reviews,
+        "completed_reviews": row.completed_reviews,
+        "approved": row.approved,
+        "rejected": row.rejected,
+        "needs_revision": row.needs_revision,
+        "approval_rate": round(row.approved / decided * 100, 1) if decided else 0.0,
+        "avg_turnaround_hours": round(row.turnaround_hours_sum / row.completed_reviews, 1) if row.completed_reviews else 0.0,
+        "p50_turnaround_hours": round(histogram.percentile(50), 1),
+        "p90_turnaround_hours": round(histogram.percentile(90), 1)
+    }
+
+def review_summary(db: Session, scope: str, scope_id: Optional[str] = None) -> Dict[str, Any]:
+    """Summary for one supervisor or department, or merged over the whole scope when ``scope_id`` is omitted"""
+    query = db.query(ReviewAggregate).filter(ReviewAggregate.scope == scope)
+    if scope_id is not None:
+        row = query.filter(ReviewAggregate.scope_id == scope_id).first()
+        return {**summarize_aggregate(row), "overdue_reviews": count_overdue(db, scope, scope_id)}
+
+    merged, histogram = _empty_aggregate(scope), _new_histogram()
+    for row in query:
+        for column in ("assigned_reviews", "open_reviews", "completed_reviews", "approved", "rejected",
+                       "needs_revision", "turnaround_hours_sum"):
+            setattr(merged, column, getattr(merged, column) + getattr(row, column))
+        histogram.merge(load_histogram(row.turnaround_histogram))
+    merged.turnaround_histogram = dump_histogram(histogram)
+    return {**summarize_aggregate(merged), "overdue_reviews": count_overdue(db, scope, None)}
+
+def rebuild_review_aggregates(db: Session) -> int:
+    """Recompute every aggregate row from the reviews table"""
+    db.query(ReviewAggregate).delete(synchronize_session=False)
+    rows: Dict[tuple, ReviewAggregate] = {}
+    histograms: Dict[tuple, LogHistogram] = {}
+
+    reviews = db.query(Review, Document.department_id).join(Document, Review.document_id == Document.id)
+    for review, department_id in reviews.yield_per(1000):
+        for key in _scopes(review, department_id):
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = _empty_aggregate(*key)
+                histograms[key] = _new_histogram()
+            row.assigned_reviews += 1
+            if review.status != ReviewStatus.COMPLETED or review.completed_date is None:
+                row.open_reviews += 1
+                continue
+            row.completed_reviews += 1
+            column = DECISION_COLUMNS.get(ReviewDecision(review.decision)) if review.decision else None
+            if column:
+                setattr(row, column, getattr(row, column) + 1)
+            if review.assigned_date:
+                turnaround = max((review.completed_date - review.assigned_date).total_seconds() / 3600, 0.0)
+                row.turnaround_hours_sum += turnaround
+                histograms[key].record(turnaround)
+
+    for key, row in rows.items():
+        row.turnaround_histogram = dump_histogram(histograms[key])
+    db.add_all(rows.values())
+    db.commit()
+    return len(rows)
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the review turnaround aggregates from the reviews table")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_review_aggregates(session)} review aggregates")
+    finally:
+        session.close()
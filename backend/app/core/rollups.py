@@ -0,0 +1,186 @@
+"""
+Daily analytics rollups.
+
+``daily_activity_rollups`` and ``document_status_rollups`` are updated in the
+same transaction as the write that changes them, so chart endpoints read one
+row per day instead of grouping over ``documents``/``downloads``.
+
+Approvals and rejections count completed review decisions on the day of
+``reviews.completed_date``, both live and when rebuilding; a status set
+directly on a document is not a decision and only moves the status rollup.
+
+Run ``python -m app.core.rollups --days 30`` to repair recent days, or
+``--all`` to backfill everything from the source tables.
+"""
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import (
+    DailyActivityRollup, Document, DocumentStatus, DocumentStatusRollup,
+    Download, Review, ReviewDecision, User
+)
+
+def _day(value: Optional[datetime]) -> date:
+    return (value or datetime.now()).date()
+
+def _bump(db: Session, model, keys: Dict, increments: Dict[str, int]):
+    """``UPDATE model SET c = c + n WHERE keys``, inserting the row if it does not exist yet"""
+    increments = {column: n for column, n in increments.items() if n}
+    if not increments:
+        return
+    statement = update(model).where(*[getattr(model, k) == v for k, v in keys.items()]).values(
+        {getattr(model, column): getattr(model, column) + n for column, n in increments.items()}
+    ).execution_options(synchronize_session=False)
+
+    if db.execute(statement).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(model(**keys, **increments))
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        db.execute(statement)
+
+def record_document_uploaded(db: Session, document: Document):
+    day = _day(document.upload_date)
+    _bump(db, DailyActivityRollup, {"day": day, "department_id": document.department_id},
+          {"uploads": 1, "storage_bytes": document.file_size or 0})
+    _bump(db, DocumentStatusRollup,
+          {"day": day, "department_id": document.department_id, "status": DocumentStatus(document.status or DocumentStatus.SUBMITTED).value},
+          {"document_count": 1})
+
+def record_status_change(db: Session, document: Document, previous_status: DocumentStatus):
+    if previous_status == document.status:
+        return
+    upload_day = _day(document.upload_date)
+    keys = {"day": upload_day, "department_id": document.department_id}
+    _bump(db, DocumentStatusRollup, {**keys, "status": DocumentStatus(previous_status).value}, {"document_count": -1})
+    _bump(db, DocumentStatusRollup, {**keys, "status": DocumentStatus(document.status).value}, {"document_count": 1})
+
+def record_review_decision(db: Session, document: Document, review: Review):
+    column = {ReviewDecision.APPROVED: "approvals", ReviewDecision.REJECTED: "rejections"}.get(review.decision)
+    if column is None or review.completed_date is None:
+        return
+    _bump(db, DailyActivityRollup, {"day": _day(review.completed_date), "department_id": document.department_id},
+          {column: 1})
+
+def record_document_deleted(db: Session, document: Document):
+    day = _day(document.upload_date)
+    _bump(db, DailyActivityRollup, {"day": day, "department_id": document.department_id},
+          {"storage_bytes": -(document.file_size or 0)})
+    _bump(db, DocumentStatusRollup,
+          {"day": day, "department_id": document.department_id, "status": DocumentStatus(document.status).value},
+          {"document_count": -1})
+
+def record_download(db: Session, document: Document):
+    _bump(db, DailyActivityRollup, {"day": date.today(), "department_id": document.department_id}, {"downloads": 1})
+
+def record_user_registered(db: Session, user: User):
+    _bump(db, DailyActivityRollup, {"day": _day(user.created_at), "department_id": user.department_id}, {"registrations": 1})
+
+def rebuild_rollups(db: Session, start_day: Optional[date] = None, end_day: Optional[date] = None) -> int:
+    """
+    Recompute rollup rows for ``[start_day, end_day]`` (everything when omitted)
+    from the source tables. Approvals and rejections are taken from completed
+    reviews, as ``record_review_decision`` counts them.
+    """
+    def in_range(column):
+        conditions = []
+        if start_day:
+            conditions.append(func.date(column) >= start_day)
+        if end_day:
+            conditions.append(func.date(column) <= end_day)
+        return conditions
+
+    def range_rows(model):
+        query = db.query(model)
+        if start_day:
+            query = query.filter(model.day >= start_day)
+        if end_day:
+            query = query.filter(model.day <= end_day)
+        return query
+
+    range_rows(DailyActivityRollup).delete(synchronize_session=False)
+    range_rows(DocumentStatusRollup).delete(synchronize_session=False)
+
+    activity: Dict[tuple, Dict[str, int]] = {}
+    def add(day, department_id, column, value):
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        row = activity.setdefault((day, department_id), {})
+        row[column] = row.get(column, 0) + int(value or 0)
+
+    upload_day = func.date(Document.upload_date)
+    for day, department_id, uploads, storage in db.query(
+        upload_day, Document.department_id, func.count(Document.id), func.sum(Document.file_size)
+    ).filter(*in_range(Document.upload_date)).group_by(upload_day, Document.department_id):
+        add(day, department_id, "uploads", uploads)
+        add(day, department_id, "storage_bytes", storage)
+
+    download_day = func.date(Download.download_timestamp)
+    for day, department_id, downloads in db.query(
+        download_day, Document.department_id, func.count(Download.id)
+    ).join(Document, Download.document_id == Document.id).filter(
+        *in_range(Download.download_timestamp)
+    ).group_by(download_day, Document.department_id):
+        add(day, department_id, "downloads", downloads)
+
+    review_day = func.date(Review.completed_date)
+    for day, department_id, decision, count in db.query(
+        review_day, Document.department_id, Review.decision, func.count(Review.id)
+    ).join(Document, Review.document_id == Document.id).filter(
+        Review.completed_date.isnot(None),
+        Review.decision.in_([ReviewDecision.APPROVED, ReviewDecision.REJECTED]),
+        *in_range(Review.completed_date)
+    ).group_by(review_day, Document.department_id, Review.decision):
+        add(day, department_id, "approvals" if decision == ReviewDecision.APPROVED else "rejections", count)
+
+    registration_day = func.date(User.created_at)
+    for day, department_id, registrations in db.query(
+        registration_day, User.department_id, func.count(User.id)
+    ).filter(*in_range(User.created_at)).group_by(registration_day, User.department_id):
+        add(day, department_id, "registrations", registrations)
+
+    db.bulk_insert_mappings(DailyActivityRollup, [
+        {"day": day, "department_id": department_id, "uploads": 0, "approvals": 0,
+         "rejections": 0, "downloads": 0, "storage_bytes": 0, "registrations": 0, **columns}
+        for (day, department_id), columns in activity.items()
+    ])
+
+    status_rows = []
+    for day, department_id, status, count in db.query(
+        upload_day, Document.department_id, Document.status, func.count(Document.id)
+    ).filter(*in_range(Document.upload_date)).group_by(upload_day, Document.department_id, Document.status):
+        status_rows.append({
+            "day": date.fromisoformat(day) if isinstance(day, str) else day,
+            "department_id": department_id,
+            "status": DocumentStatus(status).value,
+            "document_count": count
+        })
+    db.bulk_insert_mappings(DocumentStatusRollup, status_rows)
+
+    db.commit()
+    return len(activity) + len(status_rows)
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Backfill or repair the daily analytics rollups")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--days", type=int, help="Rebuild the most recent N days")
+    group.add_argument("--all", action="store_true", help="Rebuild every day from the source tables")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        start = None if args.all else date.today() - timedelta(days=args.days - 1)
+        print(f"Rebuilt {rebuild_rollups(session, start_day=start)} rollup rows")
+    finally:
+        session.close()
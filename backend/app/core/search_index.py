@@ -0,0 +1,486 @@
+"""
+Persistent full-text search index made of immutable, memory-mapped segments.
+
+Every segment is a directory of flat binary files:
+
+    docs.bin       fixed-width (36 byte) document ids; position = document ordinal
+    docs.sorted    the same ids sorted, for membership checks by binary search
+    doclen.u32     token count per document ordinal (for BM25 length normalisation)
+    terms.bin      sorted UTF-8 term bytes, concatenated
+    terms.off      uint64 offsets of each term into terms.bin (n_terms + 1)
+    postings.off   uint64 offsets of each term's postings (n_terms + 1)
+    postings.doc   uint32 document ordinals
+    postings.tf    uint16 term frequencies
+    meta.json      document count and total token count
+
+Segments are opened read-only with ``mmap`` so all uvicorn workers share the
+same pages through the OS page cache, and opening the index only reads the
+small ``manifest.json``. Updates write a new segment and tombstone older copies
+of the same documents; a background thread merges small segments.
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import settings
+from .text import tokenize
+
+DOC_ID_WIDTH = 36
+BM25_K1 = 1.2
+BM25_B = 0.75
+MERGE_FACTOR = 4
+LOCK_TIMEOUT = 30.0
+STALE_LOCK_SECONDS = 120.0
+STALE_SEGMENT_SECONDS = 300.0  # Unreferenced segments are kept a while for readers still mapping them
+
+def _open_array(path: Path, dtype: str) -> np.ndarray:
+    if path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+class Segment:
+    """Read-only view over one segment directory"""
+
+    def __init__(self, path: Path, generation: int):
+        self.path = path
+        self.name = path.name
+        self.generation = generation
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        self.n_docs = meta["n_docs"]
+        self.total_length = meta["total_length"]
+
+        self.doc_ids = _open_array(path / "docs.bin", f"S{DOC_ID_WIDTH}")
+        self.sorted_doc_ids = _open_array(path / "docs.sorted", f"S{DOC_ID_WIDTH}")
+        self.doc_lengths = _open_array(path / "doclen.u32", "<u4")
+        self.term_offsets = _open_array(path / "terms.off", "<u8")
+        self.posting_offsets = _open_array(path / "postings.off", "<u8")
+        self.posting_docs = _open_array(path / "postings.doc", "<u4")
+        self.posting_tfs = _open_array(path / "postings.tf", "<u2")
+        self.n_terms = max(len(self.term_offsets) - 1, 0)
+
+        self._term_file = open(path / "terms.bin", "rb")
+        self.term_bytes = (
+            mmap.mmap(self._term_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.n_terms else b""
+        )
+
+    def term_at(self, index: int) -> bytes:
+        return self.term_bytes[int(self.term_offsets[index]):int(self.term_offsets[index + 1])]
+
+    def find_term(self, term: bytes) -> Optional[int]:
+        """Binary search over the sorted term dictionary"""
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term_at(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self.term_at(lo) == term:
+            return lo
+        return None
+
+    def postings(self, term: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        index = self.find_term(term)
+        if index is None:
+            return None
+        start, end = int(self.posting_offsets[index]), int(self.posting_offsets[index + 1])
+        return self.posting_docs[start:end], self.posting_tfs[start:end]
+
+    def document_id(self, ordinal: int) -> str:
+        return self.doc_ids[ordinal].decode("ascii")
+
+    def contains(self, document_ids: np.ndarray) -> np.ndarray:
+        """Boolean mask of which ids (``S36`` array) are stored in this segment"""
+        if self.n_docs == 0:
+            return np.zeros(len(document_ids), dtype=bool)
+        positions = np.searchsorted(self.sorted_doc_ids, document_ids)
+        positions = np.minimum(positions, self.n_docs - 1)
+        return self.sorted_doc_ids[positions] == document_ids
+
+    def close(self):
+        if isinstance(self.term_bytes, mmap.mmap):
+            self.term_bytes.close()
+        self._term_file.close()
+
+def write_segment(root: Path, documents: Sequence[Tuple[str, List[str]]]) -> Tuple[str, int]:
+    """Write token lists as a new immutable segment; returns ``(name, n_docs)``"""
+    postings: Dict[bytes, List[Tuple[int, int]]] = {}
+    doc_ids = []
+    doc_lengths = []
+    for ordinal, (document_id, tokens) in enumerate(documents):
+        doc_ids.append(document_id.encode("ascii"))
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term.encode("utf-8"), []).append((ordinal, min(tf, 0xFFFF)))
+    return _write_segment_files(root, doc_ids, doc_lengths, sorted(postings.items()))
+
+def _write_segment_files(root: Path, doc_ids: List[bytes], doc_lengths: List[int],
+                         postings: Iterable[Tuple[bytes, Sequence[Tuple[int, int]]]]) -> Tuple[str, int]:
+    name = f"seg_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+    tmp_path = root / f".tmp-{name}"
+    tmp_path.mkdir(parents=True)
+
+    terms = bytearray()
+    term_offsets = [0]
+    posting_offsets = [0]
+    posting_docs: List[np.ndarray] = []
+    posting_tfs: List[np.ndarray] = []
+    for term, entries in postings:
+        terms.extend(term)
+        term_offsets.append(len(terms))
+        entries = np.asarray(entries, dtype=np.uint32).reshape(-1, 2)
+        posting_docs.append(entries[:, 0])
+        posting_tfs.append(entries[:, 1].astype(np.uint16))
+        posting_offsets.append(posting_offsets[-1] + len(entries))
+
+    ids = np.asarray(doc_ids, dtype=f"S{DOC_ID_WIDTH}")
+    ids.tofile(tmp_path / "docs.bin")
+    np.sort(ids).tofile(tmp_path / "docs.sorted")
+    np.asarray(doc_lengths, dtype="<u4").tofile(tmp_path / "doclen.u32")
+    (tmp_path / "terms.bin").write_bytes(bytes(terms))
+    np.asarray(term_offsets if len(term_offsets) > 1 else [], dtype="<u8").tofile(tmp_path / "terms.off")
+    np.asarray(posting_offsets if len(posting_offsets) > 1 else [], dtype="<u8").tofile(tmp_path / "postings.off")
+    (np.concatenate(posting_docs) if posting_docs else np.empty(0)).astype("<u4").tofile(tmp_path / "postings.doc")
+    (np.concatenate(posting_tfs) if posting_tfs else np.empty(0)).astype("<u2").tofile(tmp_path / "postings.tf")
+    with open(tmp_path / "meta.json", "w") as f:
+        json.dump({"n_docs": len(doc_ids), "total_length": int(sum(doc_lengths))}, f)
+
+    os.replace(tmp_path, root / name)
+    return name, len(doc_ids)
+
+class SearchIndex:
+    """Query and update the segment set described by ``manifest.json``"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._segments: Dict[str, Segment] = {}
+        self._manifest = {"generation": 0, "segments": [], "tombstones": {}}
+        self._manifest_mtime = None
+        self._reload_lock = threading.Lock()
+        self._merge_thread: Optional[threading.Thread] = None
+        self._stop_merging = threading.Event()
+
+    # --- Manifest handling -------------------------------------------------
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    @contextmanager
+    def _file_lock(self, name: str = "manifest.lock", blocking: bool = True):
+        """Cross-process lock based on exclusive file creation (portable, no fcntl)"""
+        path = self.root / name
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime > STALE_LOCK_SECONDS:
+                        path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if not blocking:
+                    yield False
+                    return
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not acquire search index lock {path}")
+                time.sleep(0.01)
+        try:
+            yield True
+        finally:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"generation": 0, "segments": [], "tombstones": {}}
+
+    def _write_manifest(self, manifest: dict):
+        tmp_path = self.root / f".manifest-{os.getpid()}-{threading.get_ident()}.json"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def open(self):
+        """Map the current segments; cheap enough to call at worker startup"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return
+        # The manifest is always replaced atomically, so a new inode means a new version
+        mtime = (stat.st_ino, stat.st_mtime_ns)
+        if mtime == self._manifest_mtime:
+            return
+
+        with self._reload_lock:
+            if mtime == self._manifest_mtime:
+                return
+            manifest = self._read_manifest()
+            segments = {}
+            for entry in manifest["segments"]:
+                segment = self._segments.get(entry["name"])
+                if segment is None:
+                    segment = Segment(self.root / entry["name"], entry["generation"])
+                segments[entry["name"]] = segment
+            self._segments = segments
+            self._manifest = manifest
+            self._manifest_mtime = mtime
+
+    # --- Queries -------------------------------------------------------------
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    @property
+    def document_count(self) -> int:
+        return sum(segment.n_docs for segment in self._segments.values())
+
+    def search(self, query: str, limit: Optional[int] = 20) -> Tuple[List[Tuple[str, float]], int]:
+        """BM25-ranked ``(document_id, score)`` pairs (all of them when ``limit`` is None) and the total number of matches"""
+        self.reload_if_changed()
+        segments = list(self._segments.values())
+        tombstones = self._manifest.get("tombstones", {})
+        terms = [term.encode("utf-8") for term in dict.fromkeys(tokenize(query))]
+        if not segments or not terms:
+            return [], 0
+
+        n_docs = sum(segment.n_docs for segment in segments) or 1
+        avg_length = (sum(segment.total_length for segment in segments) / n_docs) or 1.0
+        postings = {term: [segment.postings(term) for segment in segments] for term in terms}
+        idfs = {}
+        for term, per_segment in postings.items():
+            document_frequency = sum(len(p[0]) for p in per_segment if p is not None)
+            idfs[term] = math.log(1 + (n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        all_ids: List[np.ndarray] = []
+        all_scores: List[np.ndarray] = []
+        for position, segment in enumerate(segments):
+            scores = None
+            for term in terms:
+                segment_postings = postings[term][position]
+                if segment_postings is None:
+                    continue
+                docs, tfs = segment_postings
+                tfs = tfs.astype(np.float64)
+                lengths = segment.doc_lengths[docs]
+                weights = idfs[term] * tfs * (BM25_K1 + 1) / (tfs + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length))
+                term_scores = np.bincount(docs, weights=weights, minlength=segment.n_docs)
+                scores = term_scores if scores is None else scores + term_scores
+
+            if scores is None:
+                continue
+            hits = np.flatnonzero(scores)
+            ids = segment.doc_ids[hits]
+            if tombstones:
+                # Drop copies superseded by a newer segment or deleted documents
+                suspect = np.isin(ids, np.asarray(list(tombstones), dtype=f"S{DOC_ID_WIDTH}"))
+                for i in np.flatnonzero(suspect):
+                    if tombstones[ids[i].decode("ascii")] > segment.generation:
+                        scores[hits[i]] = 0
+                keep = scores[hits] > 0
+                hits, ids = hits[keep], ids[keep]
+            all_ids.append(ids)
+            all_scores.append(scores[hits])
+
+        if not all_ids:
+            return [], 0
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores)
+        total = len(ids)
+        if limit is not None and total > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(total)
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i].decode("ascii"), float(scores[i])) for i in top], total
+
+    # --- Updates ---------------------------------------------------------------
+
+    def add_documents(self, documents: Sequence[Tuple[str, str]]):
+        """Index ``(document_id, text)`` pairs as a new segment, replacing older copies"""
+        if not documents:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        name, count = write_segment(self.root, [(doc_id, tokenize(text)) for doc_id, text in documents])
+
+        with self._file_lock():
+            self.reload_if_changed()
+            manifest = self._read_manifest()
+            generation = manifest["generation"] + 1
+            manifest["generation"] = generation
+            manifest["segments"].append({"name": name, "generation": generation, "n_docs": count})
+            # Only documents that already have an older copy need a tombstone
+            for document_id in self._stored_ids([doc_id for doc_id, _ in documents]):
+                manifest["tombstones"][document_id] = generation
+            self._write_manifest(manifest)
+        self.reload_if_changed()
+
+    def _stored_ids(self, document_ids: List[str]) -> List[str]:
+        ids = np.asarray([doc_id.encode("ascii") for doc_id in document_ids], dtype=f"S{DOC_ID_WIDTH}")
+        present = np.zeros(len(ids), dtype=bool)
+        for segment in self._segments.values():
+            present |= segment.contains(ids)
+        return [doc_id for doc_id, found in zip(document_ids, present) if found]
+
+    def delete_documents(self, document_ids: Iterable[str]):
+        document_ids = list(document_ids)
+        if not document_ids or not self.manifest_path.exists():
+            return
+        with self._file_lock():
+            self.reload_if_changed()
+            manifest = self._read_manifest()
+            generation = manifest["generation"] + 1
+            manifest["generation"] = generation
+            for document_id in self._stored_ids(document_ids):
+                manifest["tombstones"][document_id] = generation
+            self._write_manifest(manifest)
+        self.reload_if_changed()
+
+    def merge_segments(self, max_segments: int = None) -> bool:
+        """Merge the smallest segments when there are too many; returns True if a merge happened"""
+        max_segments = max_segments or settings.SEARCH_INDEX_MAX_SEGMENTS
+        self.reload_if_changed()
+        if len(self._segments) <= max_segments:
+            return False
+
+        with self._file_lock("merge.lock", blocking=False) as acquired:
+            if not acquired:
+                return False
+            self.reload_if_changed()
+            tombstones = dict(self._manifest.get("tombstones", {}))
+            inputs = sorted(self._segments.values(), key=lambda s: s.n_docs)[:max(MERGE_FACTOR, len(self._segments) - max_segments + 1)]
+            name, count = self._merge(inputs, tombstones)
+
+            with self._file_lock():
+                manifest = self._read_manifest()
+                current = {entry["name"] for entry in manifest["segments"]}
+                if not all(segment.name in current for segment in inputs):
+                    shutil.rmtree(self.root / name, ignore_errors=True)
+                    return False
+                merged_names = {segment.name for segment in inputs}
+                manifest["segments"] = [entry for entry in manifest["segments"] if entry["name"] not in merged_names]
+                manifest["segments"].append({
+                    "name": name,
+                    "generation": max(segment.generation for segment in inputs),
+                    "n_docs": count
+                })
+                self._write_manifest(manifest)
+                self.reload_if_changed()
+                self._prune_tombstones()
+
+        self.reload_if_changed()
+        self._remove_unreferenced_segments()
+        logging.info(f"Merged {len(inputs)} search index segments into {name} ({count} documents)")
+        return True
+
+    def _merge(self, inputs: List[Segment], tombstones: Dict[str, int]) -> Tuple[str, int]:
+        doc_ids: List[bytes] = []
+        doc_lengths: List[int] = []
+        remaps = []
+        for segment in inputs:
+            ids = segment.doc_ids[:]
+            valid = np.array([
+                tombstones.get(doc_id.decode("ascii"), 0) <= segment.generation for doc_id in ids
+            ], dtype=bool)
+            remap = np.full(segment.n_docs, -1, dtype=np.int64)
+            remap[valid] = np.arange(len(doc_ids), len(doc_ids) + int(valid.sum()))
+            doc_ids.extend(ids[valid].tolist())
+            doc_lengths.extend(segment.doc_lengths[valid].tolist())
+            remaps.append(remap)
+
+        all_terms = sorted({segment.term_at(i) for segment in inputs for i in range(segment.n_terms)})
+
+        def merged_postings():
+            for term in all_terms:
+                docs, tfs = [], []
+                for segment, remap in zip(inputs, remaps):
+                    postings = segment.postings(term)
+                    if postings is None:
+                        continue
+                    new_ordinals = remap[postings[0]]
+                    keep = new_ordinals >= 0
+                    docs.append(new_ordinals[keep])
+                    tfs.append(postings[1][keep])
+                if docs:
+                    docs = np.concatenate(docs)
+                    if len(docs):
+                        yield term, np.column_stack([docs, np.concatenate(tfs)])
+
+        return _write_segment_files(self.root, doc_ids, doc_lengths, merged_postings())
+
+    def _prune_tombstones(self):
+        """Forget tombstones that no longer shadow any stored copy (manifest lock held)"""
+        manifest = self._read_manifest()
+        tombstones = manifest["tombstones"]
+        if not tombstones:
+            return
+        ids = np.asarray([doc_id.encode("ascii") for doc_id in tombstones], dtype=f"S{DOC_ID_WIDTH}")
+        generations = np.asarray(list(tombstones.values()), dtype=np.int64)
+        shadowing = np.zeros(len(ids), dtype=bool)
+        for segment in self._segments.values():
+            shadowing |= segment.contains(ids) & (generations > segment.generation)
+        manifest["tombstones"] = {
+            doc_id: int(generation) for doc_id, generation, keep in zip(tombstones, generations, shadowing) if keep
+        }
+        self._write_manifest(manifest)
+
+    def _remove_unreferenced_segments(self):
+        referenced = {entry["name"] for entry in self._read_manifest()["segments"]}
+        now = time.time()
+        for path in self.root.iterdir():
+            if not path.is_dir() or path.name in referenced:
+                continue
+            if now - path.stat().st_mtime > STALE_SEGMENT_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def start_background_merging(self, interval: int = None):
+        interval = interval or settings.SEARCH_INDEX_MERGE_INTERVAL
+        if self._merge_thread and self._merge_thread.is_alive():
+            return
+        self._stop_merging.clear()
+
+        def run():
+            while not self._stop_merging.wait(interval):
+                try:
+                    while self.merge_segments():
+                        pass
+                except Exception as e:
+                    logging.error(f"Search index merge failed: {e}")
+
+        self._merge_thread = threading.Thread(target=run, name="search-index-merger", daemon=True)
+        self._merge_thread.start()
+
+    def stop_background_merging(self):
+        self._stop_merging.set()
+
+# Global search index instance
+search_index = SearchIndex(settings.SEARCH_INDEX_DIR)
@@ -0,0 +1,26 @@
+"""
+Text normalisation helpers shared by the discovery and search features
+"""
+import re
+from typing import List
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers herself him himself his how however i if in into is it its itself
+just me more most my myself no nor not of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they this
+those through thus to too under until up upon very via was we were what when where which while who
+whom why will with within without would you your yours yourself yourselves et al
+""".split())
+
+def tokenize(text: str, min_length: int = 2) -> List[str]:
+    """Lower-case the text and split it into alphanumeric tokens without stopwords"""
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) >= min_length and token not in STOPWORDS
+    ]
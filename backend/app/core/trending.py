@@ -0,0 +1,208 @@
+"""
+Trending documents.
+
+Popularity uses forward exponential decay: an event at time ``t`` adds
+``weight * exp(lambda * (t - landmark))``, so stored scores never need to be
+decayed and their order does not change as time passes; the current value is
+``score * exp(-lambda * (now - landmark))``. The landmark advances once a
+week, when every score is rescaled by the same factor, to keep the numbers
+small.
+
+Each worker applies its own views and downloads immediately to bounded top-k
+lists (global and per department). Every ``TRENDING_FLUSH_INTERVAL`` seconds
+it adds its increments to ``document_trending_scores`` and reloads the table,
+so all workers converge on the same scores; rows whose current value has
+decayed below ``PRUNE_BELOW`` are deleted, which keeps the table to recently
+active documents.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from ..models import DocumentTrendingScore
+
+EVENT_WEIGHTS = {"view": 1.0, "download": 3.0}
+LANDMARK_PERIOD = 7 * 24 * 3600  # seconds
+PRUNE_BELOW = 0.05  # Current value under which a document is dropped (one view after ~13 days)
+GLOBAL = "global"
+
+_scores_table = DocumentTrendingScore.__table__
+
+def _decay_rate() -> float:
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+def _landmark(now: float) -> float:
+    return float(math.floor(now / LANDMARK_PERIOD) * LANDMARK_PERIOD)
+
+class TrendingTracker:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, top_k: Optional[int] = None):
+        self.session_factory = session_factory
+        self.top_k = top_k or settings.TRENDING_TOP_K
+        self.landmark = _landmark(time.time())
+        self._scores: Dict[str, Tuple[str, float]] = {}  # document_id -> (department_id, score)
+        self._top: Dict[str, Dict[str, float]] = {}  # scope -> {document_id: score}, at most top_k each
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _rebase(self, landmark: float):
+        """Rescale in-memory scores to a later landmark (caller holds the lock)"""
+        factor = math.exp(-_decay_rate() * (landmark - self.landmark))
+        self._scores = {doc: (dept, score * factor) for doc, (dept, score) in self._scores.items()}
+        self._pending = {doc: (dept, delta * factor) for doc, (dept, delta) in self._pending.items()}
+        for members in self._top.values():
+            for doc in members:
+                members[doc] *= factor
+        self.landmark = landmark
+
+    def _offer(self, scope: str, document_id: str, score: float):
+        """Keep ``document_id`` in the scope's top-k if it belongs there (scores only grow between rebases)"""
+        members = self._top.setdefault(scope, {})
+        if document_id in members or len(members) < self.top_k:
+            members[document_id] = score
+            return
+        weakest = min(members, key=members.get)
+        if score > members[weakest]:
+            del members[weakest]
+            members[document_id] = score
+
+    def record(self, kind: str, document_id: str, department_id: str, now: Optional[float] = None):
+        now = now or time.time()
+        with self._lock:
+            landmark = _landmark(now)
+            if landmark > self.landmark:
+                self._rebase(landmark)
+            delta = EVENT_WEIGHTS[kind] * math.exp(_decay_rate() * (now - self.landmark))
+            score = self._scores.get(document_id, (department_id, 0.0))[1] + delta
+            self._scores[document_id] = (department_id, score)
+            pending = self._pending.get(document_id, (department_id, 0.0))[1] + delta
+            self._pending[document_id] = (department_id, pending)
+            self._offer(GLOBAL, document_id, score)
+            self._offer(department_id, document_id, score)
+
+    def trending(self, department_id: Optional[str] = None, limit: int = 10, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Top documents of a department (or overall) with their current decayed scores"""
+        decay = math.exp(-_decay_rate() * ((now or time.time()) - self.landmark))
+        with self._lock:
+            members = self._top.get(department_id or GLOBAL, {})
+            best = heapq.nlargest(limit, members.items(), key=lambda item: item[1])
+        return [{"document_id": doc, "score": round(score * decay, 3)} for doc, score in best]
+
+    def flush(self) -> int:
+        """Persist this worker's increments, then reload every worker's scores"""
+        with self._lock:
+            landmark = _landmark(time.time())
+            if landmark > self.landmark:
+                self._rebase(landmark)
+            batch, self._pending = self._pending, {}
+            landmark = self.landmark
+
+        db = None
+        try:
+            db = self.session_factory()
+            _rebase_rows(db, landmark)
+            if batch:
+                _add_scores(db, [
+                    {"trending_id": str(uuid.uuid4()), "document_id": doc, "department_id": dept,
+                     "score": delta, "landmark": landmark}
+                    for doc, (dept, delta) in batch.items()
+                ])
+            db.query(DocumentTrendingScore).filter(
+                DocumentTrendingScore.score < PRUNE_BELOW * math.exp(_decay_rate() * (time.time() - landmark))
+            ).delete(synchronize_session=False)
+            db.commit()
+            self._load(db, landmark)
+            return len(batch)
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            logging.error(f"Failed to persist trending scores, keeping {len(batch)} for retry: {e}")
+            with self._lock:
+                for doc, (dept, delta) in batch.items():
+                    self._pending[doc] = (dept, self._pending.get(doc, (dept, 0.0))[1] + delta)
+            return 0
+        finally:
+            if db is not None:
+                db.close()
+
+    def _load(self, db: Session, landmark: float):
+        rows = db.query(
+            DocumentTrendingScore.document_id, DocumentTrendingScore.department_id, DocumentTrendingScore.score
+        ).filter(DocumentTrendingScore.landmark == landmark).all()
+        with self._lock:
+            if landmark != self.landmark:
+                return  # Rebased meanwhile; the next flush reloads
+            scores = {doc: (dept, score) for doc, dept, score in rows}
+            for doc, (dept, delta) in self._pending.items():  # Events recorded since the batch was taken
+                scores[doc] = (dept, scores.get(doc, (dept, 0.0))[1] + delta)
+            by_scope: Dict[str, List[Tuple[float, str]]] = {GLOBAL: []}
+            for doc, (dept, score) in scores.items():
+                by_scope[GLOBAL].append((score, doc))
+                by_scope.setdefault(dept, []).append((score, doc))
+            self._scores = scores
+            self._top = {
+                scope: {doc: score for score, doc in heapq.nlargest(self.top_k, entries)}
+                for scope, entries in by_scope.items()
+            }
+
+    def start(self, interval: float):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="trending", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self, interval: float):
+        self.flush()  # Load the persisted scores at startup
+        while not self._stop.wait(interval):
+            self.flush()
+
+def _add_scores(db: Session, rows: List[Dict[str, Any]]):
+    """
+    Insert new documents and add to the scores of existing ones in one
+    statement, so two workers flushing the same new document both count
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        statement = sqlite_insert(_scores_table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[_scores_table.c.document_id],
+            set_={"score": _scores_table.c.score + statement.excluded.score}
+        )
+    else:
+        statement = mysql_insert(_scores_table)
+        statement = statement.on_duplicate_key_update(score=_scores_table.c.score + statement.inserted.score)
+    db.execute(statement, rows)
+
+def _rebase_rows(db: Session, landmark: float):
+    """Rescale rows stored against an older landmark (once a week per row)"""
+    for (old,) in db.query(DocumentTrendingScore.landmark).filter(
+        DocumentTrendingScore.landmark < landmark
+    ).distinct().all():
+        factor = math.exp(-_decay_rate() * (landmark - old))
+        db.execute(
+            update(_scores_table).where(_scores_table.c.landmark == old)
+            .values(score=_scores_table.c.score * factor, landmark=landmark)
+        )
+
+# Global tracker instance
+trending_documents = TrendingTracker()
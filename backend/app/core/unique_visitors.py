@@ -0,0 +1,188 @@
+"""
+Distinct viewers and downloaders per document and per department.
+
+Every view or download adds the visitor to four HyperLogLog sketches: the
+document's and its department's, each for the current day and for all time.
+Visitors are collected in memory and merged into the stored sketches in one
+transaction every ``COUNTER_FLUSH_INTERVAL`` seconds (rows are locked while
+they are merged, so concurrent workers do not lose each other's updates).
+
+Unique counts are read from one all-time row per kind, or by merging the
+daily rows of a window; either way no ``COUNT(DISTINCT ...)`` over the event
+tables is needed.
+
+Run ``python -m app.core.unique_visitors --prune-days N`` to drop daily
+sketches older than N days (all-time sketches are kept).
+"""
+import argparse
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .hyperloglog import HyperLogLog
+from .metrics import metrics
+from ..models import UniqueVisitorSketch
+
+ALL_TIME = "all"
+KINDS = ("view", "download")
+
+SketchKey = Tuple[str, str, str, str]  # (scope, scope_id, kind, period)
+
+metrics.describe("unique_visitor_sketch_flushes_total", "counter", "Unique-visitor sketch flushes, by outcome")
+
+class UniqueVisitorTracker:
+    """Collects visitors in memory and merges them into the stored sketches in batches"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._pending: Dict[SketchKey, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, kind: str, document_id: str, department_id: Optional[str], visitor: str):
+        today = date.today().isoformat()
+        scopes = [("document", document_id)]
+        if department_id:
+            scopes.append(("department", department_id))
+        with self._lock:
+            for scope, scope_id in scopes:
+                for period in (today, ALL_TIME):
+                    self._pending.setdefault((scope, scope_id, kind, period), set()).add(visitor)
+
+    def flush(self) -> int:
+        """Merge pending visitors into their sketches; returns the number of sketches written"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        db = None
+        try:
+            db = self.session_factory()
+            # Lock sketch rows in the same order in every worker so concurrent flushes cannot deadlock
+            for key, visitors in sorted(batch.items()):
+                _merge_into_sketch(db, key, visitors)
+            db.commit()
+            metrics.increment("unique_visitor_sketch_flushes_total", outcome="ok")
+            return len(batch)
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            logging.error(f"Failed to flush unique-visitor sketches, keeping {len(batch)} for retry: {e}")
+            metrics.increment("unique_visitor_sketch_flushes_total", outcome="error")
+            with self._lock:
+                for key, visitors in batch.items():
+                    self._pending.setdefault(key, set()).update(visitors)
+            return 0
+        finally:
+            if db is not None:
+                db.close()
+
+    def start(self, interval: float):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="unique-visitors", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.flush()
+
+def _sketch_query(db: Session, key: SketchKey):
+    scope, scope_id, kind, period = key
+    return db.query(UniqueVisitorSketch).filter(
+        UniqueVisitorSketch.scope == scope,
+        UniqueVisitorSketch.scope_id == scope_id,
+        UniqueVisitorSketch.kind == kind,
+        UniqueVisitorSketch.period == period
+    )
+
+def _merge_into_sketch(db: Session, key: SketchKey, visitors: Set[str]):
+    row = _sketch_query(db, key).with_for_update().first()
+    if row is None:
+        sketch = HyperLogLog()
+        sketch.add_many(visitors)
+        scope, scope_id, kind, period = key
+        try:
+            with db.begin_nested():
+                db.add(UniqueVisitorSketch(scope=scope, scope_id=scope_id, kind=kind, period=period,
+                                           registers=sketch.to_bytes()))
+            return
+        except IntegrityError:
+            # Another worker created the row first; merge into it instead
+            row = _sketch_query(db, key).with_for_update().one()
+    sketch = HyperLogLog.from_bytes(row.registers)
+    sketch.add_many(visitors)
+    row.registers = sketch.to_bytes()
+
+def unique_visitor_counts(
+    db: Session,
+    scope: str,
+    scope_ids: Optional[Sequence[str]] = None,
+    days: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Estimated distinct viewers and downloaders over the last ``days`` days
+    (all time when omitted), merged over ``scope_ids`` (every id in the scope
+    when omitted).
+    """
+    query = db.query(UniqueVisitorSketch.kind, UniqueVisitorSketch.registers).filter(
+        UniqueVisitorSketch.scope == scope
+    )
+    if scope_ids:
+        query = query.filter(UniqueVisitorSketch.scope_id.in_(scope_ids))
+    if days:
+        today = date.today()
+        query = query.filter(
+            UniqueVisitorSketch.period >= (today - timedelta(days=days - 1)).isoformat(),
+            UniqueVisitorSketch.period <= today.isoformat()
+        )
+    else:
+        query = query.filter(UniqueVisitorSketch.period == ALL_TIME)
+
+    sketches: Dict[str, list] = {kind: [] for kind in KINDS}
+    for kind, registers in query:
+        sketches.setdefault(kind, []).append(HyperLogLog.from_bytes(registers))
+    return {
+        "unique_viewers": HyperLogLog.union(sketches["view"]).estimate(),
+        "unique_downloaders": HyperLogLog.union(sketches["download"]).estimate()
+    }
+
+def prune_daily_sketches(db: Session, keep_days: int) -> int:
+    cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+    deleted = db.query(UniqueVisitorSketch).filter(
+        UniqueVisitorSketch.period != ALL_TIME,
+        UniqueVisitorSketch.period < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+# Global tracker instance
+unique_visitors = UniqueVisitorTracker()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drop old daily unique-visitor sketches")
+    parser.add_argument("--prune-days", type=int, required=True, help="Keep daily sketches of the last N days")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(f"Deleted {prune_daily_sketches(session, args.prune_days)} daily sketches")
+    finally:
+        session.close()
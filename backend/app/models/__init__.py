@@ -6,6 +6,18 @@ from .metadata import Metadata
 from .review import Review, ReviewDecision, ReviewStatus
 from .audit_log import AuditLog
 from .download import Download
+from .related_document import RelatedDocument, DocumentTermWeight
+from .document_signature import DocumentSignature, DocumentOverlap, DocumentSignatureTombstone
+from .metadata_term import Keyword, Author, document_keywords, document_authors
+from .rollup import DailyActivityRollup, DocumentStatusRollup
+from .unique_sketch import UniqueVisitorSketch
+from .review_aggregate import ReviewAggregate
+from .rank_snapshot import DepartmentRankSnapshot
+from .trending_score import DocumentTrendingScore
+from .recommendation import CoDownload, DocumentRecommendation
+from .job_checkpoint import JobCheckpoint
+from .citation import Citation, CitationReferenceToken, CitationTitleToken, DocumentImpact
+from .dashboard_sequence import DashboardRoomSequence
 
 # Make all models available when importing from app.models
 __all__ = [
@@ -19,5 +31,28 @@ __all__ = [
     "ReviewDecision", 
     "ReviewStatus",
     "AuditLog",
-    "Download"
+    "Download",
+    "RelatedDocument",
+    "DocumentTermWeight",
+    "DocumentSignature",
+    "DocumentOverlap",
+    "DocumentSignatureTombstone",
+    "Keyword",
+    "Author",
+    "document_keywords",
+    "document_authors",
+    "DailyActivityRollup",
+    "DocumentStatusRollup",
+    "UniqueVisitorSketch",
+    "ReviewAggregate",
+    "DepartmentRankSnapshot",
+    "DocumentTrendingScore",
+    "CoDownload",
+    "DocumentRecommendation",
+    "JobCheckpoint",
+    "Citation",
+    "CitationReferenceToken",
+    "CitationTitleToken",
+    "DocumentImpact",
+    "DashboardRoomSequence"
 ]
@@ -0,0 +1,75 @@
+from sqlalchemy import Column, Float, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class Citation(Base):
+    """A reference parsed from a document, resolved to the repository document it cites when one matches"""
+    __tablename__ = "citations"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="citation_id")
+    citing_document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Order in the reference list
+    reference_text = Column(Text, nullable=False)
+
+    # Unresolved references stay NULL and are matched again when new documents are approved
+    cited_document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="SET NULL"), nullable=True, index=True)
+    match_score = Column(Float, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_citations_citing_position", "citing_document_id", "position"),
+    )
+
+    # Relationships
+    citing_document = relationship("Document", foreign_keys=[citing_document_id])
+    cited_document = relationship("Document", foreign_keys=[cited_document_id])
+
+    def __repr__(self):
+        return f"<Citation(citing={self.citing_document_id}, cited={self.cited_document_id}, position={self.position})>"
+
+class CitationTitleToken(Base):
+    """A title token of an approved document; the postings references are matched against"""
+    __tablename__ = "citation_title_tokens"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="title_token_id")
+    document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, index=True)
+    token = Column(String(64), nullable=False, index=True)
+    title_size = Column(Integer, nullable=False)  # Distinct tokens in the whole title
+
+    def __repr__(self):
+        return f"<CitationTitleToken(document_id={self.document_id}, token={self.token})>"
+
+class CitationReferenceToken(Base):
+    """A token of a parsed reference, so newly approved titles only rescan the references sharing their tokens"""
+    __tablename__ = "citation_reference_tokens"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="reference_token_id")
+    citation_id = Column(CHAR(36), ForeignKey("citations.citation_id", ondelete="CASCADE"), nullable=False, index=True)
+    token = Column(String(64), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<CitationReferenceToken(citation_id={self.citation_id}, token={self.token})>"
+
+class DocumentImpact(Base):
+    """Citation count and PageRank-style impact of an approved document"""
+    __tablename__ = "document_impact_scores"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="impact_id")
+    document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, unique=True)
+    department_id = Column(CHAR(36), nullable=False, index=True)
+    citation_count = Column(Integer, nullable=False, default=0)
+    impact_score = Column(Float, nullable=False, default=0.0, index=True)  # PageRank scaled so the average is 1
+    rank = Column(Integer, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    document = relationship("Document", foreign_keys=[document_id])
+
+    def __repr__(self):
+        return f"<DocumentImpact(document_id={self.document_id}, citations={self.citation_count}, impact={self.impact_score})>"
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class DashboardRoomSequence(Base):
+    """Number of the last dashboard stat delta published to a WebSocket room"""
+    __tablename__ = "dashboard_room_sequences"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="sequence_id")
+    room = Column(String(100), nullable=False, unique=True)
+    seq = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DashboardRoomSequence(room={self.room}, seq={self.seq})>"
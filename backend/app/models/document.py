@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, BIGINT
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, BIGINT, Float, Integer, Index
 from sqlalchemy.dialects.mysql import CHAR
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 import enum
 import uuid
@@ -26,8 +26,14 @@ class Document(Base):
     rejection_reason = Column(Text, nullable=True)
     file_path = Column(String(500), nullable=True)
     file_size = Column(BIGINT, nullable=True)
+    extracted_text = deferred(Column(Text, nullable=True))  # Filled in by background upload processing
+    overlap_score = Column(Float, nullable=True)  # Highest near-duplicate score found at upload
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Denormalized counters, incremented in batches by app.core.counters
+    download_count = Column(Integer, nullable=False, default=0, server_default="0")
+    view_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relationships
     uploader = relationship("User", foreign_keys=[uploader_id], back_populates="uploaded_documents")
     supervisor = relationship("User", foreign_keys=[supervisor_id], back_populates="supervised_documents")
@@ -37,5 +43,10 @@ class Document(Base):
     downloads = relationship("Download", back_populates="document", cascade="all, delete-orphan")
     document_metadata = relationship("Metadata", back_populates="document", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_documents_popularity", "download_count", "view_count"),
+        Index("ix_documents_uploader_downloads", "uploader_id", "download_count"),  # Per-uploader totals from the index
+    )
+
     def __repr__(self):
         return f"<Document(id={self.id}, title={self.title}, status={self.status})>"
@@ -0,0 +1,51 @@
+from sqlalchemy import Column, Float, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class DocumentSignature(Base):
+    __tablename__ = "document_signatures"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="signature_id")
+    document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+
+    # MinHash signature packed as a fixed-size little-endian uint32 array
+    signature = Column(LargeBinary(length=1024), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<DocumentSignature(document_id={self.document_id})>"
+
+class DocumentSignatureTombstone(Base):
+    """Records deleted documents so every worker drops them from its in-memory LSH index"""
+    __tablename__ = "document_signature_tombstones"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="tombstone_id")
+    document_id = Column(CHAR(36), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<DocumentSignatureTombstone(document_id={self.document_id})>"
+
+class DocumentOverlap(Base):
+    __tablename__ = "document_overlaps"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="overlap_id")
+    document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, index=True)
+    matched_document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Estimated Jaccard similarity of the shingle sets
+    score = Column(Float, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    matched_document = relationship("Document", foreign_keys=[matched_document_id])
+
+    def __repr__(self):
+        return f"<DocumentOverlap(document_id={self.document_id}, matched={self.matched_document_id}, score={self.score})>"
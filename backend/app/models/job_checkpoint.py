@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class JobCheckpoint(Base):
+    """How far an incremental batch job has processed its input"""
+    __tablename__ = "job_checkpoints"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="checkpoint_id")
+    job = Column(String(50), nullable=False, unique=True)
+    position = Column(DateTime(timezone=True), nullable=True)  # Input up to this time has been processed
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<JobCheckpoint(job={self.job}, position={self.position})>"
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Table
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+# Many-to-many links between documents and normalised metadata terms.
+# The composite primary key serves document -> term lookups, the extra
+# index on the term column serves "all documents with term X".
+document_keywords = Table(
+    "document_keywords",
+    Base.metadata,
+    Column("document_id", CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), primary_key=True),
+    Column("keyword_id", CHAR(36), ForeignKey("keywords.keyword_id", ondelete="CASCADE"), primary_key=True, index=True)
+)
+
+document_authors = Table(
+    "document_authors",
+    Base.metadata,
+    Column("document_id", CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), primary_key=True),
+    Column("author_id", CHAR(36), ForeignKey("authors.author_id", ondelete="CASCADE"), primary_key=True, index=True)
+)
+
+class Keyword(Base):
+    __tablename__ = "keywords"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="keyword_id")
+    name = Column(String(255), nullable=False)
+    normalized_name = Column(String(255), nullable=False, unique=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    documents = relationship("Document", secondary=document_keywords, viewonly=True)
+
+    def __repr__(self):
+        return f"<Keyword(id={self.id}, name={self.name})>"
+
+class Author(Base):
+    __tablename__ = "authors"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="author_id")
+    name = Column(String(255), nullable=False)
+    normalized_name = Column(String(255), nullable=False, unique=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    documents = relationship("Document", secondary=document_authors, viewonly=True)
+
+    def __repr__(self):
+        return f"<Author(id={self.id}, name={self.name})>"
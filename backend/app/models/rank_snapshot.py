@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Date, DateTime, Float, Integer, UniqueConstraint
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class DepartmentRankSnapshot(Base):
+    """A department's leaderboard rank and score as of one day"""
+    __tablename__ = "department_rank_snapshots"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="snapshot_id")
+    day = Column(Date, nullable=False, index=True)
+    department_id = Column(CHAR(36), nullable=False, index=True)
+    rank = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("day", "department_id", name="uq_rank_snapshot_day_department"),
+    )
+
+    def __repr__(self):
+        return f"<DepartmentRankSnapshot(day={self.day}, department_id={self.department_id}, rank={self.rank})>"
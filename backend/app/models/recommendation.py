@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Float, Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class CoDownload(Base):
+    """
+    Item-item co-occurrence: how many users of a department downloaded both documents.
+    Stored in both directions; the diagonal (``document_id == other_document_id``)
+    holds the number of the department's users who downloaded the document.
+    """
+    __tablename__ = "co_downloads"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="co_download_id")
+    department_id = Column(CHAR(36), nullable=False)
+    document_id = Column(CHAR(36), nullable=False)
+    other_document_id = Column(CHAR(36), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("department_id", "document_id", "other_document_id", name="uq_co_download_pair"),
+    )
+
+    def __repr__(self):
+        return f"<CoDownload(department_id={self.department_id}, document_id={self.document_id}, other={self.other_document_id}, count={self.count})>"
+
+class DocumentRecommendation(Base):
+    """Precomputed "also read" list of a document among the users of one department"""
+    __tablename__ = "document_recommendations"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="recommendation_id")
+    department_id = Column(CHAR(36), nullable=False)
+    document_id = Column(CHAR(36), nullable=False)
+    recommended_document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False)
+
+    # Shrunk cosine similarity of the download vectors and position in the list
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_document_recommendations_lookup", "department_id", "document_id", "rank"),
+    )
+
+    # Relationships
+    recommended_document = relationship("Document", foreign_keys=[recommended_document_id])
+
+    def __repr__(self):
+        return f"<DocumentRecommendation(document_id={self.document_id}, recommended={self.recommended_document_id}, score={self.score})>"
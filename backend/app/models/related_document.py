@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Float, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class RelatedDocument(Base):
+    __tablename__ = "related_documents"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="relation_id")
+    document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False)
+    related_document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Cosine similarity of the TF-IDF vectors and position in the neighbour list
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_related_documents_document_rank", "document_id", "rank"),
+    )
+
+    # Relationships
+    related_document = relationship("Document", foreign_keys=[related_document_id])
+
+    def __repr__(self):
+        return f"<RelatedDocument(document_id={self.document_id}, related={self.related_document_id}, score={self.score})>"
+
+class DocumentTermWeight(Base):
+    """TF-IDF weight of a term in an approved document; the postings of the related-documents index"""
+    __tablename__ = "document_term_weights"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="term_weight_id")
+    document_id = Column(CHAR(36), ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False, index=True)
+    term = Column(String(64), nullable=False, index=True)
+    weight = Column(Float, nullable=False)  # Component of the document's L2-normalised vector
+
+    def __repr__(self):
+        return f"<DocumentTermWeight(document_id={self.document_id}, term={self.term}, weight={self.weight})>"
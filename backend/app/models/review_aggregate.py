@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, Float, Text, DateTime, UniqueConstraint
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class ReviewAggregate(Base):
+    """Running review totals for one supervisor or department, updated as reviews are assigned and completed"""
+    __tablename__ = "review_aggregates"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="aggregate_id")
+    scope = Column(String(20), nullable=False)  # supervisor, department
+    scope_id = Column(CHAR(36), nullable=False)
+
+    assigned_reviews = Column(Integer, nullable=False, default=0)
+    open_reviews = Column(Integer, nullable=False, default=0)  # Assigned and not yet completed
+    completed_reviews = Column(Integer, nullable=False, default=0)
+    approved = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    needs_revision = Column(Integer, nullable=False, default=0)
+    turnaround_hours_sum = Column(Float, nullable=False, default=0.0)  # Assignment to completion
+    turnaround_histogram = Column(Text, nullable=True)  # JSON LogHistogram buckets, for percentiles
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_id", name="uq_review_aggregate_scope"),
+    )
+
+    def __repr__(self):
+        return f"<ReviewAggregate(scope={self.scope}, scope_id={self.scope_id}, open={self.open_reviews})>"
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, String, Integer, Date, DateTime, BIGINT, UniqueConstraint
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class DailyActivityRollup(Base):
+    """Per-day, per-department activity counters maintained on every write"""
+    __tablename__ = "daily_activity_rollups"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="rollup_id")
+    day = Column(Date, nullable=False)
+    department_id = Column(CHAR(36), nullable=False, index=True)
+
+    uploads = Column(Integer, nullable=False, default=0)
+    approvals = Column(Integer, nullable=False, default=0)
+    rejections = Column(Integer, nullable=False, default=0)
+    downloads = Column(Integer, nullable=False, default=0)
+    storage_bytes = Column(BIGINT, nullable=False, default=0)  # Bytes uploaded that day (net of deletions)
+    registrations = Column(Integer, nullable=False, default=0)  # New users in the department
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("day", "department_id", name="uq_daily_activity_day_department"),
+    )
+
+    def __repr__(self):
+        return f"<DailyActivityRollup(day={self.day}, department_id={self.department_id}, uploads={self.uploads})>"
+
+class DocumentStatusRollup(Base):
+    """Number of documents in each status, bucketed by upload day and department"""
+    __tablename__ = "document_status_rollups"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="rollup_id")
+    day = Column(Date, nullable=False)
+    department_id = Column(CHAR(36), nullable=False, index=True)
+    status = Column(String(20), nullable=False)
+    document_count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("day", "department_id", "status", name="uq_status_rollup_day_department_status"),
+    )
+
+    def __repr__(self):
+        return f"<DocumentStatusRollup(day={self.day}, status={self.status}, count={self.document_count})>"
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Float, DateTime
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class DocumentTrendingScore(Base):
+    """Forward-decayed popularity of a recently viewed or downloaded document (see app.core.trending)"""
+    __tablename__ = "document_trending_scores"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="trending_id")
+    document_id = Column(CHAR(36), nullable=False, unique=True)
+    department_id = Column(CHAR(36), nullable=False, index=True)
+    score = Column(Float, nullable=False, default=0.0, index=True)  # Relative to ``landmark``
+    landmark = Column(Float, nullable=False)  # Epoch seconds the score is scaled to
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DocumentTrendingScore(document_id={self.document_id}, score={self.score})>"
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.sql import func
+import uuid
+
+from ..core.database import Base
+
+class UniqueVisitorSketch(Base):
+    """HyperLogLog sketch of the distinct users who viewed or downloaded a document (or any document of a department)"""
+    __tablename__ = "unique_visitor_sketches"
+
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()), name="sketch_id")
+    scope = Column(String(20), nullable=False)  # document, department
+    scope_id = Column(CHAR(36), nullable=False)
+    kind = Column(String(20), nullable=False)  # view, download
+    period = Column(String(10), nullable=False)  # ISO day, or "all" for the all-time sketch
+    registers = Column(LargeBinary, nullable=False)  # Raw HyperLogLog registers, 2 ** p bytes
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_id", "kind", "period", name="uq_unique_sketch_scope_kind_period"),
+    )
+
+    def __repr__(self):
+        return f"<UniqueVisitorSketch(scope={self.scope}, scope_id={self.scope_id}, kind={self.kind}, period={self.period})>"
@@ -29,6 +29,9 @@ class DocumentResponse(DocumentBase):
     file_path: Optional[str] = None
     file_size: Optional[int] = None
     rejection_reason: Optional[str] = None
+    overlap_score: Optional[float] = None  # Highest near-duplicate score, for reviewers
+    download_count: int = 0
+    view_count: int = 0
     download_url: Optional[str] = None # This will be set in the endpoint
 
     class Config:
@@ -52,6 +55,8 @@ class DocumentFilter(BaseModel):
     department_id: Optional[uuid.UUID] = None
     supervisor_id: Optional[uuid.UUID] = None
     uploader_id: Optional[uuid.UUID] = None
+    keyword: Optional[str] = None
+    author: Optional[str] = None
     sort_by: Optional[str] = "upload_date"
     sort_order: Optional[str] = "desc"
 
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Optional
+import uuid
+
+from ..models import ReviewDecision
+
+class ReviewAssign(BaseModel):
+    document_id: uuid.UUID
+    reviewer_id: uuid.UUID
+    priority: str = "normal"  # low, normal, high, urgent
+
+class ReviewComplete(BaseModel):
+    decision: ReviewDecision
+    comments: Optional[str] = None
+    feedback: Optional[str] = None
@@ -0,0 +1,74 @@
+"""
+Shared pytest fixtures.
+
+Tests run against an in-memory SQLite database. The fixtures point the global
+session factory (used by background tasks) and the response cache at it with
+``monkeypatch``, so every global is restored when the test ends.
+"""
+from typing import Callable
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  Registers every table on Base.metadata
+from app.core import database
+from app.core.cache import InProcessLRUBackend, response_cache
+from app.core.database import Base, get_db
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture()
+def session_factory(engine, monkeypatch):
+    factory = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(database, "SessionLocal", factory)
+    monkeypatch.setattr(response_cache, "session_factory", factory)
+    monkeypatch.setattr(response_cache, "backend", InProcessLRUBackend(max_entries=16))
+    return factory
+
+@pytest.fixture()
+def make_client(session_factory) -> Callable[..., TestClient]:
+    """``make_client((router, prefix), ...)`` serves the routers against the test database"""
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def make(*routers) -> TestClient:
+        app = FastAPI()
+        for router, prefix in routers:
+            app.include_router(router, prefix=prefix)
+        app.dependency_overrides[get_db] = override_get_db
+        return TestClient(app)
+
+    return make
+
+@pytest.fixture()
+def people(session_factory):
+    """A department with a student and a supervisor; returns their ids"""
+    from app.models import Department, User, UserRole
+
+    db = session_factory()
+    try:
+        department = Department(name="Computer Science", faculty="Science")
+        db.add(department)
+        db.flush()
+        student = User(email="student@example.com", first_name="Ada", last_name="L", password="x",
+                       role=UserRole.STUDENT, department_id=department.id)
+        supervisor = User(email="supervisor@example.com", first_name="Alan", last_name="T", password="x",
+                          role=UserRole.SUPERVISOR, department_id=department.id)
+        db.add_all([student, supervisor])
+        db.commit()
+        return {"department": department.id, "student": student.id, "supervisor": supervisor.id}
+    finally:
+        db.close()
@@ -2,19 +2,29 @@ from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
 import uvicorn
 import os
 import asyncio
+import uuid
 from pathlib import Path
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.database import engine, Base
 from app.api.v1.router import api_router
+from app.api.v1.endpoints.websocket import DASHBOARD_ROOM, manager
 from app.core.auth import get_current_user
+from app.core.search_index import search_index
+from app.core.counters import document_counters
+from app.core.unique_visitors import unique_visitors
+from app.core.leaderboard import department_leaderboard
+from app.core.trending import trending_documents
+from app.core.recommendations import recommendation_builder
+from app.core.citations import impact_scores
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.core.metrics_export import CONTENT_TYPE, multiprocess_collector, render_metrics
 from app.models import User
 
 # Create database tables
@@ -27,9 +37,32 @@ async def lifespan(app: FastAPI):
     # from app.core.init_db import init_sample_data
     # await init_sample_data()
     
+    # Map the on-disk search index segments (no rebuild from the database)
+    search_index.open()
+    search_index.start_background_merging()
+    if multiprocess_collector is not None:
+        multiprocess_collector.start(settings.METRICS_FLUSH_INTERVAL)
+    document_counters.start(settings.COUNTER_FLUSH_INTERVAL, settings.COUNTER_RECONCILE_INTERVAL)
+    unique_visitors.start(settings.COUNTER_FLUSH_INTERVAL)
+    department_leaderboard.start(settings.LEADERBOARD_REFRESH_INTERVAL)
+    trending_documents.start(settings.TRENDING_FLUSH_INTERVAL)
+    recommendation_builder.start(settings.RECOMMENDATION_REFRESH_INTERVAL)
+    impact_scores.start(settings.IMPACT_REFRESH_INTERVAL)
+    await manager.start_backplane()
+    
     yield
     # Shutdown
-    pass
+    await manager.stop_backplane()
+    search_index.stop_background_merging()
+    document_counters.stop()  # Flushes what is still pending
+    unique_visitors.stop()
+    department_leaderboard.stop()
+    trending_documents.stop()
+    recommendation_builder.stop()
+    impact_scores.stop()  # Recomputes once more if citations changed
+    if multiprocess_collector is not None:
+        multiprocess_collector.stop()
+        multiprocess_collector.write()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -51,6 +84,10 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Request latency, status and database time metrics (outermost, so CORS handling is included)
+instrument_engine(engine)
+app.add_middleware(MetricsMiddleware)
+
 # Mount static files
 uploads_dir = Path(__file__).parent.parent / "uploads"
 uploads_dir.mkdir(exist_ok=True)  # Create directory if it doesn't exist
@@ -64,6 +101,12 @@ app.include_router(api_router, prefix="/api/v1")
 async def health_check():
     return {"status": "healthy", "message": "Academic Repository System API is running"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    # Reads and merges every worker's snapshot file, so keep it off the event loop
+    return Response(content=await asyncio.to_thread(render_metrics), media_type=CONTENT_TYPE)
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -84,43 +127,23 @@ async def test_cors():
 async def test_register():
     return {"message": "Test register endpoint reached!"}
 
-# WebSocket connection manager for dashboard updates
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        to_remove = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                to_remove.append(connection)
-        for conn in to_remove:
-            self.disconnect(conn)
-
-manager = ConnectionManager()
-
+# Dashboard updates share the API's WebSocket manager, so they reach clients on every worker
 @app.websocket("/ws/dashboard")
 async def websocket_dashboard(websocket: WebSocket):
-    await manager.connect(websocket)
+    await websocket.accept()
+    connection_id = f"dashboard:{uuid.uuid4().hex}"
+    manager.register(connection_id, websocket, None, [DASHBOARD_ROOM])
     try:
         while True:
-            # Keep the connection alive; optionally handle pings/pongs
-            await asyncio.sleep(30)
+            # Keep the connection alive; incoming messages are ignored
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    finally:
+        manager.disconnect(connection_id)
 
 # To broadcast an update from any endpoint, use:
-# await manager.broadcast({"type": "dashboard_update", "payload": ...})
+# await manager.send_to_room(DASHBOARD_ROOM, {"type": "dashboard_update", "payload": ...})
 # For example, after a document upload or review action.
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+"""
+Rebuild derived data (search text, thumbnails, previews, metadata terms,
+near-duplicate signatures, search index, related documents) for existing documents.
+
+Document ids are streamed in id order and processed in batches across a
+process pool. Progress is checkpointed after every contiguous run of finished
+batches so an interrupted run can continue with ``--resume``.
+
+    python reindex.py --workers 8 --batch-size 200
+    python reindex.py --resume --tasks text,search --max-docs-per-second 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import joinedload, undefer
+
+from app.core.database import SessionLocal, engine
+from app.models import Document
+
+ALL_TASKS = ["text", "thumbnails", "previews", "metadata", "signatures", "search", "related"]
+DEFAULT_TASKS = ["text", "metadata", "signatures", "search", "related"]
+DEFAULT_CHECKPOINT = ".reindex_checkpoint.json"
+
+def _init_worker():
+    # Connections inherited from the parent process must not be shared
+    engine.dispose(close=False)
+
+def _throttle_io(bytes_read: int, started: float, max_bytes_per_second: Optional[float]):
+    if not max_bytes_per_second:
+        return
+    expected = bytes_read / max_bytes_per_second
+    elapsed = time.monotonic() - started
+    if expected > elapsed:
+        time.sleep(expected - elapsed)
+
+def _may_submit(documents: int, max_docs_per_second: Optional[float], elapsed: float) -> bool:
+    """Whether ``documents`` (processed plus in flight) stay within the rate after ``elapsed`` seconds"""
+    return not max_docs_per_second or documents / max_docs_per_second <= elapsed
+
+async def _process_documents(db, documents: List[Document], tasks: List[str], max_bytes_per_second: Optional[float]) -> int:
+    from app.core.file_manager import file_manager
+    from app.core.near_duplicates import check_near_duplicates
+
+    started = time.monotonic()
+    bytes_read = 0
+    for document in documents:
+        path = Path(document.file_path) if document.file_path else None
+        if path is None or not path.exists():
+            continue
+
+        if "text" in tasks:
+            document.extracted_text = await file_manager.extract_text_content(path)
+            bytes_read += document.file_size or 0
+        if "thumbnails" in tasks:
+            await file_manager.generate_thumbnail(path, document.id)
+            bytes_read += document.file_size or 0
+        if "previews" in tasks:
+            await file_manager.create_preview(path, document.id)
+            bytes_read += document.file_size or 0
+        if "signatures" in tasks and document.extracted_text:
+            check_near_duplicates(db, document, document.extracted_text)
+
+        _throttle_io(bytes_read, started, max_bytes_per_second)
+    return bytes_read
+
+def reindex_batch(document_ids: List[str], tasks: List[str], max_bytes_per_second: Optional[float],
+                  session_factory: Optional[Callable] = None) -> Dict[str, int]:
+    """Worker entry point: rebuild the requested derived data for one batch"""
+    from app.core.metadata_index import sync_metadata_terms
+    from app.core.related import document_text
+    from app.core.search_index import search_index
+
+    db = (session_factory or SessionLocal)()
+    try:
+        documents = db.query(Document).options(
+            joinedload(Document.document_metadata),
+            undefer(Document.extracted_text)
+        ).filter(Document.id.in_(document_ids)).all()
+
+        bytes_read = asyncio.run(_process_documents(db, documents, tasks, max_bytes_per_second))
+
+        if "metadata" in tasks:
+            sync_metadata_terms(db, [doc.document_metadata for doc in documents if doc.document_metadata])
+        db.commit()
+
+        if "search" in tasks:
+            search_index.add_documents([(doc.id, document_text(doc)) for doc in documents])
+
+        return {"documents": len(document_ids), "bytes_read": bytes_read}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _load_checkpoint(path: Path) -> str:
+    try:
+        with open(path) as f:
+            return json.load(f).get("last_id", "")
+    except FileNotFoundError:
+        return ""
+
+def _save_checkpoint(path: Path, last_id: str, processed: int):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"last_id": last_id, "processed": processed, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+def _id_batches(start_after: str, batch_size: int, session_factory: Callable = SessionLocal):
+    """Stream document ids in id order using keyset pagination"""
+    db = session_factory()
+    try:
+        last_id = start_after
+        while True:
+            ids = [row[0] for row in db.query(Document.id).filter(
+                Document.id > last_id
+            ).order_by(Document.id).limit(batch_size).all()]
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+    finally:
+        db.close()
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+def run(args, session_factory: Optional[Callable] = None, executor: Optional[Executor] = None) -> int:
+    """
+    Reindex as ``main`` does. Tests pass ``session_factory`` and a thread
+    ``executor`` so the workers share their database; by default each worker
+    process opens its own sessions.
+    """
+    tasks = [task.strip() for task in args.tasks.split(",") if task.strip()]
+    unknown = set(tasks) - set(ALL_TASKS)
+    if unknown:
+        print(f"Unknown tasks: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    sessions = session_factory or SessionLocal
+    checkpoint = Path(args.checkpoint)
+    start_after = _load_checkpoint(checkpoint) if args.resume else ""
+    max_bytes_per_second = args.max_read_mb_per_second * 1024 * 1024 if args.max_read_mb_per_second else None
+
+    db = sessions()
+    try:
+        remaining = db.query(Document.id).filter(Document.id > start_after).count()
+    finally:
+        db.close()
+    print(f"Reindexing {remaining} documents ({', '.join(tasks)}) with {args.workers} workers"
+          + (f", resuming after {start_after}" if start_after else ""))
+
+    batch_tasks = [task for task in tasks if task != "related"]
+    processed = 0
+    started = time.monotonic()
+    pending = {}        # future -> (sequence, last id, size)
+    finished = {}       # sequence -> (last id, size) for batches done out of order
+    next_to_checkpoint = 0
+    sequence = 0
+
+    pool = executor or ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    batches = _id_batches(start_after, args.batch_size, sessions) if batch_tasks else iter(())
+    try:
+        with pool:
+            exhausted = False
+            while pending or not exhausted:
+                # Keep a bounded number of batches in flight, rate-limited for the database
+                while not exhausted and len(pending) < args.workers * 2:
+                    in_flight = sum(size for _, _, size in pending.values())
+                    if not _may_submit(processed + in_flight, args.max_docs_per_second, time.monotonic() - started):
+                        break
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    future = pool.submit(reindex_batch, batch, batch_tasks, max_bytes_per_second, session_factory)
+                    pending[future] = (sequence, batch[-1], len(batch))
+                    sequence += 1
+
+                if not pending:
+                    time.sleep(0.05)
+                    continue
+
+                done, _ = wait(list(pending), timeout=0.5, return_when=FIRST_COMPLETED)
+                failure = None
+                for future in done:
+                    batch_sequence, last_id, size = pending.pop(future)
+                    if future.exception() is not None:
+                        failure = failure or future.exception()
+                        continue
+                    finished[batch_sequence] = (last_id, size)
+
+                # Advance the checkpoint over the contiguous prefix of finished batches
+                advanced = False
+                while next_to_checkpoint in finished:
+                    last_id, size = finished.pop(next_to_checkpoint)
+                    processed += size
+                    next_to_checkpoint += 1
+                    advanced = True
+                if advanced:
+                    _save_checkpoint(checkpoint, last_id, processed)
+                    elapsed = time.monotonic() - started
+                    rate = processed / elapsed if elapsed else 0.0
+                    eta = (remaining - processed) / rate if rate else 0.0
+                    print(f"{processed}/{remaining} documents  {rate:.1f} docs/s  ETA {_format_duration(eta)}", flush=True)
+                if failure is not None:
+                    raise failure  # The checkpoint stays before the failed batch
+    finally:
+        if batch_tasks:
+            batches.close()
+
+    if "search" in tasks:
+        from app.core.search_index import search_index
+
+        search_index.open()
+        while search_index.merge_segments():
+            pass
+
+    if "related" in tasks:
+        from app.core.related import rebuild_related_documents
+
+        db = sessions()
+        try:
+            print(f"Rebuilt {rebuild_related_documents(db)} related-document links")
+        finally:
+            db.close()
+
+    print(f"Done: {processed} documents in {_format_duration(time.monotonic() - started)}")
+    if checkpoint.exists():
+        checkpoint.unlink()
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild derived data for all documents")
+    parser.add_argument("--tasks", default=",".join(DEFAULT_TASKS),
+                        help=f"Comma-separated subset of: {', '.join(ALL_TASKS)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="Continue after the last checkpointed document")
+    parser.add_argument("--max-docs-per-second", type=float, default=None, help="Throttle database load")
+    parser.add_argument("--max-read-mb-per-second", type=float, default=None, help="Per-worker file read throttle")
+    sys.exit(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Tests for the WebSocket backplanes and the local pub/sub broker.
+
+    python -m pytest test_backplane.py
+"""
+import asyncio
+
+from app.core.backplane import InProcessBackplane, InProcessBroker, LocalBroker, RedisBackplane
+
+async def _until(predicate, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def test_in_process_backplane_routes_by_channel():
+    async def main():
+        broker = InProcessBroker()
+        first, second = InProcessBackplane(broker), InProcessBackplane(broker)
+        received = {first: [], second: []}
+        await first.start(lambda channel, data: received[first].append((channel, data)))
+        await second.start(lambda channel, data: received[second].append((channel, data)))
+
+        first.subscribe("ws:room:role:admin")
+        second.subscribe("ws:all")
+        second.publish("ws:room:role:admin", b"1")
+        second.publish("ws:user:42", b"2")  # Nobody subscribed
+        first.publish("ws:room:role:admin", b"3")  # Not echoed to the publisher
+        assert received == {first: [("ws:room:role:admin", b"1")], second: []}
+
+        first.unsubscribe("ws:room:role:admin")
+        second.publish("ws:room:role:admin", b"4")
+        assert received[first] == [("ws:room:role:admin", b"1")]
+
+        await second.stop()
+        assert broker.subscribers == {}
+    asyncio.run(main())
+
+def test_redis_backplane_over_local_broker():
+    async def main():
+        broker = LocalBroker()
+        port = await broker.start(port=0)
+        url = f"redis://127.0.0.1:{port}"
+        receiver, sender = RedisBackplane(url), RedisBackplane(url)
+        received = []
+        receiver.subscribe("ws:room:role:admin")  # Before connecting: sent on connect
+        await receiver.start(lambda channel, data: received.append((channel, data)))
+        await sender.start(lambda channel, data: None)
+        try:
+            await asyncio.wait_for(sender.connected.wait(), 5)
+            await _until(lambda: "ws:room:role:admin" in broker.subscribers)
+
+            assert sender.publish("ws:user:42", b"skipped")
+            assert sender.publish("ws:room:role:admin", b"hello")
+            await _until(lambda: received)
+            assert received == [("ws:room:role:admin", b"hello")]
+
+            receiver.subscribe("ws:all")
+            await _until(lambda: "ws:all" in broker.subscribers)
+            receiver.unsubscribe("ws:room:role:admin")
+            await _until(lambda: "ws:room:role:admin" not in broker.subscribers)
+            sender.publish("ws:room:role:admin", b"gone")
+            sender.publish("ws:all", b"everyone")
+            await _until(lambda: len(received) == 2)
+            assert received[1] == ("ws:all", b"everyone")
+        finally:
+            await receiver.stop()
+            await sender.stop()
+            await broker.stop()
+        assert not broker.tasks and not broker.clients
+    asyncio.run(main())
+
+def test_redis_backplane_reconnects_and_resubscribes():
+    async def main():
+        broker = LocalBroker()
+        port = await broker.start(port=0)
+        url = f"redis://127.0.0.1:{port}"
+        receiver, sender = RedisBackplane(url), RedisBackplane(url)
+        received = []
+        await receiver.start(lambda channel, data: received.append((channel, data)))
+        await sender.start(lambda channel, data: None)
+        try:
+            await asyncio.wait_for(receiver.connected.wait(), 5)
+            receiver.subscribe("ws:user:7")
+            await _until(lambda: "ws:user:7" in broker.subscribers)
+
+            # Stopping the broker cancels the client connections, not just the listener
+            await broker.stop()
+            assert not broker.tasks
+            await _until(lambda: not receiver.connected.is_set() and not sender.connected.is_set())
+            assert not sender.publish("ws:user:7", b"dropped")
+
+            await broker.start(port=port)
+            await asyncio.wait_for(sender.connected.wait(), 10)
+            await _until(lambda: "ws:user:7" in broker.subscribers, timeout=10)
+            assert sender.publish("ws:user:7", b"back")
+            await _until(lambda: received)
+            assert received == [("ws:user:7", b"back")]
+        finally:
+            await receiver.stop()
+            await sender.stop()
+            await broker.stop()
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Tests for the response cache backends.
+
+    python -m pytest test_cache.py
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.cache import InProcessLRUBackend, ResponseCache, SQLiteBackend
+
+class RecordingBackend:
+    """Wraps a backend and records the thread each call runs on"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.blocking = backend.blocking
+        self.threads = []
+
+    def __getattr__(self, name):
+        method = getattr(self.backend, name)
+
+        def call(*args):
+            self.threads.append(threading.get_ident())
+            return method(*args)
+        return call
+
+def _run(cache, compute, **scope):
+    async def main():
+        loop_thread = threading.get_ident()
+        first = await cache.get_or_compute("dashboard.stats", compute, ttl=60, **scope)
+        second = await cache.get_or_compute("dashboard.stats", compute, ttl=60, **scope)
+        return loop_thread, first, second
+    return asyncio.run(main())
+
+@pytest.mark.parametrize("make_backend", [
+    lambda tmp_path: SQLiteBackend(str(tmp_path / "cache.sqlite3"), 16),
+    lambda tmp_path: InProcessLRUBackend(16)
+], ids=["sqlite", "memory"])
+def test_blocking_backends_stay_off_the_event_loop(tmp_path, make_backend, session_factory):
+    backend = RecordingBackend(make_backend(tmp_path))
+    cache = ResponseCache(backend, session_factory=session_factory)
+    computed = []
+
+    loop_thread, first, second = _run(cache, lambda db: computed.append(1) or {"total": 3}, role="admin")
+    assert first == second == {"total": 3}
+    assert computed == [1]  # The second call was served from the cache
+    assert backend.threads
+    if backend.blocking:
+        assert loop_thread not in backend.threads
+    else:
+        assert set(backend.threads) == {loop_thread}
+
+def test_invalidation_from_the_event_loop(tmp_path, session_factory):
+    cache = ResponseCache(SQLiteBackend(str(tmp_path / "cache.sqlite3"), 16), session_factory=session_factory)
+    computed = []
+    _run(cache, lambda db: computed.append(1) or len(computed))
+
+    async def invalidate():
+        cache.invalidate("dashboard.")
+    asyncio.run(invalidate())
+    cache._invalidations.submit(lambda: None).result()  # Wait for the queued invalidation
+
+    _run(cache, lambda db: computed.append(1) or len(computed))
+    assert computed == [1, 1]
+
+@pytest.mark.parametrize("make_backend", [
+    lambda tmp_path: SQLiteBackend(str(tmp_path / "cache.sqlite3"), 16),
+    lambda tmp_path: InProcessLRUBackend(16)
+], ids=["sqlite", "memory"])
+def test_a_result_computed_across_an_invalidation_is_not_cached(tmp_path, make_backend, session_factory):
+    backend = make_backend(tmp_path)
+    cache = ResponseCache(backend, session_factory=session_factory)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(db):
+        started.set()
+        release.wait(5)
+        return "stale"
+
+    async def main():
+        pending = asyncio.ensure_future(cache.get_or_compute("dashboard.stats", slow, ttl=60))
+        await asyncio.to_thread(started.wait, 5)
+        backend.invalidate("dashboard.")  # An upload lands while the old data is being read
+        release.set()
+        assert await pending == "stale"  # The caller still gets its answer
+        return await cache.get_or_compute("dashboard.stats", lambda db: "fresh", ttl=60)
+
+    assert asyncio.run(main()) == "fresh"
+    assert backend.get(cache.make_key("dashboard.stats"))[0] == "fresh"
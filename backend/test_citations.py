@@ -0,0 +1,99 @@
+"""
+Tests for the incremental citation graph.
+
+    python -m pytest test_citations.py
+"""
+import pytest
+
+from app.core.citations import ImpactScoreRefresher, rebuild_citations, remove_citations, update_citations
+from app.models import Citation, CitationTitleToken, Document, DocumentImpact, DocumentStatus
+
+TITLES = {
+    "graphs": "Shortest Path Algorithms for Weighted Road Networks",
+    "trees": "Balanced Search Trees in External Memory",
+    "survey": "A Survey of Graph and Tree Data Structures",
+}
+REFERENCES = {
+    "graphs": ["Knuth, D. The Art of Computer Programming. Addison-Wesley, 1968."],
+    "trees": ["Ada, L. Shortest path algorithms for weighted road networks. Thesis, 2021."],
+    "survey": [
+        "Ada, L. Shortest path algorithms for weighted road networks. Thesis, 2021.",
+        "Grace, H. Balanced search trees in external memory. Journal of Storage, 2022.",
+    ],
+}
+
+def _text(name: str) -> str:
+    entries = REFERENCES[name] + ["Unrelated, A. Medieval poetry and its meter. Press, 1990."]
+    return "Body text.\n\nReferences\n" + "\n".join(f"[{i}] {entry}" for i, entry in enumerate(entries, start=1))
+
+@pytest.fixture()
+def documents(session_factory, people):
+    db = session_factory()
+    try:
+        ids = {}
+        for name, title in TITLES.items():
+            document = Document(title=title, status=DocumentStatus.APPROVED, uploader_id=people["student"],
+                                department_id=people["department"], file_path=f"{name}.pdf", file_size=1,
+                                extracted_text=_text(name))
+            db.add(document)
+            db.flush()
+            ids[name] = document.id
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+def edges(db):
+    return sorted(
+        (row.citing_document_id, row.position, row.cited_document_id)
+        for row in db.query(Citation)
+    )
+
+def test_incremental_approvals_match_rebuild(session_factory, documents):
+    db = session_factory()
+    try:
+        # "trees" cites "graphs" before it is indexed; the waiting reference resolves when "graphs" arrives
+        for name in ["survey", "trees", "graphs"]:
+            update_citations(db, [documents[name]])
+        incremental = edges(db)
+        cited = {(citing, cited) for citing, _, cited in incremental if cited}
+        assert cited == {
+            (documents["trees"], documents["graphs"]),
+            (documents["survey"], documents["graphs"]),
+            (documents["survey"], documents["trees"]),
+        }
+
+        rebuild_citations(db)
+        assert edges(db) == incremental
+    finally:
+        db.close()
+
+def test_withdrawn_document_leaves_the_graph(session_factory, documents):
+    db = session_factory()
+    try:
+        update_citations(db, list(documents.values()))
+        remove_citations(db, [documents["graphs"]])
+        db.commit()
+        assert db.query(Citation).filter(Citation.cited_document_id == documents["graphs"]).count() == 0
+        assert db.query(Citation).filter(Citation.citing_document_id == documents["graphs"]).count() == 0
+        assert db.query(CitationTitleToken).filter(CitationTitleToken.document_id == documents["graphs"]).count() == 0
+
+        # Approved again: the references that cited it resolve once more
+        update_citations(db, [documents["graphs"]])
+        assert db.query(Citation).filter(Citation.cited_document_id == documents["graphs"]).count() == 2
+    finally:
+        db.close()
+
+def test_impact_is_recomputed_only_when_stale(session_factory, documents):
+    refresher = ImpactScoreRefresher(session_factory)
+    assert not refresher.run_once()
+
+    refresher.mark_stale()
+    assert refresher.run_once()
+    assert not refresher.run_once()
+
+    db = session_factory()
+    try:
+        assert db.query(DocumentImpact).count() == len(documents)
+    finally:
+        db.close()
@@ -0,0 +1,66 @@
+"""
+Tests for the batched document counters.
+
+    python -m pytest test_counters.py
+"""
+import pytest
+
+from app.core.counters import DocumentCounters, reconcile_download_counts
+from app.models import Document, DocumentStatus, Download
+
+@pytest.fixture()
+def document_id(session_factory, people):
+    db = session_factory()
+    try:
+        document = Document(title="Graph Algorithms", status=DocumentStatus.APPROVED, uploader_id=people["student"],
+                            department_id=people["department"], file_path="missing.pdf", file_size=1024)
+        db.add(document)
+        db.commit()
+        return document.id
+    finally:
+        db.close()
+
+def download(session_factory, people, document_id, counters: DocumentCounters):
+    """What the download endpoint does: commit the event row, then count it"""
+    db = session_factory()
+    try:
+        db.add(Download(document_id=document_id, user_id=people["student"]))
+        db.commit()
+    finally:
+        db.close()
+    counters.record_download(document_id)
+
+def counts(session_factory, document_id):
+    db = session_factory()
+    try:
+        document = db.get(Document, document_id)
+        return document.download_count, document.view_count
+    finally:
+        db.close()
+
+def test_reconcile_before_another_workers_flush_does_not_double_count(session_factory, people, document_id):
+    worker_a, worker_b = DocumentCounters(session_factory), DocumentCounters(session_factory)
+    download(session_factory, people, document_id, worker_a)
+    download(session_factory, people, document_id, worker_b)
+
+    worker_a.flush()
+    db = session_factory()
+    try:
+        reconcile_download_counts(db)  # Already counts worker B's committed download
+    finally:
+        db.close()
+    worker_b.flush()
+
+    assert counts(session_factory, document_id)[0] == 2
+
+def test_views_are_added(session_factory, document_id):
+    worker_a, worker_b = DocumentCounters(session_factory), DocumentCounters(session_factory)
+    worker_a.record_view(document_id)
+    worker_a.record_view(document_id)
+    worker_b.record_view(document_id)
+    assert worker_a.pending(document_id) == {"download_count": 0, "view_count": 2}
+
+    assert worker_a.flush() == 1
+    assert worker_b.flush() == 1
+    assert worker_a.pending(document_id) == {"download_count": 0, "view_count": 0}
+    assert counts(session_factory, document_id) == (0, 3)
@@ -0,0 +1,154 @@
+"""
+Query-count regression test for /dashboard/stats.
+
+Runs the dashboard router against an in-memory SQLite database (see
+conftest.py) and asserts
+that every role is served with at most two SQL statements, and that a
+repeated request is answered from the response cache without any. Also
+checks how /dashboard/bootstrap handles panels past their budget.
+
+    python -m pytest test_dashboard_stats.py
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.core.counters import reconcile_download_counts
+from app.core.leaderboard import department_leaderboard
+from app.core.rollups import rebuild_rollups
+from app.api.v1.endpoints import dashboard
+from app.models import Department, Document, DocumentStatus, Download, Review, User, UserRole
+
+MAX_QUERIES = {"admin": 1, "supervisor": 1, "staff": 1, "student": 1}
+
+@pytest.fixture()
+def client_and_data(engine, session_factory, make_client, monkeypatch):
+    # The global leaderboard is refreshed from this test's data; restore it afterwards
+    for attribute in ("_entries", "_order", "refreshed_at", "_snapshot_day"):
+        monkeypatch.setattr(department_leaderboard, attribute, getattr(department_leaderboard, attribute))
+
+    db = session_factory()
+    cs = Department(name="Computer Science", faculty="Science")
+    physics = Department(name="Physics", faculty="Science")
+    db.add_all([cs, physics])
+    db.flush()
+
+    student = User(email="student@example.com", first_name="Ada", last_name="L", password="x",
+                   role=UserRole.STUDENT, department_id=cs.id)
+    supervisor = User(email="supervisor@example.com", first_name="Alan", last_name="T", password="x",
+                      role=UserRole.SUPERVISOR, department_id=cs.id)
+    staff = User(email="staff@example.com", first_name="Grace", last_name="H", password="x",
+                 role=UserRole.STAFF, department_id=physics.id, is_active=False)
+    db.add_all([student, supervisor, staff])
+    db.flush()
+
+    statuses = [DocumentStatus.SUBMITTED, DocumentStatus.SUBMITTED, DocumentStatus.APPROVED,
+                DocumentStatus.REJECTED, DocumentStatus.UNDER_REVIEW]
+    documents = [
+        Document(title=f"Thesis {i}", status=status, uploader_id=student.id, department_id=cs.id,
+                 supervisor_id=supervisor.id, file_size=1024 * 1024, upload_date=datetime.now() - timedelta(days=i * 3))
+        for i, status in enumerate(statuses)
+    ]
+    documents.append(Document(title="Optics", status=DocumentStatus.APPROVED, uploader_id=staff.id,
+                              department_id=physics.id, file_size=2 * 1024 * 1024,
+                              upload_date=datetime.now() - timedelta(days=30)))
+    db.add_all(documents)
+    db.flush()
+
+    db.add_all([Download(document_id=documents[2].id, user_id=staff.id) for _ in range(3)])
+    db.add(Download(document_id=documents[5].id, user_id=student.id))
+    db.add(Review(document_id=documents[2].id, reviewer_id=supervisor.id))
+    db.commit()
+    reconcile_download_counts(db)  # Download counts are read from documents.download_count
+    rebuild_rollups(db)
+    department_leaderboard.refresh(db)  # The admin department breakdown is read from the leaderboard
+    ids = {"student": student.id, "supervisor": supervisor.id, "staff": staff.id, "cs": cs.id, "physics": physics.id}
+    db.close()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return make_client((dashboard.router, "/dashboard")), statements, ids
+
+def _stats(client, statements, role, **params):
+    statements.clear()
+    response = client.get("/dashboard/stats", params={"role": role, **params})
+    assert response.status_code == 200, response.text
+    assert len(statements) <= MAX_QUERIES[role], statements
+    return response.json()
+
+def test_admin_stats(client_and_data):
+    client, statements, _ = client_and_data
+    stats = _stats(client, statements, "admin")
+    assert stats["total_users"] == 3
+    assert stats["active_users"] == 2
+    assert stats["total_documents"] == 6
+    assert stats["total_departments"] == 2
+    assert stats["pending_reviews"] == 2
+    assert stats["approved_documents"] == 2
+    assert stats["rejected_documents"] == 1
+    assert stats["under_review"] == 1
+    assert stats["total_downloads"] == 4
+    assert stats["recent_uploads"] == 3
+    assert stats["storage_used_mb"] == 7.0
+    assert sorted((d["name"], d["count"]) for d in stats["department_stats"]) == [("Computer Science", 5), ("Physics", 1)]
+
+def test_supervisor_stats(client_and_data):
+    client, statements, ids = client_and_data
+    stats = _stats(client, statements, "supervisor", user_id=ids["supervisor"], department_id=ids["cs"])
+    assert stats["assigned_reviews"] == 2
+    assert stats["completed_reviews"] == 1
+    assert stats["pending_documents"] == 2
+    assert stats["approved_documents"] == 1
+    assert stats["department_documents"] == 5
+    assert stats["recent_submissions"] == 3
+
+def test_staff_stats(client_and_data):
+    client, statements, ids = client_and_data
+    stats = _stats(client, statements, "staff", user_id=ids["staff"], department_id=ids["physics"])
+    assert stats["department_documents"] == 1
+    assert stats["approved_documents"] == 1
+    assert stats["your_uploads"] == 1
+    assert stats["recent_department_uploads"] == 0
+    assert stats["total_department_users"] == 1
+    assert stats["storage_used_department_mb"] == 2.0
+
+def test_student_stats(client_and_data):
+    client, statements, ids = client_and_data
+    stats = _stats(client, statements, "student", user_id=ids["student"])
+    assert stats["total_uploads"] == 5
+    assert stats["approved_uploads"] == 1
+    assert stats["rejected_uploads"] == 1
+    assert stats["pending_reviews"] == 2
+    assert stats["under_review"] == 1
+    assert stats["total_downloads"] == 3
+
+def test_cached_stats(client_and_data):
+    client, statements, ids = client_and_data
+    first = _stats(client, statements, "student", user_id=ids["student"])
+    statements.clear()
+    assert client.get("/dashboard/stats", params={"role": "student", "user_id": ids["student"]}).json() == first
+    assert statements == []
+    # Other users get their own entry
+    assert _stats(client, statements, "student", user_id=ids["staff"])["total_uploads"] == 1
+
+def test_bootstrap_cancels_queued_panels_past_the_budget(client_and_data, session_factory, monkeypatch):
+    client, _, _ = client_and_data
+    release, ran = threading.Event(), []
+    monkeypatch.setattr(dashboard, "SessionLocal", session_factory)
+    monkeypatch.setattr(dashboard, "_panel_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(dashboard, "compute_upload_trends", lambda *args: release.wait(5) and ran.append("upload_trends"))
+    monkeypatch.setattr(dashboard, "compute_status_distribution", lambda *args: ran.append("status_distribution"))
+
+    try:
+        body = client.get("/dashboard/bootstrap", params={"role": "admin", "budget_ms": 1500}).json()
+    finally:
+        release.set()
+    dashboard._panel_executor.shutdown(wait=True)
+
+    assert sorted(body["timed_out"]) == ["status_distribution", "upload_trends"]
+    assert body["panels"]["recent_activity"] == []
+    assert body["panels"]["stats"]["total_documents"] == 6
+    assert ran == ["upload_trends"]  # Still queued behind it when the budget ran out, so never started
@@ -0,0 +1,39 @@
+"""
+Tests for post-upload document processing.
+
+    python -m pytest test_document_processing.py
+"""
+import inspect
+
+from app.core import document_processing, near_duplicates
+from app.core.document_processing import process_uploaded_document
+from app.core.near_duplicates import LSHIndex
+from app.models import Document, DocumentStatus
+
+def test_processing_runs_in_the_threadpool():
+    # BackgroundTasks runs plain functions in the threadpool and coroutines on the event loop
+    assert not inspect.iscoroutinefunction(process_uploaded_document)
+
+def test_process_uploaded_document(session_factory, people, tmp_path, monkeypatch):
+    indexed = []
+    monkeypatch.setattr(document_processing.search_index, "add_documents", indexed.extend)
+    monkeypatch.setattr(near_duplicates, "lsh_index", LSHIndex())
+    path = tmp_path / "thesis.txt"
+    path.write_text("Distributed consensus protocols for replicated state machines")
+
+    db = session_factory()
+    document = Document(title="Consensus", status=DocumentStatus.SUBMITTED, uploader_id=people["student"],
+                        department_id=people["department"], file_path=str(path), file_size=path.stat().st_size)
+    db.add(document)
+    db.commit()
+    document_id = document.id
+    db.close()
+
+    process_uploaded_document(document_id)
+
+    db = session_factory()
+    try:
+        assert db.get(Document, document_id).extracted_text.startswith("Distributed consensus")
+    finally:
+        db.close()
+    assert [entry[0] for entry in indexed] == [document_id]
@@ -0,0 +1,62 @@
+"""
+Tests for the document update endpoint.
+
+    python -m pytest test_documents.py
+"""
+import pytest
+
+from app.api.v1.endpoints import documents
+from app.core.citations import impact_scores
+from app.core.counters import document_counters
+from app.models import Department, Document, DocumentImpact, DocumentStatus, User, UserRole
+
+@pytest.fixture()
+def client_and_document(session_factory, make_client, monkeypatch):
+    monkeypatch.setattr(document_counters, "_pending", {})
+
+    db = session_factory()
+    department = Department(name="Computer Science", faculty="Science")
+    db.add(department)
+    db.flush()
+    student = User(email="student@example.com", first_name="Ada", last_name="L", password="x",
+                   role=UserRole.STUDENT, department_id=department.id)
+    db.add(student)
+    db.flush()
+    document = Document(title="Graph Algorithms", status=DocumentStatus.SUBMITTED, uploader_id=student.id,
+                        department_id=department.id, file_path="missing.pdf", file_size=1024, download_count=2)
+    db.add(document)
+    db.commit()
+    document_id = document.id
+    db.close()
+    return make_client((documents.router, "/documents")), document_id
+
+def test_update_document(client_and_document, session_factory, monkeypatch):
+    monkeypatch.setattr(impact_scores, "session_factory", session_factory)
+    client, document_id = client_and_document
+    document_counters.record_view(document_id)
+
+    response = client.put(f"/documents/{document_id}", json={"status": "approved", "title": "Graph Algorithms II"})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "approved"
+    assert body["title"] == "Graph Algorithms II"
+    assert body["download_count"] == 2
+    assert body["view_count"] == 1  # Includes the increment not yet flushed
+
+    db = session_factory()
+    try:
+        assert db.get(Document, document_id).status == DocumentStatus.APPROVED
+    finally:
+        db.close()
+
+    # The approval's background tasks ran after the response and left the impact scores to the refresher
+    assert impact_scores.run_once()
+    db = session_factory()
+    try:
+        assert db.query(DocumentImpact).filter(DocumentImpact.document_id == document_id).count() == 1
+    finally:
+        db.close()
+
+def test_update_missing_document(client_and_document):
+    client, _ = client_and_document
+    assert client.put("/documents/nope", json={"title": "x"}).status_code == 404
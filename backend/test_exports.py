@@ -0,0 +1,68 @@
+"""
+Tests for the streaming table exports: CSV, NDJSON and gzip output.
+
+    python -m pytest test_exports.py
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core.exports import EXPORT_TABLES, stream_export
+from app.models import Document, DocumentStatus
+
+@pytest.fixture()
+def documents(session_factory, people):
+    db = session_factory()
+    try:
+        rows = [
+            Document(title='Graphs, "trees" and paths', status=DocumentStatus.APPROVED, uploader_id=people["student"],
+                     department_id=people["department"], file_path=None, file_size=2048,
+                     upload_date=datetime(2026, 3, 2, 9, 30)),
+            Document(title="Notes", status=DocumentStatus.UNDER_REVIEW, uploader_id=people["student"],
+                     department_id=people["department"], supervisor_id=people["supervisor"], file_path=None,
+                     file_size=None, upload_date=datetime(2026, 3, 1, 8, 0)),
+            Document(title="Late", status=DocumentStatus.SUBMITTED, uploader_id=people["student"],
+                     department_id=people["department"], file_path=None, file_size=1,
+                     upload_date=datetime(2026, 4, 1)),
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+def _export(session_factory, format, compress=False):
+    return list(stream_export("documents", format, compress=compress, until=datetime(2026, 3, 31),
+                              session_factory=session_factory, batch_size=1))
+
+def test_csv_has_a_header_and_one_row_per_document(session_factory, documents):
+    chunks = _export(session_factory, "csv")
+    assert len(chunks) == 3  # The header, then one chunk per batch
+
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert rows[0] == list(EXPORT_TABLES["documents"].columns)
+    assert [row[1] for row in rows[1:]] == ["Notes", 'Graphs, "trees" and paths']  # By upload date; April is excluded
+    notes = dict(zip(rows[0], rows[1]))
+    assert notes["status"] == "under_review"
+    assert notes["file_size"] == "" and notes["overlap_score"] == ""
+    assert notes["upload_date"] == "2026-03-01T08:00:00"
+
+def test_ndjson_encodes_enums_and_datetimes(session_factory, documents, people):
+    lines = b"".join(_export(session_factory, "ndjson")).decode("utf-8").splitlines()
+    records = [json.loads(line) for line in lines]
+    assert records[1] == {
+        "document_id": documents[0], "title": 'Graphs, "trees" and paths', "status": "approved",
+        "uploader_id": people["student"], "department_id": people["department"], "supervisor_id": None,
+        "file_size": 2048, "overlap_score": None, "upload_date": "2026-03-02T09:30:00",
+    }
+    assert records[0]["status"] == "under_review" and records[0]["supervisor_id"] == people["supervisor"]
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_gzip_output_decompresses_to_the_plain_stream(session_factory, documents, format):
+    compressed = b"".join(_export(session_factory, format, compress=True))
+    assert compressed[:2] == b"\x1f\x8b"
+    assert gzip.decompress(compressed) == b"".join(_export(session_factory, format))
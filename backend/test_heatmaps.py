@@ -0,0 +1,94 @@
+"""
+Tests for the day-of-week by hour-of-day usage heatmaps.
+
+    python -m pytest test_heatmaps.py
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.core.heatmaps import heatmap_window, usage_heatmap, weekly_slots
+from app.models import Department, Document, DocumentStatus, Download, User
+
+MONDAY = datetime(2026, 3, 2)
+
+def test_weekly_slots_of_known_timestamps():
+    timestamps = np.array([
+        "1970-01-01T00:00",  # A Thursday
+        "2026-03-02T00:00",  # Monday midnight
+        "2026-03-02T23:59",
+        "2026-03-04T13:30",  # Wednesday afternoon
+        "2026-03-08T23:00",  # Sunday night
+        "2026-03-09T00:00",  # The next Monday
+        "1969-12-31T22:00",  # Before the epoch: a Wednesday
+    ], dtype="datetime64[m]")
+    assert weekly_slots(timestamps).tolist() == [3 * 24, 0, 23, 2 * 24 + 13, 6 * 24 + 23, 0, 2 * 24 + 22]
+
+def test_heatmap_window_covers_whole_days():
+    assert heatmap_window(7, now=datetime(2026, 3, 8, 15, 45)) == (MONDAY, datetime(2026, 3, 9))
+
+@pytest.fixture()
+def downloads(session_factory, people):
+    """Downloads of documents from two departments by one reader"""
+    db = session_factory()
+    try:
+        maths = Department(name="Mathematics", faculty="Science")
+        db.add(maths)
+        db.flush()
+        reader = User(email="reader@example.com", first_name="R", last_name="R", password="x",
+                      department_id=people["department"])
+        documents = {
+            department_id: Document(title="Notes", status=DocumentStatus.APPROVED, uploader_id=people["student"],
+                                    department_id=department_id, file_path=None, file_size=1)
+            for department_id in (people["department"], maths.id)
+        }
+        db.add(reader)
+        db.add_all(documents.values())
+        db.flush()
+        for department_id, offsets in [
+            (people["department"], [timedelta(hours=9), timedelta(hours=9, minutes=30), timedelta(days=6, hours=23, minutes=30)]),
+            (maths.id, [timedelta(hours=9, minutes=5), timedelta(days=2, hours=14), timedelta(days=7)]),
+        ]:
+            for offset in offsets:
+                db.add(Download(document_id=documents[department_id].id, user_id=reader.id,
+                                download_timestamp=MONDAY + offset))
+        db.commit()
+        return {"computing": people["department"], "maths": maths.id}
+    finally:
+        db.close()
+
+def _matrix(heatmap) -> np.ndarray:
+    return np.array(heatmap["matrix"])
+
+def test_department_matrices_sum_to_the_overall_matrix(session_factory, downloads):
+    db = session_factory()
+    try:
+        heatmap = usage_heatmap(db, "downloads", MONDAY, MONDAY + timedelta(days=7), batch_size=2)
+    finally:
+        db.close()
+
+    assert heatmap["total"] == 5  # The download on the next Monday is outside the window
+    assert sum(_matrix(entry) for entry in heatmap["departments"]).tolist() == heatmap["matrix"]
+    assert heatmap["peak"] == {"day": "Mon", "hour": 9, "count": 3}
+    computing, maths = sorted(heatmap["departments"], key=lambda entry: entry["name"] != "Computer Science")
+    assert (computing["total"], maths["total"]) == (3, 2)
+    assert computing["matrix"][6][23] == 1 and maths["matrix"][2][14] == 1
+
+def test_utc_offset_moves_events_across_midnight(session_factory, downloads):
+    db = session_factory()
+    try:
+        ahead = usage_heatmap(db, "downloads", MONDAY, MONDAY + timedelta(days=7), utc_offset_minutes=60)
+        behind = usage_heatmap(db, "downloads", MONDAY, MONDAY + timedelta(days=7), utc_offset_minutes=-600,
+                               department_id=downloads["computing"])
+        with pytest.raises(ValueError):
+            usage_heatmap(db, "uploads", MONDAY, MONDAY + timedelta(days=7))
+    finally:
+        db.close()
+
+    # Sunday 23:30 UTC is Monday 00:30 an hour ahead
+    assert _matrix(ahead)[6].sum() == 0 and ahead["matrix"][0][0] == 1
+    assert ahead["matrix"][0][10] == 3
+    # Monday morning UTC is still Sunday evening ten hours behind
+    assert behind["total"] == 3 and len(behind["departments"]) == 1
+    assert behind["matrix"][6][23] == 2 and behind["matrix"][6][13] == 1
@@ -0,0 +1,47 @@
+"""
+Tests for the HyperLogLog sketch: estimate error, merging and the stored form.
+
+    python -m pytest test_hyperloglog.py
+"""
+import pytest
+
+from app.core.hyperloglog import DEFAULT_PRECISION, HyperLogLog
+
+def _sketch(start: int, stop: int) -> HyperLogLog:
+    sketch = HyperLogLog()
+    sketch.add_many(f"user-{n}" for n in range(start, stop))
+    return sketch
+
+@pytest.mark.parametrize("count", [1000, 100000])
+def test_estimate_is_within_a_few_standard_errors(count):
+    sketch = _sketch(0, count)
+    sketch.add_many(f"user-{n}" for n in range(0, count, 3))  # Repeats do not count
+    assert abs(sketch.estimate() - count) / count < 0.03  # Standard error is about 0.8%
+    assert HyperLogLog().estimate() == 0
+
+def test_merge_and_union_match_a_sketch_of_every_item():
+    monday, tuesday, wednesday = _sketch(0, 600), _sketch(400, 1200), _sketch(1000, 1500)
+    everything = _sketch(0, 1500)
+
+    union = HyperLogLog.union([monday, tuesday, wednesday])
+    assert (union.registers == everything.registers).all()
+    assert (monday.registers == _sketch(0, 600).registers).all()  # Inputs are left alone
+    assert HyperLogLog.union([]).estimate() == 0
+
+    merged = monday.merge(tuesday).merge(wednesday)
+    assert (merged.registers == everything.registers).all()
+    with pytest.raises(ValueError):
+        merged.merge(HyperLogLog(precision=10))
+
+def test_stored_registers_are_fixed_size():
+    sparse, dense = _sketch(0, 3), _sketch(0, 50000)
+    assert len(sparse.to_bytes()) == len(dense.to_bytes()) == 1 << DEFAULT_PRECISION
+
+    restored = HyperLogLog.from_bytes(dense.to_bytes())
+    assert (restored.registers == dense.registers).all()
+    restored.add("someone-new")  # A writable copy, not a view of the stored bytes
+
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(dense.to_bytes()[:-1])
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(dense.to_bytes(), precision=12)
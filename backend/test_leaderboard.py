@@ -0,0 +1,82 @@
+"""
+Tests for the department leaderboard: decayed scores, ranks and daily snapshots.
+
+    python -m pytest test_leaderboard.py
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.core import leaderboard
+from app.core.leaderboard import DepartmentLeaderboard
+from app.models import DailyActivityRollup, Department, DepartmentRankSnapshot
+
+TODAY = date(2026, 3, 31)
+
+@pytest.fixture()
+def departments(session_factory, monkeypatch):
+    monkeypatch.setattr(leaderboard.settings, "LEADERBOARD_HALF_LIFE_DAYS", 10.0)
+    db = session_factory()
+    try:
+        rows = {name: Department(name=name, faculty="Science") for name in ["Biology", "Chemistry", "Physics", "Geology"]}
+        db.add_all(rows.values())
+        db.flush()
+        ids = {name: department.id for name, department in rows.items()}
+        for name, age, uploads, approvals, downloads in [
+            ("Biology", 0, 4, 0, 0),        # 4 today
+            ("Chemistry", 10, 8, 0, 0),     # 8 one half-life ago: also 4
+            ("Physics", 20, 0, 4, 40),      # (8 + 4) two half-lives ago: 3
+            ("Physics", 400, 100, 0, 0),    # Beyond the horizon: totals only
+        ]:
+            db.add(DailyActivityRollup(day=TODAY - timedelta(days=age), department_id=ids[name],
+                                       uploads=uploads, approvals=approvals, downloads=downloads))
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+def test_refresh_decays_each_day_by_its_age(session_factory, departments):
+    board = DepartmentLeaderboard(session_factory)
+    db = session_factory()
+    try:
+        board.refresh(db, today=TODAY)
+    finally:
+        db.close()
+
+    scores = {entry["name"]: entry["score"] for entry in board.top(10)}
+    assert scores == {"Biology": 4.0, "Chemistry": 4.0, "Physics": 3.0, "Geology": 0.0}
+    physics = board.entry(departments["Physics"])
+    assert (physics["uploads"], physics["approvals"], physics["downloads"]) == (100, 4, 40)
+
+def test_tied_departments_share_a_rank(session_factory, departments):
+    board = DepartmentLeaderboard(session_factory)
+    db = session_factory()
+    try:
+        board.refresh(db, today=TODAY)
+    finally:
+        db.close()
+
+    assert board.rank(departments["Biology"]) == board.rank(departments["Chemistry"]) == 1
+    assert board.rank(departments["Physics"]) == 3
+    assert board.rank(departments["Geology"]) == 4
+    assert board.rank("no-such-department") is None
+    assert [entry["rank"] for entry in board.top(3)] == [1, 1, 3]
+    assert len(board) == 4
+
+def test_snapshot_records_each_day_once(session_factory, departments):
+    first, second = DepartmentLeaderboard(session_factory), DepartmentLeaderboard(session_factory)
+    db = session_factory()
+    try:
+        for board in (first, second):
+            board.refresh(db, today=TODAY)
+        assert first.snapshot(db, TODAY) == 4
+        assert first.snapshot(db, TODAY) == 0
+        assert second.snapshot(db, TODAY) == 0  # Another worker already recorded the day
+        assert second.snapshot(db, TODAY + timedelta(days=1)) == 4
+
+        recorded = db.query(DepartmentRankSnapshot.day, DepartmentRankSnapshot.department_id,
+                            DepartmentRankSnapshot.rank).all()
+        assert len(recorded) == 8
+        assert (TODAY, departments["Physics"], 3) in recorded
+    finally:
+        db.close()
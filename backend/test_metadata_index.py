@@ -0,0 +1,52 @@
+"""
+Tests for the normalised keyword/author tables.
+
+    python -m pytest test_metadata_index.py
+"""
+from app.core import metadata_index
+from app.core.metadata_index import sync_metadata_terms
+from app.models import Document, DocumentStatus, Keyword, Metadata, document_keywords
+
+def _metadata(db, people, keywords):
+    document = Document(title="Graph Algorithms", status=DocumentStatus.SUBMITTED, uploader_id=people["student"],
+                        department_id=people["department"], file_path="missing.pdf", file_size=1)
+    db.add(document)
+    db.flush()
+    metadata = Metadata(document_id=document.id, keywords=keywords, authors="Ada Lovelace", publication_year=2024)
+    db.add(metadata)
+    db.flush()
+    return metadata
+
+def test_sync_links_terms(session_factory, people):
+    db = session_factory()
+    metadata = _metadata(db, people, "Graphs, Trees; graphs")
+    sync_metadata_terms(db, [metadata])
+    db.commit()
+    assert sorted(name for (name,) in db.query(Keyword.normalized_name)) == ["graphs", "trees"]
+    assert len(db.execute(document_keywords.select()).all()) == 2
+    db.close()
+
+def test_concurrently_inserted_terms(session_factory, people, monkeypatch):
+    db = session_factory()
+    db.add(Keyword(name="Graphs", normalized_name="graphs"))  # Committed by "another request"
+    db.commit()
+
+    # This request's first read predates that commit
+    select_term_ids = metadata_index._select_term_ids
+    calls = []
+
+    def stale_first_read(db, model, names, lock=False):
+        calls.append(lock)
+        return {} if len(calls) == 1 else select_term_ids(db, model, names, lock)
+    monkeypatch.setattr(metadata_index, "_select_term_ids", stale_first_read)
+
+    metadata = _metadata(db, people, "Graphs, Trees")
+    sync_metadata_terms(db, [metadata])
+    db.commit()
+
+    keywords = dict(db.query(Keyword.normalized_name, Keyword.id))
+    assert sorted(keywords) == ["graphs", "trees"]  # The term that did not conflict was still inserted
+    linked = {row.keyword_id for row in db.execute(document_keywords.select())}
+    assert linked == set(keywords.values())
+    assert True in calls  # The conflicting term was re-read with a locking read
+    db.close()
@@ -0,0 +1,81 @@
+"""
+Tests for the request metrics: histogram percentiles, the slot ring and the middleware.
+
+    python -m pytest test_metrics.py
+"""
+import random
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app.core import metrics as metrics_module
+from app.core.metrics import SLOT_COUNT, SLOT_SECONDS, UNMATCHED_ROUTE, LogHistogram, MetricsMiddleware, MetricsRegistry, RouteMetrics
+
+def test_percentiles_are_bucket_upper_bounds_within_the_growth_factor():
+    values = sorted(random.Random(7).lognormvariate(-3, 1.5) for _ in range(10000))
+    histogram = LogHistogram()
+    for value in values:
+        histogram.record(value)
+
+    for q in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * q / 100) - 1]
+        estimate = histogram.percentile(q)
+        assert exact <= estimate <= exact * histogram.growth * 1.0001
+    assert histogram.percentile(100) == histogram.max == values[-1]
+    assert LogHistogram().percentile(50) == 0.0
+
+    tiny, huge = LogHistogram(), LogHistogram()
+    tiny.record(1e-9)  # Below min_value: bucket 0
+    huge.record(1e6)  # Above max_value: the last bucket, reported as the maximum seen
+    assert tiny.counts[0] == 1 and tiny.percentile(50) == 1e-9
+    assert huge.counts[-1] == 1 and huge.percentile(50) == 1e6
+
+def test_slots_leaving_the_ring_are_folded_into_the_totals():
+    route = RouteMetrics()
+    route.record(10, 200, 0.1, 0.01, 100)
+    route.record(10, 500, 0.2, 0.02, 50)
+    route.record(10 + SLOT_COUNT, 200, 0.3, 0.0, 10)  # Same ring position an hour later
+
+    assert route.evicted.statuses == {200: 1, 500: 1} and route.evicted.bytes_sent == 150
+    assert route.window(10 + SLOT_COUNT, 5).latency.count == 1
+
+    totals = route.totals()
+    assert totals.latency.count == 3
+    assert totals.statuses == {200: 2, 500: 1}
+    assert totals.bytes_sent == 160
+    assert round(totals.db_time.sum, 6) == 0.03
+
+def test_middleware_records_status_and_bytes_per_route(monkeypatch):
+    monkeypatch.setattr(metrics_module.time, "time", lambda: 100 * SLOT_SECONDS)
+    registry = MetricsRegistry()
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404, detail="missing")
+        return PlainTextResponse("x" * item_id)
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    client = TestClient(app, raise_server_exceptions=False)
+    assert client.get("/items/5").status_code == 200
+    assert client.get("/items/7").status_code == 200
+    assert client.get("/items/0").status_code == 404
+    assert client.get("/nowhere").status_code == 404
+    assert client.get("/boom").status_code == 500
+
+    items = registry.routes["GET /items/{item_id}"].totals()
+    assert items.statuses == {200: 2, 404: 1}
+    assert items.bytes_sent == 5 + 7 + len(b'{"detail":"missing"}')
+    assert registry.routes[UNMATCHED_ROUTE].totals().statuses == {404: 1}
+    assert registry.routes["GET /boom"].totals().statuses == {500: 1}
+
+    summary = registry.summary(300)
+    assert summary["overall"]["requests"] == 5
+    assert summary["overall"]["error_rate"] == 20.0
+    assert summary["in_flight"] == 0 and summary["peak_in_flight"] == 1
@@ -0,0 +1,99 @@
+"""
+Tests for merging and compacting the per-worker metrics snapshots.
+
+    python -m pytest test_metrics_export.py
+"""
+import json
+import os
+import threading
+
+import pytest
+
+from app.core import metrics_export
+from app.core.metrics import MetricsRegistry
+from app.core.metrics_export import TOTALS_FILE, MultiprocessCollector, collect_snapshot, render
+
+def _registry(jobs: float, depth: float = 0) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.describe("jobs_total", "counter", "Jobs run")
+    registry.describe("queue_depth", "gauge", "Jobs waiting")
+    registry.describe("job_seconds", "histogram", "Job duration")
+    registry.increment("jobs_total", jobs, kind="export")
+    registry.set_gauge("queue_depth", depth)
+    registry.observe("job_seconds", 0.2)
+    return registry
+
+def _exited_worker(directory, pid: int, jobs: float, instance: str):
+    snapshot = collect_snapshot(_registry(jobs, depth=7))
+    snapshot.update(pid=pid, instance=instance)
+    directory.mkdir(exist_ok=True)
+    (directory / f"{pid}.json").write_text(json.dumps(snapshot))
+
+@pytest.fixture(autouse=True)
+def only_this_process_is_alive(monkeypatch):
+    monkeypatch.setattr(metrics_export, "_pid_alive", lambda pid: pid == os.getpid())
+
+def test_exited_workers_are_folded_into_the_totals(tmp_path):
+    directory = tmp_path / "metrics"
+    _exited_worker(directory, 999901, 3, "a")
+    _exited_worker(directory, 999902, 2, "b")
+    collector = MultiprocessCollector(str(directory), _registry(1))
+
+    before = render(collector.read_all())
+    assert 'jobs_total{kind="export"} 6' in before
+    assert "queue_depth 0" in before  # Gauges of exited workers are not reported
+    assert 'job_seconds_count 3' in before
+
+    assert collector.compact() == 2
+    assert sorted(path.name for path in directory.glob("*.json")) == sorted([TOTALS_FILE, f"{os.getpid()}.json"])
+    assert render(collector.read_all()) == before
+    assert collector.compact() == 0
+
+def test_a_reused_pid_folds_the_earlier_snapshot(tmp_path):
+    directory = tmp_path / "metrics"
+    _exited_worker(directory, os.getpid(), 3, "earlier-process")
+    collector = MultiprocessCollector(str(directory), _registry(1))
+
+    output = render(collector.read_all())
+    assert 'jobs_total{kind="export"} 4' in output
+    assert json.loads((directory / TOTALS_FILE).read_text())["folded"] == ["earlier-process"]
+
+    # Later writes are this process's own and are not folded again
+    collector.write()
+    assert 'jobs_total{kind="export"} 4' in render(collector.read_all())
+
+def test_a_snapshot_folded_before_it_was_deleted_is_not_counted_twice(tmp_path):
+    directory = tmp_path / "metrics"
+    _exited_worker(directory, 999901, 3, "a")
+    collector = MultiprocessCollector(str(directory), _registry(1))
+    collector.compact()
+    _exited_worker(directory, 999901, 3, "a")  # As if the delete had not happened
+
+    assert 'jobs_total{kind="export"} 4' in render(collector.read_all())
+    assert collector.compact() == 1
+    assert 'jobs_total{kind="export"} 4' in render(collector.read_all())
+
+def test_request_totals_never_run_backwards_while_requests_are_recorded(monkeypatch):
+    registry = MetricsRegistry()
+    clock = [0.0]
+    monkeypatch.setattr(metrics_export.time, "time", lambda: clock[0])
+    stop = threading.Event()
+
+    def record():
+        status = 200
+        while not stop.is_set():
+            clock[0] += 7  # Slots are evicted every few requests
+            status = 200 + (status - 199) % 300  # And new status codes keep appearing
+            registry.record_request("GET /x", status, 0.01, 0.0)
+
+    writer = threading.Thread(target=record)
+    writer.start()
+    try:
+        last = 0
+        for _ in range(200):
+            total = sum(value for name, _, value in collect_snapshot(registry)["samples"] if name == "http_requests_total")
+            assert total >= last
+            last = total
+    finally:
+        stop.set()
+        writer.join()
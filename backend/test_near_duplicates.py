@@ -0,0 +1,98 @@
+"""
+Tests for near-duplicate detection across worker processes, each simulated by
+its own ``LSHIndex`` over the shared test database.
+
+    python -m pytest test_near_duplicates.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app.core import near_duplicates
+from app.core.near_duplicates import LSHIndex, check_near_duplicates, record_signature_deleted
+from app.models import Document, DocumentOverlap, DocumentSignature, DocumentSignatureTombstone, DocumentStatus
+
+TEXT = " ".join(f"word{i}" for i in range(400))
+OTHER_TEXT = " ".join(f"other{i}" for i in range(400))
+
+@pytest.fixture()
+def workers(monkeypatch):
+    first, second = LSHIndex(), LSHIndex()
+
+    def use(index):
+        monkeypatch.setattr(near_duplicates, "lsh_index", index)
+    return first, second, use
+
+def _document(db, people, title):
+    document = Document(title=title, status=DocumentStatus.SUBMITTED, uploader_id=people["student"],
+                        department_id=people["department"], file_path=f"{title}.txt", file_size=1)
+    db.add(document)
+    db.flush()
+    return document
+
+def test_updated_signatures_reach_other_workers(session_factory, people, workers):
+    first, second, use = workers
+    db = session_factory()
+    original = _document(db, people, "original")
+    use(first)
+    check_near_duplicates(db, original, OTHER_TEXT)
+    hour_ago = datetime.now() - timedelta(hours=1)
+    db.query(DocumentSignature).update({"created_at": hour_ago, "updated_at": hour_ago})
+    db.commit()
+    second.refresh(db)
+
+    # The first worker re-processes the document with different text
+    check_near_duplicates(db, original, TEXT)
+    db.commit()
+
+    use(second)
+    copy = _document(db, people, "copy")
+    assert [match[0] for match in check_near_duplicates(db, copy, TEXT)] == [original.id]
+    db.close()
+
+def test_deleted_documents_leave_other_workers(session_factory, people, workers):
+    first, second, use = workers
+    db = session_factory()
+    original = _document(db, people, "original")
+    use(first)
+    check_near_duplicates(db, original, TEXT)
+    db.commit()
+    second.refresh(db)
+    assert original.id in second.signatures
+
+    # Deleted by the first worker: the tombstone removes it from the second worker's index
+    expired = DocumentSignatureTombstone(document_id="long-gone",
+                                         deleted_at=db.query(func.now()).scalar() - timedelta(days=31))
+    db.add(expired)
+    db.commit()
+    record_signature_deleted(db, original.id)
+    db.delete(original)
+    db.commit()
+    second.refresh(db)
+    assert original.id not in second.signatures
+    assert [row.document_id for row in db.query(DocumentSignatureTombstone)] == [original.id]  # Expired one pruned
+    db.close()
+
+def test_matches_of_deleted_documents_are_skipped(session_factory, people, workers):
+    first, second, use = workers
+    db = session_factory()
+    original = _document(db, people, "original")
+    use(first)
+    check_near_duplicates(db, original, TEXT)
+    db.commit()
+    second.refresh(db)
+
+    # Deleted without a tombstone the second worker has seen yet
+    original_id = original.id
+    db.delete(original)
+    db.commit()
+
+    use(second)
+    copy = _document(db, people, "copy")
+    assert check_near_duplicates(db, copy, TEXT) == []
+    db.commit()  # No overlap row referencing the deleted document
+    assert db.query(DocumentOverlap).count() == 0
+    assert copy.overlap_score == 0.0
+    assert original_id not in second.signatures
+    db.close()
@@ -0,0 +1,139 @@
+"""
+Tests for the co-download recommendations: pair counting, incremental updates and the fallback.
+
+    python -m pytest test_recommendations.py
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.core import recommendations
+from app.core.recommendations import _chunk_deltas, pair_codes, recommend_for_user, update_recommendations
+from app.models import CoDownload, Department, Document, DocumentRecommendation, DocumentStatus, Download, User
+
+T0 = datetime(2026, 3, 2, 9, 0)
+
+def _at(minutes: int) -> datetime:
+    return T0 + timedelta(minutes=minutes)
+
+def test_pair_codes_cover_each_users_most_recent_history(monkeypatch):
+    monkeypatch.setattr(recommendations, "MAX_USER_HISTORY", 2)
+    slots = np.array([0, 1, 2, 0, 4])  # Three documents; the last entry is document 1 of department 1
+    users = np.array([0, 0, 0, 1, 1])
+    recency = np.array([1.0, 3.0, 2.0, 5.0, 5.0])
+
+    codes = pair_codes(slots, users, recency, 3)
+    # User 0 keeps documents 1 and 2 (document 0 is the oldest); user 1 pairs slots 0 and 4
+    assert sorted(codes.tolist()) == sorted([1 * 3 + 1, 1 * 3 + 2, 2 * 3 + 1, 2 * 3 + 2,
+                                             0 * 3 + 0, 0 * 3 + 1, 4 * 3 + 0, 4 * 3 + 1])
+
+def test_chunk_deltas_are_the_difference_between_histories(monkeypatch):
+    monkeypatch.setattr(recommendations, "MAX_USER_HISTORY", 2)
+    rows = [
+        # Read x and y before the checkpoint, then z after it: x leaves the capped history
+        ("u1", "d", "x", _at(0), _at(0)),
+        ("u1", "d", "y", _at(1), _at(1)),
+        ("u1", "d", "z", None, _at(10)),
+        # Re-read x: its recency changes but its pairs do not
+        ("u2", "d", "x", _at(2), _at(11)),
+        ("u2", "d", "y", _at(3), _at(3)),
+    ]
+    assert _chunk_deltas(rows) == {
+        ("d", "x", "x"): -1, ("d", "x", "y"): -1, ("d", "y", "x"): -1,
+        ("d", "z", "z"): 1, ("d", "y", "z"): 1, ("d", "z", "y"): 1,
+    }
+    # A first run has no before column: every pair is new
+    assert _chunk_deltas([("u1", "d", "x", None, _at(0)), ("u1", "d", "y", None, _at(1))]) == {
+        ("d", "x", "x"): 1, ("d", "x", "y"): 1, ("d", "y", "x"): 1, ("d", "y", "y"): 1,
+    }
+
+@pytest.fixture()
+def library(session_factory, people):
+    """Five approved documents, a draft, readers in the students' department and one elsewhere"""
+    db = session_factory()
+    try:
+        other = Department(name="History", faculty="Arts")
+        db.add(other)
+        db.flush()
+        readers = {}
+        for name, department_id in [("r1", people["department"]), ("r2", people["department"]),
+                                    ("r3", people["department"]), ("outsider", other.id)]:
+            readers[name] = User(email=f"{name}@example.com", first_name=name, last_name="R", password="x",
+                                 department_id=department_id)
+        db.add_all(readers.values())
+        documents = {}
+        for name, downloads in [("a", 5), ("b", 9), ("c", 2), ("d", 7), ("e", 0), ("draft", 50)]:
+            documents[name] = Document(
+                title=name, status=DocumentStatus.SUBMITTED if name == "draft" else DocumentStatus.APPROVED,
+                uploader_id=people["student"], department_id=people["department"], file_path=None, file_size=1,
+                download_count=downloads
+            )
+        db.add_all(documents.values())
+        db.commit()
+        return {name: row.id for name, row in {**readers, **documents}.items()}
+    finally:
+        db.close()
+
+def _download(db, ids, reader, document, minutes):
+    db.add(Download(user_id=ids[reader], document_id=ids[document], download_timestamp=_at(minutes)))
+
+def _state(db):
+    counts = {
+        (row.department_id, row.document_id, row.other_document_id): row.count for row in db.query(CoDownload)
+    }
+    lists = {
+        (row.department_id, row.document_id, row.rank): (row.recommended_document_id, round(row.score, 9))
+        for row in db.query(DocumentRecommendation)
+    }
+    return counts, lists
+
+def test_incremental_runs_match_a_full_rebuild(session_factory, library, people, monkeypatch):
+    monkeypatch.setattr(recommendations, "MAX_USER_HISTORY", 2)
+    monkeypatch.setattr(recommendations, "COMMIT_LAG", timedelta(0))
+    db = session_factory()
+    try:
+        for reader, document, minutes in [("r1", "a", 0), ("r1", "b", 1), ("r2", "b", 2), ("r2", "c", 3),
+                                          ("outsider", "a", 4), ("outsider", "b", 5)]:
+            _download(db, library, reader, document, minutes)
+        db.commit()
+        assert update_recommendations(db)["users"] == 3
+
+        # r1 reads c (pushing a out of a two-document history), r3 reads everything, r2 re-reads b
+        for reader, document, minutes in [("r1", "c", 10), ("r3", "a", 11), ("r3", "b", 12),
+                                          ("r3", "c", 13), ("r2", "b", 14)]:
+            _download(db, library, reader, document, minutes)
+        db.commit()
+        assert update_recommendations(db)["users"] == 3
+        assert update_recommendations(db) == {"users": 0, "pairs": 0, "recommendations": 0}
+        incremental = _state(db)
+
+        update_recommendations(db, full=True)
+        assert _state(db) == incremental
+    finally:
+        db.close()
+
+    counts, department = incremental[0], people["department"]
+    assert (department, library["a"], library["b"]) not in counts  # a left both r1's and r3's histories
+    assert counts[(department, library["b"], library["c"])] == 3  # r1, r2 and r3
+    assert counts[(department, library["b"], library["b"])] == 3
+    assert sum(1 for key in counts if key[0] != department) == 4  # The outsider's pairs stay in their department
+
+def test_users_without_co_downloads_get_the_departments_popular_documents(session_factory, library, people):
+    db = session_factory()
+    try:
+        newcomer = db.get(User, library["r3"])
+        source, ranked = recommend_for_user(db, newcomer, limit=3)
+        assert source == "popular"
+        assert [(doc.title, score) for doc, score in ranked] == [("b", 9.0), ("d", 7.0), ("a", 5.0)]
+
+        # A history without recommendations still falls back, leaving out what was read
+        _download(db, library, "r3", "b", 0)
+        db.commit()
+        source, ranked = recommend_for_user(db, newcomer, limit=3)
+        assert source == "popular"
+        assert [doc.title for doc, _ in ranked] == ["d", "a", "c"]
+
+        assert recommend_for_user(db, db.get(User, library["outsider"]))[1] == []  # Nothing approved in History
+    finally:
+        db.close()
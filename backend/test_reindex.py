@@ -0,0 +1,74 @@
+"""
+Tests for the batched reindex: keyset order, checkpointed resume and throttling.
+
+    python -m pytest test_reindex.py
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import reindex
+from app.models import Document, DocumentStatus
+
+@pytest.fixture()
+def document_ids(session_factory, people):
+    db = session_factory()
+    try:
+        documents = [
+            Document(title=f"Document {n}", status=DocumentStatus.APPROVED, uploader_id=people["student"],
+                     department_id=people["department"], file_path=None, file_size=1)
+            for n in range(7)
+        ]
+        db.add_all(documents)
+        db.commit()
+        return sorted(document.id for document in documents)
+    finally:
+        db.close()
+
+def _args(tmp_path, **overrides):
+    values = dict(tasks="metadata", workers=1, batch_size=2, checkpoint=str(tmp_path / "checkpoint.json"),
+                  resume=False, max_docs_per_second=None, max_read_mb_per_second=None)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+def test_batches_follow_the_id_order(session_factory, document_ids):
+    assert list(reindex._id_batches("", 3, session_factory)) == [document_ids[:3], document_ids[3:6], document_ids[6:]]
+    assert list(reindex._id_batches(document_ids[4], 3, session_factory)) == [document_ids[5:]]
+
+def test_resume_continues_after_the_last_contiguous_batch(tmp_path, session_factory, document_ids, monkeypatch):
+    batches = []
+    real_batch = reindex.reindex_batch
+
+    def failing_batch(ids, *args):
+        batches.append(ids)
+        if ids == document_ids[2:4]:
+            raise RuntimeError("disk full")
+        return real_batch(ids, *args)
+
+    monkeypatch.setattr(reindex, "reindex_batch", failing_batch)
+    with pytest.raises(RuntimeError):
+        reindex.run(_args(tmp_path), session_factory, ThreadPoolExecutor(max_workers=1))
+    saved = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert (saved["last_id"], saved["processed"]) == (document_ids[1], 2)  # Not past the failed batch
+
+    batches.clear()
+    monkeypatch.setattr(reindex, "reindex_batch", lambda ids, *args: batches.append(ids) or real_batch(ids, *args))
+    assert reindex.run(_args(tmp_path, resume=True), session_factory, ThreadPoolExecutor(max_workers=1)) == 0
+    assert batches == [document_ids[2:4], document_ids[4:6], document_ids[6:]]
+    assert not (tmp_path / "checkpoint.json").exists()
+
+def test_throttle_arithmetic(monkeypatch):
+    # 200 documents at 100/s are due after 2 seconds
+    assert not reindex._may_submit(200, 100.0, 1.5)
+    assert reindex._may_submit(200, 100.0, 2.0)
+    assert reindex._may_submit(10 ** 6, None, 0.0)
+
+    slept = []
+    monkeypatch.setattr(reindex.time, "monotonic", lambda: 11.0)
+    monkeypatch.setattr(reindex.time, "sleep", slept.append)
+    reindex._throttle_io(3 * 1024 * 1024, 10.0, 1024 * 1024)  # 3 MB at 1 MB/s, 1 s in
+    reindex._throttle_io(512 * 1024, 10.0, 1024 * 1024)  # Already behind the budget
+    reindex._throttle_io(10 ** 9, 10.0, None)
+    assert slept == [2.0]
@@ -0,0 +1,98 @@
+"""
+Tests for the incremental related-documents index.
+
+    python -m pytest test_related.py
+"""
+import pytest
+
+from app.core.related import (
+    rebuild_related_documents, refill_related_lists, remove_related_documents, update_related_documents
+)
+from app.models import Document, DocumentStatus, DocumentTermWeight, RelatedDocument
+
+TEXTS = {
+    "a": "graph algorithms shortest path dijkstra weighted edges",
+    "b": "graph algorithms spanning tree kruskal weighted edges",
+    "d": "graph traversal breadth first search dijkstra",
+    "poetry": "medieval poetry sonnets rhyme meter",
+    "cells": "cell biology mitochondria membrane protein",
+    "rocks": "igneous sedimentary metamorphic rocks geology",
+    "stars": "stellar evolution supernova nebula telescope",
+}
+
+@pytest.fixture()
+def documents(session_factory, people):
+    db = session_factory()
+    try:
+        ids = {}
+        for name, text in TEXTS.items():
+            document = Document(title=name, status=DocumentStatus.APPROVED, uploader_id=people["student"],
+                                department_id=people["department"], file_path=f"{name}.pdf", file_size=1,
+                                extracted_text=text)
+            db.add(document)
+            db.flush()
+            ids[name] = document.id
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+def related(db, document_id):
+    return [relation.related_document_id for relation in db.query(RelatedDocument).filter(
+        RelatedDocument.document_id == document_id
+    ).order_by(RelatedDocument.rank)]
+
+def scores(db):
+    return {(relation.document_id, relation.related_document_id): relation.score for relation in db.query(RelatedDocument)}
+
+def test_incremental_approvals_match_rebuild(session_factory, documents):
+    db = session_factory()
+    try:
+        for name in ["poetry", "cells", "rocks", "stars", "a", "d", "b"]:
+            update_related_documents(db, [documents[name]])
+        incremental = {name: set(related(db, document_id)) for name, document_id in documents.items()}
+
+        assert incremental["b"] == {documents["a"], documents["d"]}
+        assert documents["b"] in incremental["a"]  # Entered the existing list of "a"
+        assert incremental["poetry"] == set()
+
+        incremental_scores = scores(db)
+
+        rebuild_related_documents(db)
+        assert {name: set(related(db, document_id)) for name, document_id in documents.items()} == incremental
+        # Vectors stored while the corpus grew from one to seven documents kept their
+        # older IDF; the drift shrinks as the corpus grows
+        rebuilt_scores = scores(db)
+        for pair, score in incremental_scores.items():
+            assert score == pytest.approx(rebuilt_scores[pair], abs=0.05)
+    finally:
+        db.close()
+
+def test_refill_from_stored_vectors_matches_rebuild(session_factory, documents):
+    db = session_factory()
+    try:
+        rebuild_related_documents(db)
+        rebuilt = scores(db)
+        assert refill_related_lists(db, list(documents.values())) == len(documents)
+        assert scores(db) == pytest.approx(rebuilt, abs=1e-6)
+    finally:
+        db.close()
+
+def test_withdrawn_document_leaves_every_list(session_factory, documents):
+    db = session_factory()
+    try:
+        for name in ["poetry", "cells", "rocks", "stars", "a", "d", "b"]:
+            update_related_documents(db, [documents[name]], k=1)
+        assert related(db, documents["a"]) == [documents["b"]]
+
+        owners = remove_related_documents(db, [documents["b"]])
+        assert documents["a"] in owners
+        db.commit()
+        refill_related_lists(db, owners, k=1)
+
+        assert related(db, documents["a"]) == [documents["d"]]  # Refilled with the next best
+        assert related(db, documents["b"]) == []
+        assert db.query(RelatedDocument).filter(RelatedDocument.related_document_id == documents["b"]).count() == 0
+        assert db.query(DocumentTermWeight).filter(DocumentTermWeight.document_id == documents["b"]).count() == 0
+    finally:
+        db.close()
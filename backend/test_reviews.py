@@ -0,0 +1,86 @@
+"""
+Tests for review completion and the review figures in /analytics/performance.
+
+    python -m pytest test_reviews.py
+"""
+from datetime import datetime
+
+import pytest
+
+from app.api.v1.endpoints import analytics, reviews
+from app.core.review_stats import record_review_completed, review_summary
+from app.models import Document, DocumentStatus, Review, ReviewStatus
+
+@pytest.fixture()
+def client(make_client):
+    return make_client((reviews.router, "/reviews"), (analytics.router, "/analytics"))
+
+def _document(session_factory, people) -> str:
+    db = session_factory()
+    try:
+        document = Document(title="Graph Algorithms", status=DocumentStatus.SUBMITTED, uploader_id=people["student"],
+                            department_id=people["department"], file_path="missing.pdf", file_size=1024)
+        db.add(document)
+        db.commit()
+        return document.id
+    finally:
+        db.close()
+
+def test_performance_reports_review_figures(client, session_factory, people):
+    document_id = _document(session_factory, people)
+    assert client.get("/analytics/performance").json()["metrics"]["avg_review_time"] is None
+
+    review = client.post("/reviews", json={"document_id": document_id, "reviewer_id": people["supervisor"]})
+    assert review.status_code == 200, review.text
+    completed = client.post(f"/reviews/{review.json()['id']}/complete", json={"decision": "approved"})
+    assert completed.status_code == 200, completed.text
+
+    for params in ({}, {"department_id": people["department"]}):
+        performance = client.get("/analytics/performance", params=params).json()["metrics"]
+        assert performance["approval_rate"] == 100.0
+        assert performance["avg_review_time"] == "0h"
+
+def test_complete_review_of_deleted_document(client, session_factory, people):
+    db = session_factory()
+    review = Review(document_id="deleted-document", reviewer_id=people["supervisor"], status=ReviewStatus.PENDING)
+    db.add(review)
+    db.commit()
+    review_id = review.id
+    db.close()
+
+    response = client.post(f"/reviews/{review_id}/complete", json={"decision": "approved"})
+    assert response.status_code == 404
+
+def test_stat_deltas_are_numbered_like_the_snapshot(client, make_client, session_factory, people, monkeypatch):
+    from app.api.v1.endpoints import dashboard, documents
+
+    pushed = []
+    async def record(deltas, event, document_id=None, sequences=None):
+        pushed.append(sequences)
+    monkeypatch.setattr(documents, "broadcast_stats_update", record)
+    stats_client = make_client((dashboard.router, "/dashboard"))
+
+    def admin_sequences():
+        return stats_client.get("/dashboard/stats", params={"role": "admin"}).json()["sequences"]
+
+    assert admin_sequences() == {"role:admin": 0}
+    document_id = _document(session_factory, people)
+    review = client.post("/reviews", json={"document_id": document_id, "reviewer_id": people["supervisor"]})
+    client.post(f"/reviews/{review.json()['id']}/complete", json={"decision": "approved"})
+
+    assert [sequences["role:admin"] for sequences in pushed] == [1, 2]
+    assert admin_sequences() == {"role:admin": 2}
+
+def test_completion_without_an_assigned_date_is_counted_without_turnaround(session_factory, people):
+    db = session_factory()
+    try:
+        review = Review(document_id="any-document", reviewer_id=people["supervisor"], status=ReviewStatus.COMPLETED,
+                        decision="approved", assigned_date=None, completed_date=datetime(2026, 3, 2, 9, 0))
+        record_review_completed(db, review, people["department"])
+        db.commit()
+
+        summary = review_summary(db, "department", people["department"])
+        assert (summary["completed_reviews"], summary["approved"]) == (1, 1)
+        assert summary["avg_turnaround_hours"] == 0.0 and summary["p90_turnaround_hours"] == 0.0
+    finally:
+        db.close()
@@ -0,0 +1,63 @@
+"""
+Tests that the live rollup updates agree with a rebuild from the source tables.
+
+    python -m pytest test_rollups.py
+"""
+from app.api.v1.endpoints import documents, reviews
+from app.core.counters import document_counters
+from app.core.rollups import rebuild_rollups
+from app.models import DailyActivityRollup, Document, DocumentStatus, DocumentStatusRollup
+
+def _document(session_factory, people) -> str:
+    db = session_factory()
+    try:
+        document = Document(title="Graph Algorithms", status=DocumentStatus.SUBMITTED, uploader_id=people["student"],
+                            department_id=people["department"], file_path="missing.pdf", file_size=1024)
+        db.add(document)
+        db.commit()
+        return document.id
+    finally:
+        db.close()
+
+def _rollups(session_factory):
+    db = session_factory()
+    try:
+        activity = {
+            (row.day, row.department_id): (row.approvals, row.rejections)
+            for row in db.query(DailyActivityRollup) if row.approvals or row.rejections
+        }
+        statuses = {
+            (row.day, row.department_id, row.status): row.document_count
+            for row in db.query(DocumentStatusRollup) if row.document_count
+        }
+        return activity, statuses
+    finally:
+        db.close()
+
+def test_live_decisions_match_rebuild(make_client, session_factory, people, monkeypatch):
+    monkeypatch.setattr(document_counters, "_pending", {})
+    client = make_client((reviews.router, "/reviews"), (documents.router, "/documents"))
+    reviewed, rejected, edited = (_document(session_factory, people) for _ in range(3))
+    db = session_factory()
+    try:
+        rebuild_rollups(db)  # Status rollups for the seeded documents
+    finally:
+        db.close()
+
+    for document_id, decision in ((reviewed, "approved"), (rejected, "rejected")):
+        review = client.post("/reviews", json={"document_id": document_id, "reviewer_id": people["supervisor"]})
+        assert review.status_code == 200, review.text
+        completed = client.post(f"/reviews/{review.json()['id']}/complete", json={"decision": decision})
+        assert completed.status_code == 200, completed.text
+    # Not a review decision: moves the status rollup only
+    assert client.put(f"/documents/{edited}", json={"status": "approved"}).status_code == 200
+
+    live = _rollups(session_factory)
+    assert list(live[0].values()) == [(1, 1)]
+
+    db = session_factory()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+    assert _rollups(session_factory) == live
@@ -0,0 +1,83 @@
+"""
+Tests for full-text search over the segment index.
+
+    python -m pytest test_search.py
+"""
+import pytest
+
+from app.api.v1.endpoints import documents, search
+from app.core import document_processing
+from app.core.counters import document_counters
+from app.core.search_index import SearchIndex
+from app.models import Document, DocumentStatus
+
+@pytest.fixture()
+def index(tmp_path, monkeypatch):
+    index = SearchIndex(str(tmp_path / "index"))
+    monkeypatch.setattr(search, "search_index", index)
+    monkeypatch.setattr(document_processing, "search_index", index)
+    return index
+
+@pytest.fixture()
+def graph_documents(session_factory, people, index):
+    """Six documents about graphs, ranked by how often they say so; only the even ones are approved"""
+    db = session_factory()
+    try:
+        ids = []
+        for i in range(6):
+            document = Document(title=f"Thesis {i}", uploader_id=people["student"], department_id=people["department"],
+                                status=DocumentStatus.APPROVED if i % 2 == 0 else DocumentStatus.SUBMITTED,
+                                file_path=f"{i}.pdf", file_size=1)
+            db.add(document)
+            db.flush()
+            ids.append(document.id)
+        db.commit()
+    finally:
+        db.close()
+    index.add_documents([(doc_id, "graph " * (6 - i) + "notes") for i, doc_id in enumerate(ids)])
+    return ids
+
+def test_pages_beyond_the_candidate_cap(make_client, graph_documents, monkeypatch):
+    monkeypatch.setattr(search, "MAX_SEARCH_CANDIDATES", 2)
+    monkeypatch.setattr(search, "FILTER_CHUNK_SIZE", 2)
+    client = make_client((search.router, "/search"))
+
+    first = client.get("/search/documents", params={"q": "graph", "limit": 1}).json()
+    assert [item["id"] for item in first["items"]] == [graph_documents[0]]
+    assert (first["total"], first["total_capped"]) == (1, True)  # Only the two best hits were checked
+
+    # Student filter drops the odd documents; the last approved one is still reachable
+    last = client.get("/search/documents", params={"q": "graph", "limit": 1, "offset": 2}).json()
+    assert [item["id"] for item in last["items"]] == [graph_documents[4]]
+    assert (last["total"], last["total_capped"]) == (3, True)  # The sixth hit was never ranked
+
+    everything = client.get("/search/documents", params={"q": "graph", "role": "admin"}).json()
+    assert [item["id"] for item in everything["items"]] == graph_documents
+    assert (everything["total"], everything["total_capped"]) == (6, False)
+
+def test_ranking_widens_when_the_filters_reject_too_many(make_client, graph_documents, index, monkeypatch):
+    monkeypatch.setattr(search, "MAX_SEARCH_CANDIDATES", 1)
+    requested = []
+    real_search = index.search
+    monkeypatch.setattr(index, "search", lambda q, limit: requested.append(limit) or real_search(q, limit))
+    client = make_client((search.router, "/search"))
+
+    # The best four hits hold only two approved documents; the third needs more ranked
+    page = client.get("/search/documents", params={"q": "graph", "limit": 1, "offset": 2}).json()
+    assert [item["id"] for item in page["items"]] == [graph_documents[4]]
+    assert (page["total"], page["total_capped"]) == (3, False)
+    assert requested == [4, 8]
+
+    requested.clear()
+    assert client.get("/search/documents", params={"q": "graph", "role": "admin", "limit": 2}).json()["total"] == 3
+    assert requested == [3]  # Enough passed the filters: no second round
+
+def test_title_change_is_reindexed(make_client, session_factory, graph_documents, monkeypatch):
+    monkeypatch.setattr(document_counters, "_pending", {})
+    client = make_client((search.router, "/search"), (documents.router, "/documents"))
+    assert client.get("/search/documents", params={"q": "topology"}).json()["total"] == 0
+
+    response = client.put(f"/documents/{graph_documents[0]}", json={"title": "Topology of graphs"})
+    assert response.status_code == 200, response.text
+    found = client.get("/search/documents", params={"q": "topology"}).json()
+    assert [item["id"] for item in found["items"]] == [graph_documents[0]]
@@ -0,0 +1,55 @@
+"""
+Tests for the analytics time series: bucket alignment, gap filling and moving averages.
+
+    python -m pytest test_timeseries.py
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.core.timeseries import bucketize, build_series, granularity_for, moving_average, timeframe_bounds
+
+def test_weeks_start_on_the_monday_on_or_before_the_first_day():
+    # 2026-03-05 is a Thursday; 2026-03-02 and 2026-03-09 are Mondays
+    days = [date(2026, 3, 5), date(2026, 3, 8), date(2026, 3, 9), date(2026, 3, 22), date(2026, 3, 23)]
+    starts, sums = bucketize(days, np.array([1, 2, 4, 8, 16]), date(2026, 3, 5), date(2026, 3, 22), "week")
+    assert starts.astype(str).tolist() == ["2026-03-02", "2026-03-09", "2026-03-16"]
+    assert sums.tolist() == [[3.0, 4.0, 8.0]]  # The 23rd is after the end
+
+    starts, _ = bucketize([], np.zeros((1, 0)), date(2026, 3, 9), date(2026, 3, 9), "week")
+    assert starts.astype(str).tolist() == ["2026-03-09"]  # A Monday start is its own bucket
+
+def test_months_start_on_the_first_and_skip_days_outside_the_range():
+    days = [date(2026, 1, 10), date(2026, 1, 31), date(2026, 2, 1), date(2026, 4, 30)]
+    starts, sums = bucketize(days, np.array([[1, 2, 4, 8], [0, 1, 0, 1]]), date(2026, 1, 15), date(2026, 4, 30), "month")
+    assert starts.astype(str).tolist() == ["2026-01-01", "2026-02-01", "2026-03-01", "2026-04-01"]
+    assert sums.tolist() == [[2.0, 4.0, 0.0, 8.0], [1.0, 0.0, 0.0, 1.0]]  # January 10th is before the start
+
+    with pytest.raises(ValueError):
+        bucketize(days, np.ones(4), date(2026, 1, 1), date(2026, 4, 30), "year")
+
+def test_moving_average_uses_fewer_points_at_the_start():
+    values = np.array([[3.0, 6.0, 9.0, 0.0, 3.0], [1.0, 1.0, 1.0, 1.0, 1.0]])
+    assert moving_average(values, 3).tolist() == [[3.0, 4.5, 6.0, 5.0, 4.0], [1.0, 1.0, 1.0, 1.0, 1.0]]
+    assert moving_average(values[:, :2], 7).tolist() == [[3.0, 4.5], [1.0, 1.0]]  # Window longer than the series
+    assert moving_average(values, 1).tolist() == values.tolist()
+    assert moving_average(np.zeros((2, 0)), 3).shape == (2, 0)
+
+def test_series_fill_every_missing_day():
+    start, end = timeframe_bounds(7, today=date(2026, 3, 8))
+    assert (start, end) == (date(2026, 3, 2), date(2026, 3, 8))
+
+    series = build_series([("2026-03-03", 4, None), (date(2026, 3, 6), 2, 5)], ["uploads", "downloads"], start, end)
+    assert series["granularity"] == "day" and series["moving_average_window"] == 7
+    assert [point["date"] for point in series["chart_data"]] == [f"2026-03-0{day}" for day in range(2, 9)]
+    assert [point["uploads"] for point in series["chart_data"]] == [0, 4, 0, 0, 2, 0, 0]
+    assert [point["downloads_avg"] for point in series["chart_data"]][-3:] == [1.0, 0.83, 0.71]
+    assert series["totals"] == {"uploads": 6, "downloads": 5}
+
+    empty = build_series([], ["uploads"], date(2026, 1, 1), date(2026, 6, 30))
+    assert empty["granularity"] == "month" and len(empty["chart_data"]) == 6
+    assert empty["totals"] == {"uploads": 0}
+
+def test_granularity_follows_the_timeframe_length():
+    assert [granularity_for(days) for days in (7, 31, 32, 120, 121, 365)] == ["day", "day", "week", "week", "month", "month"]
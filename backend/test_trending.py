@@ -0,0 +1,80 @@
+"""
+Tests for the time-decayed trending scores.
+
+    python -m pytest test_trending.py
+"""
+import pytest
+
+from app.core import trending
+from app.core.trending import LANDMARK_PERIOD, TrendingTracker
+from app.models import DocumentTrendingScore
+
+START = 100 * LANDMARK_PERIOD  # A landmark, so event times read as offsets from it
+HOUR = 3600.0
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(trending.time, "time", lambda: now[0])
+    monkeypatch.setattr(trending.settings, "TRENDING_HALF_LIFE_HOURS", 24)
+    return now
+
+def test_rebase_rescales_every_score_to_the_new_landmark(clock):
+    tracker = TrendingTracker(session_factory=None, top_k=5)
+    tracker.record("download", "a", "d1", now=START + 12 * HOUR)
+    tracker.record("view", "b", "d1", now=START + 12 * HOUR)
+    before = tracker.trending(now=START + LANDMARK_PERIOD)
+
+    with tracker._lock:
+        tracker._rebase(START + LANDMARK_PERIOD)
+    assert tracker.landmark == START + LANDMARK_PERIOD
+    # Weekly rescaling by 2 ** -7 (a 24 hour half-life) leaves the current values alone
+    assert tracker._scores["a"][1] == pytest.approx(3 * 2 ** 0.5 * 2 ** -7)
+    assert tracker._pending["b"][1] == pytest.approx(2 ** 0.5 * 2 ** -7)
+    assert tracker.trending(now=START + LANDMARK_PERIOD) == before
+
+def test_top_k_keeps_the_strongest_documents(clock):
+    tracker = TrendingTracker(session_factory=None, top_k=2)
+    tracker.record("view", "a", "d1", now=START)
+    tracker.record("view", "b", "d2", now=START)
+    tracker.record("download", "c", "d1", now=START)  # Evicts one of the single views
+    top = tracker._top[trending.GLOBAL]
+    assert len(top) == 2 and top["c"] == 3.0
+
+    tracker.record("view", "d", "d1", now=START)  # Weaker than both members: left out
+    assert "d" not in tracker._top[trending.GLOBAL]
+    for _ in range(3):
+        tracker.record("view", "a", "d1", now=START)  # Four views outweigh one download
+    assert [entry["document_id"] for entry in tracker.trending(limit=1)] == ["a"]
+    assert [entry["document_id"] for entry in tracker.trending("d1")] == ["a", "c"]
+
+def test_trending_reports_decayed_values(clock):
+    tracker = TrendingTracker(session_factory=None, top_k=5)
+    tracker.record("download", "a", "d1", now=START + 10 * HOUR)
+    tracker.record("view", "b", "d1", now=START + 34 * HOUR)
+
+    # One half-life after the download, at the moment of the view
+    assert tracker.trending(now=START + 34 * HOUR) == [
+        {"document_id": "a", "score": 1.5}, {"document_id": "b", "score": 1.0}
+    ]
+    later = tracker.trending(now=START + 82 * HOUR)  # Two more half-lives
+    assert [entry["score"] for entry in later] == [0.375, 0.25]
+
+def test_workers_flushing_the_same_new_document_both_count(clock, session_factory):
+    first, second = TrendingTracker(session_factory, top_k=5), TrendingTracker(session_factory, top_k=5)
+    first.record("download", "a", "d1", now=START)
+    second.record("view", "a", "d1", now=START)
+    second.record("view", "b", "d1", now=START)
+
+    assert first.flush() == 1
+    assert second.flush() == 2  # "a" was inserted by the first worker meanwhile
+
+    db = session_factory()
+    try:
+        scores = dict(db.query(DocumentTrendingScore.document_id, DocumentTrendingScore.score))
+    finally:
+        db.close()
+    assert scores == {"a": pytest.approx(4.0), "b": pytest.approx(1.0)}
+    assert second.trending()[0] == {"document_id": "a", "score": 4.0}
+    assert first.flush() == 0
+    assert [entry["document_id"] for entry in first.trending()] == ["a", "b"]  # Reloaded the other worker's rows
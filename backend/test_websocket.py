@@ -0,0 +1,202 @@
+"""
+Tests for the WebSocket endpoint, its connection registry and the per-connection send queues.
+
+    python -m pytest test_websocket.py
+"""
+import asyncio
+import json
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1.endpoints import websocket
+
+@pytest.fixture()
+def client(make_client, monkeypatch):
+    monkeypatch.setattr(websocket, "manager", websocket.ConnectionManager())
+    return make_client((websocket.router, "/ws"))
+
+def test_rooms_come_from_the_user_row(client, people):
+    # The query string claims a supervisor of another department; only the stored student role counts
+    url = f"/ws/ws/c1?user_id={people['student']}&role=supervisor&department_id=other"
+    with client.websocket_connect(url) as ws:
+        message = ws.receive_json()
+        assert message["type"] == "connected"
+        assert sorted(message["rooms"]) == sorted([f"user:{people['student']}", "role:student"])
+
+    with client.websocket_connect(f"/ws/ws/c2?user_id={people['supervisor']}") as ws:
+        rooms = ws.receive_json()["rooms"]
+        assert f"department:{people['department']}" in rooms
+        assert "role:supervisor" in rooms
+
+def test_unknown_user_is_closed(client, session_factory):
+    with client.websocket_connect("/ws/ws/c1?user_id=nobody&role=admin") as ws:
+        assert ws.receive_json() == {"type": "error", "message": "User not found"}
+        with pytest.raises(WebSocketDisconnect):
+            ws.receive_json()
+    assert not websocket.manager.active_connections
+
+def test_coalesced_stat_deltas_cover_their_sequence_range():
+    first = websocket.OutboundMessage({"type": "stats_delta", "room": "role:admin", "seq": 4, "data": {"total_documents": 1}})
+    second = websocket.OutboundMessage({"type": "stats_delta", "room": "role:admin", "seq": 5, "data": {"total_documents": 2}})
+    third = websocket.OutboundMessage({"type": "stats_delta", "room": "role:admin", "seq": 6, "data": {"under_review": 1}})
+
+    merged = first.absorb(second).absorb(third).payload
+    assert (merged["first_seq"], merged["seq"], merged["coalesced"]) == (4, 6, 3)
+    assert merged["data"] == {"total_documents": 3, "under_review": 1}
+
+def test_numbered_and_unnumbered_deltas_stay_apart(monkeypatch):
+    async def main():
+        registry = websocket.ConnectionManager()
+        monkeypatch.setattr(websocket, "manager", registry)
+        registry.register("c1", BlockedSocket(), "u1", ["role:admin"])
+
+        await websocket.broadcast_stats_update({"role:admin": {"total_documents": 1}}, "upload", sequences={"role:admin": 5})
+        await websocket.broadcast_stats_update({"role:admin": {"total_downloads": 1}}, "download")
+        await websocket.broadcast_stats_update({"role:admin": {"total_documents": 1}}, "upload", sequences={"role:admin": 6})
+        await websocket.broadcast_stats_update({"role:admin": {"total_downloads": 2}}, "download")
+
+        # A client whose snapshot covers seq 6 skips the first message and still counts the downloads once
+        numbered, unnumbered = (message.payload for message in registry.writers["c1"].queue)
+        assert (numbered["first_seq"], numbered["seq"], numbered["data"]) == (5, 6, {"total_documents": 2})
+        assert unnumbered["seq"] is None and "first_seq" not in unnumbered
+        assert unnumbered["data"] == {"total_downloads": 3}
+        registry.disconnect("c1")
+    asyncio.run(main())
+
+class BlockedSocket:
+    """Accepts sends only once released, so queued messages stay queued"""
+
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+        self.released = asyncio.Event()
+
+    async def send_text(self, text: str):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        await self.released.wait()
+        self.sent.append(json.loads(text))
+
+def _keyed(key: str, value: int) -> websocket.OutboundMessage:
+    return websocket.OutboundMessage({"type": "stats_delta", "data": {"total_documents": value}}, key)
+
+def _writer(policy: str, socket=None, max_queue: int = 2):
+    failed = []
+    writer = websocket.ConnectionWriter("c1", socket or BlockedSocket(), failed.append, max_queue=max_queue, policy=policy)
+    return writer, failed
+
+def test_coalesce_policy_merges_at_any_depth_and_drops_oldest_when_full():
+    async def main():
+        writer, failed = _writer("coalesce")
+        assert writer.enqueue(_keyed("stats_delta:a", 1))
+        assert writer.enqueue(_keyed("stats_delta:a", 2))  # Merged though the queue has room
+        assert len(writer.queue) == 1 and writer.queue[0].payload["data"] == {"total_documents": 3}
+
+        assert writer.enqueue(websocket.OutboundMessage("plain-1"))
+        assert writer.enqueue(websocket.OutboundMessage("plain-2"))  # Full: the merged delta is dropped
+        assert [message.text for message in writer.queue] == ["plain-1", "plain-2"]
+        assert not failed
+        writer.close()
+    asyncio.run(main())
+
+def test_drop_oldest_policy_keeps_keyed_messages_apart():
+    async def main():
+        writer, failed = _writer("drop_oldest")
+        for value in (1, 2, 3):
+            assert writer.enqueue(_keyed("stats_delta:a", value))
+        assert [message.payload["data"]["total_documents"] for message in writer.queue] == [2, 3]
+        assert not failed
+        writer.close()
+    asyncio.run(main())
+
+def test_disconnect_policy_closes_a_full_connection():
+    async def main():
+        writer, failed = _writer("disconnect")
+        assert writer.enqueue(websocket.OutboundMessage("1"))
+        assert writer.enqueue(websocket.OutboundMessage("2"))
+        assert not writer.enqueue(websocket.OutboundMessage("3"))
+        assert writer.closed and not writer.queue
+        assert failed == ["c1"]
+        assert not writer.enqueue(websocket.OutboundMessage("4"))
+    asyncio.run(main())
+
+def test_writer_close_paths():
+    async def main():
+        socket = BlockedSocket()
+        writer, failed = _writer("coalesce", socket)
+        writer.enqueue(websocket.OutboundMessage('{"n": 1}'))
+        socket.released.set()
+        await _settle()
+        assert socket.sent == [{"n": 1}]
+
+        writer.close()
+        await _settle()
+        assert writer._task.cancelled() or writer._task.done()
+        assert not writer.enqueue(websocket.OutboundMessage('{"n": 2}'))
+        assert not failed  # Closing on purpose is not a failure
+
+        # A failing send closes the writer and reports the connection
+        broken, failed = _writer("coalesce", BlockedSocket(fail=True))
+        broken.enqueue(websocket.OutboundMessage('{"n": 3}'))
+        broken.enqueue(websocket.OutboundMessage('{"n": 4}'))
+        await _settle()
+        assert broken.closed and not broken.queue
+        assert failed == ["c1"]
+    asyncio.run(main())
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+class RecordingBackplane:
+    def __init__(self):
+        self.channels = set()
+
+    def subscribe(self, channel: str):
+        self.channels.add(channel)
+
+    def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+
+def test_registry_keeps_rooms_users_and_reverse_maps_in_step():
+    async def main():
+        registry = websocket.ConnectionManager()
+        registry.backplane = RecordingBackplane()
+        registry.register("c1", BlockedSocket(), "u1", ["role:admin", "department:d1"])
+        registry.register("c2", BlockedSocket(), "u1", ["role:admin"])
+        registry.register("c3", BlockedSocket(), "u2")
+
+        assert registry.user_connections == {"u1": {"c1", "c2"}, "u2": {"c3"}}
+        assert registry.room_connections == {"role:admin": {"c1", "c2"}, "department:d1": {"c1"}}
+        assert registry.connection_rooms["c1"] == {"role:admin", "department:d1"}
+        assert registry.connection_users == {"c1": "u1", "c2": "u1", "c3": "u2"}
+        assert registry.backplane.channels == {
+            "ws:user:u1", "ws:user:u2", "ws:room:role:admin", "ws:room:department:d1"
+        }
+        assert registry.get_room_users("role:admin") == ["u1"]
+
+        # One message per connection even when it is in several of the rooms
+        registry._deliver("rooms", ["role:admin", "department:d1"], websocket.OutboundMessage("x"))
+        assert [len(registry.writers[c].queue) for c in ("c1", "c2", "c3")] == [1, 1, 0]
+
+        registry.leave_room("c1", "department:d1")
+        assert "department:d1" not in registry.room_connections
+        assert "ws:room:department:d1" not in registry.backplane.channels
+
+        registry.disconnect("c1")
+        registry.disconnect("c1")  # Safe twice
+        assert registry.user_connections == {"u1": {"c2"}, "u2": {"c3"}}
+        assert "c1" not in registry.connection_rooms and "c1" not in registry.writers
+
+        # Re-registering an id replaces the old connection and its rooms
+        registry.register("c2", BlockedSocket(), "u3", ["role:staff"])
+        assert "u1" not in registry.user_connections and "ws:user:u1" not in registry.backplane.channels
+        assert registry.room_connections == {"role:staff": {"c2"}}
+
+        for connection_id in list(registry.active_connections):
+            registry.disconnect(connection_id)
+        assert not any([registry.user_connections, registry.room_connections, registry.connection_users,
+                        registry.connection_rooms, registry.writers])
+        assert registry.backplane.channels == set()
+    asyncio.run(main())
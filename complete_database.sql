@@ -61,7 +61,13 @@ CREATE TABLE documents (
     rejection_reason TEXT,
     file_path VARCHAR(500),
     file_size BIGINT,
+    extracted_text TEXT NULL,
+    overlap_score FLOAT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    download_count INT NOT NULL DEFAULT 0,
+    view_count INT NOT NULL DEFAULT 0,
+    INDEX ix_documents_popularity (download_count, view_count),
+    INDEX ix_documents_uploader_downloads (uploader_id, download_count),
     FOREIGN KEY (uploader_id) REFERENCES users(user_id),
     FOREIGN KEY (department_id) REFERENCES departments(department_id),
     FOREIGN KEY (supervisor_id) REFERENCES users(user_id),
@@ -113,6 +119,275 @@ CREATE TABLE downloads (
     FOREIGN KEY (user_id) REFERENCES users(user_id)
 );
 
+-- 8. DOCUMENT_TERM_WEIGHTS TABLE
+CREATE TABLE document_term_weights (
+    term_weight_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    term VARCHAR(64) NOT NULL,
+    weight FLOAT NOT NULL,
+    INDEX ix_document_term_weights_document_id (document_id),
+    INDEX ix_document_term_weights_term (term),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- 9. RELATED_DOCUMENTS TABLE
+CREATE TABLE related_documents (
+    relation_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    related_document_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    `rank` INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_related_documents_document_rank (document_id, `rank`),
+    INDEX ix_related_documents_related_document_id (related_document_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (related_document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- 10. DOCUMENT_SIGNATURES TABLE
+CREATE TABLE document_signatures (
+    signature_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    signature BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_document_signatures_document_id (document_id),
+    INDEX ix_document_signatures_created_at (created_at),
+    INDEX ix_document_signatures_updated_at (updated_at),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- 11. DOCUMENT_SIGNATURE_TOMBSTONES TABLE
+CREATE TABLE document_signature_tombstones (
+    tombstone_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_document_signature_tombstones_document_id (document_id),
+    INDEX ix_document_signature_tombstones_deleted_at (deleted_at)
+);
+
+-- 12. DOCUMENT_OVERLAPS TABLE
+CREATE TABLE document_overlaps (
+    overlap_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    matched_document_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_document_overlaps_document_id (document_id),
+    INDEX ix_document_overlaps_matched_document_id (matched_document_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (matched_document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- 13. KEYWORDS TABLE
+CREATE TABLE keywords (
+    keyword_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    name VARCHAR(255) NOT NULL,
+    normalized_name VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_keywords_normalized_name (normalized_name)
+);
+
+-- 14. AUTHORS TABLE
+CREATE TABLE authors (
+    author_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    name VARCHAR(255) NOT NULL,
+    normalized_name VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_authors_normalized_name (normalized_name)
+);
+
+-- 15. DOCUMENT_KEYWORDS TABLE
+CREATE TABLE document_keywords (
+    document_id CHAR(36) NOT NULL,
+    keyword_id CHAR(36) NOT NULL,
+    PRIMARY KEY (document_id, keyword_id),
+    INDEX ix_document_keywords_keyword_id (keyword_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (keyword_id) REFERENCES keywords(keyword_id) ON DELETE CASCADE
+);
+
+-- 16. DOCUMENT_AUTHORS TABLE
+CREATE TABLE document_authors (
+    document_id CHAR(36) NOT NULL,
+    author_id CHAR(36) NOT NULL,
+    PRIMARY KEY (document_id, author_id),
+    INDEX ix_document_authors_author_id (author_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (author_id) REFERENCES authors(author_id) ON DELETE CASCADE
+);
+
+-- 17. DAILY_ACTIVITY_ROLLUPS TABLE
+CREATE TABLE daily_activity_rollups (
+    rollup_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    day DATE NOT NULL,
+    department_id CHAR(36) NOT NULL,
+    uploads INT NOT NULL DEFAULT 0,
+    approvals INT NOT NULL DEFAULT 0,
+    rejections INT NOT NULL DEFAULT 0,
+    downloads INT NOT NULL DEFAULT 0,
+    storage_bytes BIGINT NOT NULL DEFAULT 0,
+    registrations INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_daily_activity_day_department (day, department_id),
+    INDEX ix_daily_activity_rollups_department_id (department_id)
+);
+
+-- 18. DOCUMENT_STATUS_ROLLUPS TABLE
+CREATE TABLE document_status_rollups (
+    rollup_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    day DATE NOT NULL,
+    department_id CHAR(36) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    document_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_status_rollup_day_department_status (day, department_id, status),
+    INDEX ix_document_status_rollups_department_id (department_id)
+);
+
+-- 19. DASHBOARD_ROOM_SEQUENCES TABLE
+CREATE TABLE dashboard_room_sequences (
+    sequence_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    room VARCHAR(100) NOT NULL UNIQUE,
+    seq INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 20. UNIQUE_VISITOR_SKETCHES TABLE
+CREATE TABLE unique_visitor_sketches (
+    sketch_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    scope VARCHAR(20) NOT NULL,
+    scope_id CHAR(36) NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    period VARCHAR(10) NOT NULL,
+    registers BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_unique_sketch_scope_kind_period (scope, scope_id, kind, period)
+);
+
+-- 21. REVIEW_AGGREGATES TABLE
+CREATE TABLE review_aggregates (
+    aggregate_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    scope VARCHAR(20) NOT NULL,
+    scope_id CHAR(36) NOT NULL,
+    assigned_reviews INT NOT NULL DEFAULT 0,
+    open_reviews INT NOT NULL DEFAULT 0,
+    completed_reviews INT NOT NULL DEFAULT 0,
+    approved INT NOT NULL DEFAULT 0,
+    rejected INT NOT NULL DEFAULT 0,
+    needs_revision INT NOT NULL DEFAULT 0,
+    turnaround_hours_sum FLOAT NOT NULL DEFAULT 0,
+    turnaround_histogram TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_review_aggregate_scope (scope, scope_id)
+);
+
+-- 22. DEPARTMENT_RANK_SNAPSHOTS TABLE
+CREATE TABLE department_rank_snapshots (
+    snapshot_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    day DATE NOT NULL,
+    department_id CHAR(36) NOT NULL,
+    `rank` INT NOT NULL,
+    score FLOAT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_rank_snapshot_day_department (day, department_id),
+    INDEX ix_department_rank_snapshots_day (day),
+    INDEX ix_department_rank_snapshots_department_id (department_id)
+);
+
+-- 23. DOCUMENT_TRENDING_SCORES TABLE
+CREATE TABLE document_trending_scores (
+    trending_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL UNIQUE,
+    department_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    landmark FLOAT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_document_trending_scores_department_id (department_id),
+    INDEX ix_document_trending_scores_score (score)
+);
+
+-- 24. CO_DOWNLOADS TABLE
+CREATE TABLE co_downloads (
+    co_download_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    department_id CHAR(36) NOT NULL,
+    document_id CHAR(36) NOT NULL,
+    other_document_id CHAR(36) NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_co_download_pair (department_id, document_id, other_document_id)
+);
+
+-- 25. DOCUMENT_RECOMMENDATIONS TABLE
+CREATE TABLE document_recommendations (
+    recommendation_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    department_id CHAR(36) NOT NULL,
+    document_id CHAR(36) NOT NULL,
+    recommended_document_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    `rank` INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_document_recommendations_lookup (department_id, document_id, `rank`),
+    FOREIGN KEY (recommended_document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- 26. JOB_CHECKPOINTS TABLE
+CREATE TABLE job_checkpoints (
+    checkpoint_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    job VARCHAR(50) NOT NULL UNIQUE,
+    position DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 27. CITATIONS TABLE
+CREATE TABLE citations (
+    citation_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    citing_document_id CHAR(36) NOT NULL,
+    position INT NOT NULL,
+    reference_text TEXT NOT NULL,
+    cited_document_id CHAR(36),
+    match_score FLOAT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_citations_citing_position (citing_document_id, position),
+    INDEX ix_citations_cited_document_id (cited_document_id),
+    FOREIGN KEY (citing_document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (cited_document_id) REFERENCES documents(document_id) ON DELETE SET NULL
+);
+
+-- 28. CITATION_TITLE_TOKENS TABLE
+CREATE TABLE citation_title_tokens (
+    title_token_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    token VARCHAR(64) NOT NULL,
+    title_size INT NOT NULL,
+    INDEX ix_citation_title_tokens_document_id (document_id),
+    INDEX ix_citation_title_tokens_token (token),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- 29. CITATION_REFERENCE_TOKENS TABLE
+CREATE TABLE citation_reference_tokens (
+    reference_token_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    citation_id CHAR(36) NOT NULL,
+    token VARCHAR(64) NOT NULL,
+    INDEX ix_citation_reference_tokens_citation_id (citation_id),
+    INDEX ix_citation_reference_tokens_token (token),
+    FOREIGN KEY (citation_id) REFERENCES citations(citation_id) ON DELETE CASCADE
+);
+
+-- 30. DOCUMENT_IMPACT_SCORES TABLE
+CREATE TABLE document_impact_scores (
+    impact_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL UNIQUE,
+    department_id CHAR(36) NOT NULL,
+    citation_count INT NOT NULL DEFAULT 0,
+    impact_score FLOAT NOT NULL DEFAULT 0,
+    `rank` INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_document_impact_scores_department_id (department_id),
+    INDEX ix_document_impact_scores_impact_score (impact_score),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
 -- INSERT SAMPLE DATA
 
 -- Insert Departments
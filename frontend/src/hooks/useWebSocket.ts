@@ -1,12 +1,15 @@
 import { useEffect, useRef, useState, useCallback } from 'react'
 import { useAuthStore } from '../stores/useAuthStore'
-import { useDashboardStore } from '../stores/useDashboardStore'
+import { useDashboardStore, StatsDeltaMessage } from '../stores/useDashboardStore'
 
 interface WebSocketMessage {
   type: string
   data?: any
   message?: string
   timestamp?: number
+  room?: string
+  seq?: number | null
+  first_seq?: number
 }
 
 interface UseWebSocketOptions {
@@ -29,15 +32,29 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
   } = options
   
   const { user } = useAuthStore()
-  const { fetchStats, fetchRecentDocuments, fetchRecentActivity } = useDashboardStore()
+  const { fetchStats, fetchRecentDocuments, fetchRecentActivity, fetchAllDashboardData, applyStatsDelta, applyRecentDocument } = useDashboardStore()
   
   const [isConnected, setIsConnected] = useState(false)
-  const [connectionStatus, setConnectionStatus] = useState<'connecting' | 'connected' | 'disconnected' | 'error'>('disconnected')
+  // 'failed' once reconnect attempts are used up: pushed updates have stopped
+  const [connectionStatus, setConnectionStatus] = useState<'connecting' | 'connected' | 'disconnected' | 'error' | 'failed'>('disconnected')
   
   const wsRef = useRef<WebSocket | null>(null)
   const reconnectAttemptsRef = useRef(0)
   const reconnectTimeoutRef = useRef<number | null>(null)
   const connectionIdRef = useRef<string>('')
+  const hasConnectedRef = useRef(false)
+  const resyncingRef = useRef(false)
+
+  // Take a new stats snapshot after a missed delta, once at a time
+  const resyncStats = useCallback(async () => {
+    if (resyncingRef.current) return
+    resyncingRef.current = true
+    try {
+      await fetchStats()
+    } finally {
+      resyncingRef.current = false
+    }
+  }, [fetchStats])
 
   const generateConnectionId = useCallback(() => {
     return `${user?.id || 'anonymous'}_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`
@@ -49,7 +66,9 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
       setConnectionStatus('connecting')
       connectionIdRef.current = generateConnectionId()
       
-      const wsUrl = `ws://localhost:8000/api/v1/ws/ws/${connectionIdRef.current}?user_id=${user.id}`
+      // The server picks the rooms stat deltas are pushed to from the stored user
+      const params = new URLSearchParams({ user_id: user.id })
+      const wsUrl = `ws://localhost:8000/api/v1/ws/ws/${connectionIdRef.current}?${params.toString()}`
       wsRef.current = new WebSocket(wsUrl)
 
       wsRef.current.onopen = () => {
@@ -69,6 +88,11 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
           switch (message.type) {
             case 'connected':
               console.log('WebSocket connection confirmed')
+              // Deltas sent while disconnected are lost; take a fresh snapshot after a reconnect
+              if (hasConnectedRef.current) {
+                fetchAllDashboardData()
+              }
+              hasConnectedRef.current = true
               break
                 case 'document_uploaded':
               // Refresh dashboard data when a document is uploaded
@@ -83,17 +107,18 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
               fetchRecentActivity()
               break
               
-            case 'stats_update':
-              // Update dashboard stats in real-time
-              if (message.data) {
-                // Update the dashboard store with new stats
-                console.log('Stats updated:', message.data)
+            case 'stats_delta':
+              // Apply pushed stat changes to the current snapshot, or resync after a gap
+              if (message.data && !applyStatsDelta(message as StatsDeltaMessage)) {
+                resyncStats()
               }
               break
               
             case 'activity_update':
-              // Refresh activity feed
-              fetchRecentActivity()
+              // A new or updated entry for the recent documents list
+              if (message.data) {
+                applyRecentDocument(message.data)
+              }
               break
               
             case 'pong':
@@ -130,6 +155,8 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
           reconnectTimeoutRef.current = setTimeout(() => {
             connect()
           }, reconnectInterval)
+        } else if (event.code !== 1000) {
+          setConnectionStatus('failed')
         }
       }
 
@@ -143,7 +170,13 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
       console.error('Error creating WebSocket connection:', error)
       setConnectionStatus('error')
     }
-  }, [user, onConnect, onDisconnect, onMessage, onError, reconnectInterval, maxReconnectAttempts, generateConnectionId, fetchStats, fetchRecentDocuments, fetchRecentActivity])
+  }, [user, onConnect, onDisconnect, onMessage, onError, reconnectInterval, maxReconnectAttempts, generateConnectionId, fetchStats, fetchRecentDocuments, fetchRecentActivity, fetchAllDashboardData, applyStatsDelta, applyRecentDocument, resyncStats])
+
+  // Start over after the reconnect attempts ran out
+  const reconnect = useCallback(() => {
+    reconnectAttemptsRef.current = 0
+    connect()
+  }, [connect])
 
   const disconnect = useCallback(() => {
     if (reconnectTimeoutRef.current) {
@@ -215,6 +248,7 @@ export const useWebSocket = (options: UseWebSocketOptions = {}) => {
     isConnected,
     connectionStatus,
     connect,
+    reconnect,
     disconnect,
     sendMessage,
     ping,
@@ -10,11 +10,16 @@ import {
   RefreshCw
 } from 'lucide-react'
 import { useAuthStore } from '../stores/useAuthStore'
-import { useDashboardStore, startDashboardAutoRefresh, stopDashboardAutoRefresh } from '../stores/useDashboardStore'
+import { useDashboardStore } from '../stores/useDashboardStore'
+import { useWebSocket } from '../hooks/useWebSocket'
 import { Link } from 'react-router-dom'
 import LoadingSpinner from '../components/ui/LoadingSpinner'
 import { formatDistanceToNow } from 'date-fns'
 
+// Snapshots also correct what deltas cannot, such as uploads leaving the 7-day window
+const SNAPSHOT_REFRESH_MS = 5 * 60 * 1000
+const OFFLINE_SNAPSHOT_REFRESH_MS = 60 * 1000  // While pushed updates are unavailable
+
 const Dashboard: React.FC = () => {
   const { user } = useAuthStore()
   const { 
@@ -26,28 +31,24 @@ const Dashboard: React.FC = () => {
     fetchAllDashboardData,
     clearError  } = useDashboardStore()
 
-  // Auto-refresh dashboard data every 30 seconds (replaces WebSocket)
-  useEffect(() => {
-    const interval = setInterval(() => {
-      fetchAllDashboardData()
-    }, 30000)
-
-    return () => clearInterval(interval)
-  }, [])
+  // Stats and recent documents are kept current by deltas pushed over the WebSocket
+  const { connectionStatus, reconnect } = useWebSocket()
+  const liveUpdatesLost = connectionStatus === 'failed'
 
   useEffect(() => {
-    // Fetch initial data
+    // Fetch the initial snapshot
     fetchAllDashboardData()
-    
-    // Start auto-refresh
-    startDashboardAutoRefresh()
-
-    // Cleanup on unmount
-    return () => {
-      stopDashboardAutoRefresh()
-    }
   }, [fetchAllDashboardData])
 
+  useEffect(() => {
+    // Take a fresh snapshot now and then, more often while no deltas arrive
+    const interval = setInterval(
+      fetchAllDashboardData,
+      connectionStatus === 'connected' ? SNAPSHOT_REFRESH_MS : OFFLINE_SNAPSHOT_REFRESH_MS
+    )
+    return () => clearInterval(interval)
+  }, [fetchAllDashboardData, connectionStatus])
+
   // Clear error when component mounts
   useEffect(() => {
     if (error) {
@@ -217,6 +218,18 @@ const Dashboard: React.FC = () => {
           </div>
         </motion.div>
 
+        {liveUpdatesLost && (
+          <div className="mb-8 flex items-center justify-between gap-4 rounded-xl border border-yellow-200 bg-yellow-50 p-4 text-sm text-yellow-800">
+            <div className="flex items-center gap-2">
+              <AlertCircle className="w-4 h-4" />
+              Live updates are unavailable; figures may be out of date and refresh every minute.
+            </div>
+            <button onClick={reconnect} className="btn-secondary">
+              Reconnect
+            </button>
+          </div>
+        )}
+
         {/* Quick Actions */}
         <motion.div
           initial={{ opacity: 0, y: 20 }}
@@ -37,6 +37,16 @@ interface DashboardStats {
   approved_uploads?: number
   rejected_uploads?: number
   average_rating?: number
+
+  // Number of the last stat delta of each WebSocket room these figures include
+  sequences?: Record<string, number>
+}
+
+export interface StatsDeltaMessage {
+  room?: string
+  seq?: number | null
+  first_seq?: number
+  data: Record<string, number>
 }
 
 interface RecentDocument {
@@ -67,12 +77,15 @@ interface DashboardState {
   isLoading: boolean
   error: string | null
   lastUpdated: Date | null
+  sequences: Record<string, number>
 
   // Actions
   fetchStats: () => Promise<void>
   fetchRecentDocuments: () => Promise<void>
   fetchRecentActivity: () => Promise<void>
   fetchAllDashboardData: () => Promise<void>
+  applyStatsDelta: (message: StatsDeltaMessage) => boolean
+  applyRecentDocument: (document: RecentDocument) => void
   clearError: () => void
   reset: () => void
 }
@@ -84,10 +97,11 @@ const initialState = {
   isLoading: false,
   error: null,
   lastUpdated: null,
+  sequences: {},
 }
 
 export const useDashboardStore = create<DashboardState>()(
-  subscribeWithSelector((set) => ({
+  subscribeWithSelector((set, get) => ({
     ...initialState,    fetchStats: async () => {
       try {
         set({ isLoading: true, error: null })
@@ -105,6 +119,7 @@ export const useDashboardStore = create<DashboardState>()(
         const response = await api.get('/dashboard/stats', { params })
         set({ 
           stats: response.data,
+          sequences: response.data.sequences ?? {},
           isLoading: false,
           lastUpdated: new Date()
         })
@@ -186,19 +201,19 @@ export const useDashboardStore = create<DashboardState>()(
         if (userId) params.user_id = userId
         if (authStore.user?.department_id) params.department_id = authStore.user.department_id
         
-        const [statsResponse, documentsResponse, activityResponse] = await Promise.all([
-          api.get('/dashboard/stats', { params }),
-          api.get('/dashboard/recent-documents', { params }),
-          api.get('/dashboard/recent-activity', { params })
-        ])
+        // One round trip for every panel; panels that failed or ran over the
+        // server's latency budget are missing and keep their previous value
+        const response = await api.get('/dashboard/bootstrap', { params })
+        const { panels } = response.data
 
-        set({
-          stats: statsResponse.data,
-          recentDocuments: documentsResponse.data,
-          recentActivity: activityResponse.data,
+        set((state) => ({
+          stats: panels.stats ?? state.stats,
+          sequences: panels.stats?.sequences ?? state.sequences,
+          recentDocuments: panels.recent_documents ?? state.recentDocuments,
+          recentActivity: panels.recent_activity ?? state.recentActivity,
           isLoading: false,
           lastUpdated: new Date()
-        })
+        }))
       } catch (error: any) {
         const message = 'Failed to fetch dashboard data'
         set({ error: message, isLoading: false })
@@ -209,29 +224,42 @@ export const useDashboardStore = create<DashboardState>()(
       }
     },
 
+    // Apply a `stats_delta` pushed over the WebSocket to the last snapshot.
+    // Deltas the snapshot already includes and rooms it does not cover are
+    // skipped, and fields the current role's snapshot does not have are
+    // ignored. Returns false when a numbered delta is missing: the caller
+    // should take a new snapshot.
+    applyStatsDelta: ({ room, seq, first_seq, data }) => {
+      const state = get()
+      if (!state.stats) return true  // The pending snapshot decides what is included
+      let sequences = state.sequences
+      if (room && seq != null) {
+        const last = state.sequences[room]
+        if (last === undefined || seq <= last) return true
+        if ((first_seq ?? seq) !== last + 1) return false
+        sequences = { ...state.sequences, [room]: seq }
+      }
+      const stats: Record<string, any> = { ...state.stats }
+      for (const [field, delta] of Object.entries(data)) {
+        if (typeof stats[field] === 'number') {
+          stats[field] = Math.round((stats[field] + delta) * 10000) / 10000
+        }
+      }
+      set({ stats: stats as DashboardStats, sequences, lastUpdated: new Date() })
+      return true
+    },
+
+    // Insert or replace an entry pushed over the WebSocket in the recent documents list
+    applyRecentDocument: (document) => set((state) => {
+      const existing = state.recentDocuments.find((doc) => doc.id === document.id)
+      const recentDocuments = existing
+        ? state.recentDocuments.map((doc) => (doc.id === document.id ? { ...doc, ...document } : doc))
+        : [document, ...state.recentDocuments].slice(0, Math.max(state.recentDocuments.length, 5))
+      return { recentDocuments, lastUpdated: new Date() }
+    }),
+
     clearError: () => set({ error: null }),
 
     reset: () => set(initialState),
   }))
 )
-
-// Auto-refresh dashboard data every 5 minutes
-let refreshInterval: number | null = null
-
-export const startDashboardAutoRefresh = () => {
-  if (refreshInterval) {
-    clearInterval(refreshInterval)
-  }
-  
-  refreshInterval = setInterval(() => {
-    const { fetchAllDashboardData } = useDashboardStore.getState()
-    fetchAllDashboardData()
-  }, 5 * 60 * 1000) // 5 minutes
-}
-
-export const stopDashboardAutoRefresh = () => {
-  if (refreshInterval) {
-    clearInterval(refreshInterval)
-    refreshInterval = null
-  }
-}
@@ -0,0 +1,33 @@
+-- Migration 001: extracted document text and the related-documents tables
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/001_related_documents.sql
+
+ALTER TABLE documents ADD COLUMN extracted_text TEXT NULL AFTER file_size;
+
+CREATE TABLE IF NOT EXISTS document_term_weights (
+    term_weight_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    term VARCHAR(64) NOT NULL,
+    weight FLOAT NOT NULL,
+    INDEX ix_document_term_weights_document_id (document_id),
+    INDEX ix_document_term_weights_term (term),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS related_documents (
+    relation_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    related_document_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    `rank` INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_related_documents_document_rank (document_id, `rank`),
+    INDEX ix_related_documents_related_document_id (related_document_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (related_document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python reindex.py --tasks text,related
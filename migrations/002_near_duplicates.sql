@@ -0,0 +1,42 @@
+-- Migration 002: MinHash signatures and near-duplicate matches
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/002_near_duplicates.sql
+
+ALTER TABLE documents ADD COLUMN overlap_score FLOAT NULL AFTER extracted_text;
+
+CREATE TABLE IF NOT EXISTS document_signatures (
+    signature_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    signature BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_document_signatures_document_id (document_id),
+    INDEX ix_document_signatures_created_at (created_at),
+    INDEX ix_document_signatures_updated_at (updated_at),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS document_signature_tombstones (
+    tombstone_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_document_signature_tombstones_document_id (document_id),
+    INDEX ix_document_signature_tombstones_deleted_at (deleted_at)
+);
+
+CREATE TABLE IF NOT EXISTS document_overlaps (
+    overlap_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    matched_document_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_document_overlaps_document_id (document_id),
+    INDEX ix_document_overlaps_matched_document_id (matched_document_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (matched_document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python reindex.py --tasks text,signatures
@@ -0,0 +1,42 @@
+-- Migration 003: normalised keyword and author tables
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/003_metadata_terms.sql
+
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    name VARCHAR(255) NOT NULL,
+    normalized_name VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_keywords_normalized_name (normalized_name)
+);
+
+CREATE TABLE IF NOT EXISTS authors (
+    author_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    name VARCHAR(255) NOT NULL,
+    normalized_name VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_authors_normalized_name (normalized_name)
+);
+
+CREATE TABLE IF NOT EXISTS document_keywords (
+    document_id CHAR(36) NOT NULL,
+    keyword_id CHAR(36) NOT NULL,
+    PRIMARY KEY (document_id, keyword_id),
+    INDEX ix_document_keywords_keyword_id (keyword_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (keyword_id) REFERENCES keywords(keyword_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS document_authors (
+    document_id CHAR(36) NOT NULL,
+    author_id CHAR(36) NOT NULL,
+    PRIMARY KEY (document_id, author_id),
+    INDEX ix_document_authors_author_id (author_id),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (author_id) REFERENCES authors(author_id) ON DELETE CASCADE
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.metadata_index
@@ -0,0 +1,33 @@
+-- Migration 004: daily analytics and document status rollups
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/004_analytics_rollups.sql
+
+CREATE TABLE IF NOT EXISTS daily_activity_rollups (
+    rollup_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    day DATE NOT NULL,
+    department_id CHAR(36) NOT NULL,
+    uploads INT NOT NULL DEFAULT 0,
+    approvals INT NOT NULL DEFAULT 0,
+    rejections INT NOT NULL DEFAULT 0,
+    downloads INT NOT NULL DEFAULT 0,
+    storage_bytes BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_daily_activity_day_department (day, department_id),
+    INDEX ix_daily_activity_rollups_department_id (department_id)
+);
+
+CREATE TABLE IF NOT EXISTS document_status_rollups (
+    rollup_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    day DATE NOT NULL,
+    department_id CHAR(36) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    document_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_status_rollup_day_department_status (day, department_id, status),
+    INDEX ix_document_status_rollups_department_id (department_id)
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.rollups --all
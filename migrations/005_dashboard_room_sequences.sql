@@ -0,0 +1,11 @@
+-- Migration 005: sequence numbers of the dashboard stat deltas
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/005_dashboard_room_sequences.sql
+
+CREATE TABLE IF NOT EXISTS dashboard_room_sequences (
+    sequence_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    room VARCHAR(100) NOT NULL UNIQUE,
+    seq INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,10 @@
+-- Migration 006: daily registrations in the activity rollups
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/006_rollup_registrations.sql
+
+ALTER TABLE daily_activity_rollups ADD COLUMN registrations INT NOT NULL DEFAULT 0 AFTER storage_bytes;
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.rollups --all
@@ -0,0 +1,15 @@
+-- Migration 007: denormalized download and view counters on documents
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/007_document_counters.sql
+
+ALTER TABLE documents
+    ADD COLUMN download_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN view_count INT NOT NULL DEFAULT 0;
+
+-- Start the download counter from the existing download rows; views were never recorded
+UPDATE documents d
+SET download_count = (SELECT COUNT(*) FROM downloads dl WHERE dl.document_id = d.document_id);
+
+CREATE INDEX ix_documents_popularity ON documents (download_count, view_count);
+CREATE INDEX ix_documents_uploader_downloads ON documents (uploader_id, download_count);
@@ -0,0 +1,15 @@
+-- Migration 008: HyperLogLog sketches of unique viewers and downloaders
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/008_unique_visitor_sketches.sql
+
+CREATE TABLE IF NOT EXISTS unique_visitor_sketches (
+    sketch_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    scope VARCHAR(20) NOT NULL,
+    scope_id CHAR(36) NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    period VARCHAR(10) NOT NULL,
+    registers BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_unique_sketch_scope_kind_period (scope, scope_id, kind, period)
+);
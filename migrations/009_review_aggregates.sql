@@ -0,0 +1,24 @@
+-- Migration 009: review turnaround and workload aggregates
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/009_review_aggregates.sql
+
+CREATE TABLE IF NOT EXISTS review_aggregates (
+    aggregate_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    scope VARCHAR(20) NOT NULL,
+    scope_id CHAR(36) NOT NULL,
+    assigned_reviews INT NOT NULL DEFAULT 0,
+    open_reviews INT NOT NULL DEFAULT 0,
+    completed_reviews INT NOT NULL DEFAULT 0,
+    approved INT NOT NULL DEFAULT 0,
+    rejected INT NOT NULL DEFAULT 0,
+    needs_revision INT NOT NULL DEFAULT 0,
+    turnaround_hours_sum FLOAT NOT NULL DEFAULT 0,
+    turnaround_histogram TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_review_aggregate_scope (scope, scope_id)
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.review_stats
@@ -0,0 +1,20 @@
+-- Migration 010: daily department leaderboard ranks
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/010_department_rank_snapshots.sql
+
+CREATE TABLE IF NOT EXISTS department_rank_snapshots (
+    snapshot_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    day DATE NOT NULL,
+    department_id CHAR(36) NOT NULL,
+    `rank` INT NOT NULL,
+    score FLOAT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_rank_snapshot_day_department (day, department_id),
+    INDEX ix_department_rank_snapshots_day (day),
+    INDEX ix_department_rank_snapshots_department_id (department_id)
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.leaderboard
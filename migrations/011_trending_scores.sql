@@ -0,0 +1,15 @@
+-- Migration 011: time-decayed document popularity scores
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/011_trending_scores.sql
+
+CREATE TABLE IF NOT EXISTS document_trending_scores (
+    trending_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL UNIQUE,
+    department_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    landmark FLOAT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_document_trending_scores_department_id (department_id),
+    INDEX ix_document_trending_scores_score (score)
+);
@@ -0,0 +1,36 @@
+-- Migration 012: download co-occurrence counts and recommendations
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/012_recommendations.sql
+
+CREATE TABLE IF NOT EXISTS co_downloads (
+    co_download_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    department_id CHAR(36) NOT NULL,
+    document_id CHAR(36) NOT NULL,
+    other_document_id CHAR(36) NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_co_download_pair (department_id, document_id, other_document_id)
+);
+
+CREATE TABLE IF NOT EXISTS document_recommendations (
+    recommendation_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    department_id CHAR(36) NOT NULL,
+    document_id CHAR(36) NOT NULL,
+    recommended_document_id CHAR(36) NOT NULL,
+    score FLOAT NOT NULL,
+    `rank` INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_document_recommendations_lookup (department_id, document_id, `rank`),
+    FOREIGN KEY (recommended_document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    checkpoint_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    job VARCHAR(50) NOT NULL UNIQUE,
+    position DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.recommendations --full
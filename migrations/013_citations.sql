@@ -0,0 +1,54 @@
+-- Migration 013: citation graph, reference token postings and impact scores
+-- Applies to a database created from complete_database.sql; main.py does not run create_all.
+--
+--     mysql academic_repo_db < migrations/013_citations.sql
+
+CREATE TABLE IF NOT EXISTS citations (
+    citation_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    citing_document_id CHAR(36) NOT NULL,
+    position INT NOT NULL,
+    reference_text TEXT NOT NULL,
+    cited_document_id CHAR(36),
+    match_score FLOAT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_citations_citing_position (citing_document_id, position),
+    INDEX ix_citations_cited_document_id (cited_document_id),
+    FOREIGN KEY (citing_document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+    FOREIGN KEY (cited_document_id) REFERENCES documents(document_id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS citation_title_tokens (
+    title_token_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL,
+    token VARCHAR(64) NOT NULL,
+    title_size INT NOT NULL,
+    INDEX ix_citation_title_tokens_document_id (document_id),
+    INDEX ix_citation_title_tokens_token (token),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS citation_reference_tokens (
+    reference_token_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    citation_id CHAR(36) NOT NULL,
+    token VARCHAR(64) NOT NULL,
+    INDEX ix_citation_reference_tokens_citation_id (citation_id),
+    INDEX ix_citation_reference_tokens_token (token),
+    FOREIGN KEY (citation_id) REFERENCES citations(citation_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS document_impact_scores (
+    impact_id CHAR(36) PRIMARY KEY DEFAULT (UUID()),
+    document_id CHAR(36) NOT NULL UNIQUE,
+    department_id CHAR(36) NOT NULL,
+    citation_count INT NOT NULL DEFAULT 0,
+    impact_score FLOAT NOT NULL DEFAULT 0,
+    `rank` INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_document_impact_scores_department_id (department_id),
+    INDEX ix_document_impact_scores_impact_score (impact_score),
+    FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+);
+
+-- Fill from the existing rows afterwards (from backend/):
+--
+--     python -m app.core.citations